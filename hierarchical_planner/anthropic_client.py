@@ -5,14 +5,24 @@ Provides functions for configuring the client, initializing the model,
 generating text content, generating structured JSON content, and handling retries.
 Supports Claude 3.7 Sonnet with extended thinking capabilities.
 """
-import anthropic
 import json
 import logging
 import asyncio
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, AsyncIterator
 
 # Local imports for exceptions
-from .exceptions import ApiKeyError, ApiCallError, ApiResponseError, ApiBlockedError, JsonParsingError, JsonProcessingError
+from .exceptions import ApiKeyError, ApiCallError, ApiResponseError, ApiBlockedError, JsonParsingError, JsonProcessingError, DeadlineExceededError
+from .rate_limiter import get_rate_limiter
+from .http_pool import async_client_options, current_loop, http_settings
+from .prompt_renderer import render_prompt, cacheable_prefix
+from . import telemetry
+from . import deadline
+from .circuit_breaker import get_circuit_breaker, open_circuit_error
+from .lazy_imports import lazy_import
+
+# Imported on first use (see lazy_imports)
+anthropic = lazy_import('anthropic')
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
@@ -20,13 +30,20 @@ logger = logging.getLogger(__name__)
 # Global variables to store client configuration
 _anthropic_client = None
 _client_configured = False
+# Event loop the client's pooled connections belong to
+_client_loop = None
 
-def configure_client(api_key: str):
-    """Configures the Anthropic client with the API key."""
-    global _anthropic_client, _client_configured
+def configure_client(api_key: str, config: Optional[Dict[str, Any]] = None):
+    """
+    Configures the async Anthropic client with the API key.
+
+    The client sends requests over the shared connection pool from `http_pool`,
+    sized and timed out according to the `http` config section.
+    """
+    global _anthropic_client, _client_configured, _client_loop
     
-    # Skip if already configured
-    if _client_configured:
+    # Skip if already configured for the running event loop
+    if _client_configured and _client_loop is current_loop():
         return
         
     if not api_key:
@@ -34,7 +51,8 @@ def configure_client(api_key: str):
         raise ApiKeyError("API key is required to configure the Anthropic client.")
     
     try:
-        _anthropic_client = anthropic.Anthropic(api_key=api_key)
+        _anthropic_client = anthropic.AsyncAnthropic(api_key=api_key, **async_client_options(anthropic, config or {}))
+        _client_loop = current_loop()
         logger.info("Anthropic client configured successfully.")
         _client_configured = True
     except Exception as e:
@@ -43,7 +61,7 @@ def configure_client(api_key: str):
 
 def get_anthropic_client(config: Dict[str, Any]):
     """
-    Initializes and returns the Anthropic client based on config.
+    Initializes and returns the async Anthropic client based on config.
     
     Args:
         config: The application configuration dictionary.
@@ -59,12 +77,12 @@ def get_anthropic_client(config: Dict[str, Any]):
     api_config = config.get('anthropic', {})
     api_key = api_config.get('api_key')
     
-    # If client is already initialized, reuse it
-    if _client_configured and _anthropic_client is not None:
+    # If client is already initialized on this event loop, reuse it
+    if _client_configured and _anthropic_client is not None and _client_loop is current_loop():
         return _anthropic_client
     
-    # Configure client if not yet initialized
-    configure_client(api_key)
+    # Configure client if not yet initialized (or its connections belong to another loop)
+    configure_client(api_key, config)
     
     return _anthropic_client
 
@@ -79,6 +97,71 @@ def is_rate_limit_error(exception: Exception) -> bool:
         "resource exhausted" in error_msg
     )
 
+def _message_params(prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds the Messages API parameters for a prompt from the `anthropic` config section."""
+    # Extract model settings from config
+    api_config = config.get('anthropic', {})
+    model_name = api_config.get('model_name', 'claude-3-7-sonnet-20250219')
+    temperature = api_config.get('temperature', 0.7)
+    max_tokens = api_config.get('max_tokens', 4096)
+    
+    # Check if extended thinking is enabled
+    extended_thinking = api_config.get('extended_thinking', False)
+    
+    logger.debug(f"Sending prompt to Anthropic model {model_name}:\n{prompt[:200]}...") # Log truncated prompt
+    
+    # Prepare messages; a prefix shared with other prompts (constitution, goal)
+    # is sent as its own block marked for prompt caching
+    prefix = None
+    if api_config.get('prompt_caching', True):
+        prefix = cacheable_prefix(prompt, int(api_config.get('prompt_cache_min_chars', 4000)))
+    if prefix:
+        content: Any = [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt[len(prefix):]},
+        ]
+    else:
+        content = prompt
+    messages = [
+        {"role": "user", "content": content}
+    ]
+    
+    # Prepare API call parameters
+    api_params = {
+        "model": model_name,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    
+    # Add system prompt if provided
+    system_prompt = api_config.get('system_prompt')
+    if system_prompt:
+        api_params["system"] = system_prompt
+        
+    # Add extended thinking if enabled
+    if extended_thinking:
+        api_params["thinking"] = {
+            "enabled": True,
+            "min_tokens": api_config.get('thinking_min_tokens', 1024),
+            "max_tokens": api_config.get('thinking_max_tokens', 8192)
+        }
+        
+    # Add stop sequences if provided
+    stop_sequences = api_config.get('stop_sequences')
+    if stop_sequences:
+        api_params["stop_sequences"] = stop_sequences
+
+    # Don't let the request outlive the deadline of the call it belongs to
+    if deadline.remaining() is not None:
+        api_params["timeout"] = deadline.clamp_timeout(http_settings(config)['timeout_sec'])
+
+    return api_params
+
+def _usage_tokens(usage: Any, *fields: str) -> int:
+    """Sums the token counts a response's usage reports in `fields` (missing ones count 0)."""
+    return sum(value for value in (getattr(usage, name, None) for name in fields) if isinstance(value, int))
+
 async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
     """
     Sends a prompt to the configured Anthropic model and returns the text response.
@@ -98,53 +181,15 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
     try:
         client = get_anthropic_client(config)
         
-        # Extract model settings from config
-        api_config = config.get('anthropic', {})
-        model_name = api_config.get('model_name', 'claude-3-7-sonnet-20250219')
-        temperature = api_config.get('temperature', 0.7)
-        max_tokens = api_config.get('max_tokens', 4096)
-        
-        # Check if extended thinking is enabled
-        extended_thinking = api_config.get('extended_thinking', False)
-        
-        logger.debug(f"Sending prompt to Anthropic model {model_name}:\n{prompt[:200]}...") # Log truncated prompt
+        api_params = _message_params(prompt, config)
         
-        # Prepare messages
-        messages = [
-            {"role": "user", "content": prompt}
-        ]
-        
-        # Prepare API call parameters
-        api_params = {
-            "model": model_name,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-        }
-        
-        # Add system prompt if provided
-        system_prompt = api_config.get('system_prompt')
-        if system_prompt:
-            api_params["system"] = system_prompt
-            
-        # Add extended thinking if enabled
-        if extended_thinking:
-            api_params["thinking"] = {
-                "enabled": True,
-                "min_tokens": api_config.get('thinking_min_tokens', 1024),
-                "max_tokens": api_config.get('thinking_max_tokens', 8192)
-            }
-            
-        # Add stop sequences if provided
-        stop_sequences = api_config.get('stop_sequences')
-        if stop_sequences:
-            api_params["stop_sequences"] = stop_sequences
-            
         # Make the API call
-        response = await asyncio.to_thread(
-            client.messages.create,
-            **api_params
-        )
+        response = await client.messages.create(**api_params)
+        usage = getattr(response, 'usage', None)
+        # input_tokens excludes prompt-cache reads and writes; writes are counted as regular input
+        telemetry.note_usage(_usage_tokens(usage, 'input_tokens', 'cache_creation_input_tokens'),
+                             _usage_tokens(usage, 'output_tokens'),
+                             _usage_tokens(usage, 'cache_read_input_tokens'))
         
         # Extract content from response
         if not response.content:
@@ -176,6 +221,36 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
         logger.error(f"Unexpected error during Anthropic API call: {e}", exc_info=True)
         raise ApiCallError(f"Unexpected error during Anthropic API call: {e}") from e
 
+async def stream_content(prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Streams the text of an Anthropic response as it is generated.
+
+    Args:
+        prompt: The prompt string to send to the model.
+        config: The application configuration dictionary.
+
+    Yields:
+        Text deltas in the order they arrive.
+
+    Raises:
+        ApiCallError: If the API call fails.
+        ApiBlockedError: If the request is blocked.
+    """
+    try:
+        client = get_anthropic_client(config)
+        async with client.messages.stream(**_message_params(prompt, config)) as stream:
+            async for text in stream.text_stream:
+                yield text
+    except anthropic.APIError as e:
+        if "blocked" in str(e).lower() or "content policy" in str(e).lower():
+            logger.error(f"Anthropic API request was blocked: {e}", exc_info=True)
+            raise ApiBlockedError(f"Anthropic API request was blocked: {e}", reason=str(e))
+        logger.error(f"Error during Anthropic streaming call: {e}", exc_info=True)
+        raise ApiCallError(f"Error during Anthropic streaming call: {e}") from e
+    except Exception as e:
+        logger.error(f"Unexpected error during Anthropic streaming call: {e}", exc_info=True)
+        raise ApiCallError(f"Unexpected error during Anthropic streaming call: {e}") from e
+
 async def generate_structured_content(prompt: str, config: Dict[str, Any], structure_hint: str = "Return only JSON.") -> dict:
     """
     Sends a prompt expecting a structured (JSON) response from Anthropic.
@@ -244,26 +319,52 @@ async def call_anthropic_with_retry(prompt_template: str, context: dict, config:
         
     Raises:
         ApiCallError: If all retries fail.
+        DeadlineExceededError: If the active deadline (see `deadline`) passes first.
+        CircuitOpenError: If the Anthropic circuit breaker is open.
     """
-    prompt = prompt_template.format(**context)
+    prompt = render_prompt(prompt_template, context)
     last_exception = None
     max_retries = config.get('anthropic', {}).get('retries', 3) # Get retries from config
+    limiter = get_rate_limiter(config, 'anthropic')
+    breaker = get_circuit_breaker(config, 'anthropic')
 
     for attempt in range(max_retries):
+        if breaker and not breaker.allow_request():
+            raise open_circuit_error('anthropic', last_exception)
+        telemetry.note_attempt()
+        started = time.perf_counter()
         try:
+            if limiter:
+                await limiter.acquire()
             if is_structured:
                 # Pass config to generate_structured_content
-                response = await generate_structured_content(prompt, config)
+                response = await deadline.bounded(generate_structured_content(prompt, config))
             else:
                 # Pass config to generate_content
-                response = await generate_content(prompt, config)
+                response = await deadline.bounded(generate_content(prompt, config))
             logger.debug(f"Anthropic call successful after {attempt + 1} attempt(s).")
+            if limiter:
+                limiter.on_success()
+            if breaker:
+                breaker.on_success(time.perf_counter() - started)
             return response
+        except DeadlineExceededError:
+            logger.warning(f"Anthropic call attempt {attempt + 1}/{max_retries} ran out of its deadline budget.")
+            raise
         except Exception as e:
             last_exception = e
+            if limiter and is_rate_limit_error(e):
+                limiter.on_rate_limited()
+            if breaker:
+                breaker.on_failure(e)
             logger.warning(f"Anthropic call attempt {attempt + 1}/{max_retries} failed: {e}")
             if attempt < max_retries - 1:
+                if breaker and not breaker.is_available():
+                    continue  # The circuit just opened; don't wait out a backoff first
                 wait_time = 2 ** attempt
+                if not deadline.allows_retry(wait_time):
+                    raise DeadlineExceededError(
+                        f"Anthropic API call failed after {attempt + 1} attempt(s); no deadline budget left to retry.") from e
                 logger.info(f"Retrying in {wait_time} seconds...")
                 await asyncio.sleep(wait_time) # Exponential backoff
             else:
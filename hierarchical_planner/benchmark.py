@@ -0,0 +1,365 @@
+"""
+End-to-end throughput benchmarks on the local mock provider.
+
+Runs the real entry points against `mock_client` (no network, no API keys) at
+several plan sizes and reports wall time, LLM calls per second, p50/p99 call
+latency, simulated 429s and peak RSS:
+
+- workflow:   `main.main_workflow` (constitution, plan generation and interleaved QA)
+- validation: `qa_validator.run_validation` on a pre-built plan
+- persona:    the persona builder CLI (`persona_builder.cli.main_async`)
+
+Each measurement runs in a fresh interpreter so peak RSS belongs to that run
+alone. `--startup` instead times start-up: importing the entry modules and
+running `main --help`, each in fresh interpreters (median of `--startup-runs`).
+Usage:
+
+    python -m hierarchical_planner.benchmark --sizes small medium --output bench.json
+    python -m hierarchical_planner.benchmark --baseline bench.json --tolerance 0.2
+    python -m hierarchical_planner.benchmark --startup
+
+With `--baseline`, the exit status is 1 if any run's wall time grew by more
+than the tolerance, so the suite can gate changes in CI.
+"""
+import argparse
+import asyncio
+import copy
+import importlib
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+from . import mock_client
+from .config_loader import load_config
+from .checkpoint_writer import get_checkpoint_writer
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("workflow", "validation", "persona")
+
+# Plan shape per size; `personas` is the number of cards fed to the persona CLI
+SIZES: Dict[str, Dict[str, int]] = {
+    'small': {'phases': 2, 'tasks_per_phase': 2, 'steps_per_task': 3, 'personas': 4},
+    'medium': {'phases': 4, 'tasks_per_phase': 4, 'steps_per_task': 5, 'personas': 16},
+    'large': {'phases': 8, 'tasks_per_phase': 6, 'steps_per_task': 6, 'personas': 48},
+}
+
+PERSONA_DELIMITER = "~[PERSONA]"
+
+# Start-up commands timed by --startup: label -> interpreter arguments
+STARTUP_COMMANDS: Dict[str, List[str]] = {
+    'import_main': ['-c', 'import hierarchical_planner.main'],
+    'import_qa': ['-c', 'import hierarchical_planner.qa_validator'],
+    'import_persona': ['-c', 'import hierarchical_planner.persona_builder.cli'],
+    'cli_help': ['-m', 'hierarchical_planner.main', '--help'],
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Returns the nearest-rank percentile of `values`, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Returns the peak resident set size of this process in MiB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_config(workdir: str, size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the planner configuration for one benchmark run in `workdir`."""
+    shape = SIZES[size]
+    config = copy.deepcopy(load_config())
+    config['default_provider'] = 'mock'
+    # Every call must reach the provider to be measured
+    config['cache'] = {**config.get('cache', {}), 'enabled': False}
+    config['checkpoint'] = {**config.get('checkpoint', {}), 'directory': os.path.join(workdir, 'checkpoints')}
+    config['files'] = {**config.get('files', {}), 'default_task': os.path.join(workdir, 'task.txt')}
+    config['mock'] = {
+        **config.get('mock', {}),
+        'phases': shape['phases'],
+        'tasks_per_phase': shape['tasks_per_phase'],
+        'steps_per_task': shape['steps_per_task'],
+        'latency_ms': options.get('latency_ms', 20.0),
+        'jitter_ms': options.get('jitter_ms', 5.0),
+        'rate_limit_probability': options.get('rate_limit_probability', 0.0),
+        'seed': options.get('seed', 0),
+    }
+    generation = dict(config.get('generation', {}))
+    if options.get('concurrent'):
+        generation['concurrent'] = True
+    if options.get('stream'):
+        generation['stream'] = True
+    config['generation'] = generation
+    rate_limits = dict(config.get('rate_limits') or {})
+    if options.get('requests_per_sec'):
+        rate_limits['mock'] = {'requests_per_sec': options['requests_per_sec'], 'burst': options.get('burst', 4)}
+    config['rate_limits'] = rate_limits
+    return config
+
+
+def _write(path: str, text: str) -> str:
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def _synthetic_plan(size: str) -> Dict[str, Any]:
+    """Builds a plan of the given size without generating it, for the validation benchmark."""
+    shape = SIZES[size]
+    return {
+        f"Phase {p}: Benchmark phase {p}": {
+            f"Task {p}.{t}: Benchmark task {t}": [
+                {f"step {s}": f"Implement part {s} of task {p}.{t} in module_{p}_{t}_{s}.py using Python."}
+                for s in range(1, shape['steps_per_task'] + 1)
+            ]
+            for t in range(1, shape['tasks_per_phase'] + 1)
+        }
+        for p in range(1, shape['phases'] + 1)
+    }
+
+
+async def _run_workflow(workdir: str, size: str, config: Dict[str, Any]) -> int:
+    from .main import main_workflow
+
+    task_file = _write(config['files']['default_task'], f"Build a {size} command-line todo application.")
+    output_file = os.path.join(workdir, 'reasoning_tree.json')
+    await main_workflow(task_file, output_file, os.path.join(workdir, 'reasoning_tree_validated.json'),
+                        skip_qa=False, config=config, skip_resume=True, provider='mock')
+    if not os.path.exists(output_file):
+        raise RuntimeError("Workflow benchmark produced no plan; see the planner log for the error.")
+    with open(output_file, 'r', encoding='utf-8') as f:
+        return sum(len(steps) for tasks in json.load(f).values() for steps in tasks.values())
+
+
+async def _run_validation(workdir: str, size: str, config: Dict[str, Any]) -> int:
+    from .qa_validator import run_validation
+
+    _write(config['files']['default_task'], f"Build a {size} command-line todo application.")
+    plan = _synthetic_plan(size)
+    input_path = _write(os.path.join(workdir, 'reasoning_tree.json'), json.dumps(plan))
+    output_path = os.path.join(workdir, 'reasoning_tree_validated.json')
+    constitution = mock_client.respond("Founding Architect", config)
+    await run_validation(input_path, output_path, config, resume=False, provider='mock', constitution=constitution)
+    if not os.path.exists(output_path):
+        raise RuntimeError("Validation benchmark produced no validated plan; see the planner log for the error.")
+    return sum(len(steps) for tasks in plan.values() for steps in tasks.values())
+
+
+async def _run_persona(workdir: str, size: str, config: Dict[str, Any]) -> int:
+    from .persona_builder import cli as persona_cli
+
+    count = SIZES[size]['personas']
+    cards = [f"Persona {i}\nTitle: Benchmark persona {i}\nInstructions: Answer questions about topic {i}."
+             for i in range(1, count + 1)]
+    input_file = _write(os.path.join(workdir, 'personas.txt'), f"\n{PERSONA_DELIMITER}\n".join(cards))
+    output_dir = os.path.join(workdir, 'personas')
+    args = argparse.Namespace(input_file=input_file, output_dir=output_dir, provider='mock')
+    await persona_cli.main_async(args, config)
+    return len(os.listdir(output_dir)) if os.path.isdir(output_dir) else 0
+
+
+# Imported before timing starts so import cost is not part of the measurement
+_ENTRY_MODULES = {
+    'workflow': '.main',
+    'validation': '.qa_validator',
+    'persona': '.persona_builder.cli',
+}
+
+_RUNNERS = {
+    'workflow': _run_workflow,
+    'validation': _run_validation,
+    'persona': _run_persona,
+}
+
+
+def run_scenario(scenario: str, size: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Runs one benchmark in this process and returns its measurements.
+
+    The run happens in a temporary working directory (the workflow writes the
+    project constitution to the current directory), which is removed afterwards.
+    """
+    options = options or {}
+    mock_client.reset_stats()
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"bench_{scenario}_{size}_") as workdir:
+        config = build_config(workdir, size, options)
+        importlib.import_module(_ENTRY_MODULES[scenario], __package__)
+        os.chdir(workdir)
+        try:
+            started = time.perf_counter()
+            produced = asyncio.run(_RUNNERS[scenario](workdir, size, config))
+            wall = time.perf_counter() - started
+            # Pending checkpoint writes target the temporary directory
+            get_checkpoint_writer().flush()
+        finally:
+            os.chdir(previous_cwd)
+
+    latencies = list(mock_client.call_latencies)
+    p50 = percentile(latencies, 50)
+    p99 = percentile(latencies, 99)
+    return {
+        'scenario': scenario,
+        'size': size,
+        'wall_sec': round(wall, 4),
+        'calls': len(latencies),
+        'calls_per_sec': round(len(latencies) / wall, 2) if wall > 0 else None,
+        'p50_ms': round(p50 * 1000, 2) if p50 is not None else None,
+        'p99_ms': round(p99 * 1000, 2) if p99 is not None else None,
+        'rate_limited': mock_client.rate_limit_errors,
+        'produced': produced,
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource is not None else None,
+    }
+
+
+def run_isolated(scenario: str, size: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one benchmark in a fresh interpreter so its peak RSS is not shared with other runs."""
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory(prefix="bench_result_") as result_dir:
+        result_file = os.path.join(result_dir, 'result.json')
+        command = [sys.executable, '-m', 'hierarchical_planner.benchmark', '--run-one', scenario, size,
+                   '--result-file', result_file, '--options-json', json.dumps(options)]
+        subprocess.run(command, cwd=package_parent, check=True)
+        with open(result_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def measure_startup(runs: int = 5) -> List[Dict[str, Any]]:
+    """
+    Times each start-up command in fresh interpreters and returns the median wall time per command.
+
+    The times include interpreter start-up itself, which is the cost every CLI
+    invocation pays on top of importing the package.
+    """
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for label, arguments in STARTUP_COMMANDS.items():
+        times = []
+        for _ in range(max(1, runs)):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, *arguments], cwd=package_parent, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - started)
+        results.append({'scenario': 'startup', 'size': label, 'wall_sec': round(percentile(times, 50), 4)})
+    return results
+
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Returns a description of every run whose wall time exceeds its baseline by more than `tolerance`."""
+    previous = {(r['scenario'], r['size']): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get((result['scenario'], result['size']))
+        if not base or not base.get('wall_sec'):
+            continue
+        ratio = result['wall_sec'] / base['wall_sec']
+        if ratio > 1.0 + tolerance:
+            regressions.append(f"{result['scenario']}/{result['size']}: {base['wall_sec']:.3f}s -> "
+                               f"{result['wall_sec']:.3f}s (+{(ratio - 1.0) * 100:.0f}%)")
+    return regressions
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    """Formats results as a fixed-width text table."""
+    columns = ('scenario', 'size', 'wall_sec', 'calls', 'calls_per_sec', 'p50_ms', 'p99_ms', 'rate_limited', 'peak_rss_mb')
+    rows = [columns] + [tuple('-' if r.get(c) is None else str(r[c]) for c in columns) for r in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point; returns the process exit status."""
+    parser = argparse.ArgumentParser(description="Benchmark the planner end to end on the local mock LLM provider.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Entry points to benchmark (default: all).")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=['small', 'medium'],
+                        help="Plan sizes to run (default: small medium).")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean simulated call latency (default: 20).")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="Uniform latency jitter (default: 5).")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0,
+                        help="Chance that a mock call attempt fails with a 429 (default: 0).")
+    parser.add_argument("--requests-per-sec", type=float, default=None,
+                        help="Pace mock calls with the provider rate limiter at this rate (default: unpaced).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for simulated latencies and 429s.")
+    parser.add_argument("--concurrent", action="store_true", help="Enable concurrent plan generation.")
+    parser.add_argument("--stream", action="store_true", help="Enable streamed phase and task lists.")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run every benchmark in this process (faster; peak RSS is then cumulative).")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare wall times against.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed wall-time increase over the baseline, as a fraction (default: 0.2).")
+    parser.add_argument("--verbose", action="store_true", help="Show planner log output.")
+    parser.add_argument("--startup", action="store_true",
+                        help="Time package imports and CLI start-up instead of the throughput scenarios.")
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="Fresh interpreters per start-up command; the median is reported (default: 5).")
+    # Internal: run a single benchmark for run_isolated()
+    parser.add_argument("--run-one", nargs=2, metavar=("SCENARIO", "SIZE"), help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    parser.add_argument("--options-json", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    if args.run_one:
+        result = run_scenario(args.run_one[0], args.run_one[1], json.loads(args.options_json or "{}"))
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return 0
+
+    options = {
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'rate_limit_probability': args.rate_limit_probability,
+        'requests_per_sec': args.requests_per_sec,
+        'seed': args.seed,
+        'concurrent': args.concurrent,
+        'stream': args.stream,
+    }
+    results = []
+    if args.startup:
+        results = measure_startup(args.startup_runs)
+    else:
+        for size in args.sizes:
+            for scenario in args.scenarios:
+                run = run_scenario if args.in_process else run_isolated
+                results.append(run(scenario, size, options))
+    print(format_table(results))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Index of the checkpoints stored in a checkpoint directory.
+
+`index.json` maps each lookup key (the checkpoint id, a digest of goal and
+constitution, for generation checkpoints; the input path for QA checkpoints) to the checkpoint file, its
+last update time and a small progress summary. Resume lookups read only this
+file instead of listing the directory and parsing every checkpoint.
+
+The index is rebuilt by scanning the directory when it is missing or
+unreadable, which also picks up checkpoints written by earlier versions.
+Several processes may share a checkpoint directory: every write of the index
+re-reads it under a file lock and merges in the local changes, so concurrent
+runs never drop each other's entries.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; index writes are then only locked within a process
+    fcntl = None
+
+from .checkpoint_journal import CheckpointJournal, JOURNAL_SUFFIX
+from .checkpoint_writer import CheckpointWriter, atomic_write
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+#: Suffix of the lock file that serializes index writes across processes.
+LOCK_SUFFIX = ".lock"
+INDEX_VERSION = 2
+
+#: File extension of checkpoints written before the journal format.
+LEGACY_SUFFIX = ".checkpoint.json"
+
+GENERATION = "generation"
+QA = "qa"
+
+
+def checkpoint_id(goal: str, constitution: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Returns the stable hex SHA-256 identity of a generation run.
+
+    The digest covers the full goal text and, when given, the constitution in
+    canonical JSON form, so runs that differ in either never share a checkpoint.
+    """
+    if constitution is None:
+        material = goal
+    else:
+        material = json.dumps([goal, constitution], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def goal_hash(goal: str) -> str:
+    """Returns the identity of a goal alone (used by checkpoints saved without a constitution)."""
+    return checkpoint_id(goal)
+
+
+def stored_checkpoint_id(checkpoint_data: Dict[str, Any]) -> str:
+    """Returns the id a generation checkpoint was saved under, deriving it for legacy files."""
+    return checkpoint_data.get("checkpoint_id") or goal_hash(checkpoint_data.get("goal") or "")
+
+
+def lookup_key(kind: str, identity: str) -> str:
+    """Returns the index key for a checkpoint: its checkpoint id for generation, input path for QA."""
+    return f"{kind}:{identity}"
+
+
+def _identity(kind: str, identity: str) -> Dict[str, str]:
+    """Returns the identifying fields stored with an entry (never the full goal text)."""
+    if kind == GENERATION:
+        return {"checkpoint_id": identity}
+    return {"input_path": identity}
+
+
+def summarize(kind: str, checkpoint_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds the progress summary stored in the index without walking the whole tree."""
+    if kind == GENERATION:
+        completed = checkpoint_data.get("completed_tasks") or {}
+        return {
+            "phases": len(checkpoint_data.get("reasoning_tree") or {}),
+            "phases_expanded": len(completed),
+            "tasks_completed": sum(len(tasks) for tasks in completed.values()),
+        }
+    return {
+        "last_phase": checkpoint_data.get("last_phase"),
+        "last_task": checkpoint_data.get("last_task"),
+        "last_step_index": checkpoint_data.get("last_step_index", -1),
+    }
+
+
+def _merge(entries: Dict[str, Dict[str, Any]], changes: Dict[str, Dict[str, Any]],
+           removed: Dict[str, float]) -> None:
+    """
+    Applies local changes to entries read from disk, in place.
+
+    Removals drop entries for the file that are not newer than the removal;
+    puts replace entries unless the one on disk was updated later.
+    """
+    for filename, removed_at in removed.items():
+        for key in [key for key, entry in entries.items()
+                    if entry.get("file") == filename and entry.get("updated", 0) <= removed_at]:
+            del entries[key]
+    for key, entry in changes.items():
+        current = entries.get(key)
+        if current is None or current.get("updated", 0) <= entry["updated"]:
+            entries[key] = entry
+
+
+@contextlib.contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """Holds an exclusive inter-process lock on `path` (a no-op where `fcntl` is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class CheckpointIndex:
+    """
+    In-memory view of `index.json`, persisted after every change.
+
+    Entries store file names relative to the checkpoint directory. One
+    instance is shared per directory (see `get_checkpoint_index`) so that
+    several managers in the same process never overwrite each other's updates.
+    Other processes may share the directory too: each write re-reads the file
+    under a lock (`index.json.lock`) and merges this process's changes into it.
+    """
+
+    def __init__(self, checkpoint_dir: str, writer: Optional[CheckpointWriter] = None):
+        self.checkpoint_dir = checkpoint_dir
+        self.path = os.path.join(checkpoint_dir, INDEX_FILENAME)
+        self.lock_path = self.path + LOCK_SUFFIX
+        self.writer = writer
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # Changes not yet merged into the file: entries put by key, and removal times by file name
+        self._changes: Dict[str, Dict[str, Any]] = {}
+        self._removed: Dict[str, float] = {}
+        # Reentrant: without a writer, rebuilding inside a lookup writes the index synchronously
+        self._lock = threading.RLock()
+
+    def _scan(self) -> Dict[str, Dict[str, Any]]:
+        """Builds entries by loading every checkpoint in the directory (used only to rebuild)."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not os.path.isdir(self.checkpoint_dir):
+            return entries
+        for filename in os.listdir(self.checkpoint_dir):
+            if filename.startswith("gen_"):
+                kind = GENERATION
+            elif filename.startswith("qa_"):
+                kind = QA
+            else:
+                continue
+            path = os.path.join(self.checkpoint_dir, filename)
+            try:
+                if filename.endswith(JOURNAL_SUFFIX):
+                    checkpoint_data = CheckpointJournal(path).load()
+                elif filename.endswith(LEGACY_SUFFIX):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        checkpoint_data = json.load(f)
+                else:
+                    continue
+                updated = os.path.getmtime(path)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable checkpoint {path} while indexing: {e}")
+                continue
+            if not checkpoint_data:
+                continue
+            if kind == GENERATION:
+                identity = stored_checkpoint_id(checkpoint_data) if checkpoint_data.get("goal") else None
+            else:
+                identity = checkpoint_data.get("input_path")
+            if not identity:
+                continue
+            key = lookup_key(kind, identity)
+            if key in entries and entries[key]["updated"] >= updated:
+                continue
+            entries[key] = {"kind": kind, "file": filename, "updated": updated,
+                            "summary": summarize(kind, checkpoint_data), **_identity(kind, identity)}
+        return entries
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        """Reads the entries in `index.json`. Raises if it is missing or unreadable."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported index version {data.get('version')}")
+        entries = data["entries"]
+        if not isinstance(entries, dict):
+            raise TypeError("index entries must be an object")
+        return entries
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is not None:
+            return self._entries
+        try:
+            self._entries = self._read()
+        except FileNotFoundError:
+            logger.info(f"No checkpoint index at {self.path}; building it from the checkpoint directory")
+            self._rebuild()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Rebuilding unreadable checkpoint index {self.path}: {e}")
+            self._rebuild()
+        return self._entries
+
+    def _rebuild(self) -> None:
+        self._entries = self._scan()
+        self._changes.update(self._entries)
+        self._persist()
+
+    def _persist(self) -> None:
+        if self.writer:
+            self.writer.write_update(self.path, self._write)
+        else:
+            self._write()
+
+    def _write(self) -> None:
+        """Merges the pending changes into `index.json` under the inter-process lock."""
+        with self._lock:
+            changes, removed = self._changes, self._removed
+            self._changes, self._removed = {}, {}
+            known = dict(self._entries or {})
+        try:
+            with _file_lock(self.lock_path):
+                try:
+                    entries = self._read()
+                except (OSError, ValueError, KeyError, TypeError):
+                    # Missing or damaged on disk; this process's view is the best base
+                    entries = known
+                _merge(entries, changes, removed)
+                data = json.dumps({"version": INDEX_VERSION, "entries": entries}, ensure_ascii=False, indent=2)
+                atomic_write(self.path, (data + "\n").encode("utf-8"))
+        except BaseException:
+            with self._lock:
+                # Retried with the next write, behind any change made since
+                for key, entry in changes.items():
+                    self._changes.setdefault(key, entry)
+                for filename, removed_at in removed.items():
+                    self._removed.setdefault(filename, removed_at)
+            raise
+        with self._lock:
+            # Entries written by other processes become visible; newer local changes stay on top
+            _merge(entries, self._changes, self._removed)
+            self._entries = entries
+
+    def get(self, kind: str, identity: str) -> Optional[Dict[str, Any]]:
+        """Returns the entry for a checkpoint id (generation) or input path (QA), or None."""
+        with self._lock:
+            entry = self._load().get(lookup_key(kind, identity))
+            return dict(entry) if entry else None
+
+    def latest(self, kind: str) -> Optional[Dict[str, Any]]:
+        """Returns the most recently updated entry of a kind, or None."""
+        with self._lock:
+            entries = [entry for entry in self._load().values() if entry.get("kind") == kind]
+            return dict(max(entries, key=lambda entry: entry.get("updated", 0))) if entries else None
+
+    def put(self, kind: str, identity: str, filename: str, summary: Dict[str, Any]) -> None:
+        """Records (or refreshes) the checkpoint file for a checkpoint id or input path."""
+        with self._lock:
+            entries = self._load()
+            key = lookup_key(kind, identity)
+            entries[key] = self._changes[key] = {"kind": kind, "file": filename, "updated": time.time(),
+                                                 "summary": summary, **_identity(kind, identity)}
+        self._persist()
+
+    def remove_file(self, filename: str) -> None:
+        """Drops every entry that points at `filename`."""
+        with self._lock:
+            entries = self._load()
+            stale = [key for key, entry in entries.items() if entry.get("file") == filename]
+            for key in stale:
+                del entries[key]
+            for key in [key for key, entry in self._changes.items() if entry.get("file") == filename]:
+                del self._changes[key]
+            if not stale:
+                return
+            self._removed[filename] = time.time()
+        self._persist()
+
+
+_indexes: Dict[str, CheckpointIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_checkpoint_index(checkpoint_dir: str, writer: Optional[CheckpointWriter] = None) -> CheckpointIndex:
+    """Returns the shared index for a checkpoint directory."""
+    checkpoint_dir = os.path.abspath(checkpoint_dir)
+    with _indexes_lock:
+        index = _indexes.get(checkpoint_dir)
+        if index is None:
+            index = _indexes[checkpoint_dir] = CheckpointIndex(checkpoint_dir, writer)
+        elif writer is not None and index.writer is None:
+            index.writer = writer
+        return index
@@ -0,0 +1,214 @@
+"""
+Append-only journal storage for checkpoints.
+
+A journal is a JSON Lines file. Its first record is a full snapshot of the
+checkpoint state; every following record is a small delta describing one
+completed unit of work (a generated task list, a finished task, an annotated
+step). Replaying the deltas over the snapshot reproduces the exact state, so
+saving progress costs one short append instead of re-serializing the whole
+reasoning tree. After `compact_every` deltas the journal is rewritten as a
+single snapshot to keep replay time bounded.
+
+Record formats:
+    {"op": "snapshot", "ts": <time>, "state": {...}}
+    {"op": "set",    "ts": <time>, "path": [...], "value": ...}
+    {"op": "append", "ts": <time>, "path": [...], "value": ...}
+"""
+import copy
+import json
+import logging
+import time
+from typing import Dict, Any, Optional, List, Tuple, Union
+
+from .checkpoint_writer import CheckpointWriter, atomic_write, durable_append
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+#: A path into the checkpoint state: dict keys and list indices.
+JournalPath = List[Union[str, int]]
+#: One delta: (op, path, value) where op is "set" or "append".
+JournalUpdate = Tuple[str, JournalPath, Any]
+
+#: File extension used for journal checkpoints.
+JOURNAL_SUFFIX = ".journal.jsonl"
+
+
+def apply_update(state: Dict[str, Any], op: str, path: JournalPath, value: Any) -> None:
+    """
+    Applies a single delta to `state` in place.
+
+    Missing intermediate dicts are created, so a delta may introduce a new
+    phase or task. "set" replaces the value at `path`; "append" appends
+    `value` to the list at `path`, creating the list if needed.
+    """
+    if not path:
+        raise ValueError("Journal update path must not be empty")
+    target: Any = state
+    for part in path[:-1]:
+        if isinstance(target, dict):
+            target = target.setdefault(part, {})
+        else:
+            target = target[part]
+    last = path[-1]
+    if op == "set":
+        target[last] = value
+    elif op == "append":
+        if isinstance(target, dict):
+            target.setdefault(last, []).append(value)
+        else:
+            target[last].append(value)
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+class CheckpointJournal:
+    """
+    A single checkpoint stored as a snapshot followed by delta records.
+
+    The journal keeps an in-memory replica of the state it has written, so
+    compaction never has to re-read the file. Values are copied through JSON
+    on the way in, so later mutations by the caller cannot leak into the
+    replica without a matching delta.
+
+    With a `writer`, records are serialized immediately but written to disk
+    by its background thread; otherwise they are written synchronously. If a
+    background write fails, the next `append` (or `recover`) rewrites the
+    journal as a snapshot of the replica, so no delta lands on a stale file.
+    """
+
+    def __init__(self, path: str, compact_every: int = 200, writer: Optional[CheckpointWriter] = None):
+        """
+        Initialize the journal.
+
+        Args:
+            path: Location of the journal file.
+            compact_every: Number of deltas after which the journal is rewritten
+                           as a single snapshot. 0 disables compaction.
+            writer: Optional background writer that performs the disk I/O.
+        """
+        self.path = path
+        self.compact_every = compact_every
+        self.writer = writer
+        self._state: Optional[Dict[str, Any]] = None
+        self._deltas_since_snapshot = 0
+        # Set when replay stopped at a damaged record; appending after it would be unreadable
+        self._damaged = False
+
+    @property
+    def state(self) -> Optional[Dict[str, Any]]:
+        """The current state as last written or replayed, or None if unknown."""
+        return self._state
+
+    def snapshot(self, state: Dict[str, Any]) -> None:
+        """Replaces the journal with a single snapshot record of `state`."""
+        timestamp = time.time()
+        record = json.dumps({"op": "snapshot", "ts": timestamp, "state": state}, ensure_ascii=False)
+        data = (record + "\n").encode("utf-8")
+        if self.writer:
+            self.writer.write_snapshot(self.path, data)
+        else:
+            atomic_write(self.path, data)
+        self._state = json.loads(record)["state"]
+        self._state["timestamp"] = timestamp
+        self._deltas_since_snapshot = 0
+        self._damaged = False
+
+    def recover(self) -> bool:
+        """
+        Rewrites the journal from the replica if a background write to it failed.
+
+        Returns:
+            True if a fresh snapshot was queued.
+        """
+        if not self.writer or self._state is None:
+            return False
+        error = self.writer.take_failure(self.path)
+        if error is None:
+            return False
+        logger.warning(f"An earlier write to checkpoint {self.path} failed ({error}); rewriting it as a snapshot")
+        self.snapshot(self._state)
+        return True
+
+    def append(self, updates: List[JournalUpdate]) -> bool:
+        """
+        Appends deltas to the journal and applies them to the replica.
+
+        Returns:
+            True if the journal was rewritten as a snapshot (after a failed
+            write, a damaged replay or for compaction), False for a plain append.
+
+        Raises:
+            RuntimeError: If the journal has neither been snapshotted nor loaded.
+        """
+        if self._state is None:
+            raise RuntimeError(f"Journal {self.path} has no base snapshot")
+        if self._damaged:
+            self.snapshot(self._state)
+            rewritten = True
+        else:
+            rewritten = self.recover()
+        timestamp = time.time()
+        lines = []
+        for op, path, value in updates:
+            lines.append(json.dumps({"op": op, "ts": timestamp, "path": path, "value": value}, ensure_ascii=False))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        if self.writer:
+            self.writer.append(self.path, data)
+        else:
+            durable_append(self.path, data)
+        for line in lines:
+            record = json.loads(line)
+            apply_update(self._state, record["op"], record["path"], record["value"])
+        self._state["timestamp"] = timestamp
+
+        self._deltas_since_snapshot += len(lines)
+        if self.compact_every and self._deltas_since_snapshot >= self.compact_every:
+            logger.debug(f"Compacting checkpoint journal {self.path} after {self._deltas_since_snapshot} deltas")
+            self.snapshot(self._state)
+            rewritten = True
+        return rewritten
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Replays the journal from disk.
+
+        A truncated or corrupt record (e.g. from a crash mid-append) ends the
+        replay; everything before it is kept.
+
+        Returns:
+            A copy of the replayed state (safe for the caller to mutate), or
+            None if the file has no snapshot.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        if self.writer:
+            self.writer.flush()
+        state: Optional[Dict[str, Any]] = None
+        deltas = 0
+        damaged = False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    op = record["op"]
+                    if op == "snapshot":
+                        state = record["state"]
+                        deltas = 0
+                    elif state is None:
+                        raise ValueError("delta before snapshot")
+                    else:
+                        apply_update(state, op, record["path"], record["value"])
+                        deltas += 1
+                    state["timestamp"] = record.get("ts", state.get("timestamp"))
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    logger.warning(f"Stopping replay of {self.path} at line {line_number}: {e}")
+                    damaged = True
+                    break
+        self._state = state
+        self._deltas_since_snapshot = deltas
+        self._damaged = damaged
+        return copy.deepcopy(state)
@@ -3,17 +3,41 @@ Checkpoint manager for the Hierarchical Planner.
 
 Provides functionality to save and load checkpoints of the planning process,
 allowing the program to resume from where it left off after an interruption.
+
+Checkpoints are stored as append-only journals (see `checkpoint_journal`):
+`save_*_checkpoint` writes a full snapshot, while `record_*_progress` appends
+a small delta per completed unit of work. An index (see `checkpoint_index`)
+maps goals and input files to their checkpoint, so resuming loads exactly one
+file; it is updated when a snapshot is written (including compaction), not
+for every delta. Legacy `.checkpoint.json` files written by earlier versions are indexed
+when the index is first built.
+
+Disk writes are performed by a background writer thread (see
+`checkpoint_writer`), so saving and recording progress from async code never
+blocks the event loop. Lookups (`find_latest_*`) read from disk and wait for
+queued writes; async callers run them with `asyncio.to_thread`.
 """
 
 import os
 import json
 import logging
 import time
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, List, Callable
+
+from .checkpoint_journal import CheckpointJournal, JournalUpdate, JOURNAL_SUFFIX
+from .checkpoint_writer import CheckpointWriter, get_checkpoint_writer
+from .checkpoint_index import (
+    get_checkpoint_index, summarize, checkpoint_id, goal_hash, stored_checkpoint_id,
+    GENERATION, QA, LEGACY_SUFFIX
+)
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
+
+def _safe_name(text: str) -> str:
+    return "".join([c if c.isalnum() else "_" for c in text])
+
 class CheckpointManager:
     """
     Manages checkpoints for the hierarchical planning process.
@@ -22,13 +46,18 @@ class CheckpointManager:
     and load it back to resume from where it left off.
     """
     
-    def __init__(self, checkpoint_dir: str = "checkpoints"):
+    def __init__(self, checkpoint_dir: str = "checkpoints", compact_every: int = 200,
+                 write_behind: bool = True):
         """
         Initialize the checkpoint manager.
         
         Args:
             checkpoint_dir: Directory to store checkpoints, relative to the 
                             hierarchical_planner directory
+            compact_every: Number of recorded deltas after which a journal is
+                           compacted back into a single snapshot
+            write_behind: Write checkpoints on the shared background writer
+                          thread instead of synchronously
         """
         # Get the directory where this module is located
         module_dir = os.path.dirname(os.path.abspath(__file__))
@@ -46,12 +75,131 @@ class CheckpointManager:
         # Standard filenames for each checkpoint type
         self.gen_checkpoint_filename = "generation_checkpoint.json"
         self.qa_checkpoint_filename = "qa_checkpoint.json"
+
+        self.compact_every = compact_every
+        self.writer: Optional[CheckpointWriter] = get_checkpoint_writer() if write_behind else None
+        # Open journals by path, holding the replica of what has been written
+        self._journals: Dict[str, CheckpointJournal] = {}
+        # Shared index of checkpoints in this directory, used for O(1) resume lookups
+        self.index = get_checkpoint_index(self.checkpoint_dir, self.writer)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until all queued checkpoint writes are on disk.
+        
+        Journals whose background writes failed are rewritten from their
+        in-memory state and flushed once more.
+        
+        Args:
+            timeout: Maximum number of seconds to wait, or None to wait indefinitely
+            
+        Returns:
+            False if the timeout expired first, True otherwise
+        """
+        if not self.writer:
+            return True
+        done = self.writer.flush(timeout)
+        recovered = [journal.recover() for journal in list(self._journals.values())]
+        if done and any(recovered):
+            done = self.writer.flush(timeout)
+        return done
+
+    def _generation_stem(self, goal: str, run_id: str) -> str:
+        # The goal prefix keeps names readable; the digest makes them unique
+        return os.path.join(self.checkpoint_dir, f"gen_{_safe_name(goal[:20])}_{run_id[:16]}")
+
+    def _qa_stem(self, input_path: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"qa_{_safe_name(os.path.basename(input_path))}")
+
+    def _journal(self, path: str) -> CheckpointJournal:
+        journal = self._journals.get(path)
+        if journal is None:
+            journal = CheckpointJournal(path, compact_every=self.compact_every, writer=self.writer)
+            self._journals[path] = journal
+        return journal
+
+    def _write_snapshot(self, path: str, checkpoint_data: Dict[str, Any]) -> str:
+        """Writes a full snapshot journal, removing any legacy file it supersedes."""
+        self._journal(path).snapshot(checkpoint_data)
+        legacy_path = path[:-len(JOURNAL_SUFFIX)] + LEGACY_SUFFIX
+        if os.path.exists(legacy_path):
+            self.index.remove_file(os.path.basename(legacy_path))
+            if self.writer:
+                self.writer.delete(legacy_path)
+            else:
+                os.remove(legacy_path)
+        return path
+
+    def _append(self, path: str, updates: List[JournalUpdate], kind: str, identity: str) -> str:
+        """
+        Appends deltas to a journal this manager saved or loaded.
+
+        Never touches the disk itself, so it is safe to call from async code;
+        without a known snapshot it returns "" and the caller saves one. The
+        index is refreshed only when the journal is rewritten as a snapshot,
+        not for every delta.
+        """
+        journal = self._journal(path)
+        if journal.state is None:
+            logger.warning(f"Cannot record progress: no checkpoint snapshot saved or loaded for {path}")
+            return ""
+        if journal.append(updates):
+            self.index.put(kind, identity, os.path.basename(path), summarize(kind, journal.state))
+        return path
+
+    def _load_checkpoint_file(self, path: str) -> Optional[Dict[str, Any]]:
+        """Loads a journal or legacy JSON checkpoint. Raises on unreadable files."""
+        if path.endswith(JOURNAL_SUFFIX):
+            return self._journal(path).load()
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _find_latest(self, kind: str, identity: Optional[str], matches: Callable[[Dict[str, Any]], bool],
+                     label: str, expected_path: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Looks up a checkpoint in the index and loads only that file.
+
+        Without an identity the most recently updated checkpoint of the kind is
+        returned. `matches` confirms the loaded data belongs to the identity.
+        If the index has no entry, the file the identity would be saved under
+        (`expected_path`) is tried before giving up, and indexed when found.
+        Queued writes are flushed first so the lookup sees them.
+        """
+        self.flush()
+        entry = self.index.get(kind, identity) if identity is not None else self.index.latest(kind)
+        if entry is None and expected_path and os.path.exists(expected_path):
+            logger.info(f"{label.capitalize()} checkpoint {expected_path} is missing from the index; using it")
+            entry = {"file": os.path.basename(expected_path), "probed": True}
+        if entry is None:
+            logger.info(f"No {label} checkpoints found" + (f" for {identity}" if identity else ""))
+            return None, ""
+
+        file_path = os.path.join(self.checkpoint_dir, entry["file"])
+        try:
+            checkpoint_data = self._load_checkpoint_file(file_path)
+        except FileNotFoundError:
+            logger.warning(f"Indexed {label} checkpoint {file_path} no longer exists")
+            self.index.remove_file(entry["file"])
+            return None, ""
+        except Exception as e:
+            logger.warning(f"Failed to load checkpoint {file_path}: {e}")
+            return None, ""
+
+        if checkpoint_data is None or (identity is not None and not matches(checkpoint_data)):
+            logger.info(f"No valid {label} checkpoints found for {identity}")
+            return None, ""
+        if entry.get("probed"):
+            self.index.put(kind, identity, entry["file"], summarize(kind, checkpoint_data))
+        logger.info(f"Found valid {label} checkpoint at {file_path}")
+        return checkpoint_data, file_path
     
     def save_generation_checkpoint(self, 
                                   goal: str, 
                                   current_state: Dict[str, Any], 
                                   last_processed_phase: Optional[str] = None, 
-                                  last_processed_task: Optional[str] = None) -> str:
+                                  last_processed_task: Optional[str] = None,
+                                  completed_tasks: Optional[Dict[str, List[str]]] = None,
+                                  constitution: Optional[Dict[str, Any]] = None) -> str:
         """
         Save a checkpoint of the current generation progress.
         
@@ -60,33 +208,73 @@ class CheckpointManager:
             current_state: The current reasoning tree with all generated content so far
             last_processed_phase: The last successfully processed phase, if any
             last_processed_task: The last successfully processed task within the phase, if any
+            completed_tasks: Per-phase list of tasks whose steps are complete. Phases
+                             present as keys have had their task list generated. This
+                             record stays valid when tasks finish out of order.
+            constitution: The Project Constitution the plan is generated under. Together
+                          with the goal it determines the checkpoint's identity.
             
         Returns:
             The path to the saved checkpoint file
         """
+        run_id = checkpoint_id(goal, constitution)
         # Create checkpoint data structure
         checkpoint_data = {
             "timestamp": time.time(),
+            "checkpoint_id": run_id,
             "goal": goal,
             "reasoning_tree": current_state,
             "last_processed_phase": last_processed_phase,
-            "last_processed_task": last_processed_task
+            "last_processed_task": last_processed_task,
+            "completed_tasks": completed_tasks
         }
         
-        # Use a consistent filename based on the goal's hash
-        safe_goal = "".join([c if c.isalnum() else "_" for c in goal[:20]])
-        filename = f"gen_{safe_goal}.checkpoint.json"
-        checkpoint_path = os.path.join(self.checkpoint_dir, filename)
+        # Use a consistent filename based on the goal and constitution digest
+        checkpoint_path = self._generation_stem(goal, run_id) + JOURNAL_SUFFIX
         
         # Save the checkpoint
         try:
-            with open(checkpoint_path, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, indent=2)
+            # A checkpoint saved under the goal alone (e.g. a legacy file) is superseded by this one
+            superseded = self.index.get(GENERATION, goal_hash(goal))
+            self._write_snapshot(checkpoint_path, checkpoint_data)
+            self.index.put(GENERATION, run_id, os.path.basename(checkpoint_path), summarize(GENERATION, checkpoint_data))
+            if superseded and superseded["file"] != os.path.basename(checkpoint_path):
+                logger.info(f"Removing superseded checkpoint {superseded['file']}")
+                self.delete_checkpoint(os.path.join(self.checkpoint_dir, superseded["file"]))
             logger.info(f"Updated generation checkpoint at {checkpoint_path}")
             return checkpoint_path
         except Exception as e:
             logger.error(f"Failed to save checkpoint: {e}")
             return ""
+
+    def record_generation_progress(self, goal: str, updates: List[JournalUpdate],
+                                   constitution: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Append completed generation work to the goal's checkpoint.
+        
+        Costs one small append regardless of plan size. A snapshot must have
+        been saved (or found) for the goal first.
+        
+        Args:
+            goal: The high-level goal being processed
+            updates: Deltas as (op, path, value) tuples, where op is "set" or
+                     "append" and path addresses the checkpoint data, e.g.
+                     ("set", ["reasoning_tree", phase, task], steps)
+            constitution: The Project Constitution passed to save_generation_checkpoint
+            
+        Returns:
+            The path to the checkpoint file, or empty string on failure
+        """
+        run_id = checkpoint_id(goal, constitution)
+        checkpoint_path = self._generation_stem(goal, run_id) + JOURNAL_SUFFIX
+        try:
+            path = self._append(checkpoint_path, updates, GENERATION, run_id)
+            if path:
+                logger.debug(f"Recorded {len(updates)} generation update(s) in {checkpoint_path}")
+            return path
+        except Exception as e:
+            logger.error(f"Failed to record generation progress: {e}")
+            return ""
     
     def save_qa_checkpoint(self,
                           input_path: str,
@@ -121,27 +309,52 @@ class CheckpointManager:
         }
         
         # Create a filename based on the input file path
-        input_file_base = os.path.basename(input_path)
-        safe_input = "".join([c if c.isalnum() else "_" for c in input_file_base])
-        filename = f"qa_{safe_input}.checkpoint.json"
-        checkpoint_path = os.path.join(self.checkpoint_dir, filename)
+        checkpoint_path = self._qa_stem(input_path) + JOURNAL_SUFFIX
         
         # Save the checkpoint
         try:
-            with open(checkpoint_path, 'w', encoding='utf-8') as f:
-                json.dump(checkpoint_data, f, indent=2)
+            self._write_snapshot(checkpoint_path, checkpoint_data)
+            self.index.put(QA, input_path, os.path.basename(checkpoint_path), summarize(QA, checkpoint_data))
             logger.info(f"Updated QA checkpoint at {checkpoint_path}")
             return checkpoint_path
         except Exception as e:
             logger.error(f"Failed to save QA checkpoint: {e}")
             return ""
+
+    def record_qa_progress(self, input_path: str, updates: List[JournalUpdate]) -> str:
+        """
+        Append completed QA work to the input file's checkpoint.
+        
+        Args:
+            input_path: Path to the input plan file
+            updates: Deltas as (op, path, value) tuples, e.g.
+                     ("set", ["validated_data", phase, task, index, "qa_info"], qa_info)
+            
+        Returns:
+            The path to the checkpoint file, or empty string on failure
+        """
+        checkpoint_path = self._qa_stem(input_path) + JOURNAL_SUFFIX
+        try:
+            path = self._append(checkpoint_path, updates, QA, input_path)
+            if path:
+                logger.debug(f"Recorded {len(updates)} QA update(s) in {checkpoint_path}")
+            return path
+        except Exception as e:
+            logger.error(f"Failed to record QA progress: {e}")
+            return ""
     
-    def find_latest_generation_checkpoint(self, goal: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+    def find_latest_generation_checkpoint(self, goal: Optional[str] = None,
+                                          constitution: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Dict[str, Any]], str]:
         """
         Find the latest generation checkpoint file, optionally filtered by goal.
         
+        Checkpoints are identified by a digest of the full goal and constitution.
+        A checkpoint saved without a constitution (including legacy files) is
+        used as a fallback for the same goal.
+        
         Args:
             goal: If provided, only consider checkpoints for this goal
+            constitution: The Project Constitution of the run being resumed
             
         Returns:
             A tuple containing:
@@ -149,54 +362,18 @@ class CheckpointManager:
             - The path to the checkpoint file, or empty string if no valid checkpoint found
         """
         try:
-            # If we have a goal, try to find a checkpoint specific to that goal first
-            if goal:
-                safe_goal = "".join([c if c.isalnum() else "_" for c in goal[:20]])
-                specific_filename = f"gen_{safe_goal}.checkpoint.json"
-                specific_path = os.path.join(self.checkpoint_dir, specific_filename)
-                
-                if os.path.exists(specific_path):
-                    try:
-                        with open(specific_path, 'r', encoding='utf-8') as f:
-                            checkpoint_data = json.load(f)
-                        logger.info(f"Found valid checkpoint for goal at {specific_path}")
-                        return checkpoint_data, specific_path
-                    except Exception as e:
-                        logger.warning(f"Failed to load checkpoint {specific_path}: {e}")
-            
-            # List all checkpoint files as a fallback
-            checkpoint_files = []
-            for filename in os.listdir(self.checkpoint_dir):
-                if filename.startswith("gen_") and filename.endswith(".checkpoint.json"):
-                    checkpoint_files.append(filename)
-            
-            if not checkpoint_files:
-                logger.info("No generation checkpoints found")
-                return None, ""
-                
-            # Sort by timestamp (newest first based on file modification time)
-            checkpoint_files_with_time = [(f, os.path.getmtime(os.path.join(self.checkpoint_dir, f))) 
-                                          for f in checkpoint_files]
-            checkpoint_files_with_time.sort(key=lambda x: x[1], reverse=True)
-            
-            # Try each checkpoint until we find a valid one matching the goal
-            for filename, _ in checkpoint_files_with_time:
-                file_path = os.path.join(self.checkpoint_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        checkpoint_data = json.load(f)
-                    
-                    # If goal is provided, check if this checkpoint matches
-                    if goal is not None and checkpoint_data.get("goal") != goal:
-                        continue
-                        
-                    logger.info(f"Found valid checkpoint at {file_path}")
-                    return checkpoint_data, file_path
-                except Exception as e:
-                    logger.warning(f"Failed to load checkpoint {file_path}: {e}")
-            
-            logger.info(f"No valid generation checkpoints found for goal: {goal}")
-            return None, ""
+            if goal is None:
+                return self._find_latest(GENERATION, None, lambda data: True, "generation")
+            run_id = checkpoint_id(goal, constitution)
+            checkpoint_data, path = self._find_latest(
+                GENERATION, run_id, lambda data: stored_checkpoint_id(data) == run_id, "generation",
+                self._generation_stem(goal, run_id) + JOURNAL_SUFFIX)
+            if checkpoint_data is None and constitution is not None:
+                goal_only_id = goal_hash(goal)
+                checkpoint_data, path = self._find_latest(
+                    GENERATION, goal_only_id, lambda data: stored_checkpoint_id(data) == goal_only_id, "generation",
+                    self._generation_stem(goal, goal_only_id) + JOURNAL_SUFFIX)
+            return checkpoint_data, path
         except Exception as e:
             logger.error(f"Error finding checkpoints: {e}")
             return None, ""
@@ -214,55 +391,9 @@ class CheckpointManager:
             - The path to the checkpoint file, or empty string if no valid checkpoint found
         """
         try:
-            # If we have an input path, try to find a checkpoint specific to that file first
-            if input_path:
-                input_file_base = os.path.basename(input_path)
-                safe_input = "".join([c if c.isalnum() else "_" for c in input_file_base])
-                specific_filename = f"qa_{safe_input}.checkpoint.json"
-                specific_path = os.path.join(self.checkpoint_dir, specific_filename)
-                
-                if os.path.exists(specific_path):
-                    try:
-                        with open(specific_path, 'r', encoding='utf-8') as f:
-                            checkpoint_data = json.load(f)
-                        logger.info(f"Found valid checkpoint for input at {specific_path}")
-                        return checkpoint_data, specific_path
-                    except Exception as e:
-                        logger.warning(f"Failed to load checkpoint {specific_path}: {e}")
-            
-            # List all checkpoint files as a fallback
-            checkpoint_files = []
-            for filename in os.listdir(self.checkpoint_dir):
-                if filename.startswith("qa_") and filename.endswith(".checkpoint.json"):
-                    checkpoint_files.append(filename)
-                    
-            if not checkpoint_files:
-                logger.info("No QA checkpoints found")
-                return None, ""
-                
-            # Sort by timestamp (newest first based on file modification time)
-            checkpoint_files_with_time = [(f, os.path.getmtime(os.path.join(self.checkpoint_dir, f))) 
-                                          for f in checkpoint_files]
-            checkpoint_files_with_time.sort(key=lambda x: x[1], reverse=True)
-            
-            # Try each checkpoint until we find a valid one
-            for filename, _ in checkpoint_files_with_time:
-                file_path = os.path.join(self.checkpoint_dir, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        checkpoint_data = json.load(f)
-                    
-                    # If input_path is provided, check if this checkpoint matches
-                    if input_path is not None and checkpoint_data.get("input_path") != input_path:
-                        continue
-                        
-                    logger.info(f"Found valid QA checkpoint at {file_path}")
-                    return checkpoint_data, file_path
-                except Exception as e:
-                    logger.warning(f"Failed to load checkpoint {file_path}: {e}")
-            
-            logger.info(f"No valid QA checkpoints found for input: {input_path}")
-            return None, ""
+            expected_path = self._qa_stem(input_path) + JOURNAL_SUFFIX if input_path is not None else None
+            return self._find_latest(QA, input_path, lambda data: data.get("input_path") == input_path, "QA",
+                                     expected_path)
         except Exception as e:
             logger.error(f"Error finding QA checkpoints: {e}")
             return None, ""
@@ -275,9 +406,18 @@ class CheckpointManager:
             checkpoint_path: Path to the checkpoint file to delete
             
         Returns:
-            True if deleted successfully, False otherwise
+            True if the file was deleted (or queued for deletion), False otherwise
         """
+        known = self._journals.pop(checkpoint_path, None) is not None
         try:
+            self.index.remove_file(os.path.basename(checkpoint_path))
+            if self.writer:
+                # Queued behind any pending writes for the same file
+                if known or os.path.exists(checkpoint_path):
+                    self.writer.delete(checkpoint_path)
+                    logger.info(f"Deleting checkpoint file: {checkpoint_path}")
+                    return True
+                return False
             if os.path.exists(checkpoint_path):
                 os.remove(checkpoint_path)
                 logger.info(f"Deleted checkpoint file: {checkpoint_path}")
@@ -0,0 +1,242 @@
+"""
+Crash-safe, write-behind persistence for checkpoint files.
+
+Checkpoint writes are handed to a single background thread so the asyncio
+event loop never waits on disk I/O. Requests for the same file are coalesced:
+a newer snapshot replaces any snapshot or appends still waiting to be written,
+and queued appends are flushed with a single write.
+
+Snapshots are written to a temporary file, fsynced and renamed over the
+target, so a crash leaves either the previous snapshot or the new one, never
+a torn file. Appends are fsynced after each flush; a record torn by a crash
+is dropped on replay (see `checkpoint_journal`). Files that must be merged
+with what is on disk when they are written (see `checkpoint_index`) are
+queued as a function that produces the write instead of its data.
+
+A failed write is remembered for its path until a later snapshot of that
+path succeeds. Callers check `take_failure` before appending, since deltas
+queued behind a lost write would replay onto a stale file.
+"""
+import atexit
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+
+def _fsync_directory(directory: str) -> None:
+    """Persists a rename by syncing its directory (not supported everywhere)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replaces `path` with `data` via temp file + fsync + rename."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def durable_append(path: str, data: bytes) -> None:
+    """Appends `data` to `path` and fsyncs it."""
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def remove_file(path: str) -> None:
+    """Deletes `path` if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _PendingWrite:
+    """Coalesced work waiting to be written for one path."""
+    __slots__ = ("snapshot", "updates", "appends", "delete")
+
+    def __init__(self):
+        self.snapshot: Optional[bytes] = None
+        self.updates: List[Callable[[], None]] = []
+        self.appends: list = []
+        self.delete = False
+
+
+class CheckpointWriter:
+    """
+    Background writer thread for checkpoint files.
+
+    All public methods only enqueue work and return immediately, except
+    `flush`, which waits until everything queued so far is on disk.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, _PendingWrite] = {}
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        #: The last error raised by a background write, if any
+        self.last_error: Optional[BaseException] = None
+        # Paths whose on-disk contents fell behind what was queued for them
+        self._failed: Dict[str, BaseException] = {}
+
+    def _submit(self, path: str) -> _PendingWrite:
+        """Returns the pending entry for `path` and wakes the writer. Caller must hold the lock."""
+        if self._closed:
+            raise RuntimeError("Checkpoint writer is closed")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+            self._thread.start()
+        pending = self._pending.get(path)
+        if pending is None:
+            pending = self._pending[path] = _PendingWrite()
+        self._condition.notify_all()
+        return pending
+
+    def write_snapshot(self, path: str, data: bytes) -> None:
+        """Queues an atomic replacement of `path`, superseding earlier queued work for it."""
+        with self._condition:
+            pending = self._submit(path)
+            pending.snapshot = data
+            pending.updates = []
+            pending.appends = []
+            pending.delete = False
+
+    def write_update(self, path: str, update: Callable[[], None]) -> None:
+        """
+        Queues `update`, which rewrites `path` itself when it runs.
+
+        Used when the new contents depend on what is on disk at the time of
+        the write, so an update queued again before it ran is run only once.
+        A failure is recorded like a failed snapshot.
+        """
+        with self._condition:
+            pending = self._submit(path)
+            if update not in pending.updates:
+                pending.updates.append(update)
+            pending.delete = False
+
+    def append(self, path: str, data: bytes) -> None:
+        """Queues `data` to be appended to `path` after any queued snapshot."""
+        with self._condition:
+            self._submit(path).appends.append(data)
+
+    def delete(self, path: str) -> None:
+        """Queues removal of `path`, discarding queued writes for it."""
+        with self._condition:
+            pending = self._submit(path)
+            pending.snapshot = None
+            pending.updates = []
+            pending.appends = []
+            pending.delete = True
+
+    def take_failure(self, path: str) -> Optional[BaseException]:
+        """
+        Returns the error of a failed write to `path` not yet superseded by a
+        successful snapshot, and forgets it. The caller is expected to queue a
+        fresh snapshot of `path`.
+        """
+        with self._condition:
+            return self._failed.pop(path, None)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until all queued writes are on disk.
+
+        Returns:
+            False if the timeout expired first, True otherwise.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self) -> None:
+        """Flushes queued writes and stops the writer thread."""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, {}
+                self._busy = True
+            try:
+                for path, pending in batch.items():
+                    self._write(path, pending)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _write(self, path: str, pending: _PendingWrite) -> None:
+        try:
+            if pending.delete:
+                remove_file(path)
+                self._clear_failure(path)
+                logger.debug(f"Deleted checkpoint file {path}")
+                return
+            if pending.snapshot is not None:
+                atomic_write(path, pending.snapshot)
+                self._clear_failure(path)
+            if pending.updates:
+                for update in pending.updates:
+                    update()
+                self._clear_failure(path)
+            if pending.appends:
+                durable_append(path, b"".join(pending.appends))
+            logger.debug(f"Wrote checkpoint {path} (snapshot={pending.snapshot is not None or bool(pending.updates)}, "
+                         f"appends={len(pending.appends)})")
+        except Exception as e:
+            with self._condition:
+                self.last_error = e
+                self._failed[path] = e
+            logger.error(f"Failed to write checkpoint {path}: {e}")
+
+    def _clear_failure(self, path: str) -> None:
+        with self._condition:
+            self._failed.pop(path, None)
+
+
+_writer: Optional[CheckpointWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_checkpoint_writer() -> CheckpointWriter:
+    """Returns the process-wide checkpoint writer, flushed automatically at exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = CheckpointWriter()
+            atexit.register(_writer.flush)
+        return _writer
@@ -0,0 +1,218 @@
+"""
+Circuit breakers and health scoring for LLM providers.
+
+Each provider gets one shared breaker, configured by the `circuit_breaker`
+config section. Provider retry loops report the outcome of every attempt.
+When failures are sustained (a run of consecutive failures, or an error rate
+over the rolling window), the circuit opens. While it is open, no requests
+are sent to the provider and calls fail at once with CircuitOpenError, so an
+outage costs seconds instead of a full retry ladder per call. After
+`open_sec`, the circuit half-opens: a limited number of trial requests probe
+the provider. A success closes the circuit and a failure opens it again.
+
+Only failures of the provider itself count: blocked prompts, unparsable
+JSON and deadline expiries say nothing about its health. `rank_providers`
+orders providers for the router in `llm_client_selector` by availability
+and health (error rate, then median latency).
+"""
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Deque, List, Optional, Tuple
+
+from .exceptions import ApiBlockedError, CircuitOpenError, DeadlineExceededError, JsonProcessingError
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+def is_provider_failure(exception: BaseException) -> bool:
+    """True if an exception indicates the provider itself is failing (errors, 429s, timeouts, bad responses)."""
+    return isinstance(exception, Exception) and not isinstance(
+        exception, (ApiBlockedError, JsonProcessingError, DeadlineExceededError, CircuitOpenError))
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker over the recent attempt outcomes of one provider."""
+
+    def __init__(self, provider: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 consecutive_failures: int = 5, open_sec: float = 30.0, half_open_max_calls: int = 1):
+        """
+        Args:
+            provider: Provider name, used in log messages.
+            window: Number of recent attempts the error rate is computed over.
+            min_calls: Attempts needed in the window before the error rate can open the circuit.
+            failure_rate: Error rate in the window at which the circuit opens.
+            consecutive_failures: Consecutive failed attempts at which the circuit opens.
+            open_sec: How long the circuit stays open before trial requests are let through.
+            half_open_max_calls: Trial requests allowed at once while half-open.
+        """
+        self.provider = provider
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.consecutive_failures = consecutive_failures
+        self.open_sec = open_sec
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        # (succeeded, latency in seconds or None)
+        self._outcomes: Deque[Tuple[bool, Optional[float]]] = deque(maxlen=window)
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_started = 0.0
+
+    def _cooled_down(self, now: float) -> bool:
+        return now - self._opened_at >= self.open_sec
+
+    def _trial_slot_free(self, now: float) -> bool:
+        # A trial that never reported back (e.g. its caller was cancelled) frees its slot after open_sec
+        return self._trials < self.half_open_max_calls or now - self._trial_started >= self.open_sec
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """True if a request would currently be let through (without reserving a trial slot)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN:
+                return self._cooled_down(now)
+            if self.state == HALF_OPEN:
+                return self._trial_slot_free(now)
+            return True
+
+    def allow_request(self) -> bool:
+        """Returns True if a request may be sent now; while half-open, takes one of the trial slots."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if not self._cooled_down(now):
+                    return False
+                self.state = HALF_OPEN
+                self._trials = 0
+                logger.info(f"Circuit for {self.provider} half-open; probing with trial requests.")
+            if self.state == HALF_OPEN:
+                if not self._trial_slot_free(now):
+                    return False
+                self._trials = 1 if self._trials >= self.half_open_max_calls else self._trials + 1
+                self._trial_started = now
+            return True
+
+    def on_success(self, latency: Optional[float] = None) -> None:
+        """Records an attempt the provider answered."""
+        with self._lock:
+            self._outcomes.append((True, latency))
+            self._consecutive = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._outcomes.append((True, latency))
+                logger.info(f"Circuit for {self.provider} closed; trial request succeeded.")
+
+    def on_failure(self, exception: BaseException) -> None:
+        """Records a failed attempt; exceptions that are not provider failures count as answered."""
+        if not is_provider_failure(exception):
+            self.on_success()
+            return
+        with self._lock:
+            self._outcomes.append((False, None))
+            self._consecutive += 1
+            if self.state == HALF_OPEN:
+                self._open(f"trial request failed: {exception}")
+            elif self.state == CLOSED:
+                failures = sum(1 for ok, _ in self._outcomes if not ok)
+                if self._consecutive >= self.consecutive_failures:
+                    self._open(f"{self._consecutive} consecutive failures")
+                elif len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                    self._open(f"error rate {failures}/{len(self._outcomes)}")
+
+    def _open(self, reason: str) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        logger.warning(f"Circuit for {self.provider} opened ({reason}); pausing requests for {self.open_sec:.0f}s.")
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return sum(1 for ok, _ in self._outcomes if not ok) / len(self._outcomes)
+
+    def median_latency(self) -> Optional[float]:
+        with self._lock:
+            latencies = [latency for ok, latency in self._outcomes if ok and latency is not None]
+        return statistics.median(latencies) if latencies else None
+
+    def health(self) -> Tuple[bool, float, float]:
+        """Sort key: healthier providers sort first (closed circuit, lower error rate, lower median latency)."""
+        latency = self.median_latency()
+        return (self.state != CLOSED, self.error_rate(), latency if latency is not None else 0.0)
+
+
+_breakers: Dict[str, Tuple[Tuple, CircuitBreaker]] = {}
+
+
+def get_circuit_breaker(config: Dict[str, Any], provider: str) -> Optional[CircuitBreaker]:
+    """
+    Returns the shared circuit breaker for a provider, or None when the
+    `circuit_breaker` section is missing or disabled.
+
+    Breakers are cached per provider and rebuilt only when their settings
+    change, so every call to a provider sees the same circuit state.
+    """
+    settings = config.get('circuit_breaker')
+    if not settings or not settings.get('enabled', True):
+        return None
+
+    key = (
+        int(settings.get('window', 20)),
+        int(settings.get('min_calls', 5)),
+        float(settings.get('failure_rate', 0.5)),
+        int(settings.get('consecutive_failures', 5)),
+        float(settings.get('open_sec', 30.0)),
+        int(settings.get('half_open_max_calls', 1)),
+    )
+    cached = _breakers.get(provider)
+    if cached is None or cached[0] != key:
+        breaker = CircuitBreaker(provider, *key)
+        _breakers[provider] = (key, breaker)
+        return breaker
+    return cached[1]
+
+
+def reset_circuit_breakers() -> None:
+    """Forgets all circuit state."""
+    _breakers.clear()
+
+
+def rank_providers(config: Dict[str, Any], providers: List[str], strategy: str = 'preferred') -> List[str]:
+    """
+    Orders providers for a new call, leaving out those whose circuit is open.
+
+    Args:
+        config: The application configuration dictionary.
+        providers: Candidate providers in order of preference.
+        strategy: 'preferred' tries the first provider first while it is
+                  available, then the others by health; 'healthiest' orders
+                  them all by health. Equally healthy providers keep their
+                  preference order.
+
+    Returns:
+        The providers to try, in order. Empty if every circuit is open.
+    """
+    breakers = {name: get_circuit_breaker(config, name) for name in providers}
+    available = [name for name in providers if breakers[name] is None or breakers[name].is_available()]
+
+    def health(name: str) -> Tuple[bool, float, float]:
+        return breakers[name].health() if breakers[name] else (False, 0.0, 0.0)
+
+    if strategy == 'healthiest':
+        return sorted(available, key=health)
+    return sorted(available, key=lambda name: (name != providers[0], health(name)))
+
+
+def open_circuit_error(provider: str, last_exception: Optional[BaseException] = None) -> CircuitOpenError:
+    """Builds the error raised when a provider's circuit refuses a request."""
+    detail = f" Last error: {last_exception}" if last_exception else ""
+    return CircuitOpenError(f"Circuit for {provider} is open; request not sent.{detail}")
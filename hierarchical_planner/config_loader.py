@@ -45,7 +45,9 @@ DEFAULT_CONFIG: Dict[str, Dict[str, Any]] = {
         'retries': 3,
         'extended_thinking': True,
         'thinking_min_tokens': 1024,
-        'thinking_max_tokens': 8192
+        'thinking_max_tokens': 8192,
+        'prompt_caching': True,
+        'prompt_cache_min_chars': 4000
     },
     'deepseek': {
         'api_key': 'DEEPSEEK_API_KEY', # Default to checking this env var
@@ -55,6 +57,100 @@ DEFAULT_CONFIG: Dict[str, Dict[str, Any]] = {
         'max_tokens': 8192,
         'top_p': 1.0
     },
+    'generation': {
+        'concurrent': False,
+        'stream': False,
+        'max_concurrency': 8
+    },
+    'cache': {
+        'enabled': True,
+        'directory': 'cache/llm_responses',
+        'ttl_sec': 604800,
+        'max_entries': 5000,
+        'max_size_mb': 256
+    },
+    'coalesce': {
+        'enabled': True
+    },
+    'constitution': {
+        'digest': False,
+        'digest_levels': ['task', 'step']
+    },
+    'qa': {
+        'max_concurrency': 8,
+        'batch_size': 10,
+        'batch_context_tokens': 32000,
+        'batch_output_tokens': 8192,
+        'pipeline_workers': 4,
+        'pipeline_queue_size': 32
+    },
+    'checkpoint': {
+        'directory': 'checkpoints',
+        'compact_every': 200
+    },
+    'http': {
+        'max_connections': 20,
+        'max_keepalive_connections': 10,
+        'keepalive_expiry_sec': 30.0,
+        'timeout_sec': 600.0,
+        'connect_timeout_sec': 10.0,
+        'http2': True
+    },
+    'deadlines': {
+        'default': 0,
+        'constitution': 900,
+        'phase': 600,
+        'task': 600,
+        'step': 300
+    },
+    'circuit_breaker': {
+        'enabled': True,
+        'window': 20,
+        'min_calls': 5,
+        'failure_rate': 0.5,
+        'consecutive_failures': 5,
+        'open_sec': 30.0,
+        'half_open_max_calls': 1
+    },
+    'routing': {
+        'enabled': True,
+        'providers': ['anthropic', 'gemini'],
+        'strategy': 'preferred'
+    },
+    'hedging': {
+        'enabled': False,
+        'provider': None,
+        'percentile': 95,
+        'min_samples': 20,
+        'window': 200,
+        'initial_delay_sec': 30.0,
+        'min_delay_sec': 1.0,
+        'max_delay_sec': 120.0
+    },
+    'mock': {
+        'latency_ms': 20.0,
+        'jitter_ms': 5.0,
+        'rate_limit_probability': 0.0,
+        'seed': 0,
+        'phases': 3,
+        'tasks_per_phase': 3,
+        'steps_per_task': 4
+    },
+    'telemetry': {
+        'enabled': True,
+        'json_file': 'logs/metrics.json',
+        'prometheus_file': 'logs/metrics.prom',
+        'pricing': {
+            'gemini-2.5-pro': {'input_per_mtok': 1.25, 'output_per_mtok': 10.0},
+            'claude-3-opus': {'input_per_mtok': 15.0, 'output_per_mtok': 75.0, 'cached_input_per_mtok': 1.5},
+            'deepseek': {'input_per_mtok': 0.27, 'output_per_mtok': 1.10}
+        }
+    },
+    'rate_limits': {
+        'gemini': {'requests_per_sec': 1.0, 'burst': 4},
+        'anthropic': {'requests_per_sec': 1.0, 'burst': 4},
+        'deepseek': {'requests_per_sec': 1.0, 'burst': 4}
+    },
     'files': {
         'default_task': 'task.txt',
         'default_output': 'reasoning_tree.json',
@@ -202,6 +298,10 @@ def load_config(config_path: str = 'config/config.yaml') -> Dict[str, Any]:
     if 'log_file' in config['logging']:
         config['logging']['log_file'] = os.path.join(script_dir, config['logging']['log_file'])
 
+    for key in ['json_file', 'prometheus_file']:
+        if config.get('telemetry', {}).get(key):
+            config['telemetry'][key] = os.path.join(script_dir, config['telemetry'][key])
+
 
     return config
 
@@ -0,0 +1,102 @@
+"""
+Compact digest of a Project Constitution for lower-level prompts.
+
+The full constitution (indented JSON with descriptions of every data
+structure, dependency and file) is sent with every prompt, so prompt size
+grows with constitution size × number of calls. The digest keeps the
+binding content in a few lines of plain text: mission, architecture, tech
+stack, every non-functional constraint, dependency names and versions,
+data structure names and the file map as paths. It leaves out prose that
+only explains those choices. Constitution keys not in the schema are kept
+verbatim as compact JSON, so no constraint is dropped.
+
+The digest is derived deterministically from the constitution, so it costs
+no extra LLM call and is the same on every run. The `constitution` config
+section chooses the plan levels whose prompts use it (see
+`prompt_renderer.constitution_for_level`).
+"""
+import json
+import logging
+from typing import Dict, Any, List
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# Keys rendered by `build_digest`; any other top-level key is kept as JSON
+_KNOWN_KEYS = (
+    'project_name', 'core_mission', 'architectural_paradigm', 'primary_language_and_tech_stack',
+    'non_functional_requirements', 'global_dependencies_and_interfaces', 'key_data_structures',
+    'project_file_map',
+)
+
+
+def _compact(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def _file_paths(file_map: Any, prefix: str = "") -> List[str]:
+    """Flattens a nested project file map into paths; directories end with '/'."""
+    paths: List[str] = []
+    if not isinstance(file_map, dict):
+        return paths
+    for name, entry in file_map.items():
+        entry = entry if isinstance(entry, dict) else {}
+        is_dir = entry.get('type') == 'directory' or bool(entry.get('children'))
+        path = f"{prefix}{str(name).rstrip('/')}" + ("/" if is_dir else "")
+        paths.append(path)
+        paths.extend(_file_paths(entry.get('children'), path))
+    return paths
+
+
+def _items(values: Any, *fields: str) -> List[str]:
+    """Renders list entries as 'field1 field2' (skipping empty fields); non-dict entries as text."""
+    rendered = []
+    for value in values if isinstance(values, list) else []:
+        if isinstance(value, dict):
+            text = " ".join(str(value[f]) for f in fields if value.get(f))
+            rendered.append(text or _compact(value))
+        elif value:
+            rendered.append(str(value))
+    return rendered
+
+
+def build_digest(constitution: Dict[str, Any]) -> str:
+    """Returns the compact text digest of a constitution."""
+    lines: List[str] = []
+    name, mission = constitution.get('project_name'), constitution.get('core_mission')
+    if name or mission:
+        lines.append(f"Project: {name or ''}{' - ' if name and mission else ''}{mission or ''}")
+    if constitution.get('architectural_paradigm'):
+        lines.append(f"Architecture: {constitution['architectural_paradigm']}")
+
+    stack = constitution.get('primary_language_and_tech_stack')
+    if isinstance(stack, dict) and stack:
+        lines.append("Tech stack: " + "; ".join(f"{key}={value}" for key, value in stack.items() if value))
+    elif stack:
+        lines.append(f"Tech stack: {stack}")
+
+    rules = []
+    for value in constitution.get('non_functional_requirements') or []:
+        if isinstance(value, dict) and value.get('constraint'):
+            rules.append(f"- {value['requirement']}: {value['constraint']}" if value.get('requirement')
+                         else f"- {value['constraint']}")
+        elif value:
+            rules.append(f"- {value if isinstance(value, str) else _compact(value)}")
+    if rules:
+        lines.append("Rules:")
+        lines.extend(rules)
+
+    dependencies = _items(constitution.get('global_dependencies_and_interfaces'), 'name', 'version')
+    if dependencies:
+        lines.append("Dependencies: " + ", ".join(dependencies))
+    structures = _items(constitution.get('key_data_structures'), 'name')
+    if structures:
+        lines.append("Data structures: " + ", ".join(structures))
+    files = _file_paths(constitution.get('project_file_map'))
+    if files:
+        lines.append("Files: " + ", ".join(files))
+
+    for key, value in constitution.items():
+        if key not in _KNOWN_KEYS and value not in (None, "", [], {}):
+            lines.append(f"{key}: {value if isinstance(value, str) else _compact(value)}")
+    return "\n".join(lines)
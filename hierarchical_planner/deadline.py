@@ -0,0 +1,102 @@
+"""
+Deadline budgets for LLM calls.
+
+A deadline bounds the total time a call may take, retries, backoff sleeps,
+fallbacks and hedged duplicates included. `llm_client_selector` gives each
+call the budget configured for its plan level (the `level` telemetry tag) in
+the `deadlines` config section; code can also set one explicitly:
+
+    with deadline.within(30):
+        response = await call_with_retry(...)
+
+Deadlines live in a context variable, so they follow a call into the tasks
+it creates, and a nested deadline never extends an enclosing one. Provider
+retry loops bound each attempt by the time remaining, clamp request timeouts
+to it, and skip a retry whose backoff would outlast it. Instead of running
+past the budget, the call fails with DeadlineExceededError.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from typing import Dict, Any, Awaitable, Iterator, Optional, TypeVar
+
+from .exceptions import DeadlineExceededError
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# A retry is only started if at least this much time would remain after its backoff
+MIN_ATTEMPT_SEC = 1.0
+
+T = TypeVar('T')
+
+_expires: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('llm_deadline', default=None)
+
+
+@contextlib.contextmanager
+def within(seconds: Optional[float]) -> Iterator[None]:
+    """Limits calls made inside the block to `seconds` from now (None or <= 0 adds no limit)."""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    expires = time.monotonic() + float(seconds)
+    current = _expires.get()
+    token = _expires.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _expires.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Returns the seconds left before the active deadline (possibly negative), or None if there is none."""
+    expires = _expires.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def clamp_timeout(timeout: float) -> float:
+    """Returns a request timeout shortened to the time remaining before the active deadline."""
+    left = remaining()
+    return float(timeout) if left is None else max(0.0, min(float(timeout), left))
+
+
+def allows_retry(wait_sec: float) -> bool:
+    """True if a retry after waiting `wait_sec` would still leave time for an attempt."""
+    left = remaining()
+    return left is None or left > wait_sec + MIN_ATTEMPT_SEC
+
+
+async def bounded(awaitable: Awaitable[T]) -> T:
+    """
+    Awaits `awaitable`, cancelling it if the active deadline passes.
+
+    Raises:
+        DeadlineExceededError: If the deadline has passed or passes while waiting.
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceededError("Deadline already passed before the request was sent.")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError as e:
+        if (remaining() or 0) > 0:
+            raise  # A timeout from the request itself, not the deadline
+        raise DeadlineExceededError(f"Request did not complete within its deadline ({left:.1f}s remaining when sent).") from e
+
+
+def level_budget(config: Dict[str, Any], level: Optional[str]) -> Optional[float]:
+    """
+    Returns the deadline budget in seconds for a call at a plan level.
+
+    Levels without an entry in `deadlines` use its `default` entry; 0 or a
+    missing value means no deadline.
+    """
+    budgets = config.get('deadlines') or {}
+    budget = budgets.get(level) if level in budgets else budgets.get('default')
+    return float(budget) if budget else None
@@ -4,14 +4,19 @@ Client module for interacting with the DeepSeek-V3-0324 model using the OpenAI A
 Provides functions for configuring the client, initializing the model,
 generating text content, and generating structured JSON content.
 """
-import openai
 import json
 import logging
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 
 # Local imports for exceptions
 from .exceptions import ApiKeyError, ApiCallError, ApiResponseError, JsonParsingError, JsonProcessingError
+from .http_pool import async_client_options, current_loop
+from . import telemetry
+from .lazy_imports import lazy_import
+
+# Imported on first use (see lazy_imports)
+openai = lazy_import('openai')
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
@@ -20,6 +25,9 @@ logger = logging.getLogger(__name__)
 _client_initialized = False
 _client_base_url = None
 _client_api_key = None
+# Async OpenAI-compatible client and the event loop its pooled connections belong to
+_async_client = None
+_async_client_loop = None
 
 def configure_client(api_key: str, base_url: str = "https://api.deepseek.com/v1"):
     """
@@ -29,7 +37,7 @@ def configure_client(api_key: str, base_url: str = "https://api.deepseek.com/v1"
         api_key: The API key for DeepSeek API access
         base_url: The base URL for DeepSeek API (default: https://api.deepseek.com/v1)
     """
-    global _client_initialized, _client_base_url, _client_api_key
+    global _client_initialized, _client_base_url, _client_api_key, _async_client
     
     if not api_key:
         logger.error("Attempted to configure DeepSeek client without an API key.")
@@ -40,16 +48,34 @@ def configure_client(api_key: str, base_url: str = "https://api.deepseek.com/v1"
         _client_base_url = base_url
         _client_api_key = api_key
         _client_initialized = True
-        
-        # Initialize the OpenAI client
-        openai.base_url = base_url
-        openai.api_key = api_key
+        # Rebuild the async client with the new settings on next use
+        _async_client = None
         
         logger.info("DeepSeek client configured successfully.")
     except Exception as e:
         logger.error(f"Failed to configure DeepSeek client: {e}", exc_info=True)
         raise ApiKeyError(f"Failed to configure DeepSeek client: {e}") from e
 
+def get_async_client(config: Dict[str, Any]) -> "openai.AsyncOpenAI":
+    """
+    Returns the async OpenAI-compatible client for DeepSeek.
+
+    The client is created on first use in each event loop and sends requests
+    over the shared connection pool from `http_pool`.
+
+    Raises:
+        ApiKeyError: If the client has not been configured.
+    """
+    global _async_client, _async_client_loop
+
+    client_config = get_client_config()
+    loop = current_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = openai.AsyncOpenAI(api_key=client_config["api_key"], base_url=client_config["base_url"],
+                                           **async_client_options(openai, config))
+        _async_client_loop = loop
+    return _async_client
+
 def get_client_config():
     """Returns the current client configuration."""
     global _client_initialized, _client_base_url, _client_api_key
@@ -79,7 +105,7 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
         ApiResponseError: If the response is invalid or empty.
     """
     # Make sure client is configured
-    get_client_config()
+    client = get_async_client(config)
     
     try:
         # Extract model settings from config
@@ -90,7 +116,7 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
         
         logger.debug(f"Sending prompt to DeepSeek model {model_name}:\n{prompt[:200]}...") # Log truncated prompt
         
-        response = await openai.chat.completions.create(
+        response = await client.chat.completions.create(
             model=model_name,
             messages=[{"role": "system", "content": "You are a helpful assistant."},
                       {"role": "user", "content": prompt}],
@@ -98,6 +124,8 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
             max_tokens=max_tokens,
             top_p=top_p
         )
+        usage = getattr(response, 'usage', None)
+        telemetry.note_usage(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
         
         # Extract content from response
         if not response.choices or len(response.choices) == 0:
@@ -119,6 +147,42 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
         logger.error(f"Unexpected error during DeepSeek API call: {e}", exc_info=True)
         raise ApiCallError(f"Unexpected error during DeepSeek API call: {e}") from e
 
+async def stream_content(prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Streams the text of a DeepSeek response as it is generated.
+
+    Args:
+        prompt: The prompt string to send to the model.
+        config: The application configuration dictionary.
+
+    Yields:
+        Text deltas in the order they arrive.
+
+    Raises:
+        ApiCallError: If the API call fails.
+    """
+    client = get_async_client(config)
+    deepseek_config = config.get('deepseek', {})
+    try:
+        stream = await client.chat.completions.create(
+            model=deepseek_config.get('model_name', 'DeepSeek-V3-0324'),
+            messages=[{"role": "system", "content": "You are a helpful assistant."},
+                      {"role": "user", "content": prompt}],
+            temperature=deepseek_config.get('temperature', 0.6),
+            max_tokens=deepseek_config.get('max_tokens', 8192),
+            top_p=deepseek_config.get('top_p', 1.0),
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except openai.APIError as e:
+        logger.error(f"Error during DeepSeek streaming call: {e}", exc_info=True)
+        raise ApiCallError(f"Error during DeepSeek streaming call: {e}") from e
+    except Exception as e:
+        logger.error(f"Unexpected error during DeepSeek streaming call: {e}", exc_info=True)
+        raise ApiCallError(f"Unexpected error during DeepSeek streaming call: {e}") from e
+
 async def generate_structured_content(prompt: str, config: Dict[str, Any], structure_hint: str = "Return only JSON.") -> dict:
     """
     Sends a prompt expecting a structured (JSON) response from DeepSeek.
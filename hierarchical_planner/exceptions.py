@@ -73,6 +73,14 @@ class ApiBlockedError(ApiCallError):
             details += f" Safety Ratings: {self.ratings}."
         return details
 
+class DeadlineExceededError(ApiCallError):
+    """Raised when an API call cannot complete within its deadline budget."""
+    pass
+
+class CircuitOpenError(ApiCallError):
+    """Raised when a provider's circuit breaker is open and no request is sent."""
+    pass
+
 
 # --- JSON Processing Errors ---
 class JsonProcessingError(HierarchicalPlannerError):
@@ -4,18 +4,28 @@ Client module for interacting with the Google Generative AI (Gemini) API.
 Provides functions for configuring the client, initializing the model,
 generating text content, generating structured JSON content, and handling retries.
 """
-import google.generativeai as genai
 import json
 import logging
 import asyncio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, AsyncIterator
 # Remove the specific generation_types import
 # from google.generativeai.types import generation_types 
 
 # Local imports for exceptions
-from .exceptions import ApiKeyError, ApiCallError, ApiResponseError, ApiBlockedError, JsonParsingError, JsonProcessingError
+from .exceptions import ApiKeyError, ApiCallError, ApiResponseError, ApiBlockedError, JsonParsingError, JsonProcessingError, DeadlineExceededError
 # Import DeepSeek client for fallback
 from . import deepseek_v3_client
+from .rate_limiter import get_rate_limiter
+from .http_pool import http_settings
+from .prompt_renderer import render_prompt
+from . import telemetry
+from . import deadline
+from .circuit_breaker import get_circuit_breaker, open_circuit_error
+from .lazy_imports import lazy_import
+
+# Imported on first use (see lazy_imports)
+genai = lazy_import('google.generativeai')
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
@@ -144,9 +154,12 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
     """
     try:
         model = get_gemini_model(config)
-        request_options = {"timeout": 600}
+        # generate_content_async runs on the SDK's async gRPC channel (HTTP/2, multiplexed)
+        request_options = {"timeout": deadline.clamp_timeout(http_settings(config)['timeout_sec'])}
         logger.debug(f"Sending prompt to Gemini model {model.model_name}:\n{prompt[:200]}...") # Log truncated prompt
         response = await model.generate_content_async(prompt, request_options=request_options)
+        usage = getattr(response, 'usage_metadata', None)
+        telemetry.note_usage(getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
 
         # More robust checking based on library structure
         if not response.candidates:
@@ -211,6 +224,44 @@ async def generate_content(prompt: str, config: Dict[str, Any]) -> str:
         raise ApiCallError(f"Error during Gemini API call: {e}") from e
 
 
+async def stream_content(prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Streams the text of a Gemini response as it is generated.
+
+    Args:
+        prompt: The prompt string to send to the model.
+        config: The application configuration dictionary.
+
+    Yields:
+        Text chunks in the order they arrive.
+
+    Raises:
+        ApiCallError: If the API call fails.
+        ApiBlockedError: If the request is blocked.
+    """
+    try:
+        model = get_gemini_model(config)
+        request_options = {"timeout": deadline.clamp_timeout(http_settings(config)['timeout_sec'])}
+        logger.debug(f"Streaming prompt to Gemini model {model.model_name}:\n{prompt[:200]}...")
+        response = await model.generate_content_async(prompt, stream=True, request_options=request_options)
+        async for chunk in response:
+            if not chunk.candidates:
+                continue
+            content = chunk.candidates[0].content
+            if content and content.parts:
+                text = ''.join(part.text for part in content.parts if hasattr(part, 'text'))
+                if text:
+                    yield text
+    except ApiCallError:
+        raise
+    except Exception as e:
+        if e.__class__.__name__ in ('StopCandidateException', 'BlockedPromptException'):
+            logger.error(f"Gemini streaming call stopped: {e}", exc_info=True)
+            raise ApiBlockedError(f"Gemini streaming call stopped: {e}", reason="STOPPED") from e
+        logger.error(f"Error during Gemini streaming call: {e}", exc_info=True)
+        raise ApiCallError(f"Error during Gemini streaming call: {e}") from e
+
+
 async def generate_structured_content(prompt: str, config: Dict[str, Any], structure_hint: str = "Return only JSON.") -> dict:
     """
     Sends a prompt expecting a structured (JSON) response from Gemini.
@@ -267,6 +318,18 @@ async def generate_structured_content(prompt: str, config: Dict[str, Any], struc
 
 # --- Helper Function (Moved from main.py) ---
 
+async def _call_deepseek_fallback(prompt: str, config: Dict[str, Any], is_structured: bool):
+    """Sends a prompt to the DeepSeek fallback model."""
+    telemetry.note_fallback('deepseek', config.get('deepseek', {}).get('model_name'))
+    fallback_limiter = get_rate_limiter(config, 'deepseek')
+    if fallback_limiter:
+        await fallback_limiter.acquire()
+    if is_structured:
+        return await deepseek_v3_client.generate_structured_content(prompt, config)
+    else:
+        return await deepseek_v3_client.generate_content(prompt, config)
+
+
 async def call_gemini_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
     """Calls the appropriate Gemini client function with retries, using config."""
     global _deepseek_fallback_enabled
@@ -275,26 +338,54 @@ async def call_gemini_with_retry(prompt_template: str, context: dict, config: Di
     if not _deepseek_fallback_enabled and 'deepseek' in config:
         configure_deepseek_fallback(config)
         
-    prompt = prompt_template.format(**context)
+    prompt = render_prompt(prompt_template, context)
     last_exception = None
     max_retries = config.get('api', {}).get('retries', 3) # Get retries from config
+    limiter = get_rate_limiter(config, 'gemini')
+    breaker = get_circuit_breaker(config, 'gemini')
 
     for attempt in range(max_retries):
+        if breaker and not breaker.allow_request():
+            # Gemini is known to be down: skip the retry ladder
+            if _deepseek_fallback_enabled:
+                logger.info("Gemini circuit is open; sending request to DeepSeek fallback.")
+                return await _call_deepseek_fallback(prompt, config, is_structured)
+            raise open_circuit_error('gemini', last_exception)
+        telemetry.note_attempt()
+        started = time.perf_counter()
         try:
+            if limiter:
+                await limiter.acquire()
             if is_structured:
                 # Pass config to generate_structured_content
-                response = await generate_structured_content(prompt, config)
+                response = await deadline.bounded(generate_structured_content(prompt, config))
             else:
                  # Pass config to generate_content
                  # This branch might not be used if all prompts request JSON
-                response = await generate_content(prompt, config)
+                response = await deadline.bounded(generate_content(prompt, config))
             logger.debug(f"Gemini call successful after {attempt + 1} attempt(s).")
+            if limiter:
+                limiter.on_success()
+            if breaker:
+                breaker.on_success(time.perf_counter() - started)
             return response
+        except DeadlineExceededError:
+            logger.warning(f"Gemini call attempt {attempt + 1}/{max_retries} ran out of its deadline budget.")
+            raise
         except Exception as e:
             last_exception = e
+            if limiter and is_rate_limit_error(e):
+                limiter.on_rate_limited()
+            if breaker:
+                breaker.on_failure(e)
             logger.warning(f"Gemini call attempt {attempt + 1}/{max_retries} failed: {e}")
             if attempt < max_retries - 1:
+                if breaker and not breaker.is_available():
+                    continue  # The circuit just opened; don't wait out a backoff first
                 wait_time = 2 ** attempt
+                if not deadline.allows_retry(wait_time):
+                    raise DeadlineExceededError(
+                        f"Gemini API call failed after {attempt + 1} attempt(s); no deadline budget left to retry.") from e
                 logger.info(f"Retrying in {wait_time} seconds...")
                 await asyncio.sleep(wait_time) # Exponential backoff
             else:
@@ -304,10 +395,7 @@ async def call_gemini_with_retry(prompt_template: str, context: dict, config: Di
                 if _deepseek_fallback_enabled and is_rate_limit_error(last_exception):
                     logger.info("Falling back to DeepSeek model after Gemini rate limit...")
                     try:
-                        if is_structured:
-                            return await deepseek_v3_client.generate_structured_content(prompt, config)
-                        else:
-                            return await deepseek_v3_client.generate_content(prompt, config)
+                        return await _call_deepseek_fallback(prompt, config, is_structured)
                     except Exception as fallback_error:
                         logger.error(f"DeepSeek fallback also failed: {fallback_error}", exc_info=True)
                         # If fallback also fails, raise the original error
@@ -0,0 +1,167 @@
+"""
+Hedged LLM requests across providers.
+
+A slow response from one provider (request timeouts run to minutes) would
+otherwise stall the pipeline. With hedging enabled, a call still running
+after the configured percentile of that provider's recent call latencies
+gets a duplicate sent to a second provider. The first good answer wins and
+the other request is cancelled. A primary that fails before the hedge
+delay is hedged straight away. If both fail, the primary's error is raised.
+
+Latencies are tracked per provider over a rolling window. Until enough
+samples are collected, `initial_delay_sec` is used. Under a deadline (see
+`deadline`), the hedge fires no later than halfway through the time left,
+so the second provider still has time to answer.
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, Deque, Optional
+
+from . import deadline
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEDGING_SETTINGS: Dict[str, Any] = {
+    'enabled': False,
+    'provider': None,
+    'percentile': 95,
+    'min_samples': 20,
+    'window': 200,
+    'initial_delay_sec': 30.0,
+    'min_delay_sec': 1.0,
+    'max_delay_sec': 120.0,
+}
+
+
+def hedging_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the `hedging` config section with defaults filled in."""
+    return {**DEFAULT_HEDGING_SETTINGS, **(config.get('hedging') or {})}
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies per provider."""
+
+    def __init__(self, window: int = DEFAULT_HEDGING_SETTINGS['window']):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def record(self, provider: str, latency: float) -> None:
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self._window)).append(latency)
+
+    def count(self, provider: str) -> int:
+        with self._lock:
+            return len(self._samples.get(provider, ()))
+
+    def percentile(self, provider: str, pct: float) -> Optional[float]:
+        """Returns the nearest-rank percentile of the provider's recorded latencies, or None if there are none."""
+        with self._lock:
+            ordered = sorted(self._samples.get(provider, ()))
+        if not ordered:
+            return None
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+_tracker = LatencyTracker()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Returns the process-wide latency tracker."""
+    return _tracker
+
+
+def hedge_delay(config: Dict[str, Any], provider: str) -> float:
+    """Returns how long to wait for `provider` before sending a hedged duplicate."""
+    settings = hedging_settings(config)
+    observed = None
+    if _tracker.count(provider) >= int(settings['min_samples']):
+        observed = _tracker.percentile(provider, float(settings['percentile']))
+    delay = float(settings['initial_delay_sec']) if observed is None else observed
+    delay = min(max(delay, float(settings['min_delay_sec'])), float(settings['max_delay_sec']))
+    left = deadline.remaining()
+    if left is not None:
+        delay = min(delay, max(0.0, left / 2))
+    return delay
+
+
+async def _timed(provider: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Runs a call and records its latency if it succeeds. A cancelled call
+    records how long it ran, a lower bound on its latency. Failures are not
+    recorded, since fast errors would pull the percentile down.
+    """
+    started = time.perf_counter()
+    try:
+        result = await call()
+    except asyncio.CancelledError:
+        _tracker.record(provider, time.perf_counter() - started)
+        raise
+    _tracker.record(provider, time.perf_counter() - started)
+    return result
+
+
+async def run_hedged(provider: str, primary: Callable[[], Awaitable[Any]],
+                     hedge_provider: str, hedge: Callable[[], Awaitable[Any]], delay: float) -> Any:
+    """
+    Runs `primary`, and `hedge` as well if the primary has no good answer after `delay` seconds.
+
+    Returns:
+        The first successful result. The other call is cancelled.
+    """
+    primary_task = asyncio.ensure_future(_timed(provider, primary))
+    hedge_task: Optional[asyncio.Future] = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done and primary_task.exception() is None:
+            return primary_task.result()
+
+        reason = "failed" if done else f"no answer after {delay:.1f}s"
+        logger.info(f"{provider} call {reason}; sending hedged request to {hedge_provider}.")
+        hedge_task = asyncio.ensure_future(_timed(hedge_provider, hedge))
+        pending = {hedge_task} if done else {primary_task, hedge_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    winner = provider if task is primary_task else hedge_provider
+                    logger.debug(f"Hedged call answered by {winner}.")
+                    return task.result()
+                logger.warning(f"Hedged {'primary' if task is primary_task else 'duplicate'} call failed: {task.exception()}")
+        return primary_task.result()  # Both failed: raise the primary's error
+    finally:
+        for task in (primary_task, hedge_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def hedge_calls(provider: str, call_with_retry: Callable, hedge_provider: str, hedge_call_with_retry: Callable) -> Callable:
+    """
+    Wraps a provider's call_with_retry so slow calls are hedged with a second provider.
+
+    Hedging is looked up on every call, so switching it off in the config
+    takes effect without re-selecting the client.
+    """
+    async def hedged_call_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+        def primary():
+            return call_with_retry(prompt_template, context, config, is_structured=is_structured)
+
+        if not hedging_settings(config)['enabled']:
+            return await primary()
+
+        def hedge():
+            return hedge_call_with_retry(prompt_template, context, config, is_structured=is_structured)
+        return await run_hedged(provider, primary, hedge_provider, hedge, hedge_delay(config, provider))
+
+    hedged_call_with_retry.__wrapped__ = call_with_retry
+    return hedged_call_with_retry
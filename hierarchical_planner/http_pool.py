@@ -0,0 +1,126 @@
+"""
+Shared, pooled HTTP transport for the async provider SDK clients.
+
+The Anthropic and OpenAI-compatible (DeepSeek) SDKs accept an externally
+built `httpx.AsyncClient`. This module builds one per SDK and event loop from
+the `http` config section, so every request to a provider reuses keep-alive
+connections from a bounded pool instead of opening a fresh connection, and
+HTTP/2 is negotiated when the optional `h2` package is installed.
+
+httpx connections are bound to the event loop that opened them, so pooled
+clients are cached per loop and a new loop (e.g. a second `asyncio.run`)
+gets its own pool.
+"""
+import asyncio
+import importlib.util
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from .lazy_imports import lazy_import
+
+# httpx ships with the provider SDKs; without it they use their own defaults.
+# Imported on first use like the SDKs themselves.
+httpx = lazy_import('httpx', optional=True)
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_HTTP_SETTINGS: Dict[str, Any] = {
+    'max_connections': 20,
+    'max_keepalive_connections': 10,
+    'keepalive_expiry_sec': 30.0,
+    'timeout_sec': 600.0,
+    'connect_timeout_sec': 10.0,
+    'http2': True,
+}
+
+# (sdk name, settings) -> (event loop, pooled client)
+_clients: Dict[Tuple[str, Tuple], Tuple[asyncio.AbstractEventLoop, Any]] = {}
+
+
+def http_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the `http` config section with defaults filled in."""
+    return {**DEFAULT_HTTP_SETTINGS, **(config.get('http') or {})}
+
+
+def request_timeout(config: Dict[str, Any]) -> Any:
+    """
+    Returns the per-request timeout for provider calls.
+
+    An `httpx.Timeout` with a separate connect timeout when httpx is
+    available, otherwise the total timeout in seconds.
+    """
+    settings = http_settings(config)
+    if httpx is None:
+        return float(settings['timeout_sec'])
+    return httpx.Timeout(float(settings['timeout_sec']), connect=float(settings['connect_timeout_sec']))
+
+
+def http2_available() -> bool:
+    """True if the `h2` package needed for HTTP/2 is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def current_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """Returns the running event loop, or None outside a coroutine."""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_async_http_client(sdk: Any, config: Dict[str, Any]) -> Optional[Any]:
+    """
+    Returns the pooled async HTTP client to pass as `http_client` to an SDK client.
+
+    Args:
+        sdk: The SDK module (`anthropic` or `openai`); its `DefaultAsyncHttpxClient`
+             keeps the SDK's own defaults (redirects, headers) for anything not set here.
+        config: The application configuration dictionary.
+
+    Returns:
+        The shared client for this SDK, settings and event loop, or None when no
+        loop is running or httpx is unavailable (the SDK then uses its own pool).
+    """
+    loop = current_loop()
+    if httpx is None or loop is None or not hasattr(sdk, 'DefaultAsyncHttpxClient'):
+        return None
+
+    settings = http_settings(config)
+    key = (sdk.__name__, tuple(sorted(settings.items())))
+    cached = _clients.get(key)
+    if cached is not None and cached[0] is loop and not cached[1].is_closed:
+        return cached[1]
+
+    use_http2 = bool(settings['http2']) and http2_available()
+    limits = httpx.Limits(
+        max_connections=int(settings['max_connections']),
+        max_keepalive_connections=int(settings['max_keepalive_connections']),
+        keepalive_expiry=float(settings['keepalive_expiry_sec']),
+    )
+    client = sdk.DefaultAsyncHttpxClient(limits=limits, timeout=request_timeout(config), http2=use_http2)
+    _clients[key] = (loop, client)
+    logger.info(f"Created pooled HTTP client for {sdk.__name__}: max_connections={limits.max_connections}, "
+                f"keepalive={limits.max_keepalive_connections}, http2={use_http2}")
+    return client
+
+
+def async_client_options(sdk: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the `timeout` and (when available) `http_client` keyword arguments for an SDK's async client."""
+    options: Dict[str, Any] = {'timeout': request_timeout(config)}
+    http_client = get_async_http_client(sdk, config)
+    if http_client is not None:
+        options['http_client'] = http_client
+    return options
+
+
+async def close_http_clients() -> None:
+    """Closes the pooled clients opened on the running event loop."""
+    loop = current_loop()
+    for key, (client_loop, client) in list(_clients.items()):
+        if client_loop is loop:
+            del _clients[key]
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing pooled HTTP client for {key[0]}: {e}")
@@ -0,0 +1,161 @@
+"""
+Incremental parsing of streamed JSON responses.
+
+Structured prompts answer with an object such as `{"phases": [...]}`. While
+the response is still streaming, `JsonArrayStreamParser` scans the text as
+it arrives and returns each element of the named top-level array as soon as
+the element is complete, so work on it can start before the rest of the
+response has been generated. Text around the object (e.g. markdown code
+fences) is ignored.
+"""
+import json
+import logging
+from typing import Any, List, Optional
+
+from .exceptions import ApiResponseError, JsonParsingError
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+
+def strip_code_fences(text: str) -> str:
+    """Removes surrounding whitespace and markdown code fences from a model response."""
+    cleaned = text.strip()
+    if cleaned.startswith("```json"):
+        cleaned = cleaned[7:]
+    elif cleaned.startswith("```"):
+        cleaned = cleaned[3:]
+    if cleaned.endswith("```"):
+        cleaned = cleaned[:-3]
+    return cleaned.strip()
+
+
+class JsonArrayStreamParser:
+    """
+    Emits the elements of one top-level array of a streamed JSON object.
+
+    Only the first array stored under `array_key` directly in the root object
+    is tracked; nested keys with the same name are ignored. Each call to
+    `feed` scans only the newly received text.
+    """
+
+    def __init__(self, array_key: str):
+        """
+        Initialize the parser.
+
+        Args:
+            array_key: Key of the root-object array whose elements are emitted.
+        """
+        self.array_key = array_key
+        self.items_emitted = 0
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._in_array = False
+        self._array_seen = False
+        self._item_start = -1
+        self._root_closed = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Adds streamed text and returns the array elements completed by it.
+
+        Raises:
+            JsonParsingError: If a completed element is not valid JSON.
+        """
+        self._buffer += chunk
+        buf = self._buffer
+        items: List[Any] = []
+        i = self._pos
+        while i < len(buf) and not self._root_closed:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._last_key = json.loads(buf[self._string_start:i + 1])
+                        self._expect_key = False
+                    elif self._in_array and self._depth == 2 and self._item_start == self._string_start:
+                        items.append(self._emit(buf, i + 1))
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+                self._start_item(i)
+            elif ch in '{[':
+                if self._depth == 0 and ch == '[':
+                    # Not an object: nothing to track, the final parse reports the shape
+                    self._root_closed = True
+                    break
+                self._start_item(i)
+                if (self._depth == 1 and ch == '[' and not self._array_seen
+                        and self._last_key == self.array_key):
+                    self._in_array = self._array_seen = True
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif ch in '}]':
+                self._depth -= 1
+                if self._in_array:
+                    if self._depth == 1:
+                        # End of the tracked array; a pending scalar ends here
+                        if self._item_start >= 0:
+                            items.append(self._emit(buf, i))
+                        self._in_array = False
+                    elif self._depth == 2 and self._item_start >= 0:
+                        items.append(self._emit(buf, i + 1))
+                if self._depth <= 0:
+                    self._root_closed = True
+            elif ch == ',':
+                if self._depth == 1:
+                    self._expect_key = True
+                    self._last_key = None
+                elif self._in_array and self._depth == 2 and self._item_start >= 0:
+                    items.append(self._emit(buf, i))
+            elif not ch.isspace():
+                self._start_item(i)
+            i += 1
+        self._pos = i
+        return items
+
+    def _start_item(self, i: int) -> None:
+        if self._in_array and self._depth == 2 and self._item_start < 0:
+            self._item_start = i
+
+    def _emit(self, buf: str, end: int) -> Any:
+        text = buf[self._item_start:end].strip()
+        self._item_start = -1
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise JsonParsingError(f"Streamed '{self.array_key}' element is not valid JSON: {e}") from e
+        self.items_emitted += 1
+        return item
+
+    def close(self) -> Any:
+        """
+        Parses the complete response once the stream has ended.
+
+        Returns:
+            The full JSON document.
+
+        Raises:
+            ApiResponseError: If the response is empty.
+            JsonParsingError: If the response is not valid JSON.
+        """
+        cleaned = strip_code_fences(self._buffer)
+        if not cleaned:
+            raise ApiResponseError("Streamed response was empty after cleaning.")
+        try:
+            return json.loads(cleaned)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to decode streamed JSON response: {e}. Raw response was:\n---\n{self._buffer}\n---")
+            raise JsonParsingError(f"Streamed response was not valid JSON: {e}") from e
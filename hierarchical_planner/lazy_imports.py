@@ -0,0 +1,66 @@
+"""
+Deferred imports of the provider SDKs.
+
+`google.generativeai`, `anthropic` and `openai` take about a second to
+import together, while most invocations use one provider or none (the mock
+provider, `--help`, `--validate-only` against a cached plan). Client modules
+therefore bind their SDK with `lazy_import`, which returns the module object
+right away but only executes it on first attribute access
+(`importlib.util.LazyLoader`).
+
+The returned object is the module registered in `sys.modules`, so patching
+`anthropic.AsyncAnthropic` or `google.generativeai.configure` in tests
+affects the client modules as before.
+"""
+import importlib.util
+import logging
+import sys
+import threading
+from types import ModuleType
+from typing import Optional
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+def lazy_import(name: str, optional: bool = False) -> Optional[ModuleType]:
+    """
+    Returns module `name`, executed on first attribute access.
+
+    Whether the module is installed is checked immediately (without importing
+    it), so a missing SDK fails at the same point as a plain import.
+
+    Args:
+        name: Absolute module name, e.g. 'google.generativeai'.
+        optional: Return None instead of raising if the module is not installed.
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed and not optional.
+    """
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        try:
+            spec = importlib.util.find_spec(name)
+        except ModuleNotFoundError:  # A parent package is missing
+            spec = None
+        if spec is None or spec.loader is None:
+            if optional:
+                return None
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+
+        # Make `import parent.child` style lookups (e.g. by mock.patch) find it
+        parent_name, _, child = name.rpartition('.')
+        if parent_name:
+            setattr(sys.modules[parent_name], child, module)
+        logger.debug(f"Deferred import of {name}")
+        return module
@@ -0,0 +1,214 @@
+"""
+Content-addressed on-disk cache for LLM responses.
+
+Responses are keyed by a SHA-256 digest of (provider, model, temperature,
+response type, rendered prompt), so rerunning the planner with the same goal
+and constitution replays earlier answers instead of calling the provider
+again. Entries expire after a TTL and the cache is kept within entry-count
+and byte limits by evicting the least recently used entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+#: Directory (relative to the hierarchical_planner package) used when none is configured.
+DEFAULT_CACHE_DIR = "cache/llm_responses"
+
+#: Sentinel returned by `ResponseCache.get` on a miss (a cached response may itself be falsy).
+MISS = object()
+
+
+class ResponseCache:
+    """
+    Stores LLM responses as one JSON file per key under `cache_dir`.
+
+    File modification times double as the LRU clock: a hit touches the file,
+    and eviction removes the entries with the oldest timestamps first.
+    """
+
+    def __init__(self, cache_dir: str, ttl_sec: float = 7 * 24 * 3600,
+                 max_entries: int = 5000, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the response cache.
+
+        Args:
+            cache_dir: Absolute directory in which cache entries are stored.
+            ttl_sec: Seconds after which an entry is considered stale. 0 disables expiry.
+            max_entries: Maximum number of entries kept on disk.
+            max_bytes: Maximum total size of all entries in bytes.
+        """
+        self.cache_dir = cache_dir
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> size in bytes, ordered from least to most recently used
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], temperature: Optional[float],
+                 prompt: str, is_structured: bool = True) -> str:
+        """Returns the content address for a rendered prompt sent to a given model."""
+        material = json.dumps([provider, model, temperature, bool(is_structured), prompt],
+                              ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        """Scans the cache directory once and builds the in-memory LRU index."""
+        if self._index is not None:
+            return self._index
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for filename in files:
+                    if not filename.endswith(".json"):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, filename[:-5], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def get(self, key: str) -> Any:
+        """
+        Looks up a cached response.
+
+        Returns:
+            The cached response, or the module-level `MISS` sentinel when the
+            key is absent, expired or unreadable.
+        """
+        path = self._entry_path(key)
+        with self._lock:
+            index = self._load_index()
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except FileNotFoundError:
+                self.misses += 1
+                return MISS
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return MISS
+
+            if self.ttl_sec and time.time() - entry.get("created", 0) > self.ttl_sec:
+                logger.debug(f"Cache entry {key[:12]} expired.")
+                self._remove(key)
+                self.misses += 1
+                return MISS
+
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            if key in index:
+                index.move_to_end(key)
+            self.hits += 1
+            return entry.get("response")
+
+    def set(self, key: str, response: Any, provider: Optional[str] = None, model: Optional[str] = None) -> None:
+        """Stores a response and evicts old entries if the cache is over its limits."""
+        path = self._entry_path(key)
+        entry = {"created": time.time(), "provider": provider, "model": model, "response": response}
+        try:
+            data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Response for cache key {key[:12]} is not JSON serializable, skipping cache: {e}")
+            return
+
+        with self._lock:
+            index = self._load_index()
+            tmp_path = None
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Failed to write cache entry {path}: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return
+
+            self._total_bytes -= index.pop(key, 0)
+            index[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _remove(self, key: str) -> None:
+        """Deletes an entry from disk and the index. Caller must hold the lock."""
+        if self._index is not None:
+            self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Removes least recently used entries until both limits are respected."""
+        index = self._index
+        while index and (len(index) > self.max_entries or self._total_bytes > self.max_bytes):
+            oldest_key = next(iter(index))
+            logger.debug(f"Evicting cache entry {oldest_key[:12]}")
+            self._remove(oldest_key)
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        with self._lock:
+            for key in list(self._load_index()):
+                self._remove(key)
+
+
+_cache_instance: Optional[ResponseCache] = None
+_cache_settings: Optional[Tuple] = None
+
+
+def get_response_cache(config: Dict[str, Any]) -> Optional[ResponseCache]:
+    """
+    Returns the shared response cache configured by the `cache` config section.
+
+    Returns None when the section is missing or caching is disabled, so configs
+    that predate the cache behave exactly as before.
+    """
+    global _cache_instance, _cache_settings
+
+    cache_config = config.get('cache')
+    if not cache_config or not cache_config.get('enabled', False):
+        return None
+
+    cache_dir = cache_config.get('directory', DEFAULT_CACHE_DIR)
+    if not os.path.isabs(cache_dir):
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), cache_dir)
+    settings = (
+        cache_dir,
+        float(cache_config.get('ttl_sec', 7 * 24 * 3600)),
+        int(cache_config.get('max_entries', 5000)),
+        int(float(cache_config.get('max_size_mb', 256)) * 1024 * 1024),
+    )
+    if _cache_instance is None or _cache_settings != settings:
+        _cache_instance = ResponseCache(*settings)
+        _cache_settings = settings
+        logger.info(f"LLM response cache enabled at {cache_dir}")
+    return _cache_instance
@@ -1,66 +1,435 @@
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Optional, Callable, List, Tuple, AsyncIterator
 
 # Import client functions
 from .gemini_client import generate_structured_content as gemini_generate_structured_content
 from .gemini_client import generate_content as gemini_generate_content
 from .gemini_client import call_gemini_with_retry
+from .gemini_client import stream_content as gemini_stream_content
+from .gemini_client import is_rate_limit_error
 from .anthropic_client import generate_structured_content as anthropic_generate_structured_content
 from .anthropic_client import generate_content as anthropic_generate_content
 from .anthropic_client import call_anthropic_with_retry
+from .anthropic_client import stream_content as anthropic_stream_content
+from .mock_client import generate_structured_content as mock_generate_structured_content
+from .mock_client import generate_content as mock_generate_content
+from .mock_client import call_mock_with_retry
+from .mock_client import stream_content as mock_stream_content
+from .llm_cache import get_response_cache, MISS
+from .json_stream import JsonArrayStreamParser
+from .rate_limiter import get_rate_limiter
+from .single_flight import coalesce_calls
+from .hedging import hedge_calls, hedging_settings
+from . import deadline
+from .circuit_breaker import get_circuit_breaker, is_provider_failure, open_circuit_error, rank_providers
+from .exceptions import ApiCallError, CircuitOpenError
+from .prompt_renderer import render_prompt
+from . import telemetry
 
 logger = logging.getLogger(__name__)
 
-async def select_llm_client(config: Dict[str, Any], provider: Optional[str] = None):
+# Appended to structured prompts, matching the clients' generate_structured_content default
+_STRUCTURE_HINT = "Return only JSON."
+
+# Config section holding model settings for each provider
+_PROVIDER_CONFIG_SECTIONS = {
+    'gemini': 'api',
+    'anthropic': 'anthropic',
+    'deepseek': 'deepseek',
+    'mock': 'mock',
+}
+
+
+def _model_settings(config: Dict[str, Any], provider: str) -> Tuple[Optional[str], Optional[float]]:
+    """Returns the (model_name, temperature) a provider will be called with."""
+    section = config.get(_PROVIDER_CONFIG_SECTIONS.get(provider, provider), {}) or {}
+    return section.get('model_name'), section.get('temperature')
+
+
+def _cache_key(cache, provider: str, config: Dict[str, Any], prompt: str, is_structured: bool) -> str:
+    """Returns the response cache key for a rendered prompt sent to a provider."""
+    model_name, temperature = _model_settings(config, provider)
+    return cache.make_key(provider, model_name, temperature, prompt, is_structured)
+
+
+def _with_response_cache(provider: str, call_with_retry: Callable) -> Callable:
     """
-    Selects the appropriate LLM client based on the configuration and optional provider preference.
-    
-    Args:
-        config: The application configuration dictionary.
-        provider: Optional provider preference ('gemini', 'anthropic', 'deepseek')
-        
-    Returns:
-        A tuple containing the appropriate client functions:
-        (generate_structured_content, generate_content, call_with_retry)
+    Wraps a provider's call_with_retry so identical prompts are served from the response cache.
+
+    The cache is looked up on every call, so enabling or disabling it in the
+    config takes effect without re-selecting the client.
+    """
+    async def cached_call_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+        cache = get_response_cache(config)
+        if cache is None:
+            return await call_with_retry(prompt_template, context, config, is_structured=is_structured)
+
+        prompt = render_prompt(prompt_template, context)
+        model_name, _ = _model_settings(config, provider)
+        key = _cache_key(cache, provider, config, prompt, is_structured)
+
+        cached = cache.get(key)
+        if cached is not MISS:
+            logger.debug(f"LLM response cache hit for {provider} ({key[:12]}).")
+            telemetry.note_cache_hit()
+            return cached
+
+        response = await call_with_retry(prompt_template, context, config, is_structured=is_structured)
+        cache.set(key, response, provider=provider, model=model_name)
+        return response
+
+    cached_call_with_retry.__wrapped__ = call_with_retry
+    return cached_call_with_retry
+
+
+def _with_telemetry(provider: str, call_with_retry: Callable) -> Callable:
+    """
+    Wraps a call_with_retry so every call is measured and tagged (see `telemetry`).
+
+    Notes made by the provider client and the response cache while the call
+    runs (attempts, token usage, fallbacks, cache hits) are attributed to it.
+    """
+    async def measured_call_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+        if not telemetry.telemetry_enabled(config):
+            return await call_with_retry(prompt_template, context, config, is_structured=is_structured)
+
+        model_name, _ = _model_settings(config, provider)
+        call, token = telemetry.start_call(provider, model_name, render_prompt(prompt_template, context))
+        try:
+            response = await call_with_retry(prompt_template, context, config, is_structured=is_structured)
+        except Exception:
+            telemetry.finish_call(config, call, token, error=True)
+            raise
+        except BaseException:
+            telemetry.abandon_call(token)
+            raise
+        telemetry.finish_call(config, call, token, response)
+        return response
+
+    measured_call_with_retry.__wrapped__ = call_with_retry
+    return measured_call_with_retry
+
+
+def _measured(provider: str, call_with_retry: Callable) -> Callable:
+    """
+    Returns a provider's call_with_retry behind the response cache, in-flight
+    request coalescing and telemetry.
+
+    Coalescing sits above the cache so concurrent identical calls that all
+    miss it still reach the provider once.
+    """
+    coalesced = coalesce_calls(provider, _with_response_cache(provider, call_with_retry),
+                               lambda config: _model_settings(config, provider))
+    return _with_telemetry(provider, coalesced)
+
+
+def _with_deadline(call_with_retry: Callable) -> Callable:
+    """
+    Wraps a call_with_retry so each call runs under the deadline budget of its
+    plan level (the `level` telemetry tag; see `deadline`).
+    """
+    async def deadline_call_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+        budget = deadline.level_budget(config, telemetry.current_tags().get('level'))
+        with deadline.within(budget):
+            return await call_with_retry(prompt_template, context, config, is_structured=is_structured)
+
+    deadline_call_with_retry.__wrapped__ = call_with_retry
+    return deadline_call_with_retry
+
+
+def _provider_call(provider: str) -> Callable:
+    """Returns the measured call_with_retry of a resolved provider."""
+    if provider == 'mock':
+        return _measured('mock', call_mock_with_retry)
+    if provider == 'anthropic':
+        return _measured('anthropic', call_anthropic_with_retry)
+    return _measured('gemini', call_gemini_with_retry)
+
+
+def _provider_available(config: Dict[str, Any], provider: str) -> bool:
+    """True if a provider can be called with the given configuration."""
+    if provider == 'mock':
+        return True
+    if provider == 'anthropic':
+        return bool(config.get('anthropic', {}).get('api_key'))
+    if provider == 'gemini':
+        return bool(config.get('api', {}).get('resolved_key'))
+    return False
+
+
+def _hedge_provider(config: Dict[str, Any], provider: str) -> Optional[str]:
+    """Returns the configured provider to hedge `provider`'s calls with, or None."""
+    settings = hedging_settings(config)
+    hedge = (settings.get('provider') or '').lower()
+    if not settings['enabled'] or not hedge or hedge == provider:
+        return None
+    if _provider_available(config, hedge):
+        return hedge
+    logger.warning(f"Hedging provider '{hedge}' is not configured; {provider} calls will not be hedged.")
+    return None
+
+
+def _hedged_call(config: Dict[str, Any], provider: str) -> Callable:
+    """Returns a provider's measured call, hedged with a second provider if configured."""
+    call_with_retry = _provider_call(provider)
+    hedge = _hedge_provider(config, provider)
+    if hedge:
+        logger.info(f"Hedging slow {provider} calls with {hedge}.")
+        call_with_retry = hedge_calls(provider, call_with_retry, hedge, _provider_call(hedge))
+    return call_with_retry
+
+
+def _route_candidates(config: Dict[str, Any], provider: str) -> List[str]:
+    """
+    Returns the providers a call may be routed to, the selected one first.
+
+    The mock provider is never routed away from, so offline runs and
+    benchmarks cannot end up calling a real API.
+    """
+    settings = config.get('routing') or {}
+    if not settings.get('enabled', True) or provider == 'mock':
+        return [provider]
+    candidates = [provider]
+    for name in settings.get('providers') or []:
+        name = str(name).lower()
+        if name not in candidates and _provider_available(config, name):
+            candidates.append(name)
+    return candidates
+
+
+def _with_routing(config: Dict[str, Any], provider: str, calls: Dict[str, Callable]) -> Callable:
     """
+    Wraps per-provider calls so each call goes to the best available provider.
+
+    Providers are ranked per call by their circuit breakers (see
+    `circuit_breaker`). Providers with an open circuit are skipped. A call
+    that fails because of its provider (after that provider's own retries,
+    or at once when its circuit opens) is passed on to the next provider.
+    """
+    strategy = (config.get('routing') or {}).get('strategy', 'preferred')
+
+    async def routed_call_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+        order = rank_providers(config, list(calls), strategy)
+        if not order:
+            raise CircuitOpenError(f"Circuits are open for every configured provider ({', '.join(calls)}).")
+        last_error: Optional[Exception] = None
+        for name in order:
+            if name != provider:
+                logger.info(f"Routing {provider} call to {name}.")
+            try:
+                return await calls[name](prompt_template, context, config, is_structured=is_structured)
+            except ApiCallError as e:
+                if not (is_provider_failure(e) or isinstance(e, CircuitOpenError)):
+                    raise
+                logger.warning(f"{name} call failed ({e}); trying the next provider.")
+                last_error = e
+        raise last_error
+
+    routed_call_with_retry.__wrapped__ = calls[provider]
+    return routed_call_with_retry
+
+
+def _planned_call(config: Dict[str, Any], provider: str) -> Callable:
+    """
+    Returns the call_with_retry for a selected provider: measured and hedged
+    per provider, routed between the configured providers by health, and run
+    under the deadline of its plan level.
+    """
+    candidates = _route_candidates(config, provider)
+    calls = {name: _hedged_call(config, name) for name in candidates}
+    call_with_retry = _with_routing(config, provider, calls) if len(calls) > 1 else calls[provider]
+    return _with_deadline(call_with_retry)
+
+
+# Streaming text call of each provider
+_STREAM_CONTENT = {
+    'mock': mock_stream_content,
+    'anthropic': anthropic_stream_content,
+    'gemini': gemini_stream_content,
+}
+
+
+def _streaming_call(config: Dict[str, Any], provider: str) -> Callable:
+    """
+    Builds a streaming structured call for a selected provider.
+
+    The returned async generator yields the elements of one top-level array of
+    the JSON response (e.g. "phases") as soon as each element is complete. It
+    shares cache entries with the non-streaming call for the same prompt.
+
+    Like regular calls, streams go to the best available provider by circuit
+    breaker health (see `_with_routing`) and report their outcome to its
+    breaker. If no provider can be streamed from or the stream fails, the
+    regular planned call (with its retries, routing and hedging) is used and
+    only the elements not yet yielded are emitted.
+    """
+    candidates = _route_candidates(config, provider)
+    strategy = (config.get('routing') or {}).get('strategy', 'preferred')
+    fallback_call = _planned_call(config, provider)
+
+    async def stream_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], array_key: str) -> AsyncIterator[Any]:
+        prompt = render_prompt(prompt_template, context)
+        order = rank_providers(config, candidates, strategy)
+        name = order[0] if order else provider
+        if name != provider:
+            logger.info(f"Routing {provider} stream to {name}.")
+        model_name, _ = _model_settings(config, name)
+        # Not bound to the context: the generator may be finalized elsewhere
+        call, _ = telemetry.start_call(name, model_name, prompt, bind=False)
+        response = None
+        outcome = 'error'
+        try:
+            cache = get_response_cache(config)
+            key = _cache_key(cache, name, config, prompt, True) if cache is not None else None
+            if cache is not None:
+                cached = cache.get(key)
+                if cached is not MISS:
+                    logger.debug(f"LLM response cache hit for {name} ({key[:12]}).")
+                    call.cache_hit = True
+                    response = cached
+                    for item in ((cached.get(array_key) or []) if isinstance(cached, dict) else []):
+                        yield item
+                    outcome = 'ok'
+                    return
+
+            parser = JsonArrayStreamParser(array_key)
+            breaker = get_circuit_breaker(config, name)
+            if not order or (breaker and not breaker.allow_request()):
+                error: Optional[Exception] = open_circuit_error(name)
+            else:
+                error = None
+                limiter = get_rate_limiter(config, name)
+                call.attempts += 1
+                started = time.perf_counter()
+                try:
+                    if limiter:
+                        await limiter.acquire()
+                    async for chunk in _STREAM_CONTENT[name](f"{prompt}\n\n{_STRUCTURE_HINT}", config):
+                        for item in parser.feed(chunk):
+                            yield item
+                    response = parser.close()
+                    if limiter:
+                        limiter.on_success()
+                    if breaker:
+                        breaker.on_success(time.perf_counter() - started)
+                except Exception as e:
+                    if limiter and is_rate_limit_error(e):
+                        limiter.on_rate_limited()
+                    if breaker:
+                        breaker.on_failure(e)
+                    error = e
+
+            if error is not None:
+                logger.warning(f"Streaming {name} call failed after {parser.items_emitted} '{array_key}' "
+                               f"element(s); falling back to a regular call: {error}")
+                # The fallback is measured (and cached) as a call of its own
+                outcome = 'fallback'
+                if telemetry.telemetry_enabled(config):
+                    telemetry.finish_call(config, call, None, error=True)
+                response = await fallback_call(prompt_template, context, config, is_structured=True)
+                remaining = (response.get(array_key) or []) if isinstance(response, dict) else []
+                for item in remaining[parser.items_emitted:]:
+                    yield item
+                return
+
+            if cache is not None:
+                cache.set(key, response, provider=name, model=model_name)
+            outcome = 'ok'
+        except (GeneratorExit, asyncio.CancelledError):
+            # The consumer stopped early (e.g. the list was invalidated); not a failed call
+            if outcome != 'fallback':
+                outcome = 'abandoned'
+            raise
+        finally:
+            if outcome in ('ok', 'error') and telemetry.telemetry_enabled(config):
+                telemetry.finish_call(config, call, None, response, error=outcome == 'error')
+
+    return stream_with_retry
+
+
+def _resolve_provider(config: Dict[str, Any], provider: Optional[str] = None) -> str:
+    """Returns the provider to use ('anthropic', 'gemini' or 'mock') for a configuration and optional preference."""
     # If a specific provider is requested, try to use it
     if provider:
-        if provider.lower() == 'anthropic':
+        if provider.lower() == 'mock':
+            # Local deterministic provider; needs no API key
+            logger.info("Using local mock LLM client (user specified).")
+            return 'mock'
+        elif provider.lower() == 'anthropic':
             if 'anthropic' in config and config.get('anthropic', {}).get('api_key'):
                 logger.info("Using Anthropic client with Claude model (user specified).")
-                return (
-                    anthropic_generate_structured_content,
-                    anthropic_generate_content,
-                    call_anthropic_with_retry
-                )
+                return 'anthropic'
             else:
                 logger.warning("Anthropic provider requested but API key not configured. Falling back to auto-selection.")
         elif provider.lower() == 'gemini':
             if 'api' in config and config.get('api', {}).get('resolved_key'):
                 logger.info("Using Gemini client (user specified).")
-                return (
-                    gemini_generate_structured_content,
-                    gemini_generate_content,
-                    call_gemini_with_retry
-                )
+                return 'gemini'
             else:
                 logger.warning("Gemini provider requested but API key not configured. Falling back to auto-selection.")
         elif provider.lower() == 'deepseek':
             logger.warning("DeepSeek provider requested but not yet implemented. Falling back to auto-selection.")
-    
+
     # Auto-selection logic (original behavior)
     # Check if Anthropic is configured
     if 'anthropic' in config and config.get('anthropic', {}).get('api_key'):
         logger.info("Using Anthropic client with Claude model (auto-selected).")
+        return 'anthropic'
+    # Default to Gemini
+    logger.info("Using Gemini client (auto-selected).")
+    return 'gemini'
+
+
+async def select_llm_client(config: Dict[str, Any], provider: Optional[str] = None):
+    """
+    Selects the appropriate LLM client based on the configuration and optional provider preference.
+
+    The returned call_with_retry is fronted by the shared response cache
+    (see `llm_cache`) when the `cache` config section enables it, runs under
+    the deadline budget of its plan level (see `deadline`), and is hedged
+    with a second provider when `hedging` is enabled (see `hedging`). With
+    `routing` configured, calls move to another configured provider while
+    the selected one's circuit is open or when it fails (see `circuit_breaker`).
+
+    Args:
+        config: The application configuration dictionary.
+        provider: Optional provider preference ('gemini', 'anthropic', 'deepseek', 'mock')
+
+    Returns:
+        A tuple containing the appropriate client functions:
+        (generate_structured_content, generate_content, call_with_retry)
+    """
+    resolved = _resolve_provider(config, provider)
+    if resolved == 'mock':
+        return (
+            mock_generate_structured_content,
+            mock_generate_content,
+            _planned_call(config, 'mock')
+        )
+    if resolved == 'anthropic':
         return (
             anthropic_generate_structured_content,
             anthropic_generate_content,
-            call_anthropic_with_retry
+            _planned_call(config, 'anthropic')
         )
-    # Default to Gemini
-    logger.info("Using Gemini client (auto-selected).")
     return (
         gemini_generate_structured_content,
         gemini_generate_content,
-        call_gemini_with_retry
+        _planned_call(config, 'gemini')
     )
+
+
+async def select_streaming_client(config: Dict[str, Any], provider: Optional[str] = None) -> Callable:
+    """
+    Selects the provider like `select_llm_client` and returns its streaming structured call.
+
+    Streams are routed by circuit breaker health like regular calls, and fall
+    back to the same planned call `select_llm_client` returns.
+
+    Returns:
+        stream_with_retry(prompt_template, context, config, array_key), an async
+        generator over the elements of `array_key` in the JSON response.
+    """
+    return _streaming_call(config, _resolve_provider(config, provider))
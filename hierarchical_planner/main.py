@@ -10,12 +10,14 @@ Orchestrates the process of:
 6. Optionally, running a QA validation and annotation process on the plan.
 """
 import asyncio
+import contextlib
+import functools
 import json
 import os
 import argparse
 import logging
 import sys
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Awaitable, AsyncIterator, Callable
 
 # Local imports
 # Note: client functions now require config passed in
@@ -28,10 +30,16 @@ from .anthropic_client import generate_structured_content as anthropic_generate_
 from .anthropic_client import generate_content as anthropic_generate_content
 from .anthropic_client import call_anthropic_with_retry
 # TODO: Update qa_validator import/call signature when config is integrated there
-from .qa_validator import run_validation as run_qa_validation, validate_steps, validate_phases, validate_tasks
+from .qa_validator import run_validation as run_qa_validation, validate_steps, validate_phases, validate_tasks, validate_plan_file
 from .config_loader import load_config # ConfigError is now in exceptions
 from .logger_setup import setup_logging # Added
 from .checkpoint_manager import CheckpointManager # Import the checkpoint manager
+from .plan_scheduler import DagScheduler
+from .qa_pipeline import QaPipeline
+from .plan_fingerprint import PlanFingerprints, PreviousPlan, save_fingerprints
+from .plan_schema import constitution_schema, validate_constitution, validate_plan
+from .tree_stream import tree_items, write_tree
+from .plan_jsonl import export_plan_file, import_plan_files
 # Import custom exceptions
 from .exceptions import (
     HierarchicalPlannerError, ConfigError, FileProcessingError,
@@ -41,22 +49,41 @@ from .exceptions import (
 )
 from .project_builder import ProjectBuilder
 
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+
 # --- Load Configuration ---
-try:
-    # Assumes config.yaml is in config relative to this file's location (hierarchical_planner/)
-    CONFIG = load_config('config/config.yaml')
-    # --- Setup Logging ---
-    setup_logging(CONFIG) # Call the setup function HERE
-    logger = logging.getLogger(__name__) # Get logger AFTER setup
-    logger.info("Configuration loaded and logging configured successfully.")
-except ConfigError as e:
-    # Catch specific ConfigError from loader
-    print(f"CRITICAL: Configuration error: {e}", file=sys.stderr)
-    sys.exit(1) # Exit if config fails
-except Exception as e:
-     # Catch any other unexpected error during setup
-    print(f"CRITICAL: Unexpected error during application setup: {e}", file=sys.stderr)
-    sys.exit(1)
+def init_app(config_path: str = 'config/config.yaml') -> Dict[str, Any]:
+    """
+    Loads the configuration and sets up logging, once per process.
+
+    Importing this module has no side effects: the command line entry point
+    calls this first, and reading `main.CONFIG` calls it on first access.
+
+    Args:
+        config_path: Path of the YAML configuration, relative to the hierarchical_planner directory.
+
+    Returns:
+        The loaded configuration dictionary (also available as `CONFIG`).
+
+    Raises:
+        ConfigError: If the configuration cannot be loaded.
+    """
+    config = globals().get('CONFIG')
+    if config is None:
+        config = load_config(config_path)
+        setup_logging(config)
+        globals()['CONFIG'] = config
+        logger.info("Configuration loaded and logging configured successfully.")
+    return config
+
+
+def __getattr__(name: str) -> Any:
+    # CONFIG is loaded on first access instead of at import time
+    if name == 'CONFIG':
+        return init_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Configuration (Now loaded from CONFIG) ---
@@ -68,10 +95,85 @@ from .prompts.STEP_GENERATION_PROMPT import STEP_GENERATION_PROMPT
 
 
 # --- Helper Functions ---
-from .llm_client_selector import select_llm_client
+from .llm_client_selector import select_llm_client, select_streaming_client
+from . import telemetry
+from .prompt_renderer import constitution_text, constitution_for_level
+from .http_pool import close_http_clients
 
 # --- Main Logic ---
 
+def _restore_completed_tasks(checkpoint_data: Dict[str, Any], reasoning_tree: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Rebuilds the per-task completion record from a generation checkpoint.
+
+    Checkpoints written before completion was tracked per task only carry the
+    tree, so for those a task counts as done once it has steps, and a phase
+    counts as expanded once it has tasks.
+    """
+    completed = checkpoint_data.get("completed_tasks")
+    if isinstance(completed, dict):
+        return {phase: list(tasks) for phase, tasks in completed.items() if phase in reasoning_tree}
+
+    restored: Dict[str, List[str]] = {}
+    for phase, tasks in reasoning_tree.items():
+        if isinstance(tasks, dict) and tasks:
+            restored[phase] = [task for task, steps in tasks.items() if steps]
+    return restored
+
+
+async def _gather_or_cancel(coroutines: Iterable[Awaitable[Any]]) -> list:
+    """
+    Runs coroutines concurrently, cancelling the remaining ones if any fails.
+
+    Unlike a bare `asyncio.gather`, siblings are not left running in the
+    background once the first exception propagates.
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _fan_out_stream(items: AsyncIterator[str], start: Callable[[str], Awaitable[None]],
+                          finalize: Callable[[List[str]], Awaitable[List[str]]]) -> None:
+    """
+    Starts `start(item)` for each streamed item as soon as it arrives.
+
+    Once the stream ends, `finalize` receives the streamed items and returns the
+    final list (e.g. after validation): work for items it dropped is cancelled
+    and items it added are started. If anything fails, all remaining work is
+    cancelled before the exception propagates.
+    """
+    running: Dict[str, asyncio.Future] = {}
+    try:
+        async for item in items:
+            if item not in running:
+                running[item] = asyncio.ensure_future(start(item))
+        final = await finalize(list(running))
+        for item in [item for item in running if item not in final]:
+            running.pop(item).cancel()
+        for item in final:
+            if item not in running:
+                running[item] = asyncio.ensure_future(start(item))
+        await asyncio.gather(*running.values())
+    except BaseException:
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*running.values(), return_exceptions=True)
+        raise
+
+
+async def _holding(semaphore: asyncio.Semaphore, items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Iterates a stream while holding a semaphore slot, releasing it when the stream ends."""
+    async with semaphore:
+        async for item in items:
+            yield item
+
+
 async def generate_constitution(goal: str, config: Dict[str, Any], provider: Optional[str] = None) -> Dict[str, Any]:
     """
     Generates the project constitution by reading the schema and calling the LLM.
@@ -79,19 +181,21 @@ async def generate_constitution(goal: str, config: Dict[str, Any], provider: Opt
     logger.info("Generating Project Constitution...")
     try:
         # Load the constitution schema from the external file
-        schema_path = os.path.join(os.path.dirname(__file__), 'config', 'project_constitution_schema.json')
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            schema = json.load(f)
+        schema = constitution_schema()
         
         _, _, call_with_retry = await select_llm_client(config, provider)
         constitution_context = {
             "goal": goal,
             "schema": json.dumps(schema, indent=2)
         }
-        constitution_response = await call_with_retry(CONSTITUTION_GENERATION_PROMPT, constitution_context, config)
-        
-        # TODO: Add validation against the loaded schema here
+        with telemetry.tagged(role='founding_architect', level='constitution'):
+            constitution_response = await call_with_retry(CONSTITUTION_GENERATION_PROMPT, constitution_context, config)
         
+        schema_errors = validate_constitution(constitution_response)
+        if schema_errors:
+            logger.warning(f"Project Constitution does not match its schema ({len(schema_errors)} issue(s)): "
+                           + "; ".join(str(error) for error in schema_errors[:10]))
+
         if "project_file_map" not in constitution_response:
             constitution_response["project_file_map"] = {}
 
@@ -109,7 +213,7 @@ async def generate_constitution(goal: str, config: Dict[str, Any], provider: Opt
         raise PlanGenerationError("Could not establish Project Constitution.") from e
 
 
-async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any], resume: bool = True, provider: Optional[str] = None, constitution: Dict[str, Any] = None) -> tuple[dict | None, str | None]:
+async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any], resume: bool = True, provider: Optional[str] = None, constitution: Dict[str, Any] = None, incremental: bool = False) -> tuple[dict | None, str | None]:
     """
     Generates the hierarchical plan (Phases, Tasks, Steps) using Gemini.
 
@@ -117,11 +221,34 @@ async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any]
     (via `call_gemini_with_retry`) to generate phases, tasks for each phase,
     and steps for each task. Saves the resulting plan structure to output_file.
 
+    When `generation.concurrent` is enabled in the config, generation runs as
+    a dependency graph of units (phase list -> task list per phase -> steps per
+    task -> QA per task) on a `DagScheduler`: each unit starts as soon as the
+    unit it depends on has finished, so task lists for all phases are
+    generated at once and QA for finished tasks overlaps with step generation
+    for the others. At most `generation.max_concurrency` units run at a time.
+    The resulting tree keeps the same ordering as a serial run.
+
+    With `generation.stream`, phase and task lists are streamed: step and task
+    generation for each element starts as soon as it has been received,
+    before the rest of the list has been generated. The lists are still
+    validated as a whole once complete.
+
+    Outside the dependency graph, QA does not block generation: each task's
+    generated steps are queued for a `QaPipeline` of `qa.pipeline_workers`
+    workers, and the tree is complete once the queue has drained.
+
+    With `incremental`, the tree previously written to `output_file` is reused:
+    only nodes whose input fingerprints (see `plan_fingerprint`) changed are
+    regenerated. A checkpoint of an interrupted run takes precedence. The
+    fingerprints of the final tree are always written next to `output_file`.
+
     Args:
         task_file: Absolute path to the input file containing the high-level goal.
         output_file: Absolute path to save the generated JSON plan.
         config: The application configuration dictionary.
         resume: Whether to attempt to resume from a checkpoint if available.
+        incremental: Whether to reuse unchanged nodes of the previous plan in `output_file`.
 
     Returns:
         A tuple containing:
@@ -139,13 +266,16 @@ async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any]
     logger.info("Starting hierarchical planning process...")
     
     # Initialize checkpoint manager
-    checkpoint_manager = CheckpointManager()
+    checkpoint_manager = CheckpointManager(checkpoint_dir=config.get('checkpoint', {}).get('directory', 'checkpoints'),
+                                           compact_every=config.get('checkpoint', {}).get('compact_every', 200))
     checkpoint_path = ""
     
     goal: str | None = None
     reasoning_tree = {}
-    last_processed_phase = None
-    last_processed_task = None
+    # Maps each phase whose task list has been generated to the tasks whose steps are done
+    completed_tasks: Dict[str, List[str]] = {}
+    # Tasks finished while their phase's task list was still streaming
+    early_done: Dict[str, List[str]] = {}
 
     # 1. Read Goal
     try:
@@ -166,39 +296,74 @@ async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any]
     # 2. Check for an existing checkpoint if resume is enabled
     if resume:
         logger.info("Checking for existing checkpoints to resume from...")
-        checkpoint_data, checkpoint_path = checkpoint_manager.find_latest_generation_checkpoint(goal)
+        # Reads from disk, so it runs off the event loop
+        checkpoint_data, checkpoint_path = await asyncio.to_thread(
+            checkpoint_manager.find_latest_generation_checkpoint, goal, constitution)
         
         if checkpoint_data:
             # Resume from checkpoint
             logger.info(f"Resuming from checkpoint: {checkpoint_path}")
             reasoning_tree = checkpoint_data.get("reasoning_tree", {})
-            last_processed_phase = checkpoint_data.get("last_processed_phase")
-            last_processed_task = checkpoint_data.get("last_processed_task")
+            completed_tasks = _restore_completed_tasks(checkpoint_data, reasoning_tree)
             
             if reasoning_tree:
-                logger.info(f"Restored checkpoint with {len(reasoning_tree)} phases")
-                # If we have phases already and no last_processed_phase, we've completed phase generation
-                if not last_processed_phase and reasoning_tree:
-                    # Get the last phase we'll process next
-                    phases = list(reasoning_tree.keys())
-                    if phases:
-                        last_processed_phase = phases[-1]  # Start with the first phase
-                        logger.info(f"Will resume by processing tasks for phase: {last_processed_phase}")
+                done_count = sum(len(tasks) for tasks in completed_tasks.values())
+                logger.info(f"Restored checkpoint with {len(reasoning_tree)} phases and {done_count} completed tasks")
+
+    # Nothing is persisted until the phase list is final (it may still be streaming)
+    phases_complete = bool(reasoning_tree)
+
+    def save_progress() -> str:
+        """Persists the current tree together with the per-task completion record."""
+        return checkpoint_manager.save_generation_checkpoint(
+            goal=goal,
+            current_state=reasoning_tree,
+            completed_tasks=completed_tasks,
+            constitution=constitution
+        )
+
+    def record_progress(updates: List[Tuple[str, List[str], Any]]) -> None:
+        """Appends one unit of completed work to the checkpoint journal."""
+        nonlocal checkpoint_path
+        for _, path, value in updates:
+            # Catch malformed generated nodes as they are checkpointed, not at QA time
+            if path[0] == "reasoning_tree":
+                schema_errors = validate_plan(value, at=path[1:])
+                if schema_errors:
+                    logger.warning(f"Generated plan node {path[1:]} does not match the plan schema: "
+                                   + "; ".join(str(error) for error in schema_errors[:10]))
+        if not phases_complete:
+            # Captured by the snapshot taken once the streamed phase list is final
+            return
+        # Fall back to a full snapshot if there is no journal to append to yet
+        checkpoint_path = checkpoint_manager.record_generation_progress(goal, updates, constitution) or save_progress()
     
     try:
         if not constitution:
             raise PlanGenerationError("Cannot generate plan without a Project Constitution.")
             
-        constitution_str = json.dumps(constitution, indent=2)
+        constitution_str = constitution_text(constitution)
+        # Task and step prompts may get the compact constitution digest instead
+        task_constitution = constitution_for_level(constitution, config, 'task')
+        step_constitution = constitution_for_level(constitution, config, 'step')
+        fingerprints = PlanFingerprints(goal, constitution_str, task_constitution, step_constitution)
+        previous_plan = PreviousPlan.load(output_file, fingerprints) if incremental and not reasoning_tree else None
 
         # Select the appropriate LLM client
         _, _, call_with_retry = await select_llm_client(config, provider)
+        generation_config = config.get('generation', {})
+        stream_items = await select_streaming_client(config, provider) if generation_config.get('stream', False) else None
+        phase_context = {"goal": goal, "constitution": constitution_str}
         
-        # 3. Generate Phases if we don't have them
-        if not reasoning_tree:
+        # Concurrent generation runs phases, tasks, steps and QA as a dependency graph
+        use_dag = generation_config.get('concurrent', False) and not stream_items
+
+        async def generate_phases() -> None:
+            """Generates and validates the phase list and starts the tree (and checkpoint) from it."""
+            nonlocal checkpoint_path, phases_complete
             logger.info("Generating phases...")
-            phase_context = {"goal": goal, "constitution": constitution_str}
-            phase_response = await call_with_retry(PHASE_GENERATION_PROMPT, phase_context, config)
+            with telemetry.tagged(role='planner', level='phase'):
+                phase_response = await call_with_retry(PHASE_GENERATION_PROMPT, phase_context, config)
             phases = phase_response.get("phases", [])
 
             if phases:
@@ -211,144 +376,278 @@ async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any]
             logger.info(f"Generated {len(phases)} phases.")
             
             # Initialize reasoning tree with empty entries for each phase
-            reasoning_tree = {phase: {} for phase in phases}
+            reasoning_tree.update({phase: {} for phase in phases})
+            completed_tasks.clear()
+            phases_complete = True
             
             # Save checkpoint after phase generation
-            checkpoint_path = checkpoint_manager.save_generation_checkpoint(
-                goal=goal, 
-                current_state=reasoning_tree,
-                last_processed_phase=None,  # We haven't started processing tasks yet
-                last_processed_task=None
-            )
+            checkpoint_path = save_progress()
+
+        def reuse_tasks(phase: str) -> bool:
+            """Takes a phase's task list (and unchanged steps) from the previous plan if its inputs are unchanged."""
+            reused = previous_plan.tasks(phase) if previous_plan else None
+            if reused is None:
+                return False
+            reasoning_tree[phase], completed_tasks[phase] = reused
+            logger.info(f"Reusing {len(reused[0])} tasks of phase '{phase}' from the previous plan "
+                        f"({len(reused[1])} with unchanged steps)")
+            record_progress([
+                ("set", ["reasoning_tree", phase], reasoning_tree[phase]),
+                ("set", ["completed_tasks", phase], completed_tasks[phase]),
+            ])
+            return True
+
+        # Incremental runs start from the previous plan's phases if their inputs are unchanged
+        previous_phases = previous_plan.phases() if previous_plan else None
+        if previous_phases:
+            logger.info(f"Reusing {len(previous_phases)} phases from the previous plan")
+            reasoning_tree.update({phase: {} for phase in previous_phases})
+            phases_complete = True
+            checkpoint_path = save_progress()
+            for phase in previous_phases:
+                reuse_tasks(phase)
+
+        # 3. Generate Phases if we don't have them (streamed phases are generated in step 4,
+        #    and the dependency graph generates them as its first unit)
+        if not reasoning_tree and not stream_items and not use_dag:
+            await generate_phases()
+
+        async def generate_tasks(phase: str) -> None:
+            """Generates the task list for a phase and records it in the tree."""
+            if reuse_tasks(phase):
+                return
+            logger.info(f"Generating tasks for Phase: {phase}")
+            task_context = {"goal": goal, "phase": phase, "constitution": task_constitution}
+            with telemetry.tagged(role='planner', level='task'):
+                task_response = await call_with_retry(TASK_GENERATION_PROMPT, task_context, config)
+            tasks = task_response.get("tasks", [])
 
-        # 4. Generate Tasks for each Phase and Steps for each Task
-        phases = list(reasoning_tree.keys())
-        
-        # Determine where to start based on checkpoint
-        start_phase_idx = 0
-        if last_processed_phase:
+            if tasks:
+                tasks = await validate_tasks(tasks, goal, phase, config, constitution, provider)
+
+            if not tasks:
+                logger.warning(f"No tasks generated for phase '{phase}'. Continuing to next phase.")
+            else:
+                logger.info(f"Generated {len(tasks)} tasks for phase '{phase}'")
+
+            # Initialize each task with an empty list to be filled with steps
+            reasoning_tree[phase] = {task: [] for task in tasks}
+            completed_tasks[phase] = []
+            # Save checkpoint after task generation
+            record_progress([
+                ("set", ["reasoning_tree", phase], reasoning_tree[phase]),
+                ("set", ["completed_tasks", phase], []),
+            ])
+
+        async def draft_steps(phase: str, task: str) -> List[Dict[str, Any]]:
+            """Generates the steps for a task, before QA."""
+            logger.info(f"  Generating steps for Task: {task}")
+            step_context = {"goal": goal, "phase": phase, "task": task, "constitution": step_constitution}
+            with telemetry.tagged(role='planner', level='step'):
+                step_response = await call_with_retry(STEP_GENERATION_PROMPT, step_context, config)
+            return step_response.get("steps", [])
+
+        def checked_steps(phase: str, task: str, steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            """Logs the outcome of step generation for a task and returns its final steps."""
+            if not steps:
+                logger.warning(f"No steps generated for task '{task}' in phase '{phase}'. Continuing to next task.")
+                return []
+            logger.info(f"  Generated {len(steps)} steps for task '{task}'")
+            return steps
+
+        def failed_steps(task: str, error: Exception) -> List[Dict[str, Any]]:
+            """Returns the steps recorded for a task whose generation or QA failed."""
+            logger.error(f"Error generating steps for task '{task}': {error}", exc_info=True)
+            # Mark the task as having an error by storing a special error indicator
+            return [{"error": f"Failed to generate steps: {str(error)}"}]
+
+        def complete_task(phase: str, task: str, steps: List[Dict[str, Any]]) -> None:
+            """Stores a task's final steps, marks it complete and records the progress."""
+            if phase not in reasoning_tree or (phase in completed_tasks and task not in reasoning_tree[phase]):
+                # Dropped by list validation while its QA was still queued
+                return
+            reasoning_tree[phase][task] = steps
+            if phase not in completed_tasks:
+                # The task list is still streaming; it is recorded together with the list
+                early_done.setdefault(phase, []).append(task)
+                return
+            completed_tasks[phase].append(task)
+            # Save checkpoint after processing each task
+            record_progress([
+                ("set", ["reasoning_tree", phase, task], steps),
+                ("append", ["completed_tasks", phase], task),
+            ])
+
+        async def review_steps(phase: str, task: str, steps: List[Dict[str, Any]]) -> None:
+            """Runs QA on a task's generated steps and marks the task complete."""
             try:
-                # Find the index of the last processed phase
-                start_phase_idx = phases.index(last_processed_phase)
-                
-                # If we have a last_processed_task and it exists in the current phase's tasks,
-                # we need to continue from the next task
-                if last_processed_task and last_processed_task in reasoning_tree[last_processed_phase]:
-                    # Continue from next phase since we completed all tasks in this phase
-                    start_phase_idx += 1
-            except ValueError:
-                # Phase not found, start from beginning
-                logger.warning(f"Last processed phase '{last_processed_phase}' not found in phases, starting from beginning")
-                start_phase_idx = 0
-        
-        for phase_idx in range(start_phase_idx, len(phases)):
-            phase = phases[phase_idx]
-            logger.info(f"Processing Phase: {phase} [{phase_idx + 1}/{len(phases)}]")
-            
-            # Skip if we already have tasks for this phase
-            if reasoning_tree[phase] and all(isinstance(reasoning_tree[phase][task], list) for task in reasoning_tree[phase]):
-                logger.info(f"Skipping phase '{phase}' as it already has complete tasks with steps")
-                continue
-            
-            # Generate tasks for this phase if needed
-            if not reasoning_tree[phase]:
-                logger.info(f"Generating tasks for Phase: {phase}")
-                task_context = {"goal": goal, "phase": phase, "constitution": constitution_str}
-                task_response = await call_with_retry(TASK_GENERATION_PROMPT, task_context, config)
-                tasks = task_response.get("tasks", [])
-
-                if tasks:
-                    tasks = await validate_tasks(tasks, goal, phase, config, constitution, provider)
-                
-                if not tasks:
-                    logger.warning(f"No tasks generated for phase '{phase}'. Continuing to next phase.")
-                    # Create an empty dict for the phase
+                steps = checked_steps(phase, task, await validate_steps(steps, goal, phase, task, config,
+                                                                       constitution, provider))
+            except Exception as e:
+                steps = failed_steps(task, e)
+            complete_task(phase, task, steps)
+
+        async def generate_steps(phase: str, task: str,
+                                 review: Callable[[str, str, List[Dict[str, Any]]], Awaitable[None]] = review_steps) -> None:
+            """Generates the steps for a task and hands them to `review` (QA inline by default)."""
+            try:
+                steps = await draft_steps(phase, task)
+            except Exception as e:
+                complete_task(phase, task, failed_steps(task, e))
+                return
+            if not steps:
+                complete_task(phase, task, checked_steps(phase, task, steps))
+                return
+            await review(phase, task, steps)
+
+        # Outside the dependency graph, QA runs on a separate worker pool fed by a queue
+        qa_settings = config.get('qa', {})
+        qa_workers = int(qa_settings.get('pipeline_workers', 4))
+        qa_pipeline = QaPipeline(review_steps, qa_workers, qa_settings.get('pipeline_queue_size', 0)) if qa_workers > 0 and not use_dag else None
+        review = qa_pipeline.submit if qa_pipeline else review_steps
+
+        # 4. Generate Tasks for each Phase and Steps for each Task (phases for the dependency graph)
+        phases = list(reasoning_tree.keys())
+
+        # Leaving the pipeline waits for queued QA to finish; the tree is complete after that.
+        # If generation fails, the tasks already drafted are still reviewed and recorded first
+        async with qa_pipeline or contextlib.nullcontext():
+            if use_dag:
+                max_concurrency = max(1, int(generation_config.get('max_concurrency', 8)))
+                logger.info(f"Generating the plan as a dependency graph (max_concurrency={max_concurrency})")
+                scheduler = DagScheduler(max_concurrency)
+
+                # Units that finish a task (QA) run first, then those that unlock more work (task lists)
+                async def phases_unit() -> None:
+                    if not reasoning_tree:
+                        await generate_phases()
+                    for phase in reasoning_tree:
+                        scheduler.add(("tasks", phase), functools.partial(tasks_unit, phase), deps=["phases"], priority=1)
+
+                async def tasks_unit(phase: str) -> None:
+                    if phase not in completed_tasks:
+                        await generate_tasks(phase)
+                    done = set(completed_tasks[phase])
+                    for task in reasoning_tree[phase]:
+                        if task not in done:
+                            scheduler.add(("steps", phase, task), functools.partial(steps_unit, phase, task),
+                                          deps=[("tasks", phase)])
+
+                async def steps_unit(phase: str, task: str) -> None:
+                    await generate_steps(phase, task, schedule_review)
+
+                async def schedule_review(phase: str, task: str, steps: List[Dict[str, Any]]) -> None:
+                    # QA for this task overlaps with step generation for the others
+                    scheduler.add(("qa", phase, task), functools.partial(review_steps, phase, task, steps),
+                                  deps=[("steps", phase, task)], priority=2)
+
+                scheduler.add("phases", phases_unit)
+                await scheduler.run()
+            elif stream_items:
+                max_concurrency = max(1, int(generation_config.get('max_concurrency', 8)))
+                logger.info(f"Streaming tasks and generating steps concurrently (max_concurrency={max_concurrency})")
+                semaphore = asyncio.Semaphore(max_concurrency)
+
+                async def run_task(phase: str, task: str) -> None:
+                    async with semaphore:
+                        await generate_steps(phase, task, review)
+
+                async def stream_tasks(phase: str) -> None:
+                    """Streams the task list for a phase, starting step generation for each task as it arrives."""
+                    logger.info(f"Streaming tasks for Phase: {phase}")
                     reasoning_tree[phase] = {}
-                    # Save checkpoint after attempting task generation
-                    checkpoint_path = checkpoint_manager.save_generation_checkpoint(
-                        goal=goal, 
-                        current_state=reasoning_tree,
-                        last_processed_phase=phase,
-                        last_processed_task=None
+                    task_context = {"goal": goal, "phase": phase, "constitution": task_constitution}
+
+                    async def start(task: str) -> None:
+                        reasoning_tree[phase].setdefault(task, [])
+                        await run_task(phase, task)
+
+                    async def finalize(streamed: List[str]) -> List[str]:
+                        tasks = await validate_tasks(streamed, goal, phase, config, constitution, provider) if streamed else []
+                        if not tasks:
+                            logger.warning(f"No tasks generated for phase '{phase}'. Continuing to next phase.")
+                        else:
+                            logger.info(f"Generated {len(tasks)} tasks for phase '{phase}'")
+                        reasoning_tree[phase] = {task: reasoning_tree[phase].get(task, []) for task in tasks}
+                        completed_tasks[phase] = [task for task in early_done.pop(phase, []) if task in reasoning_tree[phase]]
+                        record_progress([
+                            ("set", ["reasoning_tree", phase], reasoning_tree[phase]),
+                            ("set", ["completed_tasks", phase], completed_tasks[phase]),
+                        ])
+                        return tasks
+
+                    tasks_stream = stream_items(TASK_GENERATION_PROMPT, task_context, config, "tasks")
+                    with telemetry.tagged(role='planner', level='task'):
+                        await _fan_out_stream(_holding(semaphore, tasks_stream), start, finalize)
+
+                async def run_phase(phase: str) -> None:
+                    if phase not in completed_tasks and not reuse_tasks(phase):
+                        await stream_tasks(phase)
+                        return
+                    done = set(completed_tasks[phase])
+                    await _gather_or_cancel(
+                        run_task(phase, task) for task in reasoning_tree[phase] if task not in done
                     )
-                    continue
-                
-                logger.info(f"Generated {len(tasks)} tasks for phase '{phase}'")
-                # Initialize each task with an empty list to be filled with steps
-                reasoning_tree[phase] = {task: [] for task in tasks}
-                
-                # Save checkpoint after task generation
-                checkpoint_path = checkpoint_manager.save_generation_checkpoint(
-                    goal=goal, 
-                    current_state=reasoning_tree,
-                    last_processed_phase=phase,
-                    last_processed_task=None
-                )
-            
-            # Generate steps for each task in this phase
-            tasks = list(reasoning_tree[phase].keys())
-            
-            # Determine where to start for tasks based on checkpoint
-            start_task_idx = 0
-            if phase == last_processed_phase and last_processed_task:
-                try:
-                    # Find the index of the last processed task
-                    start_task_idx = tasks.index(last_processed_task) + 1  # Start from the next task
-                    if start_task_idx >= len(tasks):
-                        # If we've processed all tasks in this phase, continue to the next phase
-                        logger.info(f"All tasks in phase '{phase}' already processed")
-                        continue
-                except ValueError:
-                    # Task not found, start from beginning of this phase
-                    logger.warning(f"Last processed task '{last_processed_task}' not found in phase '{phase}', starting from first task")
-                    start_task_idx = 0
-            
-            for task_idx in range(start_task_idx, len(tasks)):
-                task = tasks[task_idx]
-                logger.info(f"  Processing Task: {task} [{task_idx + 1}/{len(tasks)}]")
-                
-                # Skip if we already have steps for this task
-                if reasoning_tree[phase][task]:
-                    logger.info(f"  Skipping task '{task}' as it already has steps")
-                    continue
-                
-                # Generate steps for this task
-                logger.info(f"  Generating steps for Task: {task}")
-                step_context = {"goal": goal, "phase": phase, "task": task, "constitution": constitution_str}
-                
-                try:
-                    step_response = await call_with_retry(STEP_GENERATION_PROMPT, step_context, config)
-                    steps = step_response.get("steps", [])
-
-                    if steps:
-                        steps = await validate_steps(steps, goal, phase, task, config, constitution, provider)
-                    
-                    if not steps:
-                        logger.warning(f"No steps generated for task '{task}' in phase '{phase}'. Continuing to next task.")
-                        # Initialize with empty list to mark as processed
-                        reasoning_tree[phase][task] = []
-                    else:
-                        logger.info(f"  Generated {len(steps)} steps for task '{task}'")
-                        reasoning_tree[phase][task] = steps
-                except Exception as e:
-                    logger.error(f"Error generating steps for task '{task}': {e}", exc_info=True)
-                    # Mark the task as having an error by storing a special error indicator
-                    reasoning_tree[phase][task] = [{"error": f"Failed to generate steps: {str(e)}"}]
-                
-                # Save checkpoint after processing each task
-                checkpoint_path = checkpoint_manager.save_generation_checkpoint(
-                    goal=goal, 
-                    current_state=reasoning_tree,
-                    last_processed_phase=phase,
-                    last_processed_task=task
-                )
+
+                if phases_complete:
+                    await _gather_or_cancel(run_phase(phase) for phase in phases)
+                else:
+                    async def start_phase(phase: str) -> None:
+                        reasoning_tree.setdefault(phase, {})
+                        await run_phase(phase)
+
+                    async def finalize_phases(streamed: List[str]) -> List[str]:
+                        nonlocal checkpoint_path, phases_complete
+                        phases = await validate_phases(streamed, goal, config, constitution, provider) if streamed else []
+                        if not phases:
+                            logger.error("Could not generate phases from the streamed response.")
+                            raise PlanGenerationError("Failed to generate phases from the streamed response.")
+                        logger.info(f"Generated {len(phases)} phases.")
+                        # Keep the validated order and drop the work of phases validation removed
+                        ordered = {phase: reasoning_tree.get(phase, {}) for phase in phases}
+                        reasoning_tree.clear()
+                        reasoning_tree.update(ordered)
+                        for phase in [phase for phase in completed_tasks if phase not in ordered]:
+                            del completed_tasks[phase]
+                        phases_complete = True
+                        checkpoint_path = save_progress()
+                        return phases
+
+                    logger.info("Streaming phases...")
+                    phases_stream = stream_items(PHASE_GENERATION_PROMPT, phase_context, config, "phases")
+                    with telemetry.tagged(role='planner', level='phase'):
+                        await _fan_out_stream(_holding(semaphore, phases_stream), start_phase, finalize_phases)
+            else:
+                for phase_idx, phase in enumerate(phases):
+                    logger.info(f"Processing Phase: {phase} [{phase_idx + 1}/{len(phases)}]")
+
+                    # Generate tasks for this phase if needed
+                    if phase not in completed_tasks:
+                        await generate_tasks(phase)
+
+                    tasks = list(reasoning_tree[phase].keys())
+                    for task_idx, task in enumerate(tasks):
+                        logger.info(f"  Processing Task: {task} [{task_idx + 1}/{len(tasks)}]")
+
+                        # Skip if this task was completed in a previous run
+                        if task in completed_tasks[phase]:
+                            logger.info(f"  Skipping task '{task}' as it already has steps")
+                            continue
+
+                        await generate_steps(phase, task, review)
         
         # 5. Write Output JSON
         logger.info(f"Writing reasoning tree to {output_file}...")
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(reasoning_tree, f, indent=2, ensure_ascii=False)
+            # Written step by step and moved into place once complete
+            write_tree(output_file, tree_items(reasoning_tree))
             logger.info("Planning process completed successfully.")
+            if previous_plan:
+                logger.info(f"Incremental run reused {previous_plan.reused_tasks} tasks from the previous plan.")
+            try:
+                save_fingerprints(output_file, fingerprints, reasoning_tree)
+            except OSError as e:
+                logger.warning(f"Could not write plan fingerprints for '{output_file}': {e}")
             
             # Delete checkpoint since we completed successfully
             if checkpoint_path:
@@ -366,13 +665,8 @@ async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any]
         logger.error(f"API call failed during generation: {e}", exc_info=True)
         
         # Save our progress so far
-        if reasoning_tree and goal:
-            checkpoint_path = checkpoint_manager.save_generation_checkpoint(
-                goal=goal, 
-                current_state=reasoning_tree,
-                last_processed_phase=last_processed_phase,
-                last_processed_task=last_processed_task
-            )
+        if reasoning_tree and goal and phases_complete:
+            checkpoint_path = save_progress()
             logger.info(f"Progress saved to checkpoint: {checkpoint_path}")
         
         raise
@@ -380,21 +674,20 @@ async def generate_plan(task_file: str, output_file: str, config: Dict[str, Any]
         logger.error(f"An unexpected error occurred during plan generation: {e}", exc_info=True)
         
         # Save our progress so far
-        if reasoning_tree and goal:
-            checkpoint_path = checkpoint_manager.save_generation_checkpoint(
-                goal=goal, 
-                current_state=reasoning_tree,
-                last_processed_phase=last_processed_phase,
-                last_processed_task=last_processed_task
-            )
+        if reasoning_tree and goal and phases_complete:
+            checkpoint_path = save_progress()
             logger.info(f"Progress saved to checkpoint: {checkpoint_path}")
         
         raise PlanGenerationError(f"An unexpected error occurred during plan generation: {e}") from e
 
 
-async def main_workflow(task_file: str, output_file: str, validated_output_file: str, skip_qa: bool, config: Dict[str, Any], skip_resume: bool = False, provider: Optional[str] = None, validate_only: bool = False):
+async def main_workflow(task_file: str, output_file: str, validated_output_file: str, skip_qa: bool, config: Dict[str, Any], skip_resume: bool = False, provider: Optional[str] = None, validate_only: bool = False, incremental: bool = False, qa_only: bool = False):
     """
     Orchestrates the full application workflow.
+
+    With `qa_only`, the existing plan in `output_file` (nested JSON or a JSON
+    Lines shard) is QA-annotated into `validated_output_file` instead of
+    generating a new one.
     """
     reasoning_tree: dict | None = None
     goal: str | None = None
@@ -428,15 +721,27 @@ async def main_workflow(task_file: str, output_file: str, validated_output_file:
         if validate_only:
             logger.info("--- Running in Validation-Only Mode ---")
             try:
-                logger.info(f"Loading existing plan from: {output_file}")
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    reasoning_tree = json.load(f)
-                if not reasoning_tree:
-                    raise PlanValidationError("Reasoning tree is empty, cannot validate.")
+                # Streamed, so plans of any size are checked in bounded memory
+                logger.info(f"Validating existing plan: {output_file}")
+                step_count, structure_errors = validate_plan_file(output_file)
             except FileNotFoundError as e:
                 raise PlannerFileNotFoundError(f"Required file not found for validation: {e.filename}") from e
-            except json.JSONDecodeError as e:
-                raise JsonParsingError(f"Error parsing JSON from {output_file}: {e}") from e
+            if not step_count:
+                raise PlanValidationError("Reasoning tree is empty, cannot validate.")
+            if structure_errors:
+                error_details = "\n".join(f"- {err}" for err in structure_errors)
+                raise PlanValidationError(f"Plan structure validation failed:\n{error_details}")
+            logger.info(f"Plan structure is valid ({step_count} steps).")
+        elif qa_only:
+            logger.info("--- Running in QA-Only Mode ---")
+            await run_qa_validation(
+                output_file,
+                validated_output_file,
+                config,
+                resume=not skip_resume,
+                provider=validator_provider,
+                constitution=constitution
+            )
         else:
             # Step 1: Generate the initial plan
             reasoning_tree, _ = await generate_plan(
@@ -445,13 +750,14 @@ async def main_workflow(task_file: str, output_file: str, validated_output_file:
                 config=config,
                 resume=not skip_resume,
                 provider=planner_provider,
-                constitution=constitution
+                constitution=constitution,
+                incremental=incremental
             )
 
-        # Ensure we have a plan to validate
-        if not reasoning_tree:
-            logger.error("No reasoning tree available to validate. Halting.")
-            return
+            # Ensure we have a plan to validate
+            if not reasoning_tree:
+                logger.error("No reasoning tree available to validate. Halting.")
+                return
 
         # The QA validation is now interleaved within the generate_plan function.
         # The --skip-qa flag can be used to disable it there.
@@ -479,10 +785,25 @@ async def main_workflow(task_file: str, output_file: str, validated_output_file:
     except Exception as e:
         # Catch unexpected errors
         logger.critical(f"An unexpected error occurred in the main workflow: {e}", exc_info=True)
+    finally:
+        # Release pooled provider connections before the event loop closes
+        await close_http_clients()
+        telemetry.write_metrics(config)
 
 
 if __name__ == "__main__":
-    # Config is loaded and logging is set up before this block
+    # Load config and set up logging before anything else runs
+    try:
+        # Assumes config.yaml is in config relative to this file's location (hierarchical_planner/)
+        CONFIG = init_app('config/config.yaml')
+    except ConfigError as e:
+        # Catch specific ConfigError from loader
+        print(f"CRITICAL: Configuration error: {e}", file=sys.stderr)
+        sys.exit(1) # Exit if config fails
+    except Exception as e:
+        # Catch any other unexpected error during setup
+        print(f"CRITICAL: Unexpected error during application setup: {e}", file=sys.stderr)
+        sys.exit(1)
 
     # Use default file paths from loaded config
     # These paths are resolved to be absolute in config_loader
@@ -533,19 +854,102 @@ if __name__ == "__main__":
     parser.add_argument(
         "--provider",
         type=str,
-        choices=['gemini', 'anthropic', 'deepseek'],
-        help="Choose which LLM provider to use (gemini, anthropic, deepseek). If not specified, auto-selects based on available API keys."
+        choices=['gemini', 'anthropic', 'deepseek', 'mock'],
+        help="Choose which LLM provider to use (gemini, anthropic, deepseek, or the offline mock). If not specified, auto-selects based on available API keys."
     )
     parser.add_argument(
         "--validate-only",
         action="store_true",
         help="Run only the QA validation on an existing reasoning tree. Requires --output-file to be set."
     )
+    parser.add_argument(
+        "--qa-only",
+        action="store_true",
+        help="Run QA annotation on the existing plan in --output-file (a .json plan or a .jsonl shard) and write it to --validated-output-file."
+    )
+    parser.add_argument(
+        "--export-jsonl",
+        type=str,
+        metavar="PATH",
+        help="Convert the plan in --output-file to JSON Lines (one record per step) at PATH and exit."
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="With --export-jsonl, deal the plan's tasks round-robin into this many shard files (PATH.00001-of-0000N.jsonl, ...)."
+    )
+    parser.add_argument(
+        "--import-jsonl",
+        type=str,
+        nargs="+",
+        metavar="FILE",
+        help="Merge JSON Lines plan files (e.g. all shards of a plan) back into a nested plan at --output-file and exit."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse the plan in --output-file and regenerate only nodes whose inputs (goal, constitution, parent) changed."
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Generate tasks and steps concurrently instead of one at a time."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream phase and task lists, starting work on each element as soon as it arrives (implies --concurrent)."
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        help="Maximum number of concurrent generation calls (default: generation.max_concurrency from config)."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the on-disk LLM response cache and always call the provider."
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Write per-call LLM metrics (latency, tokens, cost) as JSON to this file (see `telemetry` in config.yaml)."
+    )
 
     args = parser.parse_args()
 
-    # Decide whether to run the planning workflow or the build workflow
-    if args.build:
+    # Command-line generation settings override the config file
+    generation_settings = CONFIG.setdefault('generation', {})
+    if args.concurrent:
+        generation_settings['concurrent'] = True
+    if args.stream:
+        generation_settings['stream'] = True
+    if args.max_concurrency is not None:
+        generation_settings['max_concurrency'] = args.max_concurrency
+    if args.no_cache:
+        CONFIG.setdefault('cache', {})['enabled'] = False
+    if args.metrics_file:
+        CONFIG.setdefault('telemetry', {})['json_file'] = os.path.abspath(args.metrics_file)
+
+    # Decide whether to convert plan formats, run the planning workflow or the build workflow
+    if args.export_jsonl or args.import_jsonl:
+        # --- JSON Lines Export/Import ---
+        try:
+            if args.export_jsonl:
+                paths = export_plan_file(args.output_file, os.path.abspath(args.export_jsonl), args.shards)
+                logger.info(f"Exported {args.output_file} to {len(paths)} JSON Lines file(s).")
+            else:
+                import_plan_files([os.path.abspath(path) for path in args.import_jsonl], args.output_file)
+        except FileNotFoundError as e:
+            logger.critical(f"Plan file not found: {e.filename}")
+            sys.exit(1)
+        except (HierarchicalPlannerError, OSError) as e:
+            logger.critical(f"JSON Lines conversion failed: {e}", exc_info=True)
+            sys.exit(1)
+
+    elif args.build:
         # --- Project Build Workflow ---
         logger.info("Starting Project Build workflow...")
         try:
@@ -595,7 +999,9 @@ if __name__ == "__main__":
                 config=CONFIG,
                 skip_resume=args.no_resume,
                 provider=args.provider,
-                validate_only=args.validate_only
+                validate_only=args.validate_only,
+                incremental=args.incremental,
+                qa_only=args.qa_only
             ))
         except HierarchicalPlannerError as e:
             logger.critical(f"Application error during plan generation/validation: {e}", exc_info=True)
@@ -0,0 +1,290 @@
+"""
+Deterministic local stand-in for an LLM provider.
+
+Recognises the planner's prompts (constitution, phases, tasks, steps, QA
+checks, persona parsing) and answers each with schema-valid JSON, so the
+whole workflow can run offline without API keys. Answers depend only on the
+prompt and the `mock` config section:
+
+    mock:
+      latency_ms: 20            # mean simulated response time
+      jitter_ms: 5              # uniform +/- jitter around the mean
+      rate_limit_probability: 0 # chance that an attempt fails with a 429
+      seed: 0                   # changes latencies and 429s, not content
+      phases: 3
+      tasks_per_phase: 3
+      steps_per_task: 4
+
+Latency and 429 injection are drawn from a generator seeded by (seed,
+prompt, attempt), so a run is reproducible. Select it with
+`--provider mock` or the model string `mock/<anything>`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional
+
+from .exceptions import ApiCallError, DeadlineExceededError
+from .rate_limiter import get_rate_limiter
+from .prompt_renderer import render_prompt
+from . import telemetry
+from . import deadline
+from .circuit_breaker import get_circuit_breaker, open_circuit_error
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOCK_SETTINGS: Dict[str, Any] = {
+    'latency_ms': 20.0,
+    'jitter_ms': 5.0,
+    'rate_limit_probability': 0.0,
+    'seed': 0,
+    'phases': 3,
+    'tasks_per_phase': 3,
+    'steps_per_task': 4,
+    'retries': 3,
+    'retry_delay_sec': 0.05,
+    'stream_chunk_chars': 64,
+}
+
+# Fixed phrases identifying each prompt; tests check them against the real templates
+_PROMPT_MARKERS = (
+    ("constitution", "Founding Architect"),
+    ("phases", "break this goal down into the major, distinct phases"),
+    ("tasks", "break this phase down into specific, actionable tasks"),
+    ("steps", "generate a sequence of prompts for the AI coding agent"),
+    ("batch_alignment", "For EACH step, critique"),
+    ("batch_resources", "For EACH prompt, identify"),
+    ("alignment", "Step(s) to Review:"),
+    ("resources", "Prompt to Analyze:"),
+    ("persona", "parse the provided Persona Card text"),
+)
+
+_BATCH_STEPS_HEADER = re.compile(r"\(a JSON object mapping each step key[^\n]*\n")
+
+# Call-level measurements for benchmarks: one entry per call_mock_with_retry
+call_latencies: List[float] = []
+rate_limit_errors = 0
+
+
+class MockRateLimitError(ApiCallError):
+    """Simulated provider rate-limit (HTTP 429) response."""
+
+
+def mock_settings(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the `mock` config section with defaults filled in."""
+    return {**DEFAULT_MOCK_SETTINGS, **(config.get('mock') or {})}
+
+
+def reset_stats() -> None:
+    """Clears the recorded call latencies and rate-limit count."""
+    global rate_limit_errors
+    call_latencies.clear()
+    rate_limit_errors = 0
+
+
+def classify_prompt(prompt: str) -> Optional[str]:
+    """Returns which planner prompt `prompt` was rendered from, or None."""
+    for kind, marker in _PROMPT_MARKERS:
+        if marker in prompt:
+            return kind
+    return None
+
+
+def _digest(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _quoted(prompt: str, label: str) -> str:
+    """Extracts the value of a `label: "value"` line from a rendered prompt."""
+    match = re.search(re.escape(label) + r':\s*"(.*)"', prompt)
+    return match.group(1) if match else "item"
+
+
+def _batch_step_keys(prompt: str) -> List[str]:
+    """Returns the step keys listed in a batched QA prompt."""
+    match = _BATCH_STEPS_HEADER.search(prompt)
+    if not match:
+        return []
+    start = prompt.find("{", match.end())
+    try:
+        steps, _ = json.JSONDecoder().raw_decode(prompt, start)
+    except (ValueError, TypeError):
+        return []
+    return list(steps) if isinstance(steps, dict) else []
+
+
+def _critique() -> Dict[str, str]:
+    return {
+        "alignment_critique": "Step logically contributes to the task.",
+        "sequence_critique": "Sequence seems correct.",
+        "clarity_critique": "Clear and actionable.",
+    }
+
+
+def _resources(digest: str) -> Dict[str, List[str]]:
+    return {
+        "external_actions": [],
+        "key_entities_dependencies": [f"module_{digest[:6]}.py"],
+        "technology_hints": ["Python"],
+    }
+
+
+def respond(prompt: str, config: Dict[str, Any]) -> Any:
+    """
+    Builds the structured answer to a rendered planner prompt.
+
+    Returns:
+        A JSON-serializable object; for unrecognised prompts, `{"response": ...}`.
+    """
+    settings = mock_settings(config)
+    kind = classify_prompt(prompt)
+    digest = _digest(prompt)
+
+    if kind == "constitution":
+        return {
+            "project_name": f"Mock Project {digest[:6]}",
+            "core_mission": "Deliver the requested goal with a small, well-tested codebase.",
+            "architectural_paradigm": "Monolithic",
+            "primary_language_and_tech_stack": {"language": "Python"},
+            "key_data_structures": [],
+            "global_dependencies_and_interfaces": [],
+            "non_functional_requirements": [],
+            "project_file_map": {},
+        }
+    if kind == "phases":
+        return {"phases": [f"Phase {i}: Mock phase {i}" for i in range(1, int(settings['phases']) + 1)]}
+    if kind == "tasks":
+        phase = _quoted(prompt, "And the current phase")
+        number = re.match(r"Phase (\d+)", phase)
+        prefix = number.group(1) if number else digest[:4]
+        return {"tasks": [f"Task {prefix}.{j}: Mock task {j} of {phase}"
+                          for j in range(1, int(settings['tasks_per_phase']) + 1)]}
+    if kind == "steps":
+        task = _quoted(prompt, "Current task")
+        return {"steps": [{f"step {k}": f"Implement part {k} of '{task}' in module_{digest[:6]}_{k}.py using Python."}
+                          for k in range(1, int(settings['steps_per_task']) + 1)]}
+    if kind == "batch_alignment":
+        return {key: _critique() for key in _batch_step_keys(prompt)}
+    if kind == "batch_resources":
+        return {key: _resources(digest) for key in _batch_step_keys(prompt)}
+    if kind == "alignment":
+        return _critique()
+    if kind == "resources":
+        return _resources(digest)
+    if kind == "persona":
+        return {
+            "title": "Mock Persona Card",
+            "persona_name": f"Mock{digest[:6]}",
+            "instructions": "Respond concisely.",
+            "personality_profile": {"Intellect": "Analytical", "Empathy": "Warm"},
+            "sections": {
+                "Core Identity & Origin": {"content": "A deterministic test persona.",
+                                           "subsections": {"Name": {"content": f"Mock{digest[:6]}"}}},
+            },
+        }
+    return {"response": f"Mock response {digest[:12]}"}
+
+
+def _draw(prompt: str, attempt: int, config: Dict[str, Any]) -> tuple:
+    """Returns (latency seconds, rate limited?) for one attempt at a prompt."""
+    settings = mock_settings(config)
+    rng = random.Random(f"{settings['seed']}:{_digest(prompt)}:{attempt}")
+    latency_ms = float(settings['latency_ms']) + rng.uniform(-1.0, 1.0) * float(settings['jitter_ms'])
+    limited = rng.random() < float(settings['rate_limit_probability'])
+    return max(0.0, latency_ms) / 1000.0, limited
+
+
+def _attempt(prompt: str, attempt: int, config: Dict[str, Any]) -> float:
+    """Returns the latency for an attempt, raising MockRateLimitError if it is rate limited."""
+    global rate_limit_errors
+    latency, limited = _draw(prompt, attempt, config)
+    if limited:
+        rate_limit_errors += 1
+        raise MockRateLimitError("429 Too Many Requests (mock rate limit)")
+    return latency
+
+
+async def generate_content(prompt: str, config: Dict[str, Any], attempt: int = 0) -> str:
+    """Returns the mock answer to `prompt` as JSON text after the simulated latency."""
+    latency = _attempt(prompt, attempt, config)
+    await asyncio.sleep(latency)
+    return json.dumps(respond(prompt, config))
+
+
+async def generate_structured_content(prompt: str, config: Dict[str, Any], structure_hint: str = "Return only JSON.", attempt: int = 0) -> dict:
+    """Returns the mock answer to `prompt` after the simulated latency."""
+    latency = _attempt(prompt, attempt, config)
+    await asyncio.sleep(latency)
+    return respond(prompt, config)
+
+
+def generate_content_sync(prompt: str, config: Dict[str, Any]) -> str:
+    """Blocking variant of `generate_content` for synchronous callers."""
+    time.sleep(_attempt(prompt, 0, config))
+    return json.dumps(respond(prompt, config))
+
+
+async def stream_content(prompt: str, config: Dict[str, Any]) -> AsyncIterator[str]:
+    """Streams the mock answer as JSON text, spreading the simulated latency across chunks."""
+    latency = _attempt(prompt, 0, config)
+    text = json.dumps(respond(prompt, config))
+    size = max(1, int(mock_settings(config)['stream_chunk_chars']))
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    for chunk in chunks:
+        await asyncio.sleep(latency / len(chunks))
+        yield chunk
+
+
+async def call_mock_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+    """Calls the mock provider with retries on simulated rate limits, recording the call latency."""
+    prompt = render_prompt(prompt_template, context)
+    settings = mock_settings(config)
+    max_retries = int(settings['retries'])
+    limiter = get_rate_limiter(config, 'mock')
+    breaker = get_circuit_breaker(config, 'mock')
+    started = time.perf_counter()
+    last_exception = None
+
+    for attempt in range(max_retries):
+        if breaker and not breaker.allow_request():
+            call_latencies.append(time.perf_counter() - started)
+            raise open_circuit_error('mock', last_exception)
+        telemetry.note_attempt()
+        attempt_started = time.perf_counter()
+        try:
+            if limiter:
+                await limiter.acquire()
+            if is_structured:
+                response = await deadline.bounded(generate_structured_content(prompt, config, attempt=attempt))
+            else:
+                response = await deadline.bounded(generate_content(prompt, config, attempt=attempt))
+            if limiter:
+                limiter.on_success()
+            if breaker:
+                breaker.on_success(time.perf_counter() - attempt_started)
+            call_latencies.append(time.perf_counter() - started)
+            return response
+        except MockRateLimitError as e:
+            last_exception = e
+            if limiter:
+                limiter.on_rate_limited()
+            if breaker:
+                breaker.on_failure(e)
+            logger.debug(f"Mock call attempt {attempt + 1}/{max_retries} rate limited")
+            if attempt < max_retries - 1:
+                if breaker and not breaker.is_available():
+                    continue  # The circuit just opened; don't wait out a backoff first
+                wait_time = float(settings['retry_delay_sec']) * 2 ** attempt
+                if not deadline.allows_retry(wait_time):
+                    call_latencies.append(time.perf_counter() - started)
+                    raise DeadlineExceededError(
+                        f"Mock API call failed after {attempt + 1} attempt(s); no deadline budget left to retry.") from e
+                await asyncio.sleep(wait_time)
+
+    call_latencies.append(time.perf_counter() - started)
+    raise ApiCallError(f"Mock API call failed after {max_retries} retries.") from last_exception
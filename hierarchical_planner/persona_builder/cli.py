@@ -122,8 +122,8 @@ async def process_persona_text(
 
 # save_output_files moved to OutputSaver
 
-async def main_async(args):
-    """Asynchronous main logic."""
+async def main_async(args, config: Optional[Dict[str, Any]] = None):
+    """Asynchronous main logic. Uses `config` instead of loading config.yaml when given."""
     # Initialize components first
     parser = None
     xml_generator = None
@@ -131,9 +131,9 @@ async def main_async(args):
     output_saver = None
     chunker = PersonaChunker() # Use default delimiter
     try:
-        main_config = load_config()
+        main_config = config or load_config()
         logger.info("Main configuration loaded successfully for CLI.")
-        parser = PersonaParser(config=main_config)
+        parser = PersonaParser(config=main_config, provider=getattr(args, 'provider', None))
         xml_generator = XmlGenerator() # Uses default schema
         md_generator = MarkdownGenerator()
         output_saver = OutputSaver()
@@ -218,6 +218,11 @@ Filenames are generated based on the 'persona_name' identified by the LLM.
         "-o", "--output-dir",
         help="Directory to save the generated output files. If not provided, prints YAML for the *first* persona to console."
     )
+    parser.add_argument(
+        "--provider",
+        choices=['gemini', 'anthropic', 'mock'],
+        help="LLM provider for parsing. If not specified, auto-selects based on available API keys ('mock' runs offline)."
+    )
     # Removed prefix/suffix arguments
 
     args = parser.parse_args()
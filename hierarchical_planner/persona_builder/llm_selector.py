@@ -2,40 +2,59 @@
 LLM selector module for the Persona Builder.
 
 Provides a function to select the appropriate LLM client based on the configuration.
+Identical persona cards parsed concurrently share one LLM request (see
+`hierarchical_planner.single_flight`).
 """
 import logging
-from typing import Dict, Any, Tuple, Callable
+from typing import Dict, Any, Tuple, Callable, Optional
 
 # Import LLM clients
 from hierarchical_planner import gemini_client
 from hierarchical_planner import anthropic_client
+from hierarchical_planner import mock_client
+from hierarchical_planner.single_flight import coalesce_calls
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
-async def select_llm_client(config: Dict[str, Any]):
+def _coalesced(provider: str, section: str, call_with_retry: Callable) -> Callable:
+    """Wraps call_with_retry so concurrent identical parsing requests are sent once."""
+    def model_settings(config: Dict[str, Any]) -> Tuple[Optional[str], Optional[float]]:
+        settings = config.get(section) or {}
+        return settings.get('model_name'), settings.get('temperature')
+    return coalesce_calls(provider, call_with_retry, model_settings)
+
+async def select_llm_client(config: Dict[str, Any], provider: Optional[str] = None):
     """
     Selects the appropriate LLM client based on the configuration.
     
     Args:
         config: The application configuration dictionary.
+        provider: Optional provider preference; 'mock' selects the local mock client.
         
     Returns:
         A tuple containing the appropriate client functions:
         (generate_structured_content, generate_content, call_with_retry)
     """
+    if provider and provider.lower() == 'mock':
+        logger.info("Using local mock LLM client for persona parsing.")
+        return (
+            mock_client.generate_structured_content,
+            mock_client.generate_content,
+            _coalesced('mock', 'mock', mock_client.call_mock_with_retry)
+        )
     # Check if Anthropic is configured
     if 'anthropic' in config and config.get('anthropic', {}).get('api_key'):
         logger.info("Using Anthropic client with Claude model for persona parsing.")
         return (
             anthropic_client.generate_structured_content,
             anthropic_client.generate_content,
-            anthropic_client.call_anthropic_with_retry
+            _coalesced('anthropic', 'anthropic', anthropic_client.call_anthropic_with_retry)
         )
     # Default to Gemini
     logger.info("Using Gemini client for persona parsing.")
     return (
         gemini_client.generate_structured_content,
         gemini_client.generate_content,
-        gemini_client.call_gemini_with_retry
+        _coalesced('gemini', 'api', gemini_client.call_gemini_with_retry)
     )
@@ -147,13 +147,14 @@ class PersonaParser:
     # Default model if not specified in config
     DEFAULT_PARSING_MODEL = "gemini-1.5-pro-latest" # Default to a Gemini model
 
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], provider: Optional[str] = None):
         """
         Initialize the PersonaParser.
 
         Args:
             config (Dict[str, Any]): The main application configuration dictionary,
                                      which includes API settings needed by the LLM clients.
+            provider (Optional[str]): LLM provider preference (e.g. 'mock'); auto-selected if None.
         """
         if not gemini_client and not anthropic_client:
             raise PersonaParserError("LLM client modules could not be imported.")
@@ -161,17 +162,18 @@ class PersonaParser:
              raise PersonaParserError("Configuration dictionary is required.")
 
         self.config = config
+        self.provider = provider
         # Configure the LLM clients using the provided config
         try:
-            # Configure Gemini client
-            if gemini_client:
+            # Configure Gemini client (the mock provider needs no client setup)
+            if gemini_client and provider != 'mock':
                 gemini_client.configure_client(config.get('api', {}).get('resolved_key'))
                 # Optionally configure DeepSeek fallback if needed for parsing
                 if 'deepseek' in config:
                     gemini_client.configure_deepseek_fallback(config)
             
             # Configure Anthropic client
-            if anthropic_client and 'anthropic' in config:
+            if anthropic_client and 'anthropic' in config and provider != 'mock':
                 anthropic_client.configure_client(config.get('anthropic', {}).get('api_key'))
         except Exception as e:
              # Log the error but allow initialization to continue; model fetching will fail later if needed
@@ -215,7 +217,7 @@ class PersonaParser:
                 parse_config['api']['temperature'] = 0.2 # Lower temp for JSON
             
             # Select the appropriate LLM client
-            _, _, call_with_retry = await select_llm_client(parse_config)
+            _, _, call_with_retry = await select_llm_client(parse_config, self.provider)
 
             # Use the selected LLM client to parse the persona card
             parsed_json = await call_with_retry(
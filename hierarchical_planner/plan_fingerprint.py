@@ -0,0 +1,158 @@
+"""
+Input fingerprints for reasoning tree nodes, for incremental re-planning.
+
+Each generated node is fingerprinted by the inputs its prompt was rendered
+from:
+
+- the phase list: the phase prompt template, the goal and the constitution
+  text the phase level sees;
+- the task list of a phase: the task prompt template, the goal, the
+  constitution text the task level sees and the phase name;
+- the steps of a task: the step prompt template, the goal, the constitution
+  text the step level sees, the phase name and the task name.
+
+The constitution text is the one `prompt_renderer.constitution_for_level`
+injects, so with the digest mode enabled, edits to constitution prose that the
+digest leaves out only invalidate the phase list.
+
+After a run, the fingerprints of every node are written next to the output
+tree (`fingerprints_path`). `PreviousPlan` reads them back so that
+`generate_plan(..., incremental=True)` regenerates only nodes whose
+fingerprints changed and reuses every other node from the previous tree.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+from .checkpoint_writer import atomic_write
+from .prompts.PHASE_GENERATION_PROMPT import PHASE_GENERATION_PROMPT
+from .prompts.TASK_GENERATION_PROMPT import TASK_GENERATION_PROMPT
+from .prompts.STEP_GENERATION_PROMPT import STEP_GENERATION_PROMPT
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# Bumped when the fingerprint inputs change, so older fingerprint files are ignored
+FINGERPRINT_VERSION = 1
+
+
+def fingerprint(*parts: str) -> str:
+    """Returns the hex SHA-256 of the parts, length-prefixed so part boundaries matter."""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'big'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def fingerprints_path(output_file: str) -> str:
+    """Returns the path of the fingerprint file kept next to a reasoning tree file."""
+    return os.path.splitext(output_file)[0] + '.fingerprints.json'
+
+
+def _has_failed_steps(steps: Any) -> bool:
+    return not isinstance(steps, list) or any(isinstance(step, dict) and "error" in step for step in steps)
+
+
+class PlanFingerprints:
+    """Computes node fingerprints for one set of generation inputs."""
+
+    def __init__(self, goal: str, phase_constitution: str, task_constitution: str, step_constitution: str):
+        self._phases = fingerprint(PHASE_GENERATION_PROMPT, goal, phase_constitution)
+        # Shared inputs of every task list / step list, hashed once
+        self._task_base = fingerprint(TASK_GENERATION_PROMPT, goal, task_constitution)
+        self._step_base = fingerprint(STEP_GENERATION_PROMPT, goal, step_constitution)
+
+    def phases(self) -> str:
+        """Fingerprint of the phase list."""
+        return self._phases
+
+    def tasks(self, phase: str) -> str:
+        """Fingerprint of a phase's task list."""
+        return fingerprint(self._task_base, phase)
+
+    def steps(self, phase: str, task: str) -> str:
+        """Fingerprint of a task's steps."""
+        return fingerprint(self._step_base, phase, task)
+
+    def for_tree(self, reasoning_tree: Dict[str, Any]) -> Dict[str, Any]:
+        """Returns the fingerprints of every node in a tree, in the fingerprint file format."""
+        return {
+            "version": FINGERPRINT_VERSION,
+            "phases": self.phases(),
+            "tasks": {phase: self.tasks(phase) for phase in reasoning_tree},
+            "steps": {
+                phase: {task: self.steps(phase, task) for task in tasks}
+                for phase, tasks in reasoning_tree.items() if isinstance(tasks, dict)
+            },
+        }
+
+
+def save_fingerprints(output_file: str, fingerprints: PlanFingerprints, reasoning_tree: Dict[str, Any]) -> str:
+    """Writes the fingerprints of a tree next to its output file and returns the path."""
+    path = fingerprints_path(output_file)
+    data = json.dumps(fingerprints.for_tree(reasoning_tree), indent=2, ensure_ascii=False)
+    atomic_write(path, data.encode('utf-8'))
+    return path
+
+
+class PreviousPlan:
+    """A previously generated tree and its fingerprints, compared against the current inputs."""
+
+    def __init__(self, reasoning_tree: Dict[str, Any], stored: Dict[str, Any], current: PlanFingerprints):
+        self.reasoning_tree = reasoning_tree
+        self._stored = stored
+        self._current = current
+        self.reused_tasks = 0
+
+    @classmethod
+    def load(cls, output_file: str, current: PlanFingerprints) -> Optional["PreviousPlan"]:
+        """Loads the tree in `output_file` and its fingerprints; None if either is missing or unreadable."""
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                reasoning_tree = json.load(f)
+            with open(fingerprints_path(output_file), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            logger.info(f"No previous plan with fingerprints at {output_file}; generating from scratch.")
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read the previous plan at {output_file}: {e}. Generating from scratch.")
+            return None
+        if not isinstance(reasoning_tree, dict) or not isinstance(stored, dict) \
+                or stored.get("version") != FINGERPRINT_VERSION:
+            logger.warning(f"Previous plan at {output_file} has no usable fingerprints. Generating from scratch.")
+            return None
+        return cls(reasoning_tree, stored, current)
+
+    def phases(self) -> Optional[List[str]]:
+        """Returns the previous phase list if its inputs are unchanged."""
+        if self._stored.get("phases") != self._current.phases() or not self.reasoning_tree:
+            return None
+        return list(self.reasoning_tree)
+
+    def tasks(self, phase: str) -> Optional[Tuple[Dict[str, List[Any]], List[str]]]:
+        """
+        Returns (task tree, completed tasks) for a phase whose task list inputs are unchanged.
+
+        Tasks whose step inputs are also unchanged keep their previous steps and
+        count as completed; the rest start with no steps and are regenerated.
+        Tasks whose steps previously failed are always regenerated.
+        """
+        previous_tasks = self.reasoning_tree.get(phase)
+        if not isinstance(previous_tasks, dict) or self._stored.get("tasks", {}).get(phase) != self._current.tasks(phase):
+            return None
+        stored_steps = self._stored.get("steps", {}).get(phase, {})
+        tasks: Dict[str, List[Any]] = {}
+        completed: List[str] = []
+        for task, steps in previous_tasks.items():
+            if stored_steps.get(task) == self._current.steps(phase, task) and not _has_failed_steps(steps):
+                tasks[task] = steps
+                completed.append(task)
+            else:
+                tasks[task] = []
+        self.reused_tasks += len(completed)
+        return tasks, completed
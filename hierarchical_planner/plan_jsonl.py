@@ -0,0 +1,330 @@
+"""
+JSON Lines plan format, for splitting a plan across workers.
+
+A nested `reasoning_tree.json` can only be processed as a whole. In the
+JSON Lines format every step is one self-contained record:
+
+    {"phase": "Phase 1", "phase_index": 0, "task": "Task 1.1", "task_index": 0,
+     "index": 0, "key": "step 1", "prompt": "...", "qa_info": {...}}
+
+`qa_info` is omitted when a step has none, and a step object of unusual
+shape (see `plan_model.Step.is_canonical`) is stored verbatim under "step"
+instead of key/prompt/qa_info. A task without steps has a record with
+"index": null, and a phase without tasks one with "task" and "task_index"
+null, so every tree round-trips exactly.
+
+`export_jsonl` can deal the tasks of a plan round-robin to several shard
+files (`reasoning_tree.00001-of-00004.jsonl`); a task is never split, so each
+shard can be QA-validated (`qa_validator.run_validation`) or built on its
+own. Every file ends with a trailer naming its shard and counting its
+records:
+
+    {"shard": 2, "shards": 4, "records": 17}
+
+`read_jsonl` merges any set of shard files back into plan order using the
+recorded positions, so the merged tree is the same whichever order the
+shards are given or finished in. A merge needs every shard of the set, each
+with all of its records: missing, truncated and duplicated shards, and
+records that disagree, are reported as `PlanValidationError`.
+"""
+import heapq
+import json
+import logging
+import os
+from typing import Dict, Any, IO, Iterable, Iterator, List, Optional, Tuple
+
+from .exceptions import JsonParsingError, PlanValidationError
+from .plan_model import Step
+from .tree_stream import TreeItem, iter_tree, tree_items, write_tree
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+JSONL_SUFFIX = '.jsonl'
+
+# phase -> (phase index, {task: task index}): where a (partial) tree's nodes sit in the full plan
+Layout = Dict[str, Tuple[int, Dict[str, int]]]
+
+# (shard number, counting from 1; number of shards in the set)
+ShardInfo = Tuple[int, int]
+
+_SortKey = Tuple[int, int, int]
+
+
+def is_jsonl(path: str) -> bool:
+    """Returns whether a plan path uses the JSON Lines format."""
+    return str(path).endswith(JSONL_SUFFIX)
+
+
+def shard_paths(path: str, shards: int) -> List[str]:
+    """Returns the file names `export_jsonl` uses for `shards` shards of `path`."""
+    if shards <= 1:
+        return [path]
+    stem = path[:-len(JSONL_SUFFIX)] if is_jsonl(path) else os.path.splitext(path)[0]
+    return [f"{stem}.{i + 1:05d}-of-{shards:05d}{JSONL_SUFFIX}" for i in range(shards)]
+
+
+def _record(item: TreeItem, phase_index: int, task_index: Optional[int]) -> Dict[str, Any]:
+    record: Dict[str, Any] = {
+        "phase": item.phase, "phase_index": phase_index,
+        "task": item.task, "task_index": task_index,
+        "index": item.index,
+    }
+    if item.index is None:
+        return record
+    step = Step.from_dict(item.step, item.index) if isinstance(item.step, dict) else None
+    if step is None or not step.is_canonical:
+        record["step"] = item.step
+        return record
+    record["key"] = step.key
+    record["prompt"] = step.prompt
+    if step.qa_info is not None:
+        record["qa_info"] = step.qa_info
+    return record
+
+
+def _item(record: Dict[str, Any]) -> TreeItem:
+    index = record["index"]
+    if index is None:
+        step = None
+    elif "step" in record:
+        step = record["step"]
+    else:
+        step = {} if record.get("key") is None else {record["key"]: record.get("prompt", "")}
+        if "qa_info" in record:
+            step["qa_info"] = record["qa_info"]
+    return TreeItem(record["phase"], record["task"], index, step)
+
+
+def export_jsonl(items: Iterable[TreeItem], path: str, shards: int = 1, layout: Optional[Layout] = None,
+                 shard: Optional[ShardInfo] = None) -> List[str]:
+    """
+    Writes plan items as JSON Lines records and returns the files written.
+
+    Args:
+        items: Plan items grouped by phase and task, e.g. from `iter_tree`.
+        path: Output file; with several shards, the base of the shard names (`shard_paths`).
+        shards: Number of files to deal the tasks to, round-robin.
+        layout: Positions of the items' phases and tasks in the full plan, for
+            items that are only part of it (see `load_jsonl`). By default,
+            positions are counted from the items.
+        shard: For a single file holding one shard of a set (see `shard_of`),
+            the shard its trailer names. By default, the files written are
+            the whole set.
+    """
+    shards = max(1, int(shards))
+    paths = shard_paths(path, shards)
+    files: List[IO[str]] = [open(p + '.tmp', 'w', encoding='utf-8') for p in paths]
+    counts = [0] * shards
+    try:
+        phase, phase_index, phase_tasks = None, -1, {}
+        task, task_index, task_ordinal = None, -1, -1
+        for item in items:
+            if item.phase != phase:
+                phase, task = item.phase, None
+                if layout is not None:
+                    phase_index, phase_tasks = layout[phase]
+                else:
+                    phase_index += 1
+                    task_index = -1
+            if item.task is None:
+                files[0].write(json.dumps(_record(item, phase_index, None), ensure_ascii=False) + '\n')
+                counts[0] += 1
+                continue
+            if item.task != task:
+                task = item.task
+                task_index = phase_tasks[task] if layout is not None else task_index + 1
+                task_ordinal += 1
+            record = _record(item, phase_index, task_index)
+            files[task_ordinal % shards].write(json.dumps(record, ensure_ascii=False) + '\n')
+            counts[task_ordinal % shards] += 1
+        for position, (f, count) in enumerate(zip(files, counts), 1):
+            number, total = shard if shard is not None else (position, shards)
+            f.write(json.dumps({"shard": number, "shards": total, "records": count}) + '\n')
+            f.close()
+        for p in paths:
+            os.replace(p + '.tmp', p)
+    except BaseException:
+        for f, p in zip(files, paths):
+            f.close()
+            if os.path.exists(p + '.tmp'):
+                os.remove(p + '.tmp')
+        raise
+    logger.info(f"Exported plan as JSON Lines to {len(paths)} file(s): {', '.join(paths)}")
+    return paths
+
+
+def _read_records(path: str, trailers: Optional[List[Tuple[str, Optional[ShardInfo]]]] = None
+                  ) -> Iterator[Tuple[_SortKey, Dict[str, Any]]]:
+    """
+    Yields (position, record) for each record of one file, checking the file
+    is in plan order and has as many records as its trailer says. Once the
+    file is read, it is appended to `trailers` with its shard (None without a trailer).
+    """
+    previous: Optional[_SortKey] = None
+    trailer: Optional[ShardInfo] = None
+    count = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            if trailer is not None:
+                raise PlanValidationError(f"{path}:{line_number}: records after the file's trailer.")
+            try:
+                record = json.loads(line)
+                if "phase" not in record:
+                    trailer = (record["shard"], record["shards"])
+                    if record["records"] != count:
+                        raise PlanValidationError(f"{path}: {count} records found, but its trailer lists "
+                                                  f"{record['records']}; the file is incomplete.")
+                    continue
+                key = (record["phase_index"],
+                       -1 if record["task_index"] is None else record["task_index"],
+                       -1 if record["index"] is None else record["index"])
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise JsonParsingError(f"Invalid plan record at {path}:{line_number}: {e}") from e
+            if previous is not None and key <= previous:
+                raise PlanValidationError(f"{path}:{line_number}: records are not in plan order.")
+            previous = key
+            count += 1
+            yield key, record
+    if trailers is not None:
+        trailers.append((path, trailer))
+
+
+def _check_shards(paths: List[str], trailers: List[Tuple[str, Optional[ShardInfo]]]) -> None:
+    """Checks the files are exactly one complete set of shards."""
+    for path, trailer in trailers:
+        if trailer is None:
+            raise PlanValidationError(f"{path} has no trailer; it is incomplete or was not written by export_jsonl.")
+    totals = {trailer[1] for _, trailer in trailers}
+    if not totals:
+        return
+    if len(totals) > 1:
+        raise PlanValidationError(f"{paths} are shards of different sets (of {sorted(totals)} shards).")
+    numbers = sorted(trailer[0] for _, trailer in trailers)
+    expected = list(range(1, totals.pop() + 1))
+    if numbers != expected:
+        duplicated = sorted({n for n in numbers if numbers.count(n) > 1})
+        missing = sorted(set(expected) - set(numbers))
+        raise PlanValidationError(f"Cannot merge {paths}: shards {missing} of {len(expected)} are missing"
+                                  + (f" and shards {duplicated} are given more than once." if duplicated else "."))
+
+
+def _merge(paths: List[str], complete: bool) -> Iterator[Tuple[_SortKey, Dict[str, Any]]]:
+    """Merges the records of several files into plan order; `complete` also requires the whole plan."""
+    trailers: List[Tuple[str, Optional[ShardInfo]]] = []
+    merged = heapq.merge(*(_read_records(path, trailers) for path in paths), key=lambda entry: entry[0])
+    names: Dict[Tuple[int, int], str] = {}
+    previous: Optional[_SortKey] = None
+    for key, record in merged:
+        phase_index, task_index, index = key
+        if key == previous:
+            raise PlanValidationError(f"Plan record {key} appears more than once in {paths}.")
+        # Positions must continue the previous record without gaps
+        if not complete:
+            contiguous = True
+        elif previous is None or phase_index != previous[0]:
+            expected_phase = 0 if previous is None else previous[0] + 1
+            contiguous = phase_index == expected_phase and task_index <= 0 and index <= 0
+        elif task_index != previous[1]:
+            contiguous = task_index == previous[1] + 1 and index <= 0
+        else:
+            contiguous = index == previous[2] + 1
+        if not contiguous:
+            raise PlanValidationError(f"Plan records before {key} are missing from {paths}; is a shard missing?")
+        # Every record of a phase (or task) must agree on its name
+        for position, name in (((phase_index, -2), record["phase"]), ((phase_index, task_index), record["task"])):
+            if names.setdefault(position, name) != name:
+                raise PlanValidationError(f"Plan records at {key} disagree on the name of a phase or task ('{name}').")
+        previous = key
+        yield key, record
+    if complete:
+        _check_shards(paths, trailers)
+
+
+def read_jsonl(paths: Iterable[str], complete: bool = True) -> Iterator[TreeItem]:
+    """
+    Merges JSON Lines plan files (a whole plan, or all of its shards) into plan order.
+
+    With `complete` False, the files may hold only part of a plan, such as a
+    single shard, and neither gaps between their tasks nor missing shards
+    are errors.
+
+    Raises:
+        FileNotFoundError, OSError: If a file cannot be read.
+        JsonParsingError: If a line is not a valid plan record.
+        PlanValidationError: If records are duplicated, out of order, leave
+            gaps in the plan, or a file is incomplete; with `complete`, also
+            if the files are not one whole set of shards. The set is checked
+            after the last item, so a consumer such as `write_tree` must not
+            commit its output before the iteration ends.
+    """
+    for _, record in _merge(list(paths), complete):
+        yield _item(record)
+
+
+def load_jsonl(paths: Iterable[str]) -> Tuple[Dict[str, Any], Layout]:
+    """
+    Loads JSON Lines plan files into a nested tree.
+
+    Returns:
+        The tree and its layout, which `save_jsonl` needs to write a shard
+        back with the positions it had in the full plan.
+
+    Raises:
+        See `read_jsonl`; the files may hold only part of a plan.
+    """
+    tree: Dict[str, Any] = {}
+    layout: Layout = {}
+    for (phase_index, task_index, _), record in _merge(list(paths), complete=False):
+        item = _item(record)
+        tasks = tree.setdefault(item.phase, {})
+        phase_tasks = layout.setdefault(item.phase, (phase_index, {}))[1]
+        if item.task is None:
+            continue
+        steps = tasks.setdefault(item.task, [])
+        phase_tasks.setdefault(item.task, task_index)
+        if item.index is not None:
+            steps.append(item.step)
+    return tree, layout
+
+
+def shard_of(path: str) -> Optional[ShardInfo]:
+    """Returns the shard a JSON Lines plan file's trailer names, or None if it has none."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().decode('utf-8', errors='replace').split('\n')
+    last = next((line for line in reversed(lines) if line.strip()), "")
+    try:
+        record = json.loads(last)
+        return (record["shard"], record["shards"]) if "phase" not in record else None
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+
+def iter_plan(path: str) -> Iterator[TreeItem]:
+    """Streams the items of a plan file in either format; a JSON Lines file may be a single shard."""
+    return read_jsonl([path], complete=False) if is_jsonl(path) else iter_tree(path)
+
+
+def export_plan_file(tree_file: str, jsonl_path: str, shards: int = 1) -> List[str]:
+    """Converts a reasoning tree file to JSON Lines, streaming it, and returns the files written."""
+    return export_jsonl(iter_plan(tree_file), jsonl_path, shards)
+
+
+def import_plan_files(jsonl_paths: Iterable[str], output_file: str) -> int:
+    """Merges JSON Lines plan files into a nested reasoning tree file and returns the number of steps."""
+    paths = sorted(jsonl_paths)
+    if not paths:
+        raise PlanValidationError("No JSON Lines plan files given to import.")
+    steps = write_tree(output_file, read_jsonl(paths))
+    logger.info(f"Merged {len(paths)} JSON Lines file(s) into {output_file} ({steps} steps)")
+    return steps
+
+
+def save_jsonl(path: str, tree: Dict[str, Any], layout: Optional[Layout] = None,
+               shard: Optional[ShardInfo] = None) -> None:
+    """Writes a nested tree (or one shard of one, positioned by `layout`) as a single JSON Lines file."""
+    export_jsonl(tree_items(tree), path, 1, layout, shard)
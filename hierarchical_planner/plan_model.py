@@ -0,0 +1,230 @@
+"""
+Typed in-memory model of a reasoning tree.
+
+On disk, a plan is nested JSON: phases map task names to lists of
+single-key step objects (`{"step 1": "..."}`), which QA extends with a
+`qa_info` object. Finding a step's prompt in that form means scanning its
+keys for the one that is not `qa_info`. `Plan.from_dict` parses the JSON
+once into `Plan` -> `Phase` -> `Task` -> `Step` nodes that hold the prompt key,
+prompt and annotations in dedicated `__slots__` attributes, so access is
+O(1) and each step costs a small fixed-size object instead of a dict.
+
+`Plan.to_dict()` reproduces the JSON it was parsed from, key order included;
+step objects with unusual shapes (extra keys, unexpected order) are kept
+verbatim apart from the prompt and `qa_info`.
+
+Every node has a stable `id`: its JSON pointer in the plan document, e.g.
+`/Phase 1/Task 1.1/0` for the first step of a task. The ids match the
+error paths reported by `plan_schema` and can be resolved with `Plan.get`.
+"""
+import logging
+from typing import Dict, Any, Iterator, List, Optional, Union
+
+from .exceptions import PlanValidationError
+from .plan_schema import json_pointer
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+QA_INFO_KEY = 'qa_info'
+
+
+class Step:
+    """One step: its prompt key ('step N'), prompt text and QA annotations."""
+
+    __slots__ = ('key', 'prompt', 'qa_info', 'index', 'task', '_raw')
+
+    def __init__(self, key: Optional[str], prompt: Any = "", qa_info: Optional[Dict[str, Any]] = None,
+                 index: int = 0, task: Optional["Task"] = None):
+        self.key = key
+        self.prompt = prompt
+        self.qa_info = qa_info
+        self.index = index
+        self.task = task
+        # The source object, kept only when it has a shape `to_dict` could not rebuild
+        self._raw: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], index: int = 0, task: Optional["Task"] = None) -> "Step":
+        """
+        Parses a step object; the first key other than 'qa_info' is the prompt key.
+
+        Raises:
+            PlanValidationError: If `data` is not a dictionary.
+        """
+        if not isinstance(data, dict):
+            where = f"{task.id}/{index}" if task is not None else f"Step {index + 1}"
+            raise PlanValidationError(f"{where}: a step must be a dictionary, got {type(data).__name__}.")
+        key = next((k for k in data if k != QA_INFO_KEY), None)
+        qa_info = data.get(QA_INFO_KEY)
+        step = cls(key, data[key] if key is not None else "",
+                   qa_info if isinstance(qa_info, dict) else None, index, task)
+        canonical = ([key] if key is not None else []) + ([QA_INFO_KEY] if QA_INFO_KEY in data else [])
+        if list(data) != canonical or (QA_INFO_KEY in data and step.qa_info is None):
+            step._raw = data
+        return step
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the step in its JSON form."""
+        if self._raw is not None:
+            data = dict(self._raw)
+        else:
+            data = {}
+        if self.key is not None:
+            data[self.key] = self.prompt
+        if self.qa_info is not None:
+            data[QA_INFO_KEY] = self.qa_info
+        return data
+
+    @property
+    def is_canonical(self) -> bool:
+        """Whether `to_dict` rebuilds the step from key, prompt and qa_info alone."""
+        return self._raw is None
+
+    def annotations(self) -> Dict[str, Any]:
+        """Returns the step's qa_info, creating it if the step has none yet."""
+        if self.qa_info is None:
+            self.qa_info = {}
+        return self.qa_info
+
+    @property
+    def id(self) -> str:
+        """JSON pointer of the step within its plan."""
+        return f"{self.task.id}/{self.index}" if self.task is not None else f"/{self.index}"
+
+    def __repr__(self) -> str:
+        return f"Step({self.key!r}, {self.prompt!r})"
+
+
+class Task:
+    """A task and its ordered steps."""
+
+    __slots__ = ('name', 'steps', 'phase')
+
+    def __init__(self, name: str, steps: Optional[List[Step]] = None, phase: Optional["Phase"] = None):
+        self.name = name
+        self.steps: List[Step] = steps if steps is not None else []
+        self.phase = phase
+
+    @classmethod
+    def from_list(cls, name: str, steps: List[Dict[str, Any]], phase: Optional["Phase"] = None) -> "Task":
+        """
+        Parses a task's list of step objects.
+
+        Raises:
+            PlanValidationError: If `steps` is not a list or contains a non-dictionary step.
+        """
+        task = cls(name, phase=phase)
+        if not isinstance(steps, list):
+            raise PlanValidationError(f"{task.id}: the steps of a task must be a list, got {type(steps).__name__}.")
+        task.steps = [Step.from_dict(step, index, task) for index, step in enumerate(steps)]
+        return task
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Returns the task's steps in their JSON form."""
+        return [step.to_dict() for step in self.steps]
+
+    @property
+    def id(self) -> str:
+        """JSON pointer of the task within its plan."""
+        parent = self.phase.id if self.phase is not None else ""
+        return parent + json_pointer((self.name,))
+
+    def __repr__(self) -> str:
+        return f"Task({self.name!r}, {len(self.steps)} steps)"
+
+
+class Phase:
+    """A phase and its tasks, in order."""
+
+    __slots__ = ('name', 'tasks')
+
+    def __init__(self, name: str, tasks: Optional[Dict[str, Task]] = None):
+        self.name = name
+        self.tasks: Dict[str, Task] = tasks if tasks is not None else {}
+
+    @classmethod
+    def from_dict(cls, name: str, tasks: Dict[str, List[Dict[str, Any]]]) -> "Phase":
+        """
+        Parses a phase's task mapping.
+
+        Raises:
+            PlanValidationError: If `tasks` is not a dictionary or a task is malformed.
+        """
+        phase = cls(name)
+        if not isinstance(tasks, dict):
+            raise PlanValidationError(f"{phase.id}: the tasks of a phase must be a dictionary, got {type(tasks).__name__}.")
+        phase.tasks = {task_name: Task.from_list(task_name, steps, phase) for task_name, steps in tasks.items()}
+        return phase
+
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Returns the phase's tasks in their JSON form."""
+        return {name: task.to_list() for name, task in self.tasks.items()}
+
+    @property
+    def id(self) -> str:
+        """JSON pointer of the phase within its plan."""
+        return json_pointer((self.name,))
+
+    def __repr__(self) -> str:
+        return f"Phase({self.name!r}, {len(self.tasks)} tasks)"
+
+
+class Plan:
+    """A reasoning tree: phases, in order."""
+
+    __slots__ = ('phases',)
+
+    def __init__(self, phases: Optional[Dict[str, Phase]] = None):
+        self.phases: Dict[str, Phase] = phases if phases is not None else {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Plan":
+        """
+        Parses a reasoning tree.
+
+        Only the containers are checked (phases are dictionaries, tasks are
+        lists of dictionaries); use `plan_schema.validate_plan` for a full
+        structural check.
+
+        Raises:
+            PlanValidationError: If the tree's containers have the wrong types.
+        """
+        if not isinstance(data, dict):
+            raise PlanValidationError(f"/: the reasoning tree must be a dictionary, got {type(data).__name__}.")
+        return cls({name: Phase.from_dict(name, tasks) for name, tasks in data.items()})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the plan in its JSON form."""
+        return {name: phase.to_dict() for name, phase in self.phases.items()}
+
+    def tasks(self) -> Iterator[Task]:
+        """Yields every task, in plan order."""
+        for phase in self.phases.values():
+            yield from phase.tasks.values()
+
+    def steps(self) -> Iterator[Step]:
+        """Yields every step, in plan order."""
+        for task in self.tasks():
+            yield from task.steps
+
+    def get(self, node_id: str) -> Union["Plan", Phase, Task, Step, None]:
+        """Returns the node with the given id (JSON pointer), or None if there is none."""
+        if not node_id:
+            return self
+        parts = [part.replace('~1', '/').replace('~0', '~') for part in node_id.split('/')[1:]]
+        phase = self.phases.get(parts[0])
+        if phase is None or len(parts) == 1:
+            return phase
+        task = phase.tasks.get(parts[1])
+        if task is None or len(parts) == 2:
+            return task
+        if len(parts) == 3 and parts[2].isdigit() and int(parts[2]) < len(task.steps):
+            return task.steps[int(parts[2])]
+        return None
+
+    def __len__(self) -> int:
+        return sum(len(task.steps) for task in self.tasks())
+
+    def __repr__(self) -> str:
+        return f"Plan({len(self.phases)} phases)"
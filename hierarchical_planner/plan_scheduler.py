@@ -0,0 +1,114 @@
+"""
+Topological scheduler for plan generation units.
+
+Plan generation is a dependency graph of units: the constitution feeds phase
+generation, each phase's task list only needs that phase's name, each task's
+steps only need that task's name, and QA for a task only needs its steps.
+`DagScheduler` runs such a graph: a unit starts as soon as every unit it
+depends on has finished, at most `max_concurrency` units run at once, and
+ready units with a higher priority start first (ties in the order they were
+added). Units may add further units while running, so the graph can grow as
+generation reveals phases and tasks.
+
+If any unit fails, all running units are cancelled and the exception
+propagates, like `asyncio.gather` with sibling cancellation.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Dict, Any, Awaitable, Callable, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+UnitFactory = Callable[[], Awaitable[Any]]
+
+
+class DagScheduler:
+    """Runs units of async work in dependency order with bounded concurrency."""
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.max_concurrency = max(1, int(max_concurrency)) if max_concurrency else None
+        self._units: Dict[Hashable, Tuple[UnitFactory, int]] = {}
+        # Number of unfinished dependencies of each waiting unit, and the units waiting on each key
+        self._waiting: Dict[Hashable, int] = {}
+        self._dependents: Dict[Hashable, List[Hashable]] = {}
+        self._ready: List[Tuple[int, int, Hashable]] = []
+        self._running: Dict[asyncio.Future, Hashable] = {}
+        self._done: Set[Hashable] = set()
+        self._results: Dict[Hashable, Any] = {}
+        self._order = itertools.count()
+
+    def add(self, key: Hashable, run: UnitFactory, deps: Iterable[Hashable] = (), priority: int = 0) -> None:
+        """
+        Adds a unit; `run()` is called once every unit in `deps` has finished.
+
+        Dependencies may be units that are already finished, running, or not
+        added yet. Raises ValueError if a unit with the same key was added.
+        """
+        if key in self._units:
+            raise ValueError(f"Generation unit {key!r} was already scheduled.")
+        self._units[key] = (run, priority)
+        pending = [dep for dep in dict.fromkeys(deps) if dep not in self._done]
+        if not pending:
+            self._push_ready(key)
+            return
+        self._waiting[key] = len(pending)
+        for dep in pending:
+            self._dependents.setdefault(dep, []).append(key)
+
+    def is_done(self, key: Hashable) -> bool:
+        """Returns whether the unit has finished."""
+        return key in self._done
+
+    def result(self, key: Hashable) -> Any:
+        """Returns the value a finished unit returned."""
+        return self._results[key]
+
+    def _push_ready(self, key: Hashable) -> None:
+        heapq.heappush(self._ready, (-self._units[key][1], next(self._order), key))
+
+    def _finish(self, key: Hashable, result: Any) -> None:
+        """Records a finished unit and moves units waiting only on it to the ready queue."""
+        self._results[key] = result
+        self._done.add(key)
+        for dependent in self._dependents.pop(key, ()):
+            self._waiting[dependent] -= 1
+            if not self._waiting[dependent]:
+                del self._waiting[dependent]
+                self._push_ready(dependent)
+
+    def _start_ready(self) -> None:
+        while self._ready and (self.max_concurrency is None or len(self._running) < self.max_concurrency):
+            _, _, key = heapq.heappop(self._ready)
+            logger.debug(f"Starting generation unit {key!r}")
+            self._running[asyncio.ensure_future(self._units[key][0]())] = key
+
+    async def run(self) -> Dict[Hashable, Any]:
+        """
+        Runs every unit, including units added while running, and returns their results by key.
+
+        Raises ValueError if units are left whose dependencies can never finish
+        (missing units or a cycle).
+        """
+        try:
+            while True:
+                self._start_ready()
+                if not self._running:
+                    break
+                finished, _ = await asyncio.wait(list(self._running), return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    key = self._running.pop(future)
+                    self._finish(key, future.result())
+        except BaseException:
+            for future in self._running:
+                future.cancel()
+            await asyncio.gather(*self._running, return_exceptions=True)
+            self._running.clear()
+            raise
+
+        if self._waiting:
+            blocked = {dep: waiting for dep, waiting in self._dependents.items()}
+            raise ValueError(f"Generation units wait on units that never finished: {blocked}")
+        return self._results
@@ -0,0 +1,303 @@
+"""
+Schema validation of reasoning trees and Project Constitutions.
+
+Schemas are JSON Schema documents restricted to the keywords the planner's
+documents need: `type`, `enum`, `minLength`, `properties`, `required`,
+`additionalProperties`, `minProperties`, `items`, `minItems` and local `$ref`
+pointers (`#/properties/...`). Annotations such as `title` and `description`
+are ignored.
+
+`CompiledSchema` turns a schema into nested closures once, so validating a
+document is a single walk over it with no schema interpretation per node; a
+plan with thousands of steps validates in a few milliseconds. Every error
+carries the path of the offending value, rendered as a JSON pointer
+(`/Phase 1/Task 1.1/3/step 4`).
+
+The reasoning tree schema is `PLAN_SCHEMA`; the constitution schema is read
+from `config/project_constitution_schema.json`. Both are compiled on first use.
+"""
+import functools
+import json
+import logging
+import os
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+CONSTITUTION_SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'config', 'project_constitution_schema.json')
+
+# Phases -> tasks -> list of steps; a step maps its prompt key ('step N') to the
+# prompt and may carry the 'qa_info' annotations added by QA
+PLAN_SCHEMA: Dict[str, Any] = {
+    "title": "Reasoning Tree",
+    "type": "object",
+    "additionalProperties": {
+        "type": "object",
+        "additionalProperties": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "minProperties": 1,
+                "properties": {"qa_info": {"type": "object"}},
+                "additionalProperties": {"type": "string", "minLength": 1},
+            },
+        },
+    },
+}
+
+PathPart = Union[str, int]
+
+
+def json_pointer(path: Sequence[PathPart]) -> str:
+    """Renders a path as a JSON pointer (RFC 6901); '' is the document root."""
+    return ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in path)
+
+
+class SchemaError(NamedTuple):
+    """A schema violation: where it is, which keyword failed, and a short message."""
+    path: Tuple[PathPart, ...]
+    keyword: str
+    message: str
+
+    @property
+    def pointer(self) -> str:
+        """The path as a JSON pointer ('' for the document root)."""
+        return json_pointer(self.path)
+
+    def __str__(self) -> str:
+        return f"{self.pointer or '/'}: {self.message}"
+
+
+# Appends the errors of `value` (found at `path`) to `errors`
+Check = Callable[[Any, List[PathPart], List[SchemaError]], None]
+
+_TYPES: Dict[str, Tuple[type, ...]] = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+_TYPE_NAMES = {
+    "object": "an object", "array": "an array", "string": "a string", "integer": "an integer",
+    "number": "a number", "boolean": "a boolean", "null": "null",
+}
+
+
+def _no_errors(value: Any, path: List[PathPart], errors: List[SchemaError]) -> None:
+    pass
+
+
+class CompiledSchema:
+    """A schema compiled into a validation function."""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self._compiled: Dict[int, Check] = {}
+        self._check = self._compile(schema)
+
+    def validate(self, instance: Any, at: Sequence[PathPart] = ()) -> List[SchemaError]:
+        """
+        Returns every violation in `instance`; an empty list if it is valid.
+
+        Args:
+            instance: The document, or the part of one found at `at`.
+            at: Path of `instance` within the document, e.g. (phase, task) to
+                validate one task's steps against the reasoning tree schema.
+                Error paths include it.
+        """
+        check = self._check_at(tuple(at)) if at else self._check
+        errors: List[SchemaError] = []
+        check(instance, list(at), errors)
+        return errors
+
+    def is_valid(self, instance: Any) -> bool:
+        """Returns whether `instance` has no violations."""
+        return not self.validate(instance)
+
+    # --- Compilation ---
+
+    def _resolve(self, ref: str) -> Dict[str, Any]:
+        if not ref.startswith('#'):
+            raise ValueError(f"Only local schema references are supported, got '{ref}'.")
+        node: Any = self.schema
+        for part in filter(None, ref[1:].split('/')):
+            part = part.replace('~1', '/').replace('~0', '~')
+            node = node[int(part)] if isinstance(node, list) else node[part]
+        return node
+
+    def _compile(self, node: Dict[str, Any]) -> Check:
+        key = id(node)
+        if key in self._compiled:
+            return self._compiled[key]
+        # A recursive `$ref` back to this node compiles to a call through `cell`
+        cell: List[Check] = []
+        self._compiled[key] = lambda value, path, errors: cell[0](value, path, errors)
+        check = self._build(node)
+        cell.append(check)
+        self._compiled[key] = check
+        return check
+
+    def _check_at(self, at: Tuple[PathPart, ...]) -> Check:
+        """Returns the check for values found at `at`, following the schema down the path."""
+        node: Optional[Dict[str, Any]] = self.schema
+        for part in at:
+            while node is not None and '$ref' in node:
+                node = self._resolve(node['$ref'])
+            if node is None:
+                break
+            if isinstance(part, int):
+                items = node.get('items')
+                node = items if isinstance(items, dict) else None
+            elif part in node.get('properties', {}):
+                node = node['properties'][part]
+            else:
+                additional = node.get('additionalProperties')
+                node = additional if isinstance(additional, dict) else None
+        return self._compile(node) if node is not None else _no_errors
+
+    def _build(self, node: Dict[str, Any]) -> Check:
+        if '$ref' in node:
+            target = self._resolve(node['$ref'])
+            return self._compile(target)
+
+        checks: List[Check] = []
+        type_check = self._build_type(node.get('type'))
+        if 'enum' in node:
+            checks.append(self._build_enum(node['enum']))
+        if 'minLength' in node:
+            checks.append(self._build_min_length(node['minLength']))
+        if any(k in node for k in ('properties', 'required', 'additionalProperties', 'minProperties')):
+            checks.append(self._build_object(node))
+        if 'items' in node or 'minItems' in node:
+            checks.append(self._build_array(node))
+
+        if type_check is None:
+            if len(checks) == 1:
+                return checks[0]
+            if not checks:
+                return _no_errors
+
+        def check(value: Any, path: List[PathPart], errors: List[SchemaError]) -> None:
+            # Other keywords are only checked once the type is right
+            if type_check is not None and not type_check(value, path, errors):
+                return
+            for sub_check in checks:
+                sub_check(value, path, errors)
+        return check
+
+    def _build_type(self, expected: Union[str, List[str], None]) -> Optional[Callable[[Any, List[PathPart], List[SchemaError]], bool]]:
+        if expected is None:
+            return None
+        names = [expected] if isinstance(expected, str) else list(expected)
+        python_types = tuple(t for name in names for t in _TYPES[name])
+        # bool is an int subclass, but JSON booleans are not numbers
+        reject_bool = 'boolean' not in names and any(name in ('integer', 'number') for name in names)
+        message = "must be " + " or ".join(_TYPE_NAMES[name] for name in names)
+
+        def check_type(value: Any, path: List[PathPart], errors: List[SchemaError]) -> bool:
+            if isinstance(value, python_types) and not (reject_bool and isinstance(value, bool)):
+                return True
+            errors.append(SchemaError(tuple(path), 'type', message))
+            return False
+        return check_type
+
+    def _build_enum(self, allowed: List[Any]) -> Check:
+        message = f"must be one of {allowed}"
+
+        def check_enum(value: Any, path: List[PathPart], errors: List[SchemaError]) -> None:
+            if value not in allowed:
+                errors.append(SchemaError(tuple(path), 'enum', message))
+        return check_enum
+
+    def _build_min_length(self, minimum: int) -> Check:
+        message = "must not be empty" if minimum == 1 else f"must be at least {minimum} characters long"
+
+        def check_min_length(value: Any, path: List[PathPart], errors: List[SchemaError]) -> None:
+            if isinstance(value, str) and len(value) < minimum:
+                errors.append(SchemaError(tuple(path), 'minLength', message))
+        return check_min_length
+
+    def _build_object(self, node: Dict[str, Any]) -> Check:
+        properties = {name: self._compile(sub) for name, sub in node.get('properties', {}).items()}
+        required = tuple(node.get('required', ()))
+        min_properties = node.get('minProperties', 0)
+        additional = node.get('additionalProperties', True)
+        additional_check: Optional[Check] = self._compile(additional) if isinstance(additional, dict) else None
+        forbid_additional = additional is False
+
+        def check_object(value: Any, path: List[PathPart], errors: List[SchemaError]) -> None:
+            if not isinstance(value, dict):
+                return
+            if len(value) < min_properties:
+                errors.append(SchemaError(tuple(path), 'minProperties', f"must have at least {min_properties} properties"))
+            for name in required:
+                if name not in value:
+                    errors.append(SchemaError(tuple(path), 'required', f"is missing required property '{name}'"))
+            for name, item in value.items():
+                sub_check = properties.get(name, additional_check)
+                if sub_check is None:
+                    if forbid_additional and name not in properties:
+                        errors.append(SchemaError(tuple(path), 'additionalProperties', f"has unexpected property '{name}'"))
+                    continue
+                path.append(name)
+                sub_check(item, path, errors)
+                path.pop()
+        return check_object
+
+    def _build_array(self, node: Dict[str, Any]) -> Check:
+        items = node.get('items')
+        item_check: Optional[Check] = self._compile(items) if isinstance(items, dict) else None
+        min_items = node.get('minItems', 0)
+
+        def check_array(value: Any, path: List[PathPart], errors: List[SchemaError]) -> None:
+            if not isinstance(value, list):
+                return
+            if len(value) < min_items:
+                errors.append(SchemaError(tuple(path), 'minItems', f"must have at least {min_items} items"))
+            if item_check is None:
+                return
+            path.append(0)
+            for index, item in enumerate(value):
+                path[-1] = index
+                item_check(item, path, errors)
+            path.pop()
+        return check_array
+
+
+@functools.lru_cache(maxsize=None)
+def plan_validator() -> CompiledSchema:
+    """Returns the compiled reasoning tree schema."""
+    return CompiledSchema(PLAN_SCHEMA)
+
+
+@functools.lru_cache(maxsize=None)
+def constitution_schema() -> Dict[str, Any]:
+    """
+    Loads the Project Constitution schema, once per process.
+
+    Raises:
+        FileNotFoundError, json.JSONDecodeError: If the schema file is missing or malformed.
+    """
+    with open(CONSTITUTION_SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@functools.lru_cache(maxsize=None)
+def constitution_validator() -> CompiledSchema:
+    """Returns the compiled Project Constitution schema."""
+    return CompiledSchema(constitution_schema())
+
+
+def validate_plan(plan: Any, at: Sequence[PathPart] = ()) -> List[SchemaError]:
+    """Validates a reasoning tree, or the part of one at `at` (e.g. (phase, task) for a step list)."""
+    return plan_validator().validate(plan, at)
+
+
+def validate_constitution(constitution: Any) -> List[SchemaError]:
+    """Validates a Project Constitution against its schema."""
+    return constitution_validator().validate(constitution)
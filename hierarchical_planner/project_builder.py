@@ -1,20 +1,25 @@
 # hierarchical_planner/project_builder.py
 
+import itertools
 import json
 import logging
+import operator
 import os
 import subprocess
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from .config_loader import load_config
 # from .gemini_client import GeminiClient  # Not used in current implementation
 # Assuming DeepSeekV3Client exists or is handled by UniversalLLMClient
 # from .deepseek_v3_client import DeepSeekV3Client  # Not used in current implementation
 from .universal_LLM_client import UniversalLLMClient
-from .exceptions import ProjectBuilderError, LLMClientError, ValidationError
+from .exceptions import ProjectBuilderError, LLMClientError, ValidationError, PlanValidationError, JsonParsingError
 from .logger_setup import setup_logging
+from .plan_model import Step
+from .tree_stream import TreeItem
+from .plan_jsonl import is_jsonl, iter_plan, load_jsonl
 
 # Configure logging will be done when config is available
 logger = logging.getLogger(__name__)
@@ -58,19 +63,43 @@ class ProjectBuilder:
         )
         # TODO: Add specific GeminiClient/DeepSeekV3Client if needed
 
-        self.reasoning_tree = self._parse_reasoning_tree()
+        # The tree is streamed step by step while building; it is only loaded whole on request
+        if not self.reasoning_tree_path.is_file():
+            logger.error(f"Reasoning tree file not found: {self.reasoning_tree_path}")
+            raise ProjectBuilderError(f"Reasoning tree file not found: {self.reasoning_tree_path}")
+        self._reasoning_tree: Optional[Dict] = None
         self.max_retries = self.config.get("project_builder", {}).get("max_retries", 1)
         self.test_runner_command = self.config.get("project_builder", {}).get("test_runner_command", "pytest") # Example
 
         logger.info(f"ProjectBuilder initialized for project directory: {self.project_dir}")
 
+    @property
+    def reasoning_tree(self) -> Dict:
+        """The whole reasoning tree, loaded on first access (`build` streams it instead)."""
+        if self._reasoning_tree is None:
+            self._reasoning_tree = self._parse_reasoning_tree()
+        return self._reasoning_tree
+
+    def _iter_reasoning_tree(self) -> Iterator[TreeItem]:
+        """Streams the steps of the reasoning tree file, nested JSON or a JSON Lines shard (see `plan_jsonl.iter_plan`)."""
+        try:
+            yield from iter_plan(str(self.reasoning_tree_path))
+        except FileNotFoundError:
+            logger.error(f"Reasoning tree file not found: {self.reasoning_tree_path}")
+            raise ProjectBuilderError(f"Reasoning tree file not found: {self.reasoning_tree_path}")
+        except (JsonParsingError, PlanValidationError, OSError) as e:
+            logger.error(f"Error reading reasoning tree: {e}")
+            raise ProjectBuilderError(f"Failed to read reasoning tree: {e}") from e
+
     def _parse_reasoning_tree(self) -> Dict:
         """Loads and potentially validates the reasoning tree JSON."""
         logger.info(f"Parsing reasoning tree from: {self.reasoning_tree_path}")
         try:
-            with open(self.reasoning_tree_path, 'r', encoding='utf-8') as f:
-                # Handle potential large file size if necessary - consider streaming/chunking later
-                tree = json.load(f)
+            if is_jsonl(str(self.reasoning_tree_path)):
+                tree, _ = load_jsonl([str(self.reasoning_tree_path)])
+            else:
+                with open(self.reasoning_tree_path, 'r', encoding='utf-8') as f:
+                    tree = json.load(f)
             # TODO: Add validation of the tree structure if needed
             logger.info("Reasoning tree parsed successfully.")
             return tree
@@ -465,10 +494,6 @@ Task: Analyze the code and the test failures. Modify the original code to fix th
         This version is primarily simulation and logging due to tool execution constraints.
         """
         logger.info("Starting project build process (Simulation Mode)...")
-        if not self.reasoning_tree:
-            logger.error("Reasoning tree is not loaded. Aborting build.")
-            return
-
         context = {"project_dir": str(self.project_dir)}
         all_test_paths = [] # Keep track of all generated test files
 
@@ -477,22 +502,29 @@ Task: Analyze the code and the test failures. Modify the original code to fix th
         # It would call build_step, execute tools, and feed results back.
         # Here, we simulate one pass.
 
-        for phase_name, tasks in self.reasoning_tree.items():
+        # The tree is streamed, so only the current step is held in memory
+        steps_seen = 0
+        items = self._iter_reasoning_tree()
+        for phase_name, phase_items in itertools.groupby(items, key=operator.attrgetter('phase')):
             logger.info(f"--- Starting Phase: {phase_name} ---")
             context["current_phase"] = phase_name
-            for task_name, steps in tasks.items():
+            for task_name, task_items in itertools.groupby(phase_items, key=operator.attrgetter('task')):
+                if task_name is None:  # Phase without tasks
+                    continue
                 logger.info(f"--- Starting Task: {task_name} ---")
                 context["current_task"] = task_name
-                if not isinstance(steps, list):
-                    logger.warning(f"Steps for task '{task_name}' is not a list. Skipping.")
-                    continue
 
-                for step_data in steps:
-                    if not isinstance(step_data, dict) or len(step_data) != 1:
-                        logger.warning(f"Invalid step format in task '{task_name}'. Skipping step: {step_data}")
+                for item in task_items:
+                    if item.index is None:  # Task without steps
+                        continue
+                    steps_seen += 1
+                    # Steps may carry QA annotations (qa_info) next to their prompt
+                    step = Step.from_dict(item.step, item.index) if isinstance(item.step, dict) else None
+                    if step is None or not step.key or not isinstance(step.prompt, str) or not step.prompt:
+                        logger.warning(f"Invalid step format in task '{task_name}'. Skipping step: {item.step}")
                         continue
 
-                    step_key, instruction = list(step_data.items())[0]
+                    step_key, instruction = step.key, step.prompt
                     logger.info(f"--- Processing Step: {step_key} ---")
                     context["current_step"] = step_key
 
@@ -675,6 +707,9 @@ Task: Analyze the code and the test failures. Modify the original code to fix th
             logger.info(f"--- Completed Phase Simulation: {phase_name} ---")
             context.pop("current_phase", None)
 
+        if not steps_seen:
+            logger.error("Reasoning tree has no steps. Nothing to build.")
+            return
         logger.info("Project build process simulation completed.")
 
 
@@ -0,0 +1,169 @@
+"""
+Prompt rendering with a pre-rendered, cacheable prefix per template.
+
+Planner and QA prompts start with text that stays the same for a whole run:
+the Project Constitution (serialized as JSON) and the user goal, then the
+fields that change per call (phase, task, steps). This module:
+
+- serializes a constitution once (`constitution_text`), instead of once per
+  call, and optionally gives lower plan levels its compact digest instead
+  (`constitution_for_level`);
+- compiles each template once and pre-renders its constant prefix, the
+  template up to the first field outside `STABLE_FIELDS`, once per distinct
+  constitution/goal, so only the short per-call tail is formatted for each call;
+- remembers the pre-rendered prefixes, so provider clients can send them as
+  cacheable blocks (`cacheable_prefix`; see Anthropic prompt caching in
+  `anthropic_client`). Providers that cache prefixes implicitly (Gemini,
+  DeepSeek) benefit from the prefix coming first without any extra markup.
+
+`render_prompt(template, context)` returns exactly `template.format(**context)`.
+"""
+import functools
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from .constitution_digest import build_digest
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# Fields whose values stay the same for a whole run
+STABLE_FIELDS = ('constitution', 'goal')
+
+# Number of pre-rendered prefixes remembered for `cacheable_prefix`
+_MAX_PREFIXES = 64
+
+
+class CompiledTemplate(NamedTuple):
+    """A template split into its constant head and per-call tail."""
+    head: str
+    head_fields: Tuple[str, ...]
+    tail: str
+
+
+def _field_spans(template: str) -> List[Tuple[int, int, str]]:
+    """Returns (start, end, field name) of each replacement field, skipping '{{' and '}}' escapes."""
+    spans = []
+    i = 0
+    while i < len(template):
+        if template.startswith('{{', i) or template.startswith('}}', i):
+            i += 2
+        elif template[i] == '{':
+            end = template.index('}', i)
+            name = template[i + 1:end]
+            for separator in ('!', ':', '.', '['):
+                name = name.split(separator, 1)[0]
+            spans.append((i, end + 1, name))
+            i = end + 1
+        else:
+            i += 1
+    return spans
+
+
+@functools.lru_cache(maxsize=128)
+def compile_template(template: str) -> CompiledTemplate:
+    """Splits a template before its first field that is not in `STABLE_FIELDS`."""
+    spans = _field_spans(template)
+    split = next((start for start, _, name in spans if name not in STABLE_FIELDS), len(template))
+    head_fields = tuple(dict.fromkeys(name for start, _, name in spans if start < split))
+    return CompiledTemplate(template[:split], head_fields, template[split:])
+
+
+_prefixes: 'OrderedDict[str, None]' = OrderedDict()
+_prefixes_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=256)
+def _render_head(template: str, values: Tuple[Tuple[str, Any], ...]) -> str:
+    head = compile_template(template).head.format(**dict(values))
+    with _prefixes_lock:
+        _prefixes[head] = None
+        _prefixes.move_to_end(head)
+        while len(_prefixes) > _MAX_PREFIXES:
+            _prefixes.popitem(last=False)
+    return head
+
+
+def render_prompt(template: str, context: Dict[str, Any]) -> str:
+    """Renders a prompt template; equivalent to `template.format(**context)`."""
+    compiled = compile_template(template)
+    if not compiled.head_fields:
+        return template.format(**context)
+    try:
+        head = _render_head(template, tuple((name, context[name]) for name in compiled.head_fields))
+    except TypeError:  # Unhashable field value; render without the prefix cache
+        return template.format(**context)
+    return head + compiled.tail.format(**context)
+
+
+def cacheable_prefix(prompt: str, min_chars: int = 0) -> Optional[str]:
+    """
+    Returns the longest pre-rendered prefix the prompt starts with, if at least `min_chars` long.
+
+    Only prefixes produced by `render_prompt` qualify, so a provider client
+    can mark them cacheable knowing the same text starts other prompts too.
+    """
+    with _prefixes_lock:
+        candidates = list(_prefixes)
+    matches = [prefix for prefix in candidates if len(prefix) >= max(min_chars, 1) and prompt.startswith(prefix)]
+    return max(matches, key=len) if matches else None
+
+
+# (constitution object, full text, digest text or None until first needed)
+_constitution_cache: Tuple[Optional[Dict[str, Any]], str, Optional[str]] = (None, "", None)
+
+
+def _cached_constitution(constitution: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], str, Optional[str]]:
+    global _constitution_cache
+    if _constitution_cache[0] is not constitution:
+        _constitution_cache = (constitution, json.dumps(constitution, indent=2), None)
+    return _constitution_cache
+
+
+def constitution_text(constitution: Dict[str, Any]) -> str:
+    """
+    Returns the constitution serialized for prompts (indented JSON).
+
+    The text is cached for the constitution object last serialized, so
+    serializing the same constitution for every call costs nothing. The
+    constitution must not be modified in place after it is first serialized.
+    """
+    return _cached_constitution(constitution)[1]
+
+
+def constitution_digest(constitution: Dict[str, Any]) -> str:
+    """Returns the compact digest of the constitution (see `constitution_digest`), cached like `constitution_text`."""
+    global _constitution_cache
+    obj, text, digest = _cached_constitution(constitution)
+    if digest is None:
+        digest = build_digest(constitution)
+        _constitution_cache = (obj, text, digest)
+        logger.info(f"Constitution digest: {len(digest)} chars (full constitution: {len(text)} chars).")
+    return digest
+
+
+def constitution_for_level(constitution: Dict[str, Any], config: Dict[str, Any], level: str) -> str:
+    """
+    Returns the constitution text to inject into prompts at a plan level.
+
+    Levels listed in `constitution.digest_levels` get the compact digest when
+    `constitution.digest` is enabled; all others get the full document. QA
+    prompts use the 'step' level.
+    """
+    settings = config.get('constitution') or {}
+    if settings.get('digest', False) and level in (settings.get('digest_levels') or ()):
+        return constitution_digest(constitution)
+    return constitution_text(constitution)
+
+
+def clear_caches() -> None:
+    """Forgets compiled templates, pre-rendered prefixes and the serialized constitution."""
+    global _constitution_cache
+    compile_template.cache_clear()
+    _render_head.cache_clear()
+    with _prefixes_lock:
+        _prefixes.clear()
+    _constitution_cache = (None, "", None)
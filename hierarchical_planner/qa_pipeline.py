@@ -0,0 +1,98 @@
+"""
+Producer/consumer pipeline that runs step QA alongside plan generation.
+
+Generation produces the steps of one task at a time; QA (resource analysis
+and alignment critique, see `qa_validator.validate_steps`) annotates them.
+Awaiting QA inline makes the run take the sum of both stages. With a
+`QaPipeline`, the generator puts each task's steps on an asyncio queue and
+moves on, while a separate pool of workers annotates queued tasks
+concurrently, so a run is bounded by the slower stage instead.
+
+    async with QaPipeline(review, workers=4) as pipeline:
+        ...
+        await pipeline.submit(phase, task, steps)
+    # Leaving the block waits for the queue to drain, even if generation failed
+
+A bounded queue (`queue_size`) makes generation wait when QA falls behind.
+"""
+import asyncio
+import logging
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# Reviews one task: (phase, task, steps) -> None; responsible for storing the result
+ReviewFunc = Callable[[str, str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+class QaPipeline:
+    """Queue of generated tasks consumed by a pool of QA workers."""
+
+    def __init__(self, review: ReviewFunc, workers: int = 4, queue_size: int = 0):
+        self._review = review
+        self.workers = max(1, int(workers))
+        self._queue: "asyncio.Queue[Tuple[str, str, List[Dict[str, Any]]]]" = asyncio.Queue(maxsize=max(0, int(queue_size)))
+        self._tasks: List[asyncio.Task] = []
+        self._error: Optional[BaseException] = None
+
+    async def __aenter__(self) -> "QaPipeline":
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        logger.debug(f"Started {self.workers} QA pipeline workers")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            await self.drain()
+        elif issubclass(exc_type, Exception):
+            # Generation failed; finish QA of the steps already drafted so that they
+            # are recorded and a resumed run does not generate them again
+            logger.info(f"Generation failed; finishing QA of {self.pending()} queued tasks before stopping")
+            try:
+                await self._queue.join()
+            finally:
+                await self._stop()
+        else:
+            # Cancelled or interrupted; queued QA is abandoned
+            await self._stop()
+        return False
+
+    async def submit(self, phase: str, task: str, steps: List[Dict[str, Any]]) -> None:
+        """Queues a task's steps for QA, waiting for room if the queue is bounded and full."""
+        self._raise_if_failed()
+        await self._queue.put((phase, task, steps))
+
+    async def drain(self) -> None:
+        """Waits until every queued task has been reviewed, then stops the workers."""
+        try:
+            await self._queue.join()
+        finally:
+            await self._stop()
+        self._raise_if_failed()
+
+    def pending(self) -> int:
+        """Returns the number of queued tasks not yet picked up by a worker."""
+        return self._queue.qsize()
+
+    async def _work(self) -> None:
+        while True:
+            phase, task, steps = await self._queue.get()
+            try:
+                if self._error is None:
+                    await self._review(phase, task, steps)
+            except Exception as e:
+                # Keep consuming so producers blocked on a full queue are released
+                logger.error(f"QA pipeline worker failed on task '{task}': {e}", exc_info=True)
+                self._error = self._error or e
+            finally:
+                self._queue.task_done()
+
+    async def _stop(self) -> None:
+        for worker in self._tasks:
+            worker.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
@@ -11,11 +11,17 @@ import json
 import asyncio
 import logging
 import os
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable
 
 # Local imports
 from .checkpoint_manager import CheckpointManager # Import the checkpoint manager
 from .llm_client_selector import select_llm_client
+from . import telemetry
+from .prompt_renderer import constitution_for_level
+from .plan_schema import SchemaError, validate_plan
+from .plan_model import Plan, Task, Step
+from .plan_jsonl import iter_plan, is_jsonl, load_jsonl, save_jsonl, shard_of
+from .tree_stream import tree_items, write_tree
 
 from .exceptions import (
     FileProcessingError, PlannerFileNotFoundError, FileReadError, FileWriteError,
@@ -88,125 +94,311 @@ Example:
 }}
 """
 
+BATCH_ALIGNMENT_CHECK_PROMPT = """
+You are a meticulous project plan reviewer.
+Your review must be consistent with the established Project Constitution.
+
+Project Constitution:
+{constitution}
+
+Analyze each of the following steps within the context of the overall goal, phase, and task.
+
+Overall Goal: "{goal}"
+Current Phase: "{phase}"
+Current Task: "{task}"
+Steps to Review (a JSON object mapping each step key to its prompt, in order):
+{steps_json}
+
+For EACH step, critique the following aspects:
+1.  **Goal Alignment:** Does the step logically contribute to achieving the stated task and, ultimately, the overall goal?
+2.  **Logical Sequence:** Is the step in a logical position relative to the other steps? Are prerequisite steps missing?
+3.  **Clarity & Actionability:** Is the prompt clear and specific enough for an AI coding agent to understand and execute?
+
+Return a single JSON object with exactly one entry per step key given above (use the keys verbatim). Each value must be an object with keys "alignment_critique", "sequence_critique", and "clarity_critique" containing concise feedback. If no issues are found, state that explicitly.
+Example:
+{{
+  "step 1": {{
+    "alignment_critique": "Step logically contributes to the task.",
+    "sequence_critique": "Sequence seems correct.",
+    "clarity_critique": "Clear."
+  }},
+  "step 2": {{
+    "alignment_critique": "Step logically contributes to the task.",
+    "sequence_critique": "Should come after step 3, which creates the parser.",
+    "clarity_critique": "Could be more specific about the expected output format."
+  }}
+}}
+"""
+
+BATCH_RESOURCE_IDENTIFICATION_PROMPT = """
+You are an assistant analyzing prompts intended for an AI coding agent.
+Your analysis must be consistent with the established Project Constitution.
+
+Project Constitution:
+{constitution}
+
+Analyze each of the following prompts in the context of the overall goal, phase, and task.
+
+Overall Goal: "{goal}"
+Current Phase: "{phase}"
+Current Task: "{task}"
+Prompts to Analyze (a JSON object mapping each step key to its prompt):
+{steps_json}
+
+For EACH prompt, identify the following based *only* on that prompt's text:
+1.  **External Actions:** Explicit instructions requiring interaction outside the current codebase (e.g., "Search the web for...", "Install library X").
+2.  **Key Entities/Dependencies:** Specific functions, classes, variables, or file names mentioned that are likely defined in previous steps or used in subsequent steps.
+3.  **Technology Hints:** Specific technologies, libraries, frameworks, or versions mentioned.
+
+Return a single JSON object with exactly one entry per step key given above (use the keys verbatim). Each value must be an object with keys "external_actions", "key_entities_dependencies", and "technology_hints", each mapping to a list of strings (empty if nothing is identified).
+Example:
+{{
+  "step 1": {{
+    "external_actions": ["Install 'requests' library"],
+    "key_entities_dependencies": ["parse_input function"],
+    "technology_hints": ["Python"]
+  }},
+  "step 2": {{
+    "external_actions": [],
+    "key_entities_dependencies": ["parser.py file"],
+    "technology_hints": []
+  }}
+}}
+"""
+
+# (qa_info key, log label, per-step prompt, batched prompt) for each QA check
+_QA_CHECKS = (
+    ("resource_analysis", "Resource analysis", RESOURCE_IDENTIFICATION_PROMPT, BATCH_RESOURCE_IDENTIFICATION_PROMPT),
+    ("step_critique", "Step critique", ALIGNMENT_CHECK_PROMPT, BATCH_ALIGNMENT_CHECK_PROMPT),
+)
+
 # --- Validation Functions ---
 
+def _plan_error_message(error: SchemaError) -> str:
+    """Describes a reasoning tree schema violation in terms of phases, tasks and steps."""
+    path = error.path
+    where = f" [at {error.pointer}]" if path else ""
+    if len(path) == 0 and error.keyword == 'type':
+        return "Root level must be a dictionary (phases)."
+    if len(path) == 1 and error.keyword == 'type':
+        return f"Phase '{path[0]}' value must be a dictionary (tasks).{where}"
+    if len(path) == 2 and error.keyword == 'type':
+        return f"Task '{path[1]}' in Phase '{path[0]}' value must be a list (steps).{where}"
+    if len(path) >= 3:
+        phase, task, index = path[0], path[1], path[2]
+        step = f"Step {index + 1 if isinstance(index, int) else index}"
+        location = f"in Task '{task}', Phase '{phase}'"
+        if len(path) == 3 and error.keyword == 'type':
+            return f"{step} {location} must be a dictionary.{where}"
+        if len(path) == 3 and error.keyword == 'minProperties':
+            return f"{step} {location} has no prompt key (e.g., 'step N'). Found keys: []{where}"
+        if len(path) == 4 and path[3] == 'qa_info':
+            return f"{step} 'qa_info' {location} must be a dictionary if present.{where}"
+        if len(path) == 4:
+            return f"{step} value ('{path[3]}') {location} must be a non-empty string (the prompt).{where}"
+    return str(error)
+
+
 def validate_plan_structure(plan_data: dict) -> list[str]:
     """
-    Programmatically validates the basic structure of the reasoning tree JSON.
+    Validates the structure of the reasoning tree JSON against `plan_schema.PLAN_SCHEMA`.
 
     Checks for correct types (dict, list) at each level (phases, tasks, steps)
-    and verifies the format of individual step entries.
+    and verifies the format of individual step entries: a step maps its
+    prompt key to a non-empty prompt string and may carry a 'qa_info'
+    dictionary. The schema is compiled once, so this is cheap enough to run
+    on every checkpoint.
 
     Args:
         plan_data: The loaded JSON data as a Python dictionary representing the plan.
 
     Returns:
-        A list of error message strings. An empty list indicates a valid structure.
+        A list of error message strings, each ending with the JSON pointer of
+        the offending value. An empty list indicates a valid structure.
         This function does not raise exceptions itself, allowing the caller
         (e.g., `run_validation`) to decide how to handle errors.
     """
-    errors: list[str] = []
-    if not isinstance(plan_data, dict):
-        errors.append("Root level must be a dictionary (phases).")
-        return errors # Cannot proceed if root is not dict
-
-    for phase_name, tasks in plan_data.items():
-        if not isinstance(tasks, dict):
-            errors.append(f"Phase '{phase_name}' value must be a dictionary (tasks).")
-            continue # Skip tasks if phase value is wrong type
-
-        for task_name, steps in tasks.items():
-            if not isinstance(steps, list):
-                errors.append(f"Task '{task_name}' in Phase '{phase_name}' value must be a list (steps).")
-                continue # Skip steps if task value is wrong type
-
-            for i, step_obj in enumerate(steps):
-                step_index = i + 1
-                if not isinstance(step_obj, dict):
-                    errors.append(f"Step {step_index} in Task '{task_name}', Phase '{phase_name}' must be a dictionary.")
-                    continue
-
-                # Allow for qa_info key, find the prompt key
-                step_keys = list(step_obj.keys())
-                prompt_key = next((k for k in step_keys if k != 'qa_info'), None)
-
-                if not prompt_key:
-                     # If only qa_info exists or it's empty, it's an error
-                     if len(step_keys) > 0 and all(k == 'qa_info' for k in step_keys):
-                         logger.warning(f"Step {step_index} in Task '{task_name}', Phase '{phase_name}' only contains 'qa_info'. Assuming valid structure but no prompt.")
-                         continue # Allow steps that might *only* have QA info after processing? Or error? Let's allow for now.
-                     else:
-                         errors.append(f"Step {step_index} in Task '{task_name}', Phase '{phase_name}' has no prompt key (e.g., 'step N'). Found keys: {step_keys}")
-                         continue
-
-                # Check prompt key format (optional, warning only)
-                if not prompt_key.lower().startswith("step"):
-                     logger.warning(f"Step {step_index} key ('{prompt_key}') in Task '{task_name}', Phase '{phase_name}' does not start with 'step'.")
-
-                # Check prompt value
-                step_value = step_obj.get(prompt_key) # Use .get for safety
-                if not isinstance(step_value, str) or not step_value:
-                    errors.append(f"Step {step_index} value ('{prompt_key}') in Task '{task_name}', Phase '{phase_name}' must be a non-empty string (the prompt).")
-
-                # Check qa_info structure if present (optional)
-                qa_info = step_obj.get('qa_info')
-                if qa_info is not None and not isinstance(qa_info, dict):
-                     errors.append(f"Step {step_index} 'qa_info' in Task '{task_name}', Phase '{phase_name}' must be a dictionary if present.")
-
-    return errors
+    return [_plan_error_message(error) for error in validate_plan(plan_data)]
+
+def validate_plan_file(plan_path: str) -> Tuple[int, List[str]]:
+    """
+    Validates the structure of a reasoning tree file without loading it whole.
+
+    The file (nested JSON, or JSON Lines as written by `plan_jsonl`) is
+    streamed step by step (`plan_jsonl.iter_plan`) and each step
+    is checked against its part of the plan schema, so memory stays bounded
+    however large the plan is. Messages match `validate_plan_structure`.
+
+    Returns:
+        (number of steps, list of error messages).
+
+    Raises:
+        FileNotFoundError, OSError: If the file cannot be read.
+        JsonParsingError: If the file is not valid JSON.
+    """
+    step_count = 0
+    errors: List[str] = []
+    try:
+        for phase, task, index, step in iter_plan(plan_path):
+            if index is None:
+                continue
+            step_count += 1
+            errors.extend(_plan_error_message(error) for error in validate_plan(step, at=(phase, task, index)))
+    except PlanValidationError as e:
+        # A phase or task container of the wrong type; the rest of the file is not read
+        errors.append(str(e))
+    return step_count, errors
+
+# Rough prompt-size estimate used to fit batches into the model's context
+_CHARS_PER_TOKEN = 4
+# Expected size of one step's answer in a batched response
+_TOKENS_PER_STEP_ANSWER = 250
+
+def _qa_max_concurrency(config: Dict[str, Any]) -> int:
+    """Returns how many QA requests may be in flight at the same time."""
+    return max(1, int(config.get('qa', {}).get('max_concurrency', 1)))
+
+def _needs_check(step: Step, result_key: str, retry_errors: bool) -> bool:
+    """Whether a QA check still has to run for a step."""
+    qa_info = step.qa_info or {}
+    if result_key in qa_info:
+        return False
+    return retry_errors or f"{result_key}_error" not in qa_info
+
+def _plan_batches(items: List[Step], batch_template: str,
+                  fixed_context: str, config: Dict[str, Any]) -> List[List[Step]]:
+    """
+    Greedily packs a task's steps into batches that fit the model's budget.
+
+    A batch closes when it reaches `qa.batch_size` steps, when its prompt would
+    exceed `qa.batch_context_tokens`, when the expected answers would exceed
+    `qa.batch_output_tokens`, or when a step key repeats (answers are keyed by step).
+    """
+    qa_config = config.get('qa', {})
+    max_steps = max(1, int(qa_config.get('batch_size', 1)))
+    if max_steps == 1:
+        return [[item] for item in items]
+
+    input_budget = int(qa_config.get('batch_context_tokens', 32000))
+    output_budget = int(qa_config.get('batch_output_tokens', 8192))
+    max_steps = min(max_steps, max(1, output_budget // _TOKENS_PER_STEP_ANSWER))
+    overhead = (len(batch_template) + len(fixed_context)) // _CHARS_PER_TOKEN
+
+    batches: List[List[Step]] = []
+    current: List[Step] = []
+    current_keys = set()
+    current_tokens = overhead
+    for step in items:
+        step_tokens = len(json.dumps({step.key: step.prompt}, indent=2)) // _CHARS_PER_TOKEN + 1
+        if current and (len(current) >= max_steps or step.key in current_keys
+                        or current_tokens + step_tokens > input_budget):
+            batches.append(current)
+            current, current_keys, current_tokens = [], set(), overhead
+        current.append(step)
+        current_keys.add(step.key)
+        current_tokens += step_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+async def _annotate_task_steps(items: List[Step],
+                               goal: str, phase: str, task: str, constitution_str: str,
+                               config: Dict[str, Any], call_with_retry,
+                               semaphore: asyncio.Semaphore,
+                               retry_errors: bool = False,
+                               on_progress: Optional[Callable[[List[Step]], None]] = None) -> None:
+    """
+    Runs resource analysis and alignment critique for the steps of one task.
+
+    `items` are the steps to analyze, each with a prompt. Steps are packed into batched requests (see `_plan_batches`) and each request is
+    sent under `semaphore`. Steps missing from, or malformed in, a batched
+    answer are re-analyzed with per-step calls. Results and errors are written
+    to each step's `qa_info`; checks that already have a result are skipped,
+    as are previously failed checks unless `retry_errors` is set.
+    `on_progress` is called with the items of each finished request.
+    """
+    async def run_single(check: Tuple[str, str, str, str], step: Step):
+        result_key, label, prompt_template, _ = check
+        error_key = f"{result_key}_error"
+        prompt_key, step_prompt = step.key, step.prompt
+        qa_info = step.annotations()
+        context = {
+            "goal": goal, "phase": phase, "task": task, "constitution": constitution_str,
+            "prompt_text": step_prompt,
+            "steps_json": json.dumps({prompt_key: step_prompt}, indent=2), # Analyze one step
+        }
+        try:
+            qa_info[result_key] = await call_with_retry(prompt_template, context, config, is_structured=True)
+            qa_info.pop(error_key, None)
+            logger.debug(f"        {label} complete for {prompt_key}.")
+        except ApiCallError as e:
+            # Log API errors but allow processing to continue for other steps
+            logger.error(f"        API call failed during {label.lower()} for step {prompt_key}: {e}", exc_info=True)
+            qa_info[error_key] = f"API Error: {e}"
+        except Exception as e:
+            logger.error(f"        Unexpected error during {label.lower()} for step {prompt_key}: {e}", exc_info=True)
+            qa_info[error_key] = f"Unexpected Error: {e}"
+
+    async def run_batch(check: Tuple[str, str, str, str], batch: List[Step]):
+        result_key, label, _, batch_template = check
+        unanswered = batch
+        async with semaphore:
+            if len(batch) > 1:
+                context = {
+                    "goal": goal, "phase": phase, "task": task, "constitution": constitution_str,
+                    "steps_json": json.dumps({step.key: step.prompt for step in batch}, indent=2),
+                }
+                try:
+                    response = await call_with_retry(batch_template, context, config, is_structured=True)
+                    unanswered = []
+                    for step in batch:
+                        answer = response.get(step.key) if isinstance(response, dict) else None
+                        if isinstance(answer, dict):
+                            qa_info = step.annotations()
+                            qa_info[result_key] = answer
+                            qa_info.pop(f"{result_key}_error", None)
+                        else:
+                            unanswered.append(step)
+                    if unanswered:
+                        logger.warning(f"        Batched {label.lower()} for Task '{task}' returned no usable answer for "
+                                       f"{len(unanswered)}/{len(batch)} steps; falling back to per-step calls.")
+                    else:
+                        logger.debug(f"        Batched {label.lower()} complete for {len(batch)} steps of Task '{task}'.")
+                except Exception as e:
+                    logger.warning(f"        Batched {label.lower()} failed for Task '{task}': {e}. Falling back to per-step calls.")
+
+            for step in unanswered:
+                await run_single(check, step)
+
+        if on_progress:
+            on_progress(batch)
+
+    fixed_context = goal + phase + task + constitution_str
+    requests = []
+    for check in _QA_CHECKS:
+        needing = [step for step in items if _needs_check(step, check[0], retry_errors)]
+        for batch in _plan_batches(needing, check[3], fixed_context, config):
+            requests.append(run_batch(check, batch))
+    with telemetry.tagged(role='qa_validator', level='step'):
+        await asyncio.gather(*requests)
 
 async def validate_steps(steps: List[Dict[str, Any]], goal: str, phase: str, task: str, config: Dict[str, Any], constitution: Dict[str, Any], provider: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Validates a list of steps for a given task.
+    Validates a list of steps for a given task and returns them annotated.
+
+    Steps are batched per `qa.batch_size` and requests run concurrently,
+    bounded by `qa.max_concurrency`.
     """
     logger.info(f"      Validating {len(steps)} steps for Task: {task}")
     _, _, call_with_retry = await select_llm_client(config, provider)
-    constitution_str = json.dumps(constitution, indent=2)
-
-    for step_obj in steps:
-        step_keys = list(step_obj.keys())
-        prompt_key = next((k for k in step_keys if k != 'qa_info'), None)
-        if not prompt_key:
-            continue
-        step_prompt = step_obj.get(prompt_key, "")
-        if not step_prompt:
-            continue
+    constitution_str = constitution_for_level(constitution, config, 'step')
 
-        if "qa_info" not in step_obj:
-            step_obj["qa_info"] = {}
+    task_model = Task.from_list(task, steps)
+    items = [step for step in task_model.steps if step.key and step.prompt]
+    await _annotate_task_steps(items, goal, phase, task, constitution_str, config, call_with_retry,
+                               asyncio.Semaphore(_qa_max_concurrency(config)), retry_errors=True)
 
-        # Resource Identification
-        if "resource_analysis" not in step_obj["qa_info"]:
-            try:
-                resource_context = {
-                    "goal": goal, "phase": phase, "task": task,
-                    "prompt_text": step_prompt, "constitution": constitution_str
-                }
-                resource_analysis = await call_with_retry(
-                    RESOURCE_IDENTIFICATION_PROMPT, resource_context, config, is_structured=True
-                )
-                step_obj["qa_info"]["resource_analysis"] = resource_analysis
-            except Exception as e:
-                logger.error(f"Error during resource analysis for step {prompt_key}: {e}", exc_info=True)
-                step_obj["qa_info"]["resource_analysis_error"] = str(e)
-
-        # Alignment/Clarity Check
-        if "step_critique" not in step_obj["qa_info"]:
-            try:
-                alignment_context = {
-                    "goal": goal, "phase": phase, "task": task,
-                    "steps_json": json.dumps({prompt_key: step_prompt}, indent=2),
-                    "constitution": constitution_str
-                }
-                alignment_critique = await call_with_retry(
-                    ALIGNMENT_CHECK_PROMPT, alignment_context, config, is_structured=True
-                )
-                step_obj["qa_info"]["step_critique"] = alignment_critique
-            except Exception as e:
-                logger.error(f"Error during step critique for step {prompt_key}: {e}", exc_info=True)
-                step_obj["qa_info"]["step_critique_error"] = str(e)
-    
-    return steps
+    return task_model.to_list()
 
 async def validate_tasks(tasks: List[str], goal: str, phase: str, config: Dict[str, Any], constitution: Dict[str, Any], provider: Optional[str] = None) -> List[str]:
     """
@@ -235,24 +427,31 @@ async def analyze_and_annotate_plan(plan_data: dict, goal: str, config: Dict[str
     """
     Uses an LLM to analyze alignment, identify resources, and annotate the plan.
 
-    Iterates through each step in the plan, calling the validation logic.
-    Adds the results (or error messages) under a 'qa_info' key within each step object.
+    Steps of a task are batched into shared requests (`qa.batch_size`) and
+    requests run concurrently, bounded by `qa.max_concurrency`; request pacing
+    is left to the per-provider rate limiters (see `rate_limiter`).
+    Adds the results (or error messages) under a 'qa_info' key within each
+    step object and returns the annotated plan. The plan is parsed into a
+    `plan_model.Plan` once, so per-step work reads prompts in O(1).
+
+    If the analysis fails, the exception raised carries the partially
+    annotated plan (as JSON) in its `partial_plan` attribute.
     
     Supports checkpoint and resume functionality if enabled.
     """
-    annotated_plan = plan_data # Modify in place
+    annotated_plan = plan_data
     
     # Initialize checkpoint manager and variables for tracking progress
-    checkpoint_manager = CheckpointManager()
+    checkpoint_manager = CheckpointManager(checkpoint_dir=config.get('checkpoint', {}).get('directory', 'checkpoints'),
+                                           compact_every=config.get('checkpoint', {}).get('compact_every', 200))
     checkpoint_path = ""
-    last_processed_phase = None
-    last_processed_task = None
-    last_processed_step_index = -1
     
     # Try to resume from checkpoint if enabled
     if resume and input_path and output_path:
         logger.info("Checking for existing QA checkpoints to resume from...")
-        checkpoint_data, checkpoint_path = checkpoint_manager.find_latest_qa_checkpoint(input_path)
+        # Reads from disk, so it runs off the event loop
+        checkpoint_data, checkpoint_path = await asyncio.to_thread(
+            checkpoint_manager.find_latest_qa_checkpoint, input_path)
         
         if checkpoint_data:
             # Resume from checkpoint
@@ -265,168 +464,83 @@ async def analyze_and_annotate_plan(plan_data: dict, goal: str, config: Dict[str
                 if saved_plan:
                     annotated_plan = saved_plan
                     logger.info("Restored annotated plan from checkpoint")
-                
-                # Restore progress tracking
-                last_processed_phase = checkpoint_data.get("last_phase")
-                last_processed_task = checkpoint_data.get("last_task")
-                last_processed_step_index = checkpoint_data.get("last_step_index", -1)
-                
-                if last_processed_phase and last_processed_task:
-                    logger.info(f"Will resume QA analysis from Phase: '{last_processed_phase}', "
-                               f"Task: '{last_processed_task}', Step index: {last_processed_step_index + 1}")
             else:
                 logger.warning("Found checkpoint is for a different output path, starting fresh")
                 
-    # Iterate through the plan phases, tasks, and steps
-    phase_names = list(annotated_plan.keys())
-    start_phase_idx = 0
-    
-    # Find the index of the last processed phase (if resuming)
-    if last_processed_phase in phase_names:
-        start_phase_idx = phase_names.index(last_processed_phase)
-        
-    # Iterate through phases
-    for phase_idx, phase_name in enumerate(phase_names[start_phase_idx:], start_phase_idx):
-        logger.info(f"  Analyzing Phase: {phase_name}")
-        tasks = annotated_plan[phase_name]
-        
-        # Get list of task names in this phase
-        task_names = list(tasks.keys())
-        start_task_idx = 0
-        
-        # If we're resuming in this phase, find the index of the last processed task
-        if phase_name == last_processed_phase and last_processed_task in task_names:
-            start_task_idx = task_names.index(last_processed_task)
-        
-        # Iterate through tasks
-        for task_idx, task_name in enumerate(task_names[start_task_idx:], start_task_idx):
-            logger.info(f"    Analyzing Task: {task_name}")
-            steps = tasks[task_name]
-            
-            if not steps:
-                logger.info("      Skipping task analysis (no steps).")
+    # Collect every step that still needs analysis, grouped by task. Completed
+    # checks are recorded in each step's qa_info, so resuming simply skips them.
+    plan = Plan.from_dict(annotated_plan)
+    pending_tasks = []
+    for task_model in plan.tasks():
+        task_name = task_model.name
+        if not task_model.steps:
+            logger.info(f"    Skipping analysis of Task '{task_name}' (no steps).")
+            continue
+        items = []
+        for step in task_model.steps:
+            if not step.key:
+                logger.warning(f"      Skipping analysis for step {step.index+1} in Task '{task_name}' - no prompt key found.")
                 continue
-            
-            # Determine the starting step index
-            start_step_idx = 0
-            if (phase_name == last_processed_phase and 
-                task_name == last_processed_task and 
-                last_processed_step_index >= 0):
-                start_step_idx = last_processed_step_index + 1  # Start from the next step
-                if start_step_idx >= len(steps):
-                    # All steps in this task were already processed
-                    logger.info(f"      All steps in task '{task_name}' already processed")
-                    continue
-
-            # --- Step-level Analysis ---
-            for step_idx in range(start_step_idx, len(steps)):
-                step_obj = steps[step_idx]
-                step_keys = list(step_obj.keys())
-                prompt_key = next((k for k in step_keys if k != 'qa_info'), None)
-
-                if not prompt_key:
-                    logger.warning(f"      Skipping analysis for step {step_idx+1} in Task '{task_name}' - no prompt key found.")
-                    continue
-
-                step_prompt = step_obj.get(prompt_key, "") # Use get for safety
-                if not step_prompt:
-                     logger.warning(f"      Skipping analysis for step {prompt_key} in Task '{task_name}' - empty prompt.")
-                     continue
-
-                logger.info(f"      Analyzing Step: {prompt_key}")
-
-                # Initialize QA info for the step if not present
-                if "qa_info" not in step_obj:
-                    step_obj["qa_info"] = {}
-
-                # Select the appropriate LLM client
-                _, _, call_with_retry = await select_llm_client(config, provider)
-                
-                # 1. Resource/Action Identification (skip if already done)
-                if "resource_analysis" not in step_obj["qa_info"] and "resource_analysis_error" not in step_obj["qa_info"]:
-                    try:
-                        constitution_str = json.dumps(constitution, indent=2)
-                        resource_context = {
-                            "goal": goal,
-                            "phase": phase_name,
-                            "task": task_name,
-                            "prompt_text": step_prompt,
-                            "constitution": constitution_str
-                        }
-                        # Pass config to retry function
-                        resource_analysis = await call_with_retry(
-                            RESOURCE_IDENTIFICATION_PROMPT, resource_context, config, is_structured=True
-                        )
-                        step_obj["qa_info"]["resource_analysis"] = resource_analysis
-                        logger.debug(f"        Resource analysis complete for {prompt_key}.")
-                    except ApiCallError as e:
-                        # Log API errors but allow processing to continue for other steps
-                        logger.error(f"        API call failed during resource analysis for step {prompt_key}: {e}", exc_info=True)
-                        step_obj["qa_info"]["resource_analysis_error"] = f"API Error: {e}"
-                    except Exception as e:
-                        # Catch other unexpected errors during this step's analysis
-                        logger.error(f"        Unexpected error during resource analysis for step {prompt_key}: {e}", exc_info=True)
-                        step_obj["qa_info"]["resource_analysis_error"] = f"Unexpected Error: {e}"
-
-                    # Save checkpoint after each resource analysis
-                    if input_path and output_path:
-                        checkpoint_path = checkpoint_manager.save_qa_checkpoint(
-                            input_path=input_path,
-                            output_path=output_path,
-                            validated_data=annotated_plan,
-                            last_phase=phase_name,
-                            last_task=task_name,
-                            last_step_index=step_idx
-                        )
-
-                # 2. Alignment/Clarity Check (Individual Step) (skip if already done)
-                if "step_critique" not in step_obj["qa_info"] and "step_critique_error" not in step_obj["qa_info"]:
-                    try:
-                        constitution_str = json.dumps(constitution, indent=2)
-                        alignment_context = {
-                            "goal": goal,
-                            "phase": phase_name,
-                            "task": task_name,
-                            "steps_json": json.dumps({prompt_key: step_prompt}, indent=2), # Analyze one step
-                            "constitution": constitution_str
-                        }
-                         # Pass config to retry function
-                        alignment_critique = await call_with_retry(
-                            ALIGNMENT_CHECK_PROMPT, alignment_context, config, is_structured=True
-                        )
-                        step_obj["qa_info"]["step_critique"] = alignment_critique
-                        logger.debug(f"        Step critique complete for {prompt_key}.")
-                    except ApiCallError as e:
-                        logger.error(f"        API call failed during step critique for step {prompt_key}: {e}", exc_info=True)
-                        step_obj["qa_info"]["step_critique_error"] = f"API Error: {e}"
-                    except Exception as e:
-                        logger.error(f"        Unexpected error during step critique for step {prompt_key}: {e}", exc_info=True)
-                        step_obj["qa_info"]["step_critique_error"] = f"Unexpected Error: {e}"
-
-                    # Save checkpoint after each step critique
-                    if input_path and output_path:
-                        checkpoint_path = checkpoint_manager.save_qa_checkpoint(
-                            input_path=input_path,
-                            output_path=output_path,
-                            validated_data=annotated_plan,
-                            last_phase=phase_name,
-                            last_task=task_name,
-                            last_step_index=step_idx
-                        )
-
-                # Update the last processed step index
-                last_processed_step_index = step_idx
-                
-                # Add a small delay to avoid hitting API rate limits too quickly
-                # Consider making this delay configurable
-                api_delay = config.get('api', {}).get('delay_between_qa_calls_sec', 1)
-                await asyncio.sleep(api_delay)
-                
+            if not step.prompt:
+                logger.warning(f"      Skipping analysis for step {step.key} in Task '{task_name}' - empty prompt.")
+                continue
+            if any(_needs_check(step, check[0], retry_errors=False) for check in _QA_CHECKS):
+                items.append(step)
+        if items:
+            pending_tasks.append((task_model.phase.name, task_name, items))
+
+    try:
+        max_concurrency = _qa_max_concurrency(config)
+        logger.info(f"  Analyzing {sum(len(items) for _, _, items in pending_tasks)} steps in {len(pending_tasks)} tasks "
+                    f"(up to {max_concurrency} concurrent requests)")
+
+        _, _, call_with_retry = await select_llm_client(config, provider)
+        constitution_str = constitution_for_level(constitution, config, 'step')
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        def save_snapshot() -> str:
+            return checkpoint_manager.save_qa_checkpoint(
+                input_path=input_path,
+                output_path=output_path,
+                validated_data=plan.to_dict()
+            )
+
+        # Write one full snapshot; progress below is appended to it as small deltas
+        if input_path and output_path and pending_tasks:
+            checkpoint_path = save_snapshot()
+
+        async def analyze_task(phase_name: str, task_name: str, items: List[Step]):
+            def save_progress(batch: List[Step]):
+                nonlocal checkpoint_path
+                # Save checkpoint after each completed request
+                if input_path and output_path:
+                    updates = [
+                        ("set", ["validated_data", phase_name, task_name, step.index, "qa_info"], step.qa_info or {})
+                        for step in batch
+                    ]
+                    updates += [
+                        ("set", ["last_phase"], phase_name),
+                        ("set", ["last_task"], task_name),
+                        ("set", ["last_step_index"], max(step.index for step in batch)),
+                    ]
+                    checkpoint_path = checkpoint_manager.record_qa_progress(input_path, updates) or save_snapshot()
+
+            logger.info(f"    Analyzing Task: {task_name} ({len(items)} steps, Phase: '{phase_name}')")
+            await _annotate_task_steps(items, goal, phase_name, task_name, constitution_str, config,
+                                       call_with_retry, semaphore, on_progress=save_progress)
+
+        await asyncio.gather(*(analyze_task(*pending) for pending in pending_tasks))
+    except Exception as e:
+        # Annotations live on the plan model, not in `plan_data`; hand the progress
+        # made so far to the caller so it can still be saved
+        e.partial_plan = plan.to_dict()
+        raise
+
     # Delete the checkpoint since we completed successfully
     if checkpoint_path:
         checkpoint_manager.delete_checkpoint(checkpoint_path)
 
-    return annotated_plan
+    return plan.to_dict()
 
 
 # --- Main Execution ---
@@ -439,9 +553,14 @@ async def run_validation(input_path: str, output_path: str, config: Dict[str, An
     original goal, analyzes and annotates the plan using Gemini, and saves
     the annotated result to `output_path`.
 
+    Either path may be a `.jsonl` file in the `plan_jsonl` format, e.g. one
+    shard of a larger plan. A JSON Lines output keeps the positions and shard
+    number recorded in a JSON Lines input, so validated shards can be merged back with
+    `plan_jsonl.import_plan_files`.
+
     Args:
-        input_path: Absolute path to the input plan JSON file.
-        output_path: Absolute path to save the validated/annotated plan JSON file.
+        input_path: Absolute path to the input plan JSON (or JSON Lines) file.
+        output_path: Absolute path to save the validated/annotated plan JSON (or JSON Lines) file.
         config: The application configuration dictionary.
         resume: Whether to attempt to resume from a checkpoint if available.
 
@@ -459,14 +578,19 @@ async def run_validation(input_path: str, output_path: str, config: Dict[str, An
     logger.info(f"Starting QA validation process for: {input_path}")
 
     # Initialize checkpoint manager
-    checkpoint_manager = CheckpointManager()
+    checkpoint_manager = CheckpointManager(checkpoint_dir=config.get('checkpoint', {}).get('directory', 'checkpoints'))
     checkpoint_path = ""
 
     # 1. Load Plan
     try:
         logger.info(f"Loading plan from: {input_path}")
-        with open(input_path, 'r', encoding='utf-8') as f:
-            plan_data = json.load(f)
+        layout, shard = None, None
+        if is_jsonl(input_path):
+            plan_data, layout = load_jsonl([input_path])
+            shard = shard_of(input_path)
+        else:
+            with open(input_path, 'r', encoding='utf-8') as f:
+                plan_data = json.load(f)
         logger.info("Plan loaded successfully.")
     except FileNotFoundError: # Built-in
         logger.error(f"Input plan file '{input_path}' not found.")
@@ -550,14 +674,17 @@ async def run_validation(input_path: str, output_path: str, config: Dict[str, An
         # Decide whether to raise or just log and save partially annotated plan
         # For now, let's log and continue to save what we have
         logger.warning("Saving potentially partially annotated plan due to analysis error.")
-        annotated_plan = plan_data # Use potentially partially modified data
+        annotated_plan = getattr(e, 'partial_plan', plan_data) # Annotations made before the error
 
 
     # 5. Save Validated Plan
     try:
         logger.info(f"Saving validated plan to: {output_path}")
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(annotated_plan, f, indent=2, ensure_ascii=False)
+        if is_jsonl(output_path):
+            save_jsonl(output_path, annotated_plan, layout, shard)
+        else:
+            # Written step by step to a temporary file that replaces the output once complete
+            write_tree(output_path, tree_items(annotated_plan))
         logger.info("Validated plan saved successfully.")
         
         # Delete checkpoint since we completed successfully
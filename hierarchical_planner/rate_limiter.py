@@ -0,0 +1,120 @@
+"""
+Adaptive token-bucket rate limiting for LLM provider calls.
+
+Each provider gets one shared limiter, configured under `rate_limits.<provider>`.
+Every API attempt takes a token before it is sent. When a provider answers
+with a rate-limit error (429, quota exhausted, ...) the limiter halves its
+refill rate and pauses all callers for a short cooldown. Successful calls
+then restore the configured rate step by step.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket that paces callers of a single provider.
+
+    Tokens are reserved synchronously, so concurrent coroutines on one event
+    loop never need a lock. A reservation may drive the bucket negative; the
+    caller then sleeps until its share of the debt has been refilled.
+    """
+
+    def __init__(self, requests_per_sec: float, burst: int = 1, min_requests_per_sec: float = 0.05,
+                 backoff_factor: float = 0.5, recovery_step: float = 0.1, cooldown_sec: float = 2.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_sec: Steady-state refill rate (the configured ceiling).
+            burst: Maximum number of tokens that can accumulate while idle.
+            min_requests_per_sec: Lower bound for the rate after repeated backoffs.
+            backoff_factor: Multiplier applied to the rate on each rate-limit error.
+            recovery_step: Fraction of the configured rate restored per successful call.
+            cooldown_sec: Pause imposed on all callers after a rate-limit error.
+        """
+        if requests_per_sec <= 0:
+            raise ValueError("requests_per_sec must be positive")
+        self.max_rate = float(requests_per_sec)
+        self.rate = self.max_rate
+        self.burst = max(1, int(burst))
+        self.min_rate = min(float(min_requests_per_sec), self.max_rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.cooldown_sec = cooldown_sec
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def reserve(self) -> float:
+        """Takes one token and returns how many seconds the caller must wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens -= 1
+        debt_wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        cooldown_wait = max(0.0, self._blocked_until - now)
+        return max(debt_wait, cooldown_wait)
+
+    async def acquire(self) -> None:
+        """Waits until a request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            logger.debug(f"Rate limiter pacing request for {wait:.2f}s (rate={self.rate:.2f}/s)")
+            await asyncio.sleep(wait)
+
+    def on_rate_limited(self) -> None:
+        """Backs off after the provider reported a rate-limit error."""
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self._tokens = min(self._tokens, 0.0)
+        self._blocked_until = max(self._blocked_until, now + self.cooldown_sec)
+        logger.warning(f"Rate limit hit; reducing request rate to {self.rate:.2f}/s")
+
+    def on_success(self) -> None:
+        """Gradually restores the configured rate after successful calls."""
+        if self.rate < self.max_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery_step)
+
+
+_limiters: Dict[str, Tuple[Tuple, TokenBucketLimiter]] = {}
+
+
+def get_rate_limiter(config: Dict[str, Any], provider: str) -> Optional[TokenBucketLimiter]:
+    """
+    Returns the shared limiter for a provider, or None if none is configured.
+
+    Limiters are cached per provider and rebuilt only when their settings change,
+    so backoff state is shared by every call to the same provider.
+    """
+    settings = (config.get('rate_limits') or {}).get(provider)
+    if not settings or not settings.get('requests_per_sec'):
+        return None
+
+    key = (
+        float(settings['requests_per_sec']),
+        int(settings.get('burst', 1)),
+        float(settings.get('min_requests_per_sec', 0.05)),
+        float(settings.get('backoff_factor', 0.5)),
+        float(settings.get('recovery_step', 0.1)),
+        float(settings.get('cooldown_sec', 2.0)),
+    )
+    cached = _limiters.get(provider)
+    if cached is None or cached[0] != key:
+        limiter = TokenBucketLimiter(*key)
+        _limiters[provider] = (key, limiter)
+        logger.info(f"Rate limiter for {provider}: {key[0]} requests/sec, burst {key[1]}")
+        return limiter
+    return cached[1]
@@ -0,0 +1,118 @@
+"""
+Single-flight coalescing of identical in-flight LLM requests.
+
+When several coroutines send the same prompt to the same model at the same
+time, only the first (the leader) reaches the provider; the others await
+its result. The request runs in its own task, so cancelling one caller
+never cancels it for the rest. It is cancelled only once every caller has
+gone. Followers receive a deep copy of the result (or the same exception),
+so callers that annotate responses in place do not share state.
+
+This only merges calls that overlap in time; repeated calls later on are
+the response cache's job (see `llm_cache`). Coalescing is switched by
+`coalesce.enabled` in the config.
+"""
+import asyncio
+import copy
+import logging
+from typing import Dict, Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from .prompt_renderer import render_prompt
+from . import telemetry
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-flight request and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one request per key at a time and shares its outcome with concurrent callers."""
+
+    def __init__(self):
+        # (event loop, key) -> in-flight request; tasks cannot be awaited from another loop
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _Flight] = {}
+
+    def in_flight(self) -> int:
+        """Returns the number of requests currently running."""
+        return len(self._flights)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Awaits the request for `key`, starting it with `factory()` if none is running.
+
+        Returns:
+            (result, shared): `shared` is True if another caller's request was joined;
+            the result is then a deep copy of that caller's result.
+        """
+        flight_key = (asyncio.get_running_loop(), key)
+        flight = self._flights.get(flight_key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[flight_key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(flight_key, flight))
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller was cancelled; nobody needs the result any more
+                flight.task.cancel()
+        return (copy.deepcopy(result) if shared else result), shared
+
+    def _forget(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], flight: _Flight) -> None:
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        if not flight.task.cancelled() and flight.task.exception() is not None and flight.waiters == 0:
+            # Nobody is left to receive the error; retrieve it so it is not reported as unhandled
+            logger.debug(f"Coalesced request failed after all callers left: {flight.task.exception()}")
+
+
+_group = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    """Returns the process-wide single-flight group shared by all provider calls."""
+    return _group
+
+
+def coalescing_enabled(config: Dict[str, Any]) -> bool:
+    """True unless `coalesce.enabled` is switched off."""
+    return bool((config.get('coalesce') or {}).get('enabled', True))
+
+
+def coalesce_calls(provider: str, call_with_retry: Callable,
+                   model_settings: Callable[[Dict[str, Any]], Tuple[Optional[str], Optional[float]]]) -> Callable:
+    """
+    Wraps a provider's call_with_retry so identical concurrent calls share one request.
+
+    Args:
+        provider: Provider name, part of the request identity.
+        call_with_retry: The call to wrap.
+        model_settings: Returns the (model_name, temperature) a config sends
+                        requests with; calls differing in either are not merged.
+    """
+    async def coalesced_call_with_retry(prompt_template: str, context: dict, config: Dict[str, Any], is_structured: bool = True):
+        if not coalescing_enabled(config):
+            return await call_with_retry(prompt_template, context, config, is_structured=is_structured)
+
+        model_name, temperature = model_settings(config)
+        key = (provider, model_name, temperature, is_structured, render_prompt(prompt_template, context))
+        result, shared = await _group.run(
+            key, lambda: call_with_retry(prompt_template, context, config, is_structured=is_structured))
+        if shared:
+            logger.debug(f"Joined an identical in-flight {provider} request.")
+            telemetry.note_coalesced()
+        return result
+
+    coalesced_call_with_retry.__wrapped__ = call_with_retry
+    return coalesced_call_with_retry
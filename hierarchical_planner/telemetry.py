@@ -0,0 +1,334 @@
+"""
+Per-call telemetry for LLM provider calls.
+
+Every call made through `llm_client_selector` is measured: latency, attempts
+(and so retries), prompt/completion tokens, response-cache hits, calls that
+joined an identical in-flight request, fallback to another provider, errors
+and estimated cost. Calls are tagged with the agent
+role (`founding_architect`, `planner`, `qa_validator`, ...) and plan level
+(`constitution`, `phase`, `task`, `step`) active where they were made:
+
+    with telemetry.tagged(role='planner', level='task'):
+        response = await call_with_retry(...)
+
+Tags live in context variables, so they follow a call into the tasks it
+creates. Provider clients report details of the call in progress with
+`note_attempt`, `note_usage` and `note_fallback`; when a provider reports no
+token usage, tokens are estimated from the text length.
+
+Metrics are aggregated in memory per (provider, model, role, level) and
+written at the end of a run as JSON and/or Prometheus text exposition
+format (see the `telemetry` config section).
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; a final +Inf bucket is implied
+LATENCY_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Rough characters-per-token ratio used when a provider reports no usage
+_CHARS_PER_TOKEN = 4
+
+_tags: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar('telemetry_tags', default={})
+_current_call: contextvars.ContextVar[Optional['CallRecord']] = contextvars.ContextVar('telemetry_call', default=None)
+
+
+@contextlib.contextmanager
+def tagged(**tags: str) -> Iterator[None]:
+    """Tags every call made inside the block (merged over any enclosing tags)."""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags() -> Dict[str, str]:
+    """Returns the tags active in the current context."""
+    return dict(_tags.get())
+
+
+class CallRecord:
+    """Measurements of one logical provider call (all of its attempts)."""
+
+    def __init__(self, provider: str, model: Optional[str], prompt: str):
+        self.provider = provider
+        self.model = model or "unknown"
+        self.prompt = prompt
+        self.tags = current_tags()
+        self.started = time.perf_counter()
+        self.attempts = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.usage_reported = False
+        self.cache_hit = False
+        self.coalesced = False
+        self.fallback: Optional[str] = None
+
+
+def note_attempt() -> None:
+    """Records one attempt (the first, or a retry) of the call in progress."""
+    call = _current_call.get()
+    if call is not None:
+        call.attempts += 1
+
+
+def note_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int],
+               cached_prompt_tokens: Optional[int] = None) -> None:
+    """
+    Adds token usage reported by a provider response to the call in progress.
+
+    `cached_prompt_tokens` are prompt tokens read from the provider's prompt
+    cache, not included in `prompt_tokens` and priced at the cached input rate.
+    """
+    call = _current_call.get()
+    counts = [n if isinstance(n, int) else 0 for n in (prompt_tokens, completion_tokens, cached_prompt_tokens)]
+    if call is not None and any(counts):
+        call.prompt_tokens += counts[0]
+        call.completion_tokens += counts[1]
+        call.cached_prompt_tokens += counts[2]
+        call.usage_reported = True
+
+
+def note_fallback(provider: str, model: Optional[str] = None) -> None:
+    """Records that the call in progress was answered by a fallback provider."""
+    call = _current_call.get()
+    if call is not None:
+        call.fallback = provider
+        if model:
+            call.model = model
+
+
+def note_cache_hit() -> None:
+    """Records that the call in progress was served from the response cache."""
+    call = _current_call.get()
+    if call is not None:
+        call.cache_hit = True
+
+
+def note_coalesced() -> None:
+    """Records that the call in progress shared the result of an identical in-flight call."""
+    call = _current_call.get()
+    if call is not None:
+        call.coalesced = True
+
+
+def _estimate_tokens(value: Any) -> int:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return max(1, len(text) // _CHARS_PER_TOKEN)
+
+
+def _new_series() -> Dict[str, Any]:
+    return {
+        'calls': 0, 'errors': 0, 'cache_hits': 0, 'coalesced': 0, 'fallbacks': 0,
+        'attempts': 0, 'retries': 0,
+        'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0, 'estimated_token_calls': 0,
+        'cost_usd': 0.0,
+        'latency_sum_sec': 0.0, 'latency_max_sec': 0.0,
+        'latency_buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+def _is_free(call: CallRecord) -> bool:
+    """Cache hits and coalesced calls send nothing to the provider themselves."""
+    return call.cache_hit or call.coalesced
+
+
+class MetricsRegistry:
+    """Thread-safe aggregation of call records per (provider, model, role, level)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def observe(self, call: CallRecord, latency: float, error: bool, cost: float) -> None:
+        key = (call.provider, call.model, call.tags.get('role', 'unknown'), call.tags.get('level', 'unknown'))
+        with self._lock:
+            series = self._series.setdefault(key, _new_series())
+            series['calls'] += 1
+            series['errors'] += int(error)
+            series['cache_hits'] += int(call.cache_hit)
+            series['coalesced'] += int(call.coalesced)
+            series['fallbacks'] += int(call.fallback is not None)
+            series['attempts'] += call.attempts
+            series['retries'] += max(0, call.attempts - 1)
+            series['prompt_tokens'] += call.prompt_tokens
+            series['cached_prompt_tokens'] += call.cached_prompt_tokens
+            series['completion_tokens'] += call.completion_tokens
+            series['estimated_token_calls'] += int(not call.usage_reported and not _is_free(call))
+            series['cost_usd'] += cost
+            series['latency_sum_sec'] += latency
+            series['latency_max_sec'] = max(series['latency_max_sec'], latency)
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+            series['latency_buckets'][bucket] += 1
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Returns one dict per series, with its labels and a copy of its counters."""
+        with self._lock:
+            return [
+                {'provider': p, 'model': m, 'role': r, 'level': l,
+                 **{k: (list(v) if isinstance(v, list) else v) for k, v in series.items()}}
+                for (p, m, r, l), series in sorted(self._series.items())
+            ]
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    return _registry
+
+
+def estimate_cost(config: Dict[str, Any], model: str, prompt_tokens: int, completion_tokens: int,
+                  cached_prompt_tokens: int = 0) -> float:
+    """
+    Returns the estimated cost in USD of a call from `telemetry.pricing`.
+
+    Pricing entries are keyed by model name or model-name prefix (the longest
+    matching prefix wins) and give `input_per_mtok` / `output_per_mtok` in USD
+    per million tokens, and optionally `cached_input_per_mtok` for prompt-cache
+    reads (default: a tenth of the input rate). Unknown models cost 0.
+    """
+    pricing = (config.get('telemetry') or {}).get('pricing') or {}
+    matches = [name for name in pricing if model == name or model.startswith(name)]
+    if not matches:
+        return 0.0
+    rates = pricing[max(matches, key=len)] or {}
+    input_rate = float(rates.get('input_per_mtok', 0.0))
+    return (prompt_tokens * input_rate
+            + cached_prompt_tokens * float(rates.get('cached_input_per_mtok', input_rate / 10))
+            + completion_tokens * float(rates.get('output_per_mtok', 0.0))) / 1_000_000
+
+
+def telemetry_enabled(config: Dict[str, Any]) -> bool:
+    """True unless `telemetry.enabled` is switched off."""
+    return bool((config.get('telemetry') or {}).get('enabled', True))
+
+
+def start_call(provider: str, model: Optional[str], prompt: str, bind: bool = True) -> Tuple[CallRecord, Optional[contextvars.Token]]:
+    """
+    Begins measuring a call.
+
+    With `bind`, provider notes made in this context until `finish_call` are
+    attributed to the call. Async generators, which may be finalized in
+    another context, pass bind=False and record their details directly.
+    """
+    call = CallRecord(provider, model, prompt)
+    return call, (_current_call.set(call) if bind else None)
+
+
+def finish_call(config: Dict[str, Any], call: CallRecord, token: Optional[contextvars.Token],
+                response: Any = None, error: bool = False) -> None:
+    """Completes a call started with `start_call` and adds it to the registry."""
+    latency = time.perf_counter() - call.started
+    if token is not None:
+        _current_call.reset(token)
+    if not call.usage_reported and not _is_free(call):
+        call.prompt_tokens = _estimate_tokens(call.prompt)
+        call.completion_tokens = _estimate_tokens(response) if response is not None else 0
+    cost = 0.0 if _is_free(call) else estimate_cost(config, call.model, call.prompt_tokens, call.completion_tokens,
+                                                     call.cached_prompt_tokens)
+    _registry.observe(call, latency, error, cost)
+
+
+def abandon_call(token: Optional[contextvars.Token]) -> None:
+    """Stops attributing notes to a call that was cancelled; it is not recorded."""
+    if token is not None:
+        _current_call.reset(token)
+
+
+def _totals(series: List[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = ('calls', 'errors', 'cache_hits', 'coalesced', 'fallbacks', 'retries', 'prompt_tokens', 'cached_prompt_tokens',
+            'completion_tokens', 'cost_usd', 'latency_sum_sec')
+    return {key: sum(s[key] for s in series) for key in keys}
+
+
+def render_json(series: List[Dict[str, Any]]) -> str:
+    """Renders a registry snapshot as a JSON document with per-series and total figures."""
+    return json.dumps({
+        'latency_buckets_sec': list(LATENCY_BUCKETS) + ['+Inf'],
+        'totals': _totals(series),
+        'series': series,
+    }, indent=2)
+
+
+def _labels(s: Dict[str, Any], **extra: str) -> str:
+    labels = {'provider': s['provider'], 'model': s['model'], 'role': s['role'], 'level': s['level'], **extra}
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def render_prometheus(series: List[Dict[str, Any]]) -> str:
+    """Renders a registry snapshot in the Prometheus text exposition format."""
+    counters = (
+        ('llm_calls_total', 'calls', 'LLM calls made.'),
+        ('llm_call_errors_total', 'errors', 'LLM calls that failed after all retries.'),
+        ('llm_cache_hits_total', 'cache_hits', 'LLM calls answered from the response cache.'),
+        ('llm_coalesced_calls_total', 'coalesced', 'LLM calls that shared an identical in-flight request.'),
+        ('llm_fallbacks_total', 'fallbacks', 'LLM calls answered by a fallback provider.'),
+        ('llm_retries_total', 'retries', 'Retried LLM call attempts.'),
+        ('llm_prompt_tokens_total', 'prompt_tokens', 'Prompt tokens sent (estimated where not reported).'),
+        ('llm_cached_prompt_tokens_total', 'cached_prompt_tokens', 'Prompt tokens read from provider prompt caches.'),
+        ('llm_completion_tokens_total', 'completion_tokens', 'Completion tokens received (estimated where not reported).'),
+        ('llm_cost_usd_total', 'cost_usd', 'Estimated LLM cost in USD.'),
+    )
+    lines: List[str] = []
+    for name, key, help_text in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f"{name}{_labels(s)} {s[key]}" for s in series]
+    name = 'llm_call_latency_seconds'
+    lines += [f"# HELP {name} End-to-end LLM call latency including retries.", f"# TYPE {name} histogram"]
+    for s in series:
+        cumulative = 0
+        for bound, count in zip(list(LATENCY_BUCKETS) + ['+Inf'], s['latency_buckets']):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(s, le=str(bound))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(s)} {s['latency_sum_sec']}")
+        lines.append(f"{name}_count{_labels(s)} {s['calls']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(config: Dict[str, Any]) -> List[str]:
+    """
+    Writes the collected metrics to the files named in the `telemetry` config section.
+
+    Returns:
+        The paths written. Write failures are logged, not raised, so a run's
+        result never depends on its metrics being saved.
+    """
+    settings = config.get('telemetry') or {}
+    series = _registry.snapshot()
+    if not telemetry_enabled(config) or not series:
+        return []
+    written = []
+    for key, render in (('json_file', render_json), ('prometheus_file', render_prometheus)):
+        path = settings.get(key)
+        if not path:
+            continue
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(render(series))
+            written.append(path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {path}: {e}")
+    totals = _totals(series)
+    logger.info(f"LLM calls: {totals['calls']} ({totals['errors']} failed, {totals['cache_hits']} cached, {totals['coalesced']} coalesced, "
+                f"{totals['retries']} retries), tokens: {totals['prompt_tokens']} in / "
+                f"{totals['completion_tokens']} out, estimated cost: ${totals['cost_usd']:.4f}")
+    return written
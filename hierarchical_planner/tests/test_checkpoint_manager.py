@@ -0,0 +1,350 @@
+import pytest
+import json
+import os
+import threading
+import time
+
+# Module to test
+from ..checkpoint_manager import CheckpointManager
+from ..checkpoint_journal import CheckpointJournal, apply_update
+from .. import checkpoint_writer
+from .. import checkpoint_index
+from ..checkpoint_index import checkpoint_id
+from ..checkpoint_writer import CheckpointWriter
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def manager(tmp_path):
+    """Provides a checkpoint manager writing to a temporary directory."""
+    manager = CheckpointManager(checkpoint_dir=str(tmp_path / "checkpoints"), compact_every=100)
+    yield manager
+    manager.flush()
+
+# --- Test Cases ---
+
+def test_apply_update_set_and_append():
+    """Deltas create missing dicts, replace values and append to lists."""
+    state = {"tree": {"P1": {"T1": [{"step 1": "a"}]}}}
+    apply_update(state, "set", ["tree", "P2"], {"T2": []})
+    apply_update(state, "set", ["tree", "P1", "T1", 0, "qa_info"], {"ok": True})
+    apply_update(state, "append", ["done", "P1"], "T1")
+    assert state == {
+        "tree": {"P1": {"T1": [{"step 1": "a", "qa_info": {"ok": True}}]}, "P2": {"T2": []}},
+        "done": {"P1": ["T1"]},
+    }
+    with pytest.raises(ValueError):
+        apply_update(state, "delete", ["tree"], None)
+
+def test_generation_journal_replays_to_exact_tree(manager, tmp_path):
+    """Snapshot plus deltas reload as the same tree a full save would have written."""
+    tree = {"Phase A": {}, "Phase B": {}}
+    path = manager.save_generation_checkpoint(goal="Build it", current_state=tree, completed_tasks={})
+    manager.record_generation_progress("Build it", [
+        ("set", ["reasoning_tree", "Phase A"], {"T1": [], "T2": []}),
+        ("set", ["completed_tasks", "Phase A"], []),
+    ])
+    manager.record_generation_progress("Build it", [
+        ("set", ["reasoning_tree", "Phase A", "T2"], [{"step 1": "x"}]),
+        ("append", ["completed_tasks", "Phase A"], "T2"),
+    ])
+
+    reloaded, found_path = CheckpointManager(checkpoint_dir=manager.checkpoint_dir).find_latest_generation_checkpoint("Build it")
+
+    assert found_path == path
+    assert reloaded["reasoning_tree"] == {"Phase A": {"T1": [], "T2": [{"step 1": "x"}]}, "Phase B": {}}
+    assert list(reloaded["reasoning_tree"]["Phase A"]) == ["T1", "T2"]
+    assert reloaded["completed_tasks"] == {"Phase A": ["T2"]}
+    assert reloaded["goal"] == "Build it"
+
+def test_recording_appends_small_records(manager):
+    """Each recorded unit adds one line whose size does not depend on the tree size."""
+    big_tree = {f"Phase {i}": {f"Task {j}": [{"step 1": "x" * 100}] for j in range(20)} for i in range(20)}
+    path = manager.save_generation_checkpoint(goal="Big", current_state=big_tree, completed_tasks={})
+
+    manager.flush()
+    snapshot_size = os.path.getsize(path)
+    manager.record_generation_progress("Big", [("append", ["completed_tasks", "Phase 0"], "Task 0")])
+    manager.flush()
+
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    assert len(lines) == 2
+    assert os.path.getsize(path) - snapshot_size < 200
+
+def test_journal_compacts_periodically(tmp_path):
+    """After compact_every deltas the journal is rewritten as a single snapshot."""
+    journal = CheckpointJournal(str(tmp_path / "j.journal.jsonl"), compact_every=3)
+    journal.snapshot({"items": []})
+    for i in range(3):
+        journal.append([("append", ["items"], i)])
+
+    with open(journal.path, encoding='utf-8') as f:
+        lines = f.readlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["state"]["items"] == [0, 1, 2]
+
+def test_torn_trailing_record_is_ignored(tmp_path):
+    """A partial last line from a crash is dropped and the journal stays appendable."""
+    journal = CheckpointJournal(str(tmp_path / "j.journal.jsonl"))
+    journal.snapshot({"items": []})
+    journal.append([("append", ["items"], 1)])
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "append", "path": ["ite')
+
+    reopened = CheckpointJournal(journal.path)
+    assert reopened.load()["items"] == [1]
+    reopened.append([("append", ["items"], 2)])
+    assert CheckpointJournal(journal.path).load()["items"] == [1, 2]
+
+def test_record_without_snapshot_fails_softly(manager):
+    """Recording progress with no snapshot returns an empty path instead of raising."""
+    assert manager.record_generation_progress("Unknown goal", [("set", ["x"], 1)]) == ""
+
+def test_legacy_checkpoint_is_still_found(manager):
+    """Full-tree .checkpoint.json files from earlier versions are loaded on resume."""
+    legacy_path = os.path.join(manager.checkpoint_dir, "gen_Old_goal.checkpoint.json")
+    with open(legacy_path, 'w', encoding='utf-8') as f:
+        json.dump({"goal": "Old goal", "reasoning_tree": {"P": {}}}, f)
+
+    data, path = manager.find_latest_generation_checkpoint("Old goal", {"x": 1})
+    assert path == legacy_path
+    assert data["reasoning_tree"] == {"P": {}}
+
+    # The first snapshot replaces the legacy file with a journal, even under a constitution
+    new_path = manager.save_generation_checkpoint(goal="Old goal", current_state={"P": {}}, constitution={"x": 1})
+    manager.flush()
+    assert new_path.endswith(".journal.jsonl")
+    assert not os.path.exists(legacy_path)
+
+def test_qa_progress_round_trip(manager):
+    """QA deltas attach qa_info to individual steps of the validated plan."""
+    plan = {"P": {"T": [{"step 1": "a"}, {"step 2": "b"}]}}
+    manager.save_qa_checkpoint(input_path="/x/plan.json", output_path="/x/out.json", validated_data=plan)
+    manager.record_qa_progress("/x/plan.json", [
+        ("set", ["validated_data", "P", "T", 1, "qa_info"], {"step_critique": {"ok": True}}),
+        ("set", ["last_step_index"], 1),
+    ])
+
+    data, _ = CheckpointManager(checkpoint_dir=manager.checkpoint_dir).find_latest_qa_checkpoint("/x/plan.json")
+    assert data["validated_data"]["P"]["T"][1]["qa_info"] == {"step_critique": {"ok": True}}
+    assert "qa_info" not in data["validated_data"]["P"]["T"][0]
+    assert data["last_step_index"] == 1
+    assert data["output_path"] == "/x/out.json"
+
+def test_writer_coalesces_and_survives_failed_snapshot(tmp_path, mocker):
+    """Queued snapshots collapse to the newest one; a failed write keeps the last good file."""
+    writer = CheckpointWriter()
+    path = str(tmp_path / "c.journal.jsonl")
+    gate = threading.Event()
+    real_atomic_write = checkpoint_writer.atomic_write
+    writes = []
+
+    def slow_atomic_write(target, data):
+        gate.wait()
+        writes.append(data)
+        real_atomic_write(target, data)
+
+    mocker.patch('hierarchical_planner.checkpoint_writer.atomic_write', side_effect=slow_atomic_write)
+    writer.write_snapshot(path, b"first\n")
+    time.sleep(0.05)  # let the writer pick up the first snapshot and block
+    writer.write_snapshot(path, b"second\n")
+    writer.append(path, b"a\n")
+    writer.write_snapshot(path, b"third\n")
+    writer.append(path, b"b\n")
+    gate.set()
+    assert writer.flush(timeout=5)
+    assert writes == [b"first\n", b"third\n"]
+    with open(path, 'rb') as f:
+        assert f.read() == b"third\nb\n"
+
+    mocker.patch('hierarchical_planner.checkpoint_writer.os.replace', side_effect=OSError("disk full"))
+    writer.write_snapshot(path, b"fourth\n")
+    assert writer.flush(timeout=5)
+    assert isinstance(writer.last_error, OSError)
+    with open(path, 'rb') as f:
+        assert f.read() == b"third\nb\n"
+    assert os.listdir(tmp_path) == ["c.journal.jsonl"]  # temp file cleaned up
+    writer.close()
+
+@pytest.mark.parametrize("flush_between", [True, False])
+def test_failed_snapshot_is_rewritten_before_deltas(manager, mocker, flush_between):
+    """Deltas are never left queued behind a snapshot that failed to reach disk."""
+    real_atomic_write = checkpoint_writer.atomic_write
+    failures = []
+
+    def failing_once(target, data):
+        if target.endswith(".journal.jsonl") and not failures:
+            failures.append(target)
+            raise OSError("disk full")
+        real_atomic_write(target, data)
+
+    mocker.patch('hierarchical_planner.checkpoint_writer.atomic_write', side_effect=failing_once)
+    path = manager.save_generation_checkpoint(goal="Flaky disk", current_state={"P": {}}, completed_tasks={})
+    if flush_between:
+        manager.writer.flush()
+    manager.record_generation_progress("Flaky disk", [("set", ["reasoning_tree", "P"], {"T": []})])
+    manager.flush()
+
+    assert failures == [path]
+    assert manager.writer.take_failure(path) is None
+    reloaded, found_path = CheckpointManager(checkpoint_dir=manager.checkpoint_dir).find_latest_generation_checkpoint("Flaky disk")
+    assert found_path == path
+    assert reloaded["reasoning_tree"] == {"P": {"T": []}}
+
+@pytest.mark.asyncio
+async def test_recording_progress_never_waits_for_the_writer(manager, mocker):
+    """Recording from async code only queues work, even for an unknown checkpoint."""
+    flush = mocker.spy(manager.writer, 'flush')
+    manager.save_generation_checkpoint(goal="Queued goal", current_state={"P": {}})
+    manager.record_generation_progress("Queued goal", [("set", ["reasoning_tree", "P"], {"T": []})])
+    assert CheckpointManager(checkpoint_dir=manager.checkpoint_dir).record_generation_progress(
+        "Queued goal", [("set", ["x"], 1)]) == ""
+    flush.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_saving_does_not_write_on_the_calling_thread(manager, mocker):
+    """Checkpoint I/O from async code is handed to the background writer thread."""
+    calling_thread = threading.get_ident()
+    write_threads = []
+    real_append = checkpoint_writer.durable_append
+    mocker.patch('hierarchical_planner.checkpoint_writer.durable_append',
+                 side_effect=lambda *a: (write_threads.append(threading.get_ident()), real_append(*a)))
+
+    manager.save_generation_checkpoint(goal="Async goal", current_state={"P": {}})
+    manager.record_generation_progress("Async goal", [("set", ["reasoning_tree", "P"], {"T": []})])
+    manager.flush()
+
+    assert write_threads and calling_thread not in write_threads
+
+def test_index_tracks_saves_compactions_and_deletes(tmp_path):
+    """index.json maps the goal hash to its checkpoint with the summary of its last snapshot."""
+    manager = CheckpointManager(checkpoint_dir=str(tmp_path / "checkpoints"), compact_every=2)
+    path = manager.save_generation_checkpoint(goal="Indexed goal", current_state={"A": {}, "B": {}}, completed_tasks={})
+    manager.flush()
+    index_path = os.path.join(manager.checkpoint_dir, "index.json")
+    written = os.stat(index_path).st_mtime_ns
+    manager.record_generation_progress("Indexed goal", [("set", ["completed_tasks", "A"], ["T1"])])
+    manager.flush()
+    assert os.stat(index_path).st_mtime_ns == written  # plain deltas leave the index alone
+
+    manager.record_generation_progress("Indexed goal", [("append", ["completed_tasks", "A"], "T2")])
+    manager.flush()
+    with open(index_path, encoding='utf-8') as f:
+        index = json.load(f)
+    key = f"generation:{checkpoint_id('Indexed goal')}"
+    entry = index["entries"][key]
+    assert entry["file"] == os.path.basename(path)
+    assert entry["summary"] == {"phases": 2, "phases_expanded": 1, "tasks_completed": 2}
+    assert "Indexed goal" not in json.dumps(index)  # only the hash is stored
+
+    manager.delete_checkpoint(path)
+    manager.flush()
+    with open(os.path.join(manager.checkpoint_dir, "index.json"), encoding='utf-8') as f:
+        assert key not in json.load(f)["entries"]
+
+def test_resume_lookup_loads_only_the_matching_checkpoint(manager, mocker):
+    """Finding a checkpoint never parses the other checkpoints in the directory."""
+    for i in range(5):
+        manager.save_generation_checkpoint(goal=f"Goal number {i}", current_state={"P": {}})
+    manager.flush()
+    load = mocker.spy(CheckpointJournal, 'load')
+    listdir = mocker.spy(os, 'listdir')
+
+    data, _ = manager.find_latest_generation_checkpoint("Goal number 3")
+
+    assert data["goal"] == "Goal number 3"
+    assert load.call_count == 1
+    assert listdir.call_count == 0
+
+def test_index_is_rebuilt_when_missing(tmp_path):
+    """Deleting index.json makes the next manager rebuild it from the checkpoint files."""
+    checkpoint_dir = str(tmp_path / "rebuild")
+    CheckpointManager(checkpoint_dir=checkpoint_dir, write_behind=False).save_qa_checkpoint(
+        input_path="/plans/a.json", output_path="/plans/a_out.json", validated_data={}, last_step_index=4)
+    os.remove(os.path.join(checkpoint_dir, "index.json"))
+    checkpoint_index._indexes.clear()
+
+    data, path = CheckpointManager(checkpoint_dir=checkpoint_dir, write_behind=False).find_latest_qa_checkpoint("/plans/a.json")
+
+    assert data["last_step_index"] == 4
+    with open(os.path.join(checkpoint_dir, "index.json"), encoding='utf-8') as f:
+        assert json.load(f)["entries"]["qa:/plans/a.json"]["summary"]["last_step_index"] == 4
+
+@pytest.mark.parametrize("write_behind", [True, False])
+def test_indexes_of_separate_processes_are_merged(tmp_path, write_behind):
+    """Runs that loaded the index separately never drop each other's entries when writing it."""
+    checkpoint_dir = str(tmp_path / "shared")
+    first = CheckpointManager(checkpoint_dir=checkpoint_dir, write_behind=write_behind)
+    first.save_qa_checkpoint(input_path="/plans/old.json", output_path="/plans/old_out.json", validated_data={})
+    first.flush()
+    checkpoint_index._indexes.clear()  # The second manager stands in for another process
+    second = CheckpointManager(checkpoint_dir=checkpoint_dir, write_behind=write_behind)
+    assert first.index is not second.index
+    assert first.find_latest_generation_checkpoint("goal A") == second.find_latest_generation_checkpoint("goal B") == (None, "")
+
+    first.save_generation_checkpoint(goal="goal A", current_state={"A": {}})
+    second.save_generation_checkpoint(goal="goal B", current_state={"B": {}})
+    first.delete_checkpoint(first._qa_stem("/plans/old.json") + ".journal.jsonl")
+    first.flush()
+    second.flush()
+
+    with open(os.path.join(checkpoint_dir, "index.json"), encoding='utf-8') as f:
+        entries = json.load(f)["entries"]
+    assert sorted(entries) == sorted([f"generation:{checkpoint_id('goal A')}", f"generation:{checkpoint_id('goal B')}"])
+    # A process picks up the other's entries with its next write
+    first.save_generation_checkpoint(goal="goal A", current_state={"A": {"T": []}})
+    first.flush()
+    assert first.index.get("generation", checkpoint_id("goal B"))["file"].startswith("gen_goal_B_")
+
+def test_checkpoint_missing_from_the_index_is_still_resumed(tmp_path):
+    """A run whose index entry was lost resumes from its checkpoint file instead of starting over."""
+    checkpoint_dir = str(tmp_path / "shared")
+    first = CheckpointManager(checkpoint_dir=checkpoint_dir)
+    first.find_latest_generation_checkpoint("goal A", {"v": 1})
+    checkpoint_index._indexes.clear()  # The second manager stands in for another process
+    second = CheckpointManager(checkpoint_dir=checkpoint_dir)
+    second.find_latest_generation_checkpoint("goal B", {"v": 1})
+    first.save_generation_checkpoint(goal="goal A", current_state={"A": {}}, constitution={"v": 1})
+    path_b = second.save_generation_checkpoint(goal="goal B", current_state={"B": {}}, constitution={"v": 1})
+    first.flush()
+    second.flush()
+    # Lose B's entry, as an index written by an older version racing with this run would have
+    index_path = os.path.join(checkpoint_dir, "index.json")
+    with open(index_path, encoding='utf-8') as f:
+        index = json.load(f)
+    del index["entries"][f"generation:{checkpoint_id('goal B', {'v': 1})}"]
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    checkpoint_index._indexes.clear()
+
+    resumed = CheckpointManager(checkpoint_dir=checkpoint_dir)
+    data, path = resumed.find_latest_generation_checkpoint("goal B", {"v": 1})
+
+    assert path == path_b and data["reasoning_tree"] == {"B": {}}
+    assert resumed.find_latest_generation_checkpoint("goal B", {"v": 2}) == (None, "")
+    resumed.flush()
+    with open(index_path, encoding='utf-8') as f:
+        assert f"generation:{checkpoint_id('goal B', {'v': 1})}" in json.load(f)["entries"]
+
+def test_goals_sharing_a_prefix_get_separate_checkpoints(manager):
+    """Goals with the same first 20 characters no longer overwrite each other."""
+    goal_a = "Build an end to end pipeline for images"
+    goal_b = "Build an end to end pipeline for audio"
+    path_a = manager.save_generation_checkpoint(goal=goal_a, current_state={"A": {}}, constitution={"v": 1})
+    path_b = manager.save_generation_checkpoint(goal=goal_b, current_state={"B": {}}, constitution={"v": 1})
+    assert path_a != path_b
+
+    data_a, _ = manager.find_latest_generation_checkpoint(goal_a, {"v": 1})
+    data_b, _ = manager.find_latest_generation_checkpoint(goal_b, {"v": 1})
+    assert data_a["reasoning_tree"] == {"A": {}}
+    assert data_b["reasoning_tree"] == {"B": {}}
+
+def test_checkpoint_identity_includes_constitution(manager):
+    """The same goal under a different constitution does not resume the other run."""
+    manager.save_generation_checkpoint(goal="Same goal", current_state={"A": {}}, constitution={"stack": "python"})
+
+    assert manager.find_latest_generation_checkpoint("Same goal", {"stack": "rust"}) == (None, "")
+    data, _ = manager.find_latest_generation_checkpoint("Same goal", {"stack": "python"})
+    assert data["reasoning_tree"] == {"A": {}}
+    assert checkpoint_id("Same goal", {"a": 1, "b": 2}) == checkpoint_id("Same goal", {"b": 2, "a": 1})
@@ -0,0 +1,112 @@
+import time
+import pytest
+from unittest.mock import AsyncMock
+
+# Module to test
+from .. import circuit_breaker
+from .. import llm_client_selector
+from .. import mock_client
+from ..circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from ..exceptions import ApiCallError, ApiBlockedError, CircuitOpenError, JsonParsingError
+
+# --- Test Fixtures ---
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    """Ensures every test starts with closed circuits."""
+    circuit_breaker.reset_circuit_breakers()
+    mock_client.reset_stats()
+    yield
+    circuit_breaker.reset_circuit_breakers()
+    mock_client.reset_stats()
+
+@pytest.fixture
+def breaker_config():
+    """Provides a breaker section that opens quickly and probes again soon after."""
+    return {'circuit_breaker': {'consecutive_failures': 2, 'min_calls': 4, 'failure_rate': 0.5, 'open_sec': 0.05}}
+
+# --- Test Cases ---
+
+def test_opens_on_consecutive_failures_and_recovers_through_half_open():
+    breaker = CircuitBreaker('gemini', consecutive_failures=2, open_sec=0.05)
+    breaker.on_failure(ApiCallError("500"))
+    assert breaker.state == CLOSED and breaker.allow_request()
+    breaker.on_failure(ApiCallError("500"))
+    assert breaker.state == OPEN
+    assert not breaker.allow_request() and not breaker.is_available()
+
+    time.sleep(0.06)
+    assert breaker.is_available()
+    assert breaker.allow_request() and breaker.state == HALF_OPEN
+    assert not breaker.allow_request()  # Only one trial at a time
+    breaker.on_failure(ApiCallError("still down"))
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.on_success(0.2)
+    assert breaker.state == CLOSED and breaker.error_rate() == 0.0
+
+def test_error_rate_opens_and_non_provider_errors_do_not_count():
+    breaker = CircuitBreaker('anthropic', min_calls=4, failure_rate=0.5, consecutive_failures=10)
+    for error in (ApiBlockedError("blocked"), JsonParsingError("bad json")):
+        breaker.on_failure(error)
+    breaker.on_success(1.0)
+    assert breaker.error_rate() == 0.0
+    breaker.on_failure(ApiCallError("429"))
+    assert breaker.state == CLOSED
+    breaker.on_failure(ApiCallError("429"))
+    breaker.on_failure(ApiCallError("429"))
+    assert breaker.state == OPEN
+
+def test_rank_providers_by_strategy(breaker_config):
+    breakers = {name: circuit_breaker.get_circuit_breaker(breaker_config, name) for name in ('gemini', 'anthropic', 'mock')}
+    breakers['gemini'].on_success(5.0)
+    breakers['anthropic'].on_success(1.0)
+    breakers['mock'].on_success(3.0)
+    providers = ['gemini', 'anthropic', 'mock']
+    assert circuit_breaker.rank_providers(breaker_config, providers) == ['gemini', 'anthropic', 'mock']
+    assert circuit_breaker.rank_providers(breaker_config, providers, 'healthiest') == ['anthropic', 'mock', 'gemini']
+
+    breakers['gemini'].on_failure(ApiCallError("down"))
+    breakers['gemini'].on_failure(ApiCallError("down"))
+    assert circuit_breaker.rank_providers(breaker_config, providers) == ['anthropic', 'mock']
+    assert circuit_breaker.rank_providers({}, providers) == providers
+
+@pytest.mark.asyncio
+async def test_open_circuit_cuts_the_retry_ladder_short(breaker_config):
+    """Once the circuit opens mid-ladder the call fails at once; later calls send nothing."""
+    config = {**breaker_config, 'mock': {'latency_ms': 0, 'jitter_ms': 0, 'rate_limit_probability': 1.0,
+                                         'retries': 6, 'retry_delay_sec': 0}}
+    with pytest.raises(CircuitOpenError):
+        await mock_client.call_mock_with_retry("P {x}", {"x": 1}, config)
+    assert mock_client.rate_limit_errors == 2
+    with pytest.raises(CircuitOpenError):
+        await mock_client.call_mock_with_retry("P {x}", {"x": 2}, config)
+    assert mock_client.rate_limit_errors == 2
+
+@pytest.mark.asyncio
+async def test_router_fails_over_and_skips_open_circuits(mocker, breaker_config):
+    """Calls move to the next configured provider on failure, and skip a provider whose circuit is open."""
+    gemini_call = mocker.patch('hierarchical_planner.llm_client_selector.call_gemini_with_retry',
+                               AsyncMock(side_effect=ApiCallError("Gemini API call failed after 3 retries.")))
+    config = {
+        **breaker_config,
+        'api': {'resolved_key': 'key'},
+        'mock': {'latency_ms': 0, 'jitter_ms': 0},
+        'routing': {'providers': ['anthropic', 'mock']},
+    }
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(config, 'gemini')
+    assert isinstance(await call_with_retry("Goal: {goal}", {"goal": "g"}, config), dict)
+    assert gemini_call.await_count == 1
+
+    gemini_breaker = circuit_breaker.get_circuit_breaker(config, 'gemini')
+    gemini_breaker.on_failure(ApiCallError("down"))
+    gemini_breaker.on_failure(ApiCallError("down"))
+    await call_with_retry("Goal: {goal}", {"goal": "h"}, config)
+    assert gemini_call.await_count == 1
+
+    gemini_call.side_effect = ApiBlockedError("blocked")
+    time.sleep(0.06)
+    with pytest.raises(ApiBlockedError):
+        await call_with_retry("Goal: {goal}", {"goal": "i"}, config)
@@ -0,0 +1,60 @@
+import pytest
+
+# Module to test
+from .. import prompt_renderer
+from ..constitution_digest import build_digest
+from ..prompt_renderer import constitution_for_level, constitution_text
+
+CONSTITUTION = {
+    "project_name": "Todo CLI",
+    "core_mission": "Manage tasks from the terminal.",
+    "architectural_paradigm": "Layered",
+    "primary_language_and_tech_stack": {"language": "Python 3.11", "frameworks": "click"},
+    "non_functional_requirements": [
+        {"requirement": "Performance", "constraint": "Commands finish in under 100ms.", "rationale": "Long prose " * 50},
+        "All output is UTF-8.",
+    ],
+    "global_dependencies_and_interfaces": [{"name": "click", "version": "8.1", "purpose": "CLI parsing"}],
+    "key_data_structures": [{"name": "Task", "description": "A todo item " * 20, "fields": {"id": "int"}}],
+    "project_file_map": {
+        "src": {"type": "directory", "children": {"cli.py": {"type": "file", "description": "Entry point"}}},
+        "README.md": {"type": "file"},
+    },
+    "coding_standards": ["PEP 8"],
+}
+
+# --- Test Fixtures ---
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Ensures every test serializes the constitution afresh."""
+    prompt_renderer.clear_caches()
+    yield
+    prompt_renderer.clear_caches()
+
+# --- Test Cases ---
+
+def test_digest_keeps_binding_content():
+    digest = build_digest(CONSTITUTION)
+    assert "Project: Todo CLI - Manage tasks from the terminal." in digest
+    assert "Tech stack: language=Python 3.11; frameworks=click" in digest
+    assert "- Performance: Commands finish in under 100ms." in digest
+    assert "- All output is UTF-8." in digest
+    assert "Dependencies: click 8.1" in digest
+    assert "Data structures: Task" in digest
+    assert "Files: src/, src/cli.py, README.md" in digest
+    assert 'coding_standards: ["PEP 8"]' in digest
+    assert "Long prose" not in digest and "Entry point" not in digest
+
+def test_digest_is_deterministic_and_smaller():
+    assert build_digest(CONSTITUTION) == build_digest(dict(CONSTITUTION))
+    assert len(build_digest(CONSTITUTION)) < len(constitution_text(CONSTITUTION)) / 3
+    assert build_digest({}) == ""
+
+def test_constitution_for_level_uses_digest_only_when_configured():
+    config = {'constitution': {'digest': True, 'digest_levels': ['task', 'step']}}
+    assert constitution_for_level(CONSTITUTION, config, 'step') == build_digest(CONSTITUTION)
+    assert constitution_for_level(CONSTITUTION, config, 'phase') == constitution_text(CONSTITUTION)
+    assert constitution_for_level(CONSTITUTION, {}, 'step') == constitution_text(CONSTITUTION)
+    config['constitution']['digest'] = False
+    assert constitution_for_level(CONSTITUTION, config, 'task') == constitution_text(CONSTITUTION)
@@ -0,0 +1,132 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+
+# Module to test
+from .. import hedging
+from .. import deadline
+from .. import llm_client_selector
+from .. import mock_client
+from ..exceptions import ApiCallError, DeadlineExceededError
+
+# --- Test Fixtures ---
+
+@pytest.fixture(autouse=True)
+def reset_tracker():
+    """Ensures every test starts with no recorded latencies."""
+    hedging.get_latency_tracker().reset()
+    yield
+    hedging.get_latency_tracker().reset()
+
+def _after(seconds, result=None, error=None):
+    """Returns a call that answers (or fails) after `seconds`, recording whether it was cancelled."""
+    state = {'cancelled': False, 'calls': 0}
+
+    async def call():
+        state['calls'] += 1
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            state['cancelled'] = True
+            raise
+        if error:
+            raise error
+        return result
+    return call, state
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    primary, _ = _after(0.01, "primary")
+    hedge, hedge_state = _after(0, "hedge")
+    assert await hedging.run_hedged('gemini', primary, 'anthropic', hedge, delay=0.5) == "primary"
+    assert hedge_state['calls'] == 0
+    assert hedging.get_latency_tracker().count('gemini') == 1
+
+@pytest.mark.asyncio
+async def test_slow_primary_loses_to_hedge_and_is_cancelled():
+    primary, primary_state = _after(5, "primary")
+    hedge, _ = _after(0.01, "hedge")
+    started = time.perf_counter()
+    assert await hedging.run_hedged('gemini', primary, 'anthropic', hedge, delay=0.02) == "hedge"
+    assert time.perf_counter() - started < 1
+    await asyncio.sleep(0)
+    assert primary_state['cancelled']
+
+@pytest.mark.asyncio
+async def test_failures_hedge_immediately_and_raise_primary_error():
+    primary, _ = _after(0, error=ApiCallError("primary down"))
+    hedge, _ = _after(0, "hedge")
+    assert await hedging.run_hedged('gemini', primary, 'anthropic', hedge, delay=10) == "hedge"
+
+    primary, _ = _after(0, error=ApiCallError("primary down"))
+    hedge, _ = _after(0, error=ApiCallError("hedge down"))
+    with pytest.raises(ApiCallError, match="primary down"):
+        await hedging.run_hedged('gemini', primary, 'anthropic', hedge, delay=10)
+
+def test_hedge_delay_follows_latency_percentile():
+    """The delay starts at initial_delay_sec, then tracks the percentile within its bounds."""
+    config = {'hedging': {'min_samples': 4, 'percentile': 75, 'initial_delay_sec': 7, 'min_delay_sec': 0.5}}
+    tracker = hedging.get_latency_tracker()
+    for latency in (1.0, 2.0, 3.0):
+        tracker.record('gemini', latency)
+    assert hedging.hedge_delay(config, 'gemini') == 7
+    tracker.record('gemini', 4.0)
+    assert hedging.hedge_delay(config, 'gemini') == 3.0
+    config['hedging']['max_delay_sec'] = 2
+    assert hedging.hedge_delay(config, 'gemini') == 2
+    with deadline.within(1.0):
+        assert hedging.hedge_delay(config, 'gemini') <= 0.5
+
+@pytest.mark.asyncio
+async def test_deadlines_nest_and_bound_awaits():
+    """Nested deadlines never extend the enclosing one; awaits past the deadline are cancelled."""
+    assert deadline.remaining() is None
+    with deadline.within(10):
+        with deadline.within(60):
+            assert deadline.remaining() <= 10
+        with deadline.within(0.05):
+            assert deadline.clamp_timeout(600) <= 0.05
+            assert not deadline.allows_retry(1)
+            with pytest.raises(DeadlineExceededError):
+                await deadline.bounded(asyncio.sleep(1))
+    assert deadline.remaining() is None
+
+def test_level_budgets():
+    config = {'deadlines': {'default': 0, 'step': 300, 'phase': 600}}
+    assert deadline.level_budget(config, 'step') == 300
+    assert deadline.level_budget(config, None) is None
+    assert deadline.level_budget({'deadlines': {'default': 30}}, 'task') == 30
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_the_deadline():
+    """A retry whose backoff would outlast the deadline is skipped and the call fails early."""
+    config = {'mock': {'latency_ms': 0, 'jitter_ms': 0, 'rate_limit_probability': 1.0, 'retry_delay_sec': 5}}
+    mock_client.reset_stats()
+    started = time.perf_counter()
+    with deadline.within(2):
+        with pytest.raises(DeadlineExceededError):
+            await mock_client.call_mock_with_retry("P {x}", {"x": 1}, config)
+    assert time.perf_counter() - started < 1
+    assert mock_client.rate_limit_errors == 1
+    mock_client.reset_stats()
+
+@pytest.mark.asyncio
+async def test_selector_hedges_slow_provider(mocker):
+    """With hedging enabled, a stalled primary provider is answered by the hedge provider."""
+    async def stalled(prompt_template, context, config, is_structured=True):
+        await asyncio.sleep(30)
+    gemini_call = mocker.patch('hierarchical_planner.llm_client_selector.call_gemini_with_retry',
+                               AsyncMock(side_effect=stalled))
+    config = {
+        'cache': {'enabled': False},
+        'mock': {'latency_ms': 0, 'jitter_ms': 0},
+        'hedging': {'enabled': True, 'provider': 'mock', 'initial_delay_sec': 0.05, 'min_delay_sec': 0},
+        'deadlines': {'default': 5},
+    }
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(config, 'gemini')
+    response = await call_with_retry("Goal: {goal}", {"goal": "g"}, config)
+    assert isinstance(response, dict)
+    assert gemini_call.await_count == 1
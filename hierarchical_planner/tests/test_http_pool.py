@@ -0,0 +1,113 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+# Module to test
+from .. import http_pool
+from .. import anthropic_client
+from .. import deepseek_v3_client
+
+# --- Test Fixtures ---
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    """Ensures every test starts without pooled or cached provider clients."""
+    http_pool._clients.clear()
+    anthropic_client._anthropic_client = None
+    anthropic_client._client_configured = False
+    anthropic_client._client_loop = None
+    deepseek_v3_client._async_client = None
+    yield
+    http_pool._clients.clear()
+    anthropic_client._anthropic_client = None
+    anthropic_client._client_configured = False
+    anthropic_client._client_loop = None
+    deepseek_v3_client._async_client = None
+
+@pytest.fixture
+def fake_httpx(mocker):
+    """Replaces httpx with a recorder so pool construction can be inspected."""
+    fake = SimpleNamespace(
+        Limits=lambda **kwargs: SimpleNamespace(**kwargs),
+        Timeout=lambda total, connect: ("timeout", total, connect),
+    )
+    mocker.patch.object(http_pool, 'httpx', fake)
+    return fake
+
+@pytest.fixture
+def fake_sdk():
+    """An SDK module stand-in whose DefaultAsyncHttpxClient records its arguments."""
+    def make_client(**kwargs):
+        return SimpleNamespace(is_closed=False, kwargs=kwargs, aclose=AsyncMock())
+    return SimpleNamespace(__name__="fake_sdk", DefaultAsyncHttpxClient=MagicMock(side_effect=make_client))
+
+def _message(text):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)])
+
+# --- Test Cases ---
+
+def test_settings_fill_defaults():
+    """Missing http settings fall back to the defaults."""
+    settings = http_pool.http_settings({'http': {'max_connections': 5}})
+    assert settings['max_connections'] == 5
+    assert settings['timeout_sec'] == http_pool.DEFAULT_HTTP_SETTINGS['timeout_sec']
+
+def test_no_pool_outside_event_loop(fake_httpx, fake_sdk):
+    """Pools are bound to an event loop, so none is built outside one."""
+    assert http_pool.get_async_http_client(fake_sdk, {}) is None
+    assert http_pool.async_client_options(fake_sdk, {}) == {'timeout': ("timeout", 600.0, 10.0)}
+
+@pytest.mark.asyncio
+async def test_pool_is_shared_and_configured(fake_httpx, fake_sdk, mocker):
+    """One pooled client per SDK and loop, built with the configured limits and timeouts."""
+    mocker.patch.object(http_pool, 'http2_available', return_value=False)
+    config = {'http': {'max_connections': 7, 'max_keepalive_connections': 3, 'timeout_sec': 30, 'connect_timeout_sec': 2}}
+
+    first = http_pool.async_client_options(fake_sdk, config)
+    second = http_pool.async_client_options(fake_sdk, config)
+
+    assert first['http_client'] is second['http_client']
+    assert fake_sdk.DefaultAsyncHttpxClient.call_count == 1
+    kwargs = first['http_client'].kwargs
+    assert kwargs['limits'].max_connections == 7
+    assert kwargs['limits'].max_keepalive_connections == 3
+    assert kwargs['timeout'] == ("timeout", 30.0, 2.0)
+    assert kwargs['http2'] is False
+
+    await http_pool.close_http_clients()
+    first['http_client'].aclose.assert_awaited_once()
+    assert http_pool._clients == {}
+
+@pytest.mark.asyncio
+async def test_anthropic_uses_async_client(mocker):
+    """Anthropic requests are awaited on one reused AsyncAnthropic client, not a worker thread."""
+    client = MagicMock()
+    client.messages.create = AsyncMock(return_value=_message("hello"))
+    mock_async_anthropic = mocker.patch('hierarchical_planner.anthropic_client.anthropic.AsyncAnthropic', return_value=client)
+    mock_to_thread = mocker.patch('hierarchical_planner.anthropic_client.asyncio.to_thread')
+    config = {'anthropic': {'api_key': 'key', 'model_name': 'claude'}, 'http': {'timeout_sec': 42}}
+
+    assert await anthropic_client.generate_content("p1", config) == "hello"
+    assert await anthropic_client.generate_content("p2", config) == "hello"
+
+    mock_async_anthropic.assert_called_once()
+    assert mock_async_anthropic.call_args.kwargs['api_key'] == 'key'
+    assert 'timeout' in mock_async_anthropic.call_args.kwargs
+    assert client.messages.create.await_count == 2
+    mock_to_thread.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_deepseek_uses_async_client(mocker):
+    """DeepSeek requests are awaited on an AsyncOpenAI client pointed at the configured base URL."""
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=response)
+    mock_async_openai = mocker.patch('hierarchical_planner.deepseek_v3_client.openai.AsyncOpenAI', return_value=client)
+    deepseek_v3_client.configure_client("ds-key", "https://example.invalid/v1")
+
+    assert await deepseek_v3_client.generate_content("prompt", {'deepseek': {'model_name': 'ds'}}) == "ok"
+
+    kwargs = mock_async_openai.call_args.kwargs
+    assert kwargs['api_key'] == "ds-key"
+    assert kwargs['base_url'] == "https://example.invalid/v1"
+    assert client.chat.completions.create.call_args.kwargs['model'] == 'ds'
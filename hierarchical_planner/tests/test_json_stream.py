@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import AsyncMock
+
+# Module to test
+from .. import llm_client_selector
+from ..json_stream import JsonArrayStreamParser, strip_code_fences
+from ..exceptions import JsonParsingError
+
+RESPONSE = ('```json\n{"note": {"steps": ["nested"]}, "steps": ["say \\"hi\\" ]", '
+            '{"step 1": "do {it}", "tags": [1, 2]}, 3, true], "after": ["z"]}\n```')
+EXPECTED_STEPS = ['say "hi" ]', {"step 1": "do {it}", "tags": [1, 2]}, 3, True]
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def stream_config(tmp_path):
+    """Provides a config dictionary for a Gemini-backed streaming client with caching enabled."""
+    return {
+        'api': {'resolved_key': 'test_key', 'model_name': 'mock-model', 'temperature': 0.5},
+        'cache': {'enabled': True, 'directory': str(tmp_path / "llm_cache"), 'ttl_sec': 60},
+    }
+
+def _chunked(text, size):
+    """Builds a fake stream_content that yields `text` in chunks of `size` characters."""
+    async def fake_stream(prompt, config):
+        for i in range(0, len(text), size):
+            yield text[i:i + size]
+    return fake_stream
+
+async def _collect(stream):
+    return [item async for item in stream]
+
+# --- Test Cases ---
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(RESPONSE)])
+def test_parser_emits_elements_of_top_level_array(chunk_size):
+    """Elements are emitted as they complete, regardless of how the text is split."""
+    parser = JsonArrayStreamParser("steps")
+    items = []
+    for i in range(0, len(RESPONSE), chunk_size):
+        items.extend(parser.feed(RESPONSE[i:i + chunk_size]))
+    assert items == EXPECTED_STEPS
+    assert parser.close()["steps"] == EXPECTED_STEPS
+
+def test_parser_emits_element_before_array_closes():
+    """An element is available as soon as it is closed, before the response ends."""
+    parser = JsonArrayStreamParser("phases")
+    assert parser.feed('{"phases": ["Phase A", "Pha') == ["Phase A"]
+    assert parser.feed('se B"') == ["Phase B"]
+    assert parser.feed(']}') == []
+
+def test_parser_rejects_malformed_element():
+    """A completed element that is not valid JSON raises JsonParsingError."""
+    parser = JsonArrayStreamParser("tasks")
+    with pytest.raises(JsonParsingError):
+        parser.feed('{"tasks": [nope, "b"]}')
+
+def test_strip_code_fences():
+    assert strip_code_fences('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert strip_code_fences('  {"a": 1} ') == '{"a": 1}'
+
+@pytest.mark.asyncio
+async def test_streaming_client_yields_and_caches(mocker, stream_config):
+    """Streamed elements are yielded and the full response is cached for later calls."""
+    mocker.patch('hierarchical_planner.llm_client_selector.gemini_stream_content', _chunked(RESPONSE, 5))
+    mock_call = mocker.patch('hierarchical_planner.llm_client_selector.call_gemini_with_retry', new_callable=AsyncMock)
+    stream_items = await llm_client_selector.select_streaming_client(stream_config, 'gemini')
+
+    assert await _collect(stream_items("Goal: {goal}", {"goal": "g"}, stream_config, "steps")) == EXPECTED_STEPS
+    mocker.patch('hierarchical_planner.llm_client_selector.gemini_stream_content', side_effect=AssertionError("not cached"))
+    assert await _collect(stream_items("Goal: {goal}", {"goal": "g"}, stream_config, "steps")) == EXPECTED_STEPS
+    mock_call.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_streaming_client_falls_back_without_duplicates(mocker, stream_config):
+    """A stream that breaks mid-way is completed by a regular call, skipping elements already yielded."""
+    async def broken_stream(prompt, config):
+        yield '{"tasks": ["T1", "T2", "T'
+        raise RuntimeError("connection reset")
+    mocker.patch('hierarchical_planner.llm_client_selector.gemini_stream_content', broken_stream)
+    mock_call = mocker.patch('hierarchical_planner.llm_client_selector.call_gemini_with_retry',
+                             new_callable=AsyncMock, return_value={"tasks": ["T1", "T2", "T3"]})
+    stream_items = await llm_client_selector.select_streaming_client(stream_config, 'gemini')
+
+    assert await _collect(stream_items("P {x}", {"x": 1}, stream_config, "tasks")) == ["T1", "T2", "T3"]
+    mock_call.assert_awaited_once()
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import pytest
+
+# Module to test
+from ..lazy_imports import lazy_import
+
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def probe_package(tmp_path, monkeypatch):
+    """Provides an importable package whose submodule records when it is executed."""
+    package = tmp_path / "lazy_probe_pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("executed = []\n", encoding='utf-8')
+    (package / "heavy.py").write_text(
+        "import lazy_probe_pkg\nlazy_probe_pkg.executed.append('heavy')\nVALUE = 42\n", encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in ("lazy_probe_pkg.heavy", "lazy_probe_pkg"):
+        sys.modules.pop(name, None)
+
+# --- Test Cases ---
+
+def test_module_executes_on_first_attribute_access(probe_package):
+    heavy = lazy_import("lazy_probe_pkg.heavy")
+    import lazy_probe_pkg
+    assert lazy_probe_pkg.executed == []
+    assert lazy_probe_pkg.heavy is heavy is sys.modules["lazy_probe_pkg.heavy"]
+    assert heavy.VALUE == 42
+    assert lazy_probe_pkg.executed == ["heavy"]
+    assert lazy_import("lazy_probe_pkg.heavy") is heavy
+
+def test_missing_modules():
+    assert lazy_import("no_such_sdk_module", optional=True) is None
+    assert lazy_import("no_such_sdk_package.client", optional=True) is None
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("no_such_sdk_module")
+
+def test_importing_main_loads_no_sdk_and_no_config():
+    """Importing the CLI module neither executes provider SDKs nor loads config or sets up logging."""
+    code = (
+        "import sys, logging, hierarchical_planner.main as main\n"
+        "loaded = [name for name in ('anthropic', 'openai', 'google.generativeai')\n"
+        "          if name in sys.modules and type(sys.modules[name]).__name__ != '_LazyModule']\n"
+        "assert not loaded, loaded\n"
+        "assert 'CONFIG' not in vars(main) and not logging.getLogger().handlers\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_PARENT, check=True)
@@ -0,0 +1,106 @@
+import pytest
+import os
+import time
+from unittest.mock import AsyncMock
+
+# Module to test
+from .. import llm_cache
+from .. import llm_client_selector
+from ..llm_cache import ResponseCache, MISS
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def cache(tmp_path):
+    """Provides an empty cache rooted in a temporary directory."""
+    return ResponseCache(str(tmp_path / "cache"), ttl_sec=60, max_entries=3, max_bytes=1024 * 1024)
+
+@pytest.fixture
+def cache_config(tmp_path):
+    """Provides a config dictionary with caching enabled in a temporary directory."""
+    return {
+        'api': {'resolved_key': 'test_key', 'model_name': 'mock-model', 'temperature': 0.5},
+        'cache': {'enabled': True, 'directory': str(tmp_path / "llm_cache"), 'ttl_sec': 60}
+    }
+
+# --- Test Cases ---
+
+def test_make_key_depends_on_every_component():
+    """Keys are stable for identical inputs and change when any input changes."""
+    base = ResponseCache.make_key("gemini", "m", 0.5, "prompt")
+    assert base == ResponseCache.make_key("gemini", "m", 0.5, "prompt")
+    assert base != ResponseCache.make_key("anthropic", "m", 0.5, "prompt")
+    assert base != ResponseCache.make_key("gemini", "m2", 0.5, "prompt")
+    assert base != ResponseCache.make_key("gemini", "m", 0.6, "prompt")
+    assert base != ResponseCache.make_key("gemini", "m", 0.5, "prompt!")
+    assert base != ResponseCache.make_key("gemini", "m", 0.5, "prompt", is_structured=False)
+
+def test_set_then_get_round_trips(cache):
+    """A stored response is returned verbatim, including falsy values."""
+    cache.set("a" * 64, {"phases": ["P1"]})
+    cache.set("b" * 64, {})
+    assert cache.get("a" * 64) == {"phases": ["P1"]}
+    assert cache.get("b" * 64) == {}
+    assert cache.get("c" * 64) is MISS
+
+def test_expired_entries_are_misses(cache, mocker):
+    """Entries older than the TTL are treated as misses and removed."""
+    cache.set("a" * 64, "old")
+    mocker.patch('hierarchical_planner.llm_cache.time.time', return_value=time.time() + 120)
+    assert cache.get("a" * 64) is MISS
+    assert not os.path.exists(cache._entry_path("a" * 64))
+
+def test_lru_eviction_keeps_recently_used(cache):
+    """Exceeding max_entries evicts the least recently used entry."""
+    for key in ("a", "b", "c"):
+        cache.set(key * 64, key)
+    assert cache.get("a" * 64) == "a"  # 'b' is now the least recently used
+    cache.set("d" * 64, "d")
+    assert cache.get("b" * 64) is MISS
+    assert cache.get("a" * 64) == "a"
+    assert cache.get("d" * 64) == "d"
+
+def test_size_limit_evicts(tmp_path):
+    """Exceeding max_bytes evicts entries until the cache fits."""
+    small_cache = ResponseCache(str(tmp_path / "small"), max_entries=100, max_bytes=400)
+    small_cache.set("a" * 64, "x" * 200)
+    small_cache.set("b" * 64, "y" * 200)
+    assert small_cache.get("a" * 64) is MISS
+    assert small_cache.get("b" * 64) == "y" * 200
+
+def test_index_is_rebuilt_from_disk(cache):
+    """A new cache instance over the same directory sees existing entries."""
+    cache.set("a" * 64, "persisted")
+    reopened = ResponseCache(cache.cache_dir, ttl_sec=60)
+    assert reopened.get("a" * 64) == "persisted"
+
+def test_get_response_cache_disabled_without_section():
+    """Configs without a cache section do not use the cache."""
+    assert llm_cache.get_response_cache({}) is None
+    assert llm_cache.get_response_cache({'cache': {'enabled': False}}) is None
+
+@pytest.mark.asyncio
+async def test_selected_client_serves_repeat_prompts_from_cache(mocker, cache_config):
+    """The second identical call through select_llm_client does not reach the provider."""
+    mock_call = mocker.patch('hierarchical_planner.llm_client_selector.call_gemini_with_retry',
+                             new_callable=AsyncMock, return_value={"tasks": ["T1"]})
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(cache_config, 'gemini')
+
+    first = await call_with_retry("Goal: {goal}", {"goal": "g"}, cache_config)
+    second = await call_with_retry("Goal: {goal}", {"goal": "g"}, cache_config)
+    other = await call_with_retry("Goal: {goal}", {"goal": "different"}, cache_config)
+
+    assert first == second == other == {"tasks": ["T1"]}
+    assert mock_call.await_count == 2
+
+@pytest.mark.asyncio
+async def test_selected_client_does_not_cache_failures(mocker, cache_config):
+    """Errors propagate and are not stored, so the next call retries the provider."""
+    mock_call = mocker.patch('hierarchical_planner.llm_client_selector.call_gemini_with_retry',
+                             new_callable=AsyncMock, side_effect=[RuntimeError("boom"), {"ok": True}])
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(cache_config, 'gemini')
+
+    with pytest.raises(RuntimeError):
+        await call_with_retry("P {x}", {"x": 1}, cache_config)
+    assert await call_with_retry("P {x}", {"x": 1}, cache_config) == {"ok": True}
+    assert mock_call.await_count == 2
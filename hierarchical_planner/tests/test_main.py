@@ -3,6 +3,7 @@ import sys
 from unittest.mock import patch, MagicMock, AsyncMock
 import argparse
 import asyncio
+import json
 import os # Import os for basename mocking
 
 # Import the module under test *without* module-level patches
@@ -298,3 +299,277 @@ def test_run_main_exception(mock_exit, mock_main_wf, mock_arg_parser, mocker):
     # Match the actual f-string format used in main.py
     main.logger.critical.assert_called_with(f"Application error at top level: {error_message}", exc_info=True)
     mock_exit.assert_called_once_with(1)
+
+
+# --- Tests for generate_plan ---
+
+def _fake_generation_call(tracker):
+    """Builds a fake call_with_retry that answers phase/task/step prompts and tracks concurrency."""
+    async def fake_call(prompt_template, context, config, is_structured=True):
+        tracker['in_flight'] += 1
+        tracker['max_in_flight'] = max(tracker['max_in_flight'], tracker['in_flight'])
+        try:
+            if prompt_template == main.PHASE_GENERATION_PROMPT:
+                return {"phases": ["Phase A", "Phase B", "Phase C"]}
+            if prompt_template == main.TASK_GENERATION_PROMPT:
+                await asyncio.sleep(0.01)
+                return {"tasks": [f"{context['phase']} / Task {i}" for i in range(1, 4)]}
+            # Later tasks finish first so completion order differs from plan order
+            task_number = int(context['task'].rsplit(' ', 1)[-1])
+            await asyncio.sleep(0.03 / task_number)
+            return {"steps": [{"step 1": f"Do {context['task']}"}]}
+        finally:
+            tracker['in_flight'] -= 1
+    return fake_call
+
+
+@pytest.fixture
+def generation_mocks(mocker):
+    """Patches the LLM selector, validators and checkpoint manager used by generate_plan."""
+    tracker = {'in_flight': 0, 'max_in_flight': 0}
+    mocker.patch('hierarchical_planner.main.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, _fake_generation_call(tracker)))
+    mocker.patch('hierarchical_planner.main.validate_phases', new_callable=AsyncMock, side_effect=lambda phases, *a, **k: phases)
+    mocker.patch('hierarchical_planner.main.validate_tasks', new_callable=AsyncMock, side_effect=lambda tasks, *a, **k: tasks)
+    mocker.patch('hierarchical_planner.main.validate_steps', new_callable=AsyncMock, side_effect=lambda steps, *a, **k: steps)
+    checkpoint_cls = mocker.patch('hierarchical_planner.main.CheckpointManager')
+    checkpoint_manager = checkpoint_cls.return_value
+    checkpoint_manager.find_latest_generation_checkpoint.return_value = (None, "")
+    checkpoint_manager.save_generation_checkpoint.return_value = "/fake/checkpoint.json"
+    return tracker, checkpoint_manager
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrent", [False, True])
+async def test_generate_plan_preserves_order(generation_mocks, tmp_path, concurrent):
+    """Serial and concurrent generation produce identically ordered trees."""
+    tracker, _ = generation_mocks
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    output_file = tmp_path / "tree.json"
+    config = {'generation': {'concurrent': concurrent, 'max_concurrency': 4}}
+
+    tree, goal = await main.generate_plan(str(task_file), str(output_file), config, constitution={"project_name": "x"})
+
+    assert goal == "Build a thing"
+    assert list(tree.keys()) == ["Phase A", "Phase B", "Phase C"]
+    for phase, tasks in tree.items():
+        assert list(tasks.keys()) == [f"{phase} / Task {i}" for i in range(1, 4)]
+        for task, steps in tasks.items():
+            assert steps == [{"step 1": f"Do {task}"}]
+    if concurrent:
+        assert 1 < tracker['max_in_flight'] <= 4
+    else:
+        assert tracker['max_in_flight'] == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_plan_resumes_from_completed_tasks(generation_mocks, tmp_path):
+    """Only tasks missing from the checkpoint's completion record are regenerated."""
+    _, checkpoint_manager = generation_mocks
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    checkpoint_manager.find_latest_generation_checkpoint.return_value = ({
+        "reasoning_tree": {
+            "Phase A": {"Phase A / Task 1": [], "Phase A / Task 2": [{"step 1": "kept"}]},
+            "Phase B": {},
+        },
+        "completed_tasks": {"Phase A": ["Phase A / Task 2"]},
+    }, "/fake/checkpoint.json")
+    config = {'generation': {'concurrent': True, 'max_concurrency': 2}}
+
+    tree, _ = await main.generate_plan(str(task_file), str(tmp_path / "tree.json"), config, constitution={"project_name": "x"})
+
+    assert list(tree["Phase A"].keys()) == ["Phase A / Task 1", "Phase A / Task 2"]
+    assert tree["Phase A"]["Phase A / Task 2"] == [{"step 1": "kept"}]
+    assert tree["Phase A"]["Phase A / Task 1"] == [{"step 1": "Do Phase A / Task 1"}]
+    assert list(tree["Phase B"].keys()) == [f"Phase B / Task {i}" for i in range(1, 4)]
+    recorded = [update for call in checkpoint_manager.record_generation_progress.call_args_list
+                for update in call.args[1]]
+    assert ("append", ["completed_tasks", "Phase A"], "Phase A / Task 1") in recorded
+    assert ("append", ["completed_tasks", "Phase A"], "Phase A / Task 2") not in recorded
+    checkpoint_manager.save_generation_checkpoint.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_generate_plan_concurrent_overlaps_qa_with_step_generation(generation_mocks, tmp_path):
+    """In the dependency graph, QA for a finished task runs while steps of other tasks are still generating."""
+    events = []
+
+    async def slow_validate(steps, goal, phase, task, *args, **kwargs):
+        events.append(f"qa start {task}")
+        await asyncio.sleep(0.02)
+        events.append(f"qa end {task}")
+        return steps
+
+    main.validate_steps.side_effect = slow_validate
+    _, _, generation_call = main.select_llm_client.return_value
+
+    async def recording_call(prompt_template, context, config, is_structured=True):
+        if prompt_template == main.STEP_GENERATION_PROMPT:
+            events.append(f"steps start {context['task']}")
+        return await generation_call(prompt_template, context, config, is_structured)
+
+    main.select_llm_client.return_value = (None, None, recording_call)
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    config = {'generation': {'concurrent': True, 'max_concurrency': 3}}
+
+    tree, _ = await main.generate_plan(str(task_file), str(tmp_path / "tree.json"), config, constitution={"project_name": "x"})
+
+    assert all(steps == [{"step 1": f"Do {task}"}] for tasks in tree.values() for task, steps in tasks.items())
+    assert len([event for event in events if event.startswith("qa end")]) == 9
+    # Step generation for some tasks starts after QA for others has started
+    last_steps = max(i for i, event in enumerate(events) if event.startswith("steps start"))
+    first_qa = min(i for i, event in enumerate(events) if event.startswith("qa start"))
+    assert first_qa < last_steps
+    assert main.validate_steps.await_count == 9
+
+
+@pytest.mark.asyncio
+async def test_generate_plan_serial_pipelines_qa(generation_mocks, tmp_path):
+    """Serial generation queues steps for QA workers instead of waiting for QA before the next task."""
+    events = []
+
+    async def slow_validate(steps, goal, phase, task, *args, **kwargs):
+        events.append(f"qa start {task}")
+        await asyncio.sleep(0.05)
+        events.append(f"qa end {task}")
+        return [{**step, "qa_info": {}} for step in steps]
+
+    main.validate_steps.side_effect = slow_validate
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    config = {'qa': {'pipeline_workers': 2}}
+
+    tree, _ = await main.generate_plan(str(task_file), str(tmp_path / "tree.json"), config, constitution={"project_name": "x"})
+
+    assert list(tree["Phase C"].keys()) == [f"Phase C / Task {i}" for i in range(1, 4)]
+    assert all(steps == [{"step 1": f"Do {task}", "qa_info": {}}] for tasks in tree.values() for task, steps in tasks.items())
+    # QA for the first task was still running when the second one was queued
+    assert events.index("qa start Phase A / Task 2") < events.index("qa end Phase A / Task 1")
+
+
+@pytest.mark.asyncio
+async def test_generate_plan_pipeline_records_drafted_tasks_on_failure(generation_mocks, tmp_path):
+    """Tasks still queued for QA when generation fails are reviewed and recorded before the error propagates."""
+    _, checkpoint_manager = generation_mocks
+
+    async def slow_validate(steps, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        return steps
+
+    async def failing_validate_tasks(tasks, goal, phase, *args, **kwargs):
+        if phase == "Phase C":
+            raise ApiCallError("quota exhausted")
+        return tasks
+
+    main.validate_steps.side_effect = slow_validate
+    main.validate_tasks.side_effect = failing_validate_tasks
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    config = {'qa': {'pipeline_workers': 1}}
+
+    with pytest.raises(HierarchicalPlannerError):
+        await main.generate_plan(str(task_file), str(tmp_path / "tree.json"), config, constitution={"project_name": "x"})
+
+    recorded = [update for call in checkpoint_manager.record_generation_progress.call_args_list
+                for update in call.args[1]]
+    completed = [update[2] for update in recorded if update[:2] == ("append", ["completed_tasks", update[1][1]])]
+    assert completed == [f"{phase} / Task {i}" for phase in ("Phase A", "Phase B") for i in range(1, 4)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrent", [False, True])
+async def test_generate_plan_incremental_regenerates_only_changed_nodes(generation_mocks, tmp_path, concurrent):
+    """An incremental run reuses nodes with unchanged fingerprints and regenerates the rest."""
+    tracker, _ = generation_mocks
+    calls = []
+    _, _, generation_call = main.select_llm_client.return_value
+
+    async def counting_call(prompt_template, context, config, is_structured=True):
+        calls.append(context.get('task') or context.get('phase') or 'phases')
+        return await generation_call(prompt_template, context, config, is_structured)
+
+    main.select_llm_client.return_value = (None, None, counting_call)
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    output_file = str(tmp_path / "tree.json")
+    config = {'generation': {'concurrent': concurrent}}
+    constitution = {"project_name": "x"}
+
+    first, _ = await main.generate_plan(str(task_file), output_file, config, constitution=constitution, incremental=True)
+    assert len(calls) == 1 + 3 + 9
+    fingerprints_file = tmp_path / "tree.fingerprints.json"
+    stored = json.loads(fingerprints_file.read_text(encoding='utf-8'))
+
+    # Unchanged inputs: nothing is regenerated
+    calls.clear()
+    second, _ = await main.generate_plan(str(task_file), output_file, config, constitution=constitution, incremental=True)
+    assert calls == [] and second == first
+
+    # A stale fingerprint for one task's steps and one phase's task list
+    stored["steps"]["Phase A"]["Phase A / Task 2"] = "stale"
+    stored["tasks"]["Phase C"] = "stale"
+    fingerprints_file.write_text(json.dumps(stored), encoding='utf-8')
+    calls.clear()
+    third, _ = await main.generate_plan(str(task_file), output_file, config, constitution=constitution, incremental=True)
+    assert sorted(calls) == sorted(["Phase A / Task 2", "Phase C"] + [f"Phase C / Task {i}" for i in range(1, 4)])
+    assert third == first
+
+
+def _fake_stream_items(events):
+    """Builds a fake stream_with_retry that yields list elements slowly and logs when each stream ends."""
+    async def fake_stream(prompt_template, context, config, array_key):
+        if array_key == "phases":
+            items, label, delay = ["Phase A", "Phase B", "Phase C"], "phases", 0.05
+        else:
+            items, label, delay = [f"{context['phase']} / Task {i}" for i in range(1, 4)], context['phase'], 0.005
+        for item in items:
+            await asyncio.sleep(delay)
+            yield item
+        events.append(f"end {label}")
+    return fake_stream
+
+
+@pytest.mark.asyncio
+async def test_generate_plan_streaming_starts_children_early(generation_mocks, tmp_path, mocker):
+    """With streaming, step generation starts before the phase list has finished streaming."""
+    _, checkpoint_manager = generation_mocks
+    events = []
+    mocker.patch('hierarchical_planner.main.select_streaming_client', new_callable=AsyncMock,
+                 return_value=_fake_stream_items(events))
+    original_steps = main.validate_steps.side_effect
+    main.validate_steps.side_effect = lambda steps, goal, phase, task, *a, **k: events.append(f"steps {task}") or original_steps(steps)
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    config = {'generation': {'stream': True, 'max_concurrency': 8}}
+
+    tree, _ = await main.generate_plan(str(task_file), str(tmp_path / "tree.json"), config, constitution={"project_name": "x"})
+
+    assert list(tree.keys()) == ["Phase A", "Phase B", "Phase C"]
+    for phase, tasks in tree.items():
+        assert list(tasks.keys()) == [f"{phase} / Task {i}" for i in range(1, 4)]
+        assert all(steps == [{"step 1": f"Do {task}"}] for task, steps in tasks.items())
+    assert events.index("steps Phase A / Task 1") < events.index("end phases")
+    checkpoint_manager.save_generation_checkpoint.assert_called()
+    recorded = [update for call in checkpoint_manager.record_generation_progress.call_args_list
+                for update in call.args[1]]
+    assert any(update[:2] == ("set", ["completed_tasks", "Phase C"]) for update in recorded)
+
+
+@pytest.mark.asyncio
+async def test_generate_plan_streaming_drops_invalidated_elements(generation_mocks, tmp_path, mocker):
+    """Elements removed by list validation are dropped from the tree even if work on them started."""
+    mocker.patch('hierarchical_planner.main.select_streaming_client', new_callable=AsyncMock,
+                 return_value=_fake_stream_items([]))
+    main.validate_phases.side_effect = lambda phases, *a, **k: [p for p in phases if p != "Phase B"]
+    main.validate_tasks.side_effect = lambda tasks, goal, phase, *a, **k: [t for t in tasks if not t.endswith("Task 2")]
+    task_file = tmp_path / "task.txt"
+    task_file.write_text("Build a thing", encoding='utf-8')
+    config = {'generation': {'stream': True, 'max_concurrency': 2}}
+
+    tree, _ = await main.generate_plan(str(task_file), str(tmp_path / "tree.json"), config, constitution={"project_name": "x"})
+
+    assert list(tree.keys()) == ["Phase A", "Phase C"]
+    assert list(tree["Phase A"].keys()) == ["Phase A / Task 1", "Phase A / Task 3"]
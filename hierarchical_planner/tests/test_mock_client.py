@@ -0,0 +1,135 @@
+import json
+import pytest
+from collections import defaultdict
+
+# Module to test
+from .. import mock_client
+from .. import benchmark
+from .. import llm_client_selector
+from ..exceptions import ApiCallError
+from ..prompts.CONSTITUTION_GENERATION_PROMPT import CONSTITUTION_GENERATION_PROMPT
+from ..prompts.PHASE_GENERATION_PROMPT import PHASE_GENERATION_PROMPT
+from ..prompts.TASK_GENERATION_PROMPT import TASK_GENERATION_PROMPT
+from ..prompts.STEP_GENERATION_PROMPT import STEP_GENERATION_PROMPT
+from ..qa_validator import (
+    ALIGNMENT_CHECK_PROMPT, RESOURCE_IDENTIFICATION_PROMPT,
+    BATCH_ALIGNMENT_CHECK_PROMPT, BATCH_RESOURCE_IDENTIFICATION_PROMPT
+)
+from ..persona_builder.parser import PERSONA_PARSING_PROMPT
+from ..universal_LLM_client import UniversalLLMClient
+
+STEPS_JSON = json.dumps({"step 1": "Create main.py", "step 2": "Add tests"})
+
+def _render(template, **values):
+    """Fills every placeholder of a prompt template, using defaults for those not given."""
+    context = defaultdict(lambda: "x", {"phase": "Phase 2: Build", "task": "Task 2.1: Parser", "steps_json": STEPS_JSON})
+    context.update(values)
+    return template.format_map(context)
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def mock_config():
+    """Provides a config for the mock provider without simulated latency."""
+    return {'mock': {'latency_ms': 0, 'jitter_ms': 0, 'phases': 2, 'tasks_per_phase': 3, 'steps_per_task': 2,
+                     'retry_delay_sec': 0}}
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    mock_client.reset_stats()
+    yield
+    mock_client.reset_stats()
+
+# --- Test Cases ---
+
+@pytest.mark.parametrize("template, kind", [
+    (CONSTITUTION_GENERATION_PROMPT, "constitution"),
+    (PHASE_GENERATION_PROMPT, "phases"),
+    (TASK_GENERATION_PROMPT, "tasks"),
+    (STEP_GENERATION_PROMPT, "steps"),
+    (ALIGNMENT_CHECK_PROMPT, "alignment"),
+    (RESOURCE_IDENTIFICATION_PROMPT, "resources"),
+    (BATCH_ALIGNMENT_CHECK_PROMPT, "batch_alignment"),
+    (BATCH_RESOURCE_IDENTIFICATION_PROMPT, "batch_resources"),
+    (PERSONA_PARSING_PROMPT, "persona"),
+])
+def test_classifies_every_planner_prompt(template, kind):
+    """Each rendered prompt template is recognised, guarding against prompt wording drift."""
+    assert mock_client.classify_prompt(_render(template)) == kind
+
+def test_responses_follow_prompt_schemas(mock_config):
+    """Generated phases, tasks, steps and QA answers have the shapes the planner expects."""
+    assert mock_client.respond(_render(PHASE_GENERATION_PROMPT), mock_config)["phases"] == \
+        ["Phase 1: Mock phase 1", "Phase 2: Mock phase 2"]
+
+    tasks = mock_client.respond(_render(TASK_GENERATION_PROMPT), mock_config)["tasks"]
+    assert len(tasks) == 3 and all(t.startswith("Task 2.") for t in tasks)
+
+    steps = mock_client.respond(_render(STEP_GENERATION_PROMPT), mock_config)["steps"]
+    assert [list(s) for s in steps] == [["step 1"], ["step 2"]]
+    assert "Task 2.1: Parser" in steps[0]["step 1"]
+
+    critiques = mock_client.respond(_render(BATCH_ALIGNMENT_CHECK_PROMPT), mock_config)
+    assert list(critiques) == ["step 1", "step 2"]
+    assert set(critiques["step 1"]) == {"alignment_critique", "sequence_critique", "clarity_critique"}
+
+    resources = mock_client.respond(_render(BATCH_RESOURCE_IDENTIFICATION_PROMPT), mock_config)
+    assert set(resources["step 2"]) == {"external_actions", "key_entities_dependencies", "technology_hints"}
+
+    persona = mock_client.respond(_render(PERSONA_PARSING_PROMPT), mock_config)
+    assert isinstance(persona["sections"], dict) and persona["persona_name"]
+
+def test_latency_and_rate_limits_are_deterministic():
+    """The same seed, prompt and attempt always draw the same latency and 429 decision."""
+    config = {'mock': {'latency_ms': 50, 'jitter_ms': 20, 'rate_limit_probability': 0.5, 'seed': 7}}
+    draws = [mock_client._draw("prompt", attempt, config) for attempt in range(20)]
+    assert draws == [mock_client._draw("prompt", attempt, config) for attempt in range(20)]
+    assert all(0.030 <= latency <= 0.070 for latency, _ in draws)
+    assert {limited for _, limited in draws} == {True, False}
+
+@pytest.mark.asyncio
+async def test_retries_rate_limited_calls(mock_config):
+    """Simulated 429s are retried and reported; calls failing every attempt raise ApiCallError."""
+    mock_config['mock']['rate_limit_probability'] = 1.0
+    with pytest.raises(ApiCallError):
+        await mock_client.call_mock_with_retry("Goal {goal}", {"goal": "g"}, mock_config)
+    assert mock_client.rate_limit_errors == mock_client.DEFAULT_MOCK_SETTINGS['retries']
+    assert len(mock_client.call_latencies) == 1
+
+@pytest.mark.asyncio
+async def test_selector_returns_mock_client(mock_config):
+    """The mock provider is selectable without any API key configured."""
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(mock_config, 'mock')
+    response = await call_with_retry(PHASE_GENERATION_PROMPT, {"goal": "g", "constitution": "{}"}, mock_config)
+    assert len(response["phases"]) == 2
+
+    stream_items = await llm_client_selector.select_streaming_client(mock_config, 'mock')
+    items = [item async for item in stream_items(TASK_GENERATION_PROMPT, {"goal": "g", "phase": "Phase 1: A", "constitution": "{}"},
+                                                 mock_config, "tasks")]
+    assert len(items) == 3
+
+@pytest.mark.asyncio
+async def test_universal_client_mock_provider():
+    """UniversalLLMClient serves 'mock/...' models synchronously and asynchronously."""
+    client = UniversalLLMClient(config_filepath=None, mock_settings={'latency_ms': 0, 'jitter_ms': 0})
+    messages = [{"role": "user", "content": _render(PHASE_GENERATION_PROMPT)}]
+    text = client.generate("mock/planner", messages)
+    assert json.loads(text)["phases"]
+    assert await client.agenerate("mock/planner", messages) == text
+
+def test_benchmark_percentile_and_baseline():
+    assert benchmark.percentile([], 50) is None
+    assert benchmark.percentile([0.4, 0.1, 0.3, 0.2], 50) == 0.2
+    assert benchmark.percentile(list(range(1, 101)), 99) == 99
+
+    baseline = [{'scenario': 'workflow', 'size': 'small', 'wall_sec': 1.0}]
+    assert benchmark.compare_to_baseline([{'scenario': 'workflow', 'size': 'small', 'wall_sec': 1.1}], baseline, 0.2) == []
+    regressions = benchmark.compare_to_baseline([{'scenario': 'workflow', 'size': 'small', 'wall_sec': 1.5}], baseline, 0.2)
+    assert len(regressions) == 1 and "workflow/small" in regressions[0]
+
+@pytest.mark.parametrize("scenario", ["validation", "persona"])
+def test_benchmark_scenario_runs_in_process(scenario):
+    """A benchmark run drives the real entry point and reports its measurements."""
+    result = benchmark.run_scenario(scenario, 'small', {'latency_ms': 0, 'jitter_ms': 0})
+    assert result['calls'] > 0 and result['produced'] > 0
+    assert result['p50_ms'] is not None and result['wall_sec'] > 0
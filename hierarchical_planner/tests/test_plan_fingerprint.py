@@ -0,0 +1,66 @@
+import json
+import pytest
+
+# Module to test
+from ..plan_fingerprint import PlanFingerprints, PreviousPlan, fingerprint, fingerprints_path, save_fingerprints
+
+TREE = {
+    "Phase A": {"Task 1": [{"step 1": "a"}], "Task 2": [{"error": "Failed to generate steps: boom"}]},
+    "Phase B": {"Task 3": [{"step 1": "b"}]},
+}
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def fingerprints():
+    """Provides fingerprints for a fixed goal and constitution texts."""
+    return PlanFingerprints("Build a thing", "full constitution", "task digest", "step digest")
+
+@pytest.fixture
+def previous_output(tmp_path, fingerprints):
+    """Writes TREE and its fingerprints as a previous run's output."""
+    output_file = str(tmp_path / "tree.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(TREE, f)
+    save_fingerprints(output_file, fingerprints, TREE)
+    return output_file
+
+# --- Test Cases ---
+
+def test_fingerprints_cover_each_level_inputs(fingerprints):
+    assert fingerprint("ab", "c") != fingerprint("a", "bc")
+    assert fingerprints.tasks("Phase A") != fingerprints.tasks("Phase B")
+    assert fingerprints.steps("Phase A", "Task 1") != fingerprints.steps("Phase B", "Task 1")
+
+    # A change only the phase level sees keeps task and step fingerprints
+    prose_changed = PlanFingerprints("Build a thing", "edited constitution", "task digest", "step digest")
+    assert prose_changed.phases() != fingerprints.phases()
+    assert prose_changed.tasks("Phase A") == fingerprints.tasks("Phase A")
+    assert prose_changed.steps("Phase A", "Task 1") == fingerprints.steps("Phase A", "Task 1")
+
+    goal_changed = PlanFingerprints("Build another thing", "full constitution", "task digest", "step digest")
+    assert goal_changed.steps("Phase A", "Task 1") != fingerprints.steps("Phase A", "Task 1")
+
+def test_previous_plan_reuses_unchanged_nodes(previous_output, fingerprints):
+    previous = PreviousPlan.load(previous_output, fingerprints)
+    assert previous.phases() == ["Phase A", "Phase B"]
+    tasks, completed = previous.tasks("Phase A")
+    assert tasks == {"Task 1": [{"step 1": "a"}], "Task 2": []}  # Failed steps are regenerated
+    assert completed == ["Task 1"]
+    assert previous.tasks("Phase C") is None
+    assert previous.reused_tasks == 1
+
+def test_previous_plan_detects_changed_inputs(previous_output):
+    changed = PlanFingerprints("Build a thing", "edited constitution", "task digest", "step digest")
+    previous = PreviousPlan.load(previous_output, changed)
+    assert previous.phases() is None
+    assert previous.tasks("Phase B") == ({"Task 3": [{"step 1": "b"}]}, ["Task 3"])
+
+    steps_changed = PlanFingerprints("Build a thing", "full constitution", "task digest", "edited step digest")
+    assert PreviousPlan.load(previous_output, steps_changed).tasks("Phase B") == ({"Task 3": []}, [])
+
+def test_missing_or_unusable_fingerprints_mean_no_previous_plan(tmp_path, previous_output, fingerprints):
+    assert PreviousPlan.load(str(tmp_path / "missing.json"), fingerprints) is None
+    with open(fingerprints_path(previous_output), 'w', encoding='utf-8') as f:
+        json.dump({"version": 0}, f)
+    assert PreviousPlan.load(previous_output, fingerprints) is None
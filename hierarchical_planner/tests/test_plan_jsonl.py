@@ -0,0 +1,183 @@
+import json
+import random
+from unittest.mock import patch, AsyncMock
+
+import pytest
+
+# Module to test
+from hierarchical_planner import qa_validator
+from hierarchical_planner.plan_jsonl import (
+    export_plan_file, import_plan_files, iter_plan, load_jsonl, read_jsonl, save_jsonl, shard_of, shard_paths,
+)
+from hierarchical_planner.exceptions import JsonParsingError, PlanValidationError
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def tree():
+    """Provides a tree with annotations, odd step shapes, an empty task and an empty phase."""
+    return {
+        "Phase 1": {
+            "Task 1.1": [
+                {"step 1": "Write \"main.py\" ✓", "qa_info": {"scores": [1, None]}},
+                {"step 2": "Do thing B"},
+            ],
+            "Task 1.2": [],
+            "Task 1.3": [{"qa_info": {"note": "first"}, "step 1": "Odd order"}, {"error": "Failed", "detail": 1}],
+        },
+        "Phase 2": {},
+        "Phase 3": {f"Task 3.{t}": [{f"step {s}": f"Do {t}.{s}"} for s in range(1, 3)] for t in range(1, 6)},
+    }
+
+@pytest.fixture
+def tree_file(tmp_path, tree):
+    """Writes the tree the way the planner does."""
+    path = tmp_path / "reasoning_tree.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tree, f, indent=2, ensure_ascii=False)
+    return path
+
+# --- Test Cases ---
+
+def test_records_carry_step_fields(tmp_path, tree_file):
+    """Each step is one record with its phase, task, key, prompt and qa_info."""
+    [path] = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"))
+    records = [json.loads(line) for line in open(path, encoding='utf-8')]
+    assert records[0] == {"phase": "Phase 1", "phase_index": 0, "task": "Task 1.1", "task_index": 0, "index": 0,
+                          "key": "step 1", "prompt": "Write \"main.py\" ✓", "qa_info": {"scores": [1, None]}}
+    assert "qa_info" not in records[1]
+    assert records[2] == {"phase": "Phase 1", "phase_index": 0, "task": "Task 1.2", "task_index": 1, "index": None}
+    assert records[3]["step"] == {"qa_info": {"note": "first"}, "step 1": "Odd order"}
+    assert records[5] == {"phase": "Phase 2", "phase_index": 1, "task": None, "task_index": None, "index": None}
+    assert records[-1] == {"shard": 1, "shards": 1, "records": len(records) - 1}
+
+@pytest.mark.parametrize("shards", [1, 3, 20])
+def test_round_trip_is_byte_identical(tmp_path, tree_file, shards):
+    """Exporting, shuffling the shards and importing reproduces the nested file exactly."""
+    paths = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), shards)
+    assert paths == shard_paths(str(tmp_path / "plan.jsonl"), shards)
+    random.Random(shards).shuffle(paths)
+    merged = tmp_path / "merged.json"
+    assert import_plan_files(paths, str(merged)) == 14
+    assert merged.read_bytes() == tree_file.read_bytes()
+
+def test_tasks_are_not_split(tmp_path, tree_file, tree):
+    """Tasks are dealt round-robin and all steps of a task stay in one shard."""
+    paths = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), 4)
+    assert [p.rsplit("/", 1)[1] for p in paths[:2]] == ["plan.00001-of-00004.jsonl", "plan.00002-of-00004.jsonl"]
+    owners = {}
+    for shard, path in enumerate(paths):
+        for phase, task, _, _ in iter_plan(path):
+            assert owners.setdefault((phase, task), shard) == shard
+    assert owners[("Phase 1", "Task 1.1")] == 0
+    assert owners[("Phase 1", "Task 1.2")] == 1
+    assert owners[("Phase 3", "Task 3.1")] == 3
+
+def test_missing_shard_is_reported(tmp_path, tree_file):
+    """Merging an incomplete set of shards fails instead of silently dropping tasks."""
+    paths = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), 3)
+    with pytest.raises(PlanValidationError, match="is a shard missing"):
+        import_plan_files(paths[1:], str(tmp_path / "merged.json"))
+    # A single shard can still be read on its own
+    assert len(list(iter_plan(paths[1]))) > 0
+
+def test_missing_last_shard_is_reported(tmp_path):
+    """A shard holding only the final tasks of the plan cannot be left out either."""
+    tree = {"P1": {"T1": [{"step 1": "a"}], "T2": [{"step 1": "b"}]},
+            "P2": {"T3": [{"step 1": "c"}], "T4": [{"step 1": "d"}]}}
+    source = tmp_path / "reasoning_tree.json"
+    source.write_text(json.dumps(tree, indent=2))
+    paths = export_plan_file(str(source), str(tmp_path / "plan.jsonl"), 4)
+    merged = tmp_path / "merged.json"
+    merged.write_text("previous")
+    with pytest.raises(PlanValidationError, match=r"shards \[4\] of 4 are missing"):
+        import_plan_files(paths[:3], str(merged))
+    assert merged.read_text() == "previous"
+    # More shards than tasks leaves some shards with only a trailer; they still count
+    paths = export_plan_file(str(source), str(tmp_path / "plan.jsonl"), 6)
+    with pytest.raises(PlanValidationError, match=r"shards \[5\] of 6 are missing"):
+        import_plan_files(paths[:4] + paths[5:], str(merged))
+    with pytest.raises(PlanValidationError, match=r"shards \[6\] are given more than once"):
+        import_plan_files(paths + paths[5:], str(merged))
+
+def test_truncated_shard_is_reported(tmp_path, tree_file):
+    """A shard that lost its last records, or its trailer, is rejected."""
+    paths = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), 2)
+    lines = open(paths[1], encoding='utf-8').readlines()
+    with open(paths[1], 'w', encoding='utf-8') as f:
+        f.writelines(lines[:-2] + lines[-1:])
+    with pytest.raises(PlanValidationError, match="the file is incomplete"):
+        list(iter_plan(paths[1]))
+    with open(paths[1], 'w', encoding='utf-8') as f:
+        f.writelines(lines[:-1])
+    with pytest.raises(PlanValidationError, match="has no trailer"):
+        import_plan_files(paths, str(tmp_path / "merged.json"))
+
+def test_duplicate_and_conflicting_records_are_reported(tmp_path, tree_file):
+    """The same shard twice, or shards of different plans, cannot be merged."""
+    first, second = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), 2)
+    with pytest.raises(PlanValidationError, match="more than once"):
+        list(read_jsonl([first, second, first]))
+    other = tmp_path / "other.jsonl"
+    other.write_text(open(second, encoding='utf-8').read().replace('"Phase 1"', '"Phase X"'), encoding='utf-8')
+    with pytest.raises(PlanValidationError, match="disagree on the name"):
+        list(read_jsonl([first, str(other)]))
+
+@pytest.mark.parametrize("content, error, message", [
+    ('{"phase": "P", "phase_index": 0, "task": "T", "task_index": 0, "index": 0, "key"', JsonParsingError, "plan.jsonl:1"),
+    ('{"phase": "P"}', JsonParsingError, "plan.jsonl:1"),
+    ('{"phase": "P", "phase_index": 0, "task": "T", "task_index": 0, "index": 1, "key": "s", "prompt": "b"}\n'
+     '{"phase": "P", "phase_index": 0, "task": "T", "task_index": 0, "index": 0, "key": "s", "prompt": "a"}',
+     PlanValidationError, "plan.jsonl:2: records are not in plan order"),
+])
+def test_invalid_records(tmp_path, content, error, message):
+    """Malformed lines and out-of-order files are reported with their location."""
+    path = tmp_path / "plan.jsonl"
+    path.write_text(content)
+    with pytest.raises(error, match=message):
+        list(read_jsonl([str(path)], complete=False))
+
+def test_shard_keeps_its_positions(tmp_path, tree_file):
+    """A shard loaded and saved again keeps the positions it has in the full plan."""
+    paths = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), 2)
+    tree, layout = load_jsonl([paths[1]])
+    assert list(tree) == ["Phase 1", "Phase 3"]
+    assert layout["Phase 3"] == (2, {"Task 3.1": 0, "Task 3.3": 2, "Task 3.5": 4})
+    assert shard_of(paths[1]) == (2, 2)
+    copy = tmp_path / "copy.jsonl"
+    save_jsonl(str(copy), tree, layout, shard_of(paths[1]))
+    assert copy.read_text(encoding='utf-8') == open(paths[1], encoding='utf-8').read()
+
+@pytest.mark.asyncio
+@patch('hierarchical_planner.qa_validator.analyze_and_annotate_plan', new_callable=AsyncMock)
+async def test_run_validation_on_shards(mock_analyze, tmp_path, tree_file, tree):
+    """Shards validated separately by run_validation merge back into the annotated plan."""
+    (tmp_path / "task.txt").write_text("My Test Goal")
+    config = {'files': {'default_task': 'task.txt'}, 'checkpoint': {'directory': str(tmp_path / "checkpoints")}}
+
+    async def annotate(plan, goal, config, constitution, **kwargs):
+        for tasks in plan.values():
+            for steps in tasks.values():
+                for step in steps:
+                    step.setdefault("qa_info", {})["checked"] = True
+        return plan
+    mock_analyze.side_effect = annotate
+
+    # The structure check rejects failed steps, so the plan is cleaned up first
+    del tree["Phase 1"]["Task 1.3"]
+    with open(tree_file, 'w', encoding='utf-8') as f:
+        json.dump(tree, f, indent=2, ensure_ascii=False)
+    shards = export_plan_file(str(tree_file), str(tmp_path / "plan.jsonl"), 3)
+    validated = []
+    for shard in reversed(shards):
+        out = shard.replace("plan.", "validated.")
+        await qa_validator.run_validation(shard, out, config, constitution={"principles": []})
+        validated.append(out)
+
+    merged = tmp_path / "validated.json"
+    import_plan_files(validated, str(merged))
+    result = json.loads(merged.read_text(encoding='utf-8'))
+    assert list(result) == list(tree)
+    assert result["Phase 1"]["Task 1.1"][0]["qa_info"] == {"scores": [1, None], "checked": True}
+    assert all(step["qa_info"]["checked"] for tasks in result.values() for steps in tasks.values() for step in steps)
+    assert {task: len(steps) for task, steps in result["Phase 3"].items()} == {task: 2 for task in tree["Phase 3"]}
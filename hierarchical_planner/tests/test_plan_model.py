@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+# Module to test
+from hierarchical_planner.plan_model import Plan, Phase, Task, Step
+from hierarchical_planner.exceptions import PlanValidationError
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def plan_data():
+    """Provides a plan with annotated, failed and oddly shaped steps."""
+    return {
+        "Phase 1": {
+            "Task 1.1": [
+                {"step 1": "Do thing A"},
+                {"step 2": "Do thing B", "qa_info": {"step_critique": {"ok": True}}},
+                {"qa_info": {"note": "annotations before the prompt"}, "step 3": "Do thing C"},
+                {"step 4": "Do thing D", "extra": 1},
+            ],
+            "Task 1.2": [{"error": "Failed to generate steps: boom"}],
+        },
+        "Phase 2/3": {
+            "Task ~1": [],
+        },
+    }
+
+# --- Test Cases ---
+
+def test_round_trip_is_lossless(plan_data):
+    """to_dict reproduces the parsed JSON byte for byte, key order included."""
+    original = json.dumps(plan_data)
+    plan = Plan.from_dict(json.loads(original))
+    assert json.dumps(plan.to_dict()) == original
+
+def test_prompt_and_annotations_are_attributes(plan_data):
+    """Each step exposes its prompt key, prompt and qa_info directly."""
+    steps = list(Plan.from_dict(plan_data).steps())
+    assert [(step.key, step.prompt) for step in steps[:4]] == [
+        ("step 1", "Do thing A"), ("step 2", "Do thing B"), ("step 3", "Do thing C"), ("step 4", "Do thing D"),
+    ]
+    assert steps[0].qa_info is None
+    assert steps[1].qa_info == {"step_critique": {"ok": True}}
+    assert steps[4].key == "error"
+
+def test_annotations_are_written_back(plan_data):
+    """qa_info added through the model appears in the JSON form, in place for odd shapes too."""
+    plan = Plan.from_dict(plan_data)
+    for step in plan.steps():
+        step.annotations()["checked"] = True
+    tree = plan.to_dict()
+    assert tree["Phase 1"]["Task 1.1"][0] == {"step 1": "Do thing A", "qa_info": {"checked": True}}
+    assert list(tree["Phase 1"]["Task 1.1"][2]) == ["qa_info", "step 3"]
+    assert tree["Phase 1"]["Task 1.1"][3] == {"step 4": "Do thing D", "extra": 1, "qa_info": {"checked": True}}
+
+def test_node_ids_are_json_pointers(plan_data):
+    """Ids are stable JSON pointers that Plan.get resolves."""
+    plan = Plan.from_dict(plan_data)
+    phase = plan.phases["Phase 2/3"]
+    task = phase.tasks["Task ~1"]
+    step = plan.phases["Phase 1"].tasks["Task 1.1"].steps[2]
+    assert (phase.id, task.id, step.id) == ("/Phase 2~13", "/Phase 2~13/Task ~01", "/Phase 1/Task 1.1/2")
+    for node in (plan, phase, task, step):
+        assert plan.get(node.id if node is not plan else "") is node
+    assert plan.get("/Phase 1/Task 1.1/9") is None
+    assert plan.get("/Missing") is None
+
+def test_iteration_and_len(plan_data):
+    """Tasks and steps are yielded in plan order."""
+    plan = Plan.from_dict(plan_data)
+    assert [task.name for task in plan.tasks()] == ["Task 1.1", "Task 1.2", "Task ~1"]
+    assert len(plan) == 5
+
+@pytest.mark.parametrize("data, message", [
+    (["not", "a", "dict"], "/: the reasoning tree must be a dictionary"),
+    ({"Phase 1": ["tasks"]}, "/Phase 1: the tasks of a phase must be a dictionary"),
+    ({"Phase 1": {"Task 1": {"step 1": "x"}}}, "/Phase 1/Task 1: the steps of a task must be a list"),
+    ({"Phase 1": {"Task 1": ["step 1"]}}, "/Phase 1/Task 1/0: a step must be a dictionary"),
+])
+def test_malformed_containers_raise(data, message):
+    """Wrong container types are reported with the path of the offending node."""
+    with pytest.raises(PlanValidationError, match=message):
+        Plan.from_dict(data)
+
+def test_nodes_use_slots():
+    """Nodes have no per-instance __dict__."""
+    task = Task.from_list("Task", [{"step 1": "x"}])
+    for node in (Plan(), Phase("Phase"), task, task.steps[0]):
+        assert not hasattr(node, "__dict__")
+    assert isinstance(task.steps[0], Step)
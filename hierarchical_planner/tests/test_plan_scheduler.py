@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+
+# Module to test
+from ..plan_scheduler import DagScheduler
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def events():
+    """Collects 'start'/'end' events in the order units run."""
+    return []
+
+def _unit(events, name, delay=0.0, result=None):
+    async def run():
+        events.append(f"start {name}")
+        await asyncio.sleep(delay)
+        events.append(f"end {name}")
+        return result
+    return run
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_units_start_once_dependencies_finish(events):
+    scheduler = DagScheduler()
+    scheduler.add("qa", _unit(events, "qa"), deps=["steps"])
+    scheduler.add("steps", _unit(events, "steps", 0.01, result=[1]), deps=["tasks"])
+    scheduler.add("tasks", _unit(events, "tasks", 0.01))
+    scheduler.add("other", _unit(events, "other", 0.03))
+
+    results = await scheduler.run()
+
+    assert results["steps"] == [1] and scheduler.is_done("qa")
+    assert events.index("end tasks") < events.index("start steps") < events.index("end steps") < events.index("start qa")
+    assert events.index("start qa") < events.index("end other")  # Independent units overlap
+
+@pytest.mark.asyncio
+async def test_units_added_while_running_and_priority_order(events):
+    scheduler = DagScheduler(max_concurrency=1)
+
+    async def root():
+        scheduler.add("low", _unit(events, "low"), deps=["root"])
+        scheduler.add("high", _unit(events, "high"), deps=["root"], priority=5)
+
+    scheduler.add("root", root)
+    await scheduler.run()
+    assert events == ["start high", "end high", "start low", "end low"]
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded():
+    scheduler = DagScheduler(max_concurrency=2)
+    tracker = {'in_flight': 0, 'max': 0}
+
+    async def work():
+        tracker['in_flight'] += 1
+        tracker['max'] = max(tracker['max'], tracker['in_flight'])
+        await asyncio.sleep(0.005)
+        tracker['in_flight'] -= 1
+
+    for i in range(6):
+        scheduler.add(i, work)
+    await scheduler.run()
+    assert tracker['max'] == 2
+
+@pytest.mark.asyncio
+async def test_failure_cancels_running_units(events):
+    scheduler = DagScheduler()
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    scheduler.add("slow", _unit(events, "slow", 1.0))
+    scheduler.add("fail", fail)
+    scheduler.add("after", _unit(events, "after"), deps=["fail"])
+    with pytest.raises(RuntimeError):
+        await scheduler.run()
+    assert events == ["start slow"]
+
+@pytest.mark.asyncio
+async def test_missing_dependency_and_duplicate_key_are_errors(events):
+    scheduler = DagScheduler()
+    scheduler.add("a", _unit(events, "a"), deps=["never added"])
+    with pytest.raises(ValueError):
+        scheduler.add("a", _unit(events, "a"))
+    with pytest.raises(ValueError):
+        await scheduler.run()
@@ -0,0 +1,108 @@
+import pytest
+
+# Module to test
+from hierarchical_planner import plan_schema
+from hierarchical_planner.plan_schema import CompiledSchema, SchemaError
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def valid_constitution():
+    """Provides a constitution that satisfies project_constitution_schema.json."""
+    return {
+        "project_name": "Todo",
+        "core_mission": "Track todos.",
+        "architectural_paradigm": "Monolithic",
+        "primary_language_and_tech_stack": {"language": "Python", "database": "SQLite"},
+        "key_data_structures": [{"name": "Todo", "description": "A task."}],
+        "project_file_map": {
+            "src": {"type": "directory", "children": {"app.py": {"type": "file"}}},
+        },
+    }
+
+@pytest.fixture
+def large_plan():
+    """Provides a plan with 20 phases x 25 tasks x 10 steps (5000 steps)."""
+    return {
+        f"Phase {p}": {
+            f"Task {p}.{t}": [{f"step {s}": f"Do {p}.{t}.{s}", "qa_info": {}} for s in range(1, 11)]
+            for t in range(1, 26)
+        }
+        for p in range(1, 21)
+    }
+
+# --- Test Cases ---
+
+def test_valid_plan_has_no_errors(large_plan):
+    """A well-formed plan, including qa_info annotations, passes."""
+    assert plan_schema.validate_plan(large_plan) == []
+
+def test_plan_errors_have_json_pointer_paths():
+    """Every violation is reported with the path of the offending value."""
+    plan = {
+        "Phase/1": {
+            "Task 1": ["just a string", {"step 1": ""}, {"step 2": 3}, {}, {"step 3": "ok", "qa_info": []}],
+            "Task 2": {"step 1": "not a list"},
+        },
+        "Phase 2": [],
+    }
+    errors = {(error.pointer, error.keyword) for error in plan_schema.validate_plan(plan)}
+    assert errors == {
+        ("/Phase~11/Task 1/0", "type"),
+        ("/Phase~11/Task 1/1/step 1", "minLength"),
+        ("/Phase~11/Task 1/2/step 2", "type"),
+        ("/Phase~11/Task 1/3", "minProperties"),
+        ("/Phase~11/Task 1/4/qa_info", "type"),
+        ("/Phase~11/Task 2", "type"),
+        ("/Phase 2", "type"),
+    }
+
+def test_root_error_pointer_is_empty():
+    """A root of the wrong type is reported at the empty pointer."""
+    errors = plan_schema.validate_plan(["not", "a", "dict"])
+    assert errors == [SchemaError((), 'type', "must be an object")]
+    assert str(errors[0]) == "/: must be an object"
+
+def test_validate_fragment_at_path():
+    """A subtree validated `at` a path uses the matching sub-schema and reports full paths."""
+    errors = plan_schema.validate_plan([{"step 1": "ok"}, {"step 2": None}], at=("Phase 1", "Task 1"))
+    assert [error.pointer for error in errors] == ["/Phase 1/Task 1/1/step 2"]
+    assert plan_schema.validate_plan({"Task 1": []}, at=("Phase 1",)) == []
+
+def test_valid_constitution(valid_constitution):
+    """The constitution schema shipped with the project is compiled and enforced."""
+    assert plan_schema.validate_constitution(valid_constitution) == []
+
+def test_constitution_errors(valid_constitution):
+    """Missing required fields, wrong types and recursive file map entries are reported."""
+    del valid_constitution["core_mission"]
+    valid_constitution["primary_language_and_tech_stack"] = {"database": "SQLite"}
+    valid_constitution["key_data_structures"].append("Todo")
+    valid_constitution["project_file_map"]["src"]["children"]["app.py"]["type"] = "symlink"
+    errors = {(error.pointer, error.keyword) for error in plan_schema.validate_constitution(valid_constitution)}
+    assert errors == {
+        ("", "required"),
+        ("/primary_language_and_tech_stack", "required"),
+        ("/key_data_structures/1", "type"),
+        ("/project_file_map/src/children/app.py/type", "enum"),
+    }
+
+def test_compiled_schema_keywords():
+    """Type unions, booleans vs. integers, minItems and additionalProperties: false."""
+    schema = CompiledSchema({
+        "type": "object",
+        "properties": {
+            "count": {"type": "integer"},
+            "note": {"type": ["string", "null"]},
+            "tags": {"type": "array", "minItems": 1, "items": {"type": "string"}},
+        },
+        "additionalProperties": False,
+    })
+    assert schema.is_valid({"count": 1, "note": None, "tags": ["a"]})
+    errors = {(error.pointer, error.keyword) for error in schema.validate({"count": True, "tags": [], "extra": 1})}
+    assert errors == {("/count", "type"), ("/tags", "minItems"), ("", "additionalProperties")}
+
+def test_rejects_remote_references():
+    """Only local `$ref` pointers are supported."""
+    with pytest.raises(ValueError):
+        CompiledSchema({"$ref": "http://example.com/schema.json"})
@@ -126,5 +126,46 @@ class TestProjectBuilder(unittest.TestCase):
         self.assertEqual(actions[0]['type'], 'analysis')
         self.assertEqual(actions[0]['summary'], response_text)
 
+    @patch('hierarchical_planner.project_builder.time.sleep')
+    @patch('hierarchical_planner.project_builder.UniversalLLMClient')
+    def test_build_streams_steps_including_annotated_ones(self, mock_llm_client, mock_sleep):
+        """Build processes every step streamed from the file, including steps carrying qa_info."""
+        tree = {
+            "Phase 1": {
+                "Task 1": [{"step 1": "Create README.md", "qa_info": {"step_critique": {}}}],
+                "Task 2": [],
+            },
+            "Phase 2": {"Task 3": [{"step 1": "Create src/"}, "not a step"]},
+        }
+        with open(self.reasoning_tree_path, 'w') as f:
+            json.dump(tree, f)
+        builder = ProjectBuilder(
+            reasoning_tree_path=str(self.reasoning_tree_path),
+            config_path=str(self.config_path),
+            project_dir=str(self.project_dir)
+        )
+        builder._execute_step = MagicMock(return_value={"status": "success", "prepared_actions": []})
+        builder._validate_step = MagicMock(return_value={"status": "success"})
+
+        builder.build()
+
+        instructions = [call.args[0] for call in builder._execute_step.call_args_list]
+        self.assertEqual(instructions, ["Create README.md", "Create src/"])
+
+    @patch('hierarchical_planner.project_builder.UniversalLLMClient')
+    def test_build_malformed_tree_raises(self, mock_llm_client):
+        """A malformed tree file surfaces as ProjectBuilderError when streamed."""
+        with open(self.reasoning_tree_path, 'w') as f:
+            f.write('{"Phase 1": {"Task 1": [{"step 1": "ok"}, ')
+        builder = ProjectBuilder(
+            reasoning_tree_path=str(self.reasoning_tree_path),
+            config_path=str(self.config_path),
+            project_dir=str(self.project_dir)
+        )
+        builder._execute_step = MagicMock(return_value={"status": "success", "prepared_actions": []})
+        builder._validate_step = MagicMock(return_value={"status": "success"})
+        with patch('hierarchical_planner.project_builder.time.sleep'), self.assertRaises(ProjectBuilderError):
+            builder.build()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,84 @@
+import pytest
+
+# Module to test
+from .. import prompt_renderer
+from .. import telemetry
+from ..anthropic_client import _message_params
+from ..prompt_renderer import render_prompt, compile_template, cacheable_prefix, constitution_text
+from ..prompts.CONSTITUTION_GENERATION_PROMPT import CONSTITUTION_GENERATION_PROMPT
+from ..prompts.PHASE_GENERATION_PROMPT import PHASE_GENERATION_PROMPT
+from ..prompts.TASK_GENERATION_PROMPT import TASK_GENERATION_PROMPT
+from ..prompts.STEP_GENERATION_PROMPT import STEP_GENERATION_PROMPT
+from ..qa_validator import (
+    ALIGNMENT_CHECK_PROMPT, RESOURCE_IDENTIFICATION_PROMPT,
+    BATCH_ALIGNMENT_CHECK_PROMPT, BATCH_RESOURCE_IDENTIFICATION_PROMPT
+)
+
+CONSTITUTION = {"project_name": "Demo", "core_principles": ["Keep it {simple}"] * 200}
+
+# --- Test Fixtures ---
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Ensures every test starts without compiled templates or remembered prefixes."""
+    prompt_renderer.clear_caches()
+    yield
+    prompt_renderer.clear_caches()
+
+@pytest.fixture
+def context():
+    """Provides values for every field used by the planner and QA templates."""
+    return {
+        "goal": "Build a {CLI} tool", "constitution": constitution_text(CONSTITUTION),
+        "phase": "Phase 1: Setup", "task": "Task 1.1: Init", "steps_json": '{"step 1": "x"}',
+        "prompt_text": "Create main.py", "schema": "{}",
+    }
+
+# --- Test Cases ---
+
+@pytest.mark.parametrize("template", [
+    CONSTITUTION_GENERATION_PROMPT, PHASE_GENERATION_PROMPT, TASK_GENERATION_PROMPT, STEP_GENERATION_PROMPT,
+    ALIGNMENT_CHECK_PROMPT, RESOURCE_IDENTIFICATION_PROMPT,
+    BATCH_ALIGNMENT_CHECK_PROMPT, BATCH_RESOURCE_IDENTIFICATION_PROMPT,
+    "No fields, {{escaped}} only", "{phase} first, then {constitution}",
+])
+def test_render_matches_str_format(template, context):
+    assert render_prompt(template, context) == template.format(**context)
+    assert render_prompt(template, context) == template.format(**context)  # From the pre-rendered prefix
+
+def test_templates_split_before_first_per_call_field():
+    compiled = compile_template(TASK_GENERATION_PROMPT)
+    assert compiled.head_fields == ('constitution', 'goal')
+    assert compiled.tail.startswith("{phase}")
+    assert compile_template("{{x}} {goal}: {task:>5}").tail == "{task:>5}"
+    assert compile_template("{phase} {goal}").head_fields == ()
+
+def test_constitution_is_serialized_once_per_object():
+    text = constitution_text(CONSTITUTION)
+    assert constitution_text(CONSTITUTION) is text
+    assert constitution_text(dict(CONSTITUTION)) == text
+
+def test_cacheable_prefix_is_the_rendered_head(context):
+    prompt = render_prompt(STEP_GENERATION_PROMPT, context)
+    prefix = cacheable_prefix(prompt)
+    assert prefix and prompt.startswith(prefix)
+    assert context["goal"] in prefix and prefix.endswith('Current phase: "')
+    assert cacheable_prefix(prompt, min_chars=len(prefix) + 1) is None
+    assert cacheable_prefix("An unrelated prompt") is None
+
+def test_anthropic_sends_prefix_as_cached_block(context):
+    prompt = render_prompt(PHASE_GENERATION_PROMPT, context) + "\n\nReturn only JSON."
+    config = {'anthropic': {'model_name': 'claude-3-opus-20240229', 'prompt_cache_min_chars': 100}}
+    blocks = _message_params(prompt, config)["messages"][0]["content"]
+    assert blocks[0]["cache_control"] == {"type": "ephemeral"}
+    assert blocks[0]["text"] + blocks[1]["text"] == prompt
+
+    config['anthropic']['prompt_caching'] = False
+    assert _message_params(prompt, config)["messages"][0]["content"] == prompt
+    assert _message_params("Short prompt", {'anthropic': {}})["messages"][0]["content"] == "Short prompt"
+
+def test_cached_prompt_tokens_are_priced_at_cache_rate():
+    config = {'telemetry': {'pricing': {'claude': {'input_per_mtok': 10.0, 'output_per_mtok': 0.0}}}}
+    assert telemetry.estimate_cost(config, 'claude-x', 1_000_000, 0, cached_prompt_tokens=1_000_000) == pytest.approx(11.0)
+    config['telemetry']['pricing']['claude']['cached_input_per_mtok'] = 2.0
+    assert telemetry.estimate_cost(config, 'claude-x', 0, 0, cached_prompt_tokens=1_000_000) == pytest.approx(2.0)
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+
+# Module to test
+from ..qa_pipeline import QaPipeline
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def reviewed():
+    """Collects (task, steps) pairs in the order they were reviewed."""
+    return []
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_workers_review_concurrently_and_exit_drains(reviewed):
+    tracker = {'in_flight': 0, 'max': 0}
+
+    async def review(phase, task, steps):
+        tracker['in_flight'] += 1
+        tracker['max'] = max(tracker['max'], tracker['in_flight'])
+        await asyncio.sleep(0.01)
+        tracker['in_flight'] -= 1
+        reviewed.append((task, steps))
+
+    async with QaPipeline(review, workers=3) as pipeline:
+        for i in range(6):
+            await pipeline.submit("Phase", f"Task {i}", [i])
+        assert len(reviewed) < 6  # Submitting does not wait for review
+    assert sorted(reviewed) == [(f"Task {i}", [i]) for i in range(6)]
+    assert tracker['max'] == 3
+
+@pytest.mark.asyncio
+async def test_bounded_queue_applies_backpressure(reviewed):
+    release = asyncio.Event()
+
+    async def review(phase, task, steps):
+        await release.wait()
+        reviewed.append(task)
+
+    async with QaPipeline(review, workers=1, queue_size=1) as pipeline:
+        await pipeline.submit("Phase", "Task 1", [])  # Taken by the worker
+        await asyncio.sleep(0)
+        await pipeline.submit("Phase", "Task 2", [])  # Fills the queue
+        blocked = asyncio.ensure_future(pipeline.submit("Phase", "Task 3", []))
+        await asyncio.sleep(0.01)
+        assert not blocked.done() and pipeline.pending() == 1
+        release.set()
+        await blocked
+    assert reviewed == ["Task 1", "Task 2", "Task 3"]
+
+@pytest.mark.asyncio
+async def test_review_error_is_raised_when_draining(reviewed):
+    async def review(phase, task, steps):
+        if task == "bad":
+            raise RuntimeError("boom")
+        reviewed.append(task)
+
+    with pytest.raises(RuntimeError):
+        async with QaPipeline(review, workers=1) as pipeline:
+            await pipeline.submit("Phase", "bad", [])
+            await pipeline.submit("Phase", "skipped", [])
+    assert reviewed == []
+
+@pytest.mark.asyncio
+async def test_generation_error_finishes_queued_review(reviewed):
+    async def review(phase, task, steps):
+        await asyncio.sleep(0.01)
+        reviewed.append(task)
+
+    with pytest.raises(ValueError):
+        async with QaPipeline(review, workers=1) as pipeline:
+            for i in range(3):
+                await pipeline.submit("Phase", f"Task {i}", [])
+            raise ValueError("generation failed")
+    assert reviewed == ["Task 0", "Task 1", "Task 2"]
+
+@pytest.mark.asyncio
+async def test_cancellation_abandons_queued_review(reviewed):
+    async def review(phase, task, steps):
+        await asyncio.sleep(1)
+        reviewed.append(task)
+
+    with pytest.raises(asyncio.CancelledError):
+        async with QaPipeline(review, workers=1) as pipeline:
+            await pipeline.submit("Phase", "Task", [])
+            raise asyncio.CancelledError()
+    assert reviewed == []
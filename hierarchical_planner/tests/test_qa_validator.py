@@ -4,6 +4,7 @@ from unittest.mock import AsyncMock, MagicMock, patch, mock_open
 
 # Module to test
 from hierarchical_planner import qa_validator
+from hierarchical_planner.plan_model import Step
 from hierarchical_planner.exceptions import PlanValidationError, PlannerFileNotFoundError, FileReadError, JsonParsingError, FileWriteError, JsonSerializationError, ApiCallError
 
 # --- Test Fixtures ---
@@ -213,7 +214,6 @@ async def test_run_validation_success(mock_analyze, mock_validate, mock_config):
         file_handles = [
             MagicMock(),  # Handle for input file (plan)
             MagicMock(),  # Handle for goal file
-            MagicMock()   # Handle for output file
         ]
         mock_file.side_effect = file_handles
         
@@ -223,23 +223,26 @@ async def test_run_validation_success(mock_analyze, mock_validate, mock_config):
         file_handles[1].__enter__.return_value.read.return_value = goal_content
         
         # Set up the mocks for json operations
-        with patch('json.load', return_value=plan_content), patch('json.dump') as mock_json_dump:
+        with patch('json.load', return_value=plan_content), \
+                patch('hierarchical_planner.qa_validator.write_tree') as mock_write_tree:
             # Mock analyze function return value
             mock_analyze.return_value = annotated_content
             
             # Run the function under test
-            await qa_validator.run_validation(input_path, output_path, mock_config)
+            constitution = {"principles": []}
+            await qa_validator.run_validation(input_path, output_path, mock_config, constitution=constitution)
 
             # Check calls
-            assert mock_file.call_count >= 3  # Read plan, read goal, write output
+            assert mock_file.call_count == 2  # Read plan, read goal
             mock_validate.assert_called_once_with(plan_content)
-            mock_analyze.assert_called_once_with(plan_content, goal_content, mock_config)
+            mock_analyze.assert_called_once_with(plan_content, goal_content, mock_config, constitution, resume=True,
+                                                 input_path=input_path, output_path=output_path, provider=None)
             
-            # Check that json.dump was called with correct arguments
-            mock_json_dump.assert_called_once()
-            args, kwargs = mock_json_dump.call_args
-            assert args[0] == annotated_content  # First arg is the data to dump
-            assert kwargs.get('indent') == 2  # Check the indent parameter
+            # Check that the annotated plan was streamed to the output file
+            mock_write_tree.assert_called_once()
+            args, _ = mock_write_tree.call_args
+            assert args[0] == output_path
+            assert list(args[1]) == [("Phase 1", "Task 1", 0, {"step 1": "...", "qa_info": {}})]
 
 @pytest.mark.asyncio
 @patch('builtins.open', mock_open(read_data='invalid json'))
@@ -297,11 +300,167 @@ async def test_run_validation_write_error(mock_analyze, mock_validate, mock_file
     mock_file.side_effect = [
         mock_open(read_data=json.dumps(plan_content)).return_value, # Read plan
         mock_open(read_data=goal_content).return_value,           # Read goal
-        IOError("Cannot write")                                   # Write output fails
     ]
     mock_analyze.return_value = annotated_content
 
-    with pytest.raises(FileWriteError, match="Cannot write"):
-        await qa_validator.run_validation(input_path, output_path, mock_config)
+    with patch('hierarchical_planner.qa_validator.write_tree', side_effect=IOError("Cannot write")) as mock_write_tree:
+        with pytest.raises(FileWriteError, match="Cannot write"):
+            await qa_validator.run_validation(input_path, output_path, mock_config, constitution={"principles": []})
 
-    assert mock_file.call_count == 3 # Read plan, read goal, attempt write output
+    assert mock_file.call_count == 2 # Read plan, read goal
+    mock_write_tree.assert_called_once()
+
+# --- Test Cases for concurrent annotation ---
+
+@pytest.mark.asyncio
+async def test_analyze_annotate_runs_steps_concurrently(mocker, mock_config, valid_plan_data):
+    """Steps are analyzed in parallel up to qa.max_concurrency, with no fixed sleep."""
+    import asyncio
+    mock_config['qa'] = {'max_concurrency': 4}
+    in_flight = 0
+    peak = 0
+
+    async def fake_call(prompt_template, context, config, is_structured=True):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if prompt_template is qa_validator.RESOURCE_IDENTIFICATION_PROMPT:
+            return {"key_entities_dependencies": [context["prompt_text"]]}
+        return {"alignment_critique": "Good"}
+
+    mocker.patch('hierarchical_planner.qa_validator.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, fake_call))
+    mock_sleep = mocker.spy(qa_validator.asyncio, 'sleep')
+
+    annotated = await qa_validator.analyze_and_annotate_plan(valid_plan_data, "Test Goal", mock_config, {})
+
+    assert peak > 2  # both checks of several steps overlapped
+    assert all(call.args == (0.01,) for call in mock_sleep.call_args_list)
+    step = annotated["Phase 1"]["Task 1.1"][1]
+    assert step["qa_info"]["resource_analysis"] == {"key_entities_dependencies": ["Do thing B"]}
+    assert step["qa_info"]["step_critique"] == {"alignment_critique": "Good"}
+
+@pytest.mark.asyncio
+async def test_analyze_annotate_skips_completed_checks(mocker, mock_config, valid_plan_data):
+    """Checks already recorded in qa_info (results or errors) are not repeated on resume."""
+    valid_plan_data["Phase 1"]["Task 1.1"][0]["qa_info"] = {"resource_analysis": {}, "step_critique": {}}
+    valid_plan_data["Phase 1"]["Task 1.1"][1]["qa_info"] = {"resource_analysis_error": "API Error: x"}
+    fake_call = AsyncMock(return_value={"ok": True})
+    mocker.patch('hierarchical_planner.qa_validator.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, fake_call))
+
+    annotated = await qa_validator.analyze_and_annotate_plan(valid_plan_data, "Test Goal", mock_config, {})
+
+    # Step 1.1.2 only needs its critique; step 2.1.1 needs both checks
+    assert fake_call.await_count == 3
+    assert annotated["Phase 1"]["Task 1.1"][1]["qa_info"]["step_critique"] == {"ok": True}
+
+@pytest.mark.asyncio
+async def test_run_validation_saves_annotations_made_before_an_error(mocker, mock_config, valid_plan_data, tmp_path):
+    """After an unexpected error, the output keeps the qa_info recorded so far."""
+    import asyncio
+    input_path = tmp_path / "reasoning_tree.json"
+    output_path = tmp_path / "reasoning_tree_validated.json"
+    input_path.write_text(json.dumps(valid_plan_data))
+    (tmp_path / "task.txt").write_text("Test Goal")
+    mock_config['checkpoint'] = {'directory': str(tmp_path / "checkpoints")}
+
+    async def fake_call(prompt_template, context, config, is_structured=True):
+        if "Do thing C" in json.dumps(context):
+            await asyncio.sleep(0.05)  # Let Task 1.1 finish first
+        return {"ok": True}
+    mocker.patch('hierarchical_planner.qa_validator.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, fake_call))
+
+    def record_progress(input_path, updates):
+        if updates[0][1][2] == "Task 2.1":
+            raise RuntimeError("Checkpoint disk full")
+        return None
+    mocker.patch.object(qa_validator.CheckpointManager, 'record_qa_progress', side_effect=record_progress)
+
+    await qa_validator.run_validation(str(input_path), str(output_path), mock_config, resume=False,
+                                      constitution={"principles": []})
+
+    saved = json.loads(output_path.read_text())
+    for step in saved["Phase 1"]["Task 1.1"]:
+        assert step["qa_info"] == {"resource_analysis": {"ok": True}, "step_critique": {"ok": True}}
+
+# --- Test Cases for batched annotation ---
+
+def _batched_fake_call(broken_keys=()):
+    """Returns a fake call_with_retry answering batched prompts per step key."""
+    async def fake_call(prompt_template, context, config, is_structured=True):
+        if prompt_template in (qa_validator.BATCH_RESOURCE_IDENTIFICATION_PROMPT, qa_validator.BATCH_ALIGNMENT_CHECK_PROMPT):
+            keys = json.loads(context["steps_json"]).keys()
+            return {key: {"batched": True} for key in keys if key not in broken_keys}
+        return {"batched": False}
+    return AsyncMock(side_effect=fake_call)
+
+@pytest.mark.asyncio
+async def test_validate_steps_batches_a_task_into_two_calls(mocker, mock_config):
+    """Ten steps cost one request per prompt type instead of twenty."""
+    mock_config['qa'] = {'batch_size': 10}
+    fake_call = _batched_fake_call()
+    mocker.patch('hierarchical_planner.qa_validator.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, fake_call))
+    steps = [{f"step {i}": f"Do thing {i}"} for i in range(1, 11)]
+
+    result = await qa_validator.validate_steps(steps, "Goal", "Phase 1", "Task 1", mock_config, {})
+
+    assert fake_call.await_count == 2
+    assert all(step["qa_info"]["resource_analysis"] == {"batched": True} for step in result)
+    assert all(step["qa_info"]["step_critique"] == {"batched": True} for step in result)
+
+@pytest.mark.asyncio
+async def test_batched_answer_missing_steps_falls_back_per_step(mocker, mock_config):
+    """Steps absent from a batched answer are re-analyzed individually."""
+    mock_config['qa'] = {'batch_size': 10}
+    fake_call = _batched_fake_call(broken_keys={"step 2"})
+    mocker.patch('hierarchical_planner.qa_validator.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, fake_call))
+    steps = [{f"step {i}": f"Do thing {i}"} for i in range(1, 4)]
+
+    result = await qa_validator.validate_steps(steps, "Goal", "Phase 1", "Task 1", mock_config, {})
+
+    assert fake_call.await_count == 4  # two batches plus two per-step fallbacks
+    assert result[1]["qa_info"]["resource_analysis"] == {"batched": False}
+    assert result[2]["qa_info"]["step_critique"] == {"batched": True}
+
+@pytest.mark.asyncio
+async def test_malformed_batched_response_falls_back_per_step(mocker, mock_config):
+    """A non-object batched answer (or a failing batch call) triggers per-step calls."""
+    mock_config['qa'] = {'batch_size': 10}
+
+    async def fake_call(prompt_template, context, config, is_structured=True):
+        if prompt_template is qa_validator.BATCH_RESOURCE_IDENTIFICATION_PROMPT:
+            return ["not", "an", "object"]
+        if prompt_template is qa_validator.BATCH_ALIGNMENT_CHECK_PROMPT:
+            raise ApiCallError("batch failed")
+        return {"single": True}
+
+    mock_call = AsyncMock(side_effect=fake_call)
+    mocker.patch('hierarchical_planner.qa_validator.select_llm_client', new_callable=AsyncMock,
+                 return_value=(None, None, mock_call))
+    steps = [{"step 1": "A"}, {"step 2": "B"}]
+
+    result = await qa_validator.validate_steps(steps, "Goal", "Phase 1", "Task 1", mock_config, {})
+
+    assert mock_call.await_count == 6
+    for step in result:
+        assert step["qa_info"] == {"resource_analysis": {"single": True}, "step_critique": {"single": True}}
+
+def test_plan_batches_respects_context_budget_and_duplicate_keys():
+    """Batches shrink for long prompts and never contain the same step key twice."""
+    items = [Step(f"step {i}", "x" * 400, index=i) for i in range(6)]
+    config = {'qa': {'batch_size': 10, 'batch_context_tokens': 350, 'batch_output_tokens': 8192}}
+    batches = qa_validator._plan_batches(items, "template", "", config)
+    assert [len(batch) for batch in batches] == [3, 3]
+
+    duplicates = [Step("step 1", "a", index=0), Step("step 1", "b", index=1), Step("step 2", "c", index=2)]
+    batches = qa_validator._plan_batches(duplicates, "template", "", {'qa': {'batch_size': 10}})
+    assert [[step.index for step in batch] for batch in batches] == [[0], [1, 2]]
+
+    config = {'qa': {'batch_size': 10, 'batch_output_tokens': 500}}
+    assert [len(b) for b in qa_validator._plan_batches(items, "t", "", config)] == [2, 2, 2]
@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import AsyncMock
+
+# Module to test
+from .. import rate_limiter
+from .. import gemini_client
+from ..rate_limiter import TokenBucketLimiter, get_rate_limiter
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def clock(mocker):
+    """Replaces the limiter's monotonic clock with a controllable one."""
+    now = [1000.0]
+    mocker.patch('hierarchical_planner.rate_limiter.time.monotonic', side_effect=lambda: now[0])
+    return now
+
+@pytest.fixture(autouse=True)
+def reset_limiters():
+    """Ensures every test starts without shared limiter state."""
+    rate_limiter._limiters.clear()
+    yield
+    rate_limiter._limiters.clear()
+
+# --- Test Cases ---
+
+def test_burst_is_free_then_requests_are_paced(clock):
+    """Requests within the burst pass immediately; later ones wait for refill."""
+    limiter = TokenBucketLimiter(requests_per_sec=2.0, burst=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.5)
+    assert limiter.reserve() == pytest.approx(1.0)
+    clock[0] += 1.0  # refills the two tokens already owed
+    assert limiter.reserve() == pytest.approx(0.5)
+
+def test_rate_limit_error_backs_off_and_recovers(clock):
+    """A 429 halves the rate and imposes a cooldown; successes restore the rate."""
+    limiter = TokenBucketLimiter(requests_per_sec=4.0, burst=4, cooldown_sec=3.0, recovery_step=0.25)
+    limiter.on_rate_limited()
+    assert limiter.rate == pytest.approx(2.0)
+    assert limiter.reserve() == pytest.approx(3.0)  # cooldown dominates
+
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(3.0)
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(4.0)  # never exceeds the configured rate
+
+def test_rate_never_drops_below_minimum(clock):
+    """Repeated backoffs stop at min_requests_per_sec."""
+    limiter = TokenBucketLimiter(requests_per_sec=1.0, min_requests_per_sec=0.2)
+    for _ in range(10):
+        limiter.on_rate_limited()
+    assert limiter.rate == pytest.approx(0.2)
+
+def test_get_rate_limiter_is_shared_per_provider():
+    """The same limiter is returned until the provider's settings change."""
+    config = {'rate_limits': {'gemini': {'requests_per_sec': 2, 'burst': 3}}}
+    first = get_rate_limiter(config, 'gemini')
+    assert first is get_rate_limiter(config, 'gemini')
+    assert first.burst == 3
+    assert get_rate_limiter(config, 'anthropic') is None
+    assert get_rate_limiter({}, 'gemini') is None
+
+    config['rate_limits']['gemini']['requests_per_sec'] = 5
+    assert get_rate_limiter(config, 'gemini') is not first
+
+@pytest.mark.asyncio
+async def test_gemini_retry_reports_rate_limits_to_limiter(mocker):
+    """call_gemini_with_retry paces each attempt and backs off on 429 errors."""
+    config = {
+        'api': {'retries': 2},
+        'rate_limits': {'gemini': {'requests_per_sec': 100, 'burst': 10, 'cooldown_sec': 0}}
+    }
+    mocker.patch('hierarchical_planner.gemini_client.asyncio.sleep', new_callable=AsyncMock)
+    mocker.patch('hierarchical_planner.gemini_client.generate_structured_content', new_callable=AsyncMock,
+                 side_effect=[Exception("429 Resource has been exhausted"), {"ok": True}])
+    limiter = get_rate_limiter(config, 'gemini')
+    acquire = mocker.spy(limiter, 'acquire')
+    backoff = mocker.spy(limiter, 'on_rate_limited')
+
+    result = await gemini_client.call_gemini_with_retry("Prompt {x}", {"x": 1}, config)
+
+    assert result == {"ok": True}
+    assert acquire.call_count == 2
+    assert backoff.call_count == 1
+    assert limiter.rate < limiter.max_rate
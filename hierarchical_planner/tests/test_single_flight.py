@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+# Module to test
+from .. import single_flight
+from .. import telemetry
+from .. import llm_client_selector
+from ..single_flight import SingleFlight, coalesce_calls
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def slow_call():
+    """Provides a call_with_retry that takes a moment and returns a fresh dict per call."""
+    async def call(prompt_template, context, config, is_structured=True):
+        await asyncio.sleep(0.01)
+        return {"prompt": prompt_template.format(**context), "notes": []}
+    return AsyncMock(side_effect=call)
+
+def _settings(config):
+    return config.get('model'), config.get('temperature')
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_request(slow_call):
+    """Concurrent identical calls reach the provider once; each caller gets its own copy."""
+    call = coalesce_calls('mock', slow_call, _settings)
+    results = await asyncio.gather(*(call("P {x}", {"x": 1}, {}) for _ in range(5)))
+
+    assert slow_call.await_count == 1
+    assert all(r == {"prompt": "P 1", "notes": []} for r in results)
+    results[0]["notes"].append("qa")
+    assert results[1]["notes"] == []
+    assert single_flight.get_single_flight().in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_different_requests_are_not_merged(slow_call):
+    """Calls differing in prompt, model, temperature or structure each reach the provider."""
+    call = coalesce_calls('mock', slow_call, _settings)
+    await asyncio.gather(
+        call("P {x}", {"x": 1}, {}),
+        call("P {x}", {"x": 2}, {}),
+        call("P {x}", {"x": 1}, {'model': 'other'}),
+        call("P {x}", {"x": 1}, {'temperature': 0.2}),
+        call("P {x}", {"x": 1}, {}, is_structured=False),
+    )
+    assert slow_call.await_count == 5
+
+@pytest.mark.asyncio
+async def test_sequential_calls_and_disabled_coalescing(slow_call):
+    """Only overlapping calls are merged, and coalescing can be switched off."""
+    call = coalesce_calls('mock', slow_call, _settings)
+    await call("P {x}", {"x": 1}, {})
+    await call("P {x}", {"x": 1}, {})
+    assert slow_call.await_count == 2
+
+    disabled = {'coalesce': {'enabled': False}}
+    await asyncio.gather(call("P {x}", {"x": 1}, disabled), call("P {x}", {"x": 1}, disabled))
+    assert slow_call.await_count == 4
+
+@pytest.mark.asyncio
+async def test_errors_are_shared():
+    """Every waiting caller receives the leader's exception."""
+    failing = AsyncMock(side_effect=[ValueError("boom")])
+    group = SingleFlight()
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        return await failing()
+
+    results = await asyncio.gather(group.run("k", factory), group.run("k", factory), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert failing.await_count == 1
+
+@pytest.mark.asyncio
+async def test_cancelling_the_leader_does_not_cancel_followers():
+    """A cancelled caller leaves the request running for the others; it stops once all have gone."""
+    group = SingleFlight()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def factory():
+        started.set()
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(group.run("k", factory))
+    await started.wait()
+    follower = asyncio.create_task(group.run("k", factory))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await follower == ("done", True)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    release.clear()
+    only = asyncio.create_task(group.run("k2", factory))
+    await asyncio.sleep(0)
+    only.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await only
+    await asyncio.sleep(0)
+    assert group.in_flight() == 0
+
+@pytest.mark.asyncio
+async def test_selector_coalesces_and_records_shared_calls():
+    """Calls through the selected client are coalesced and counted as such in telemetry."""
+    telemetry.get_registry().reset()
+    config = {'mock': {'latency_ms': 20, 'jitter_ms': 0, 'retry_delay_sec': 0}}
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(config, 'mock')
+    await asyncio.gather(*(call_with_retry("Goal: {goal}", {"goal": "g"}, config) for _ in range(3)))
+
+    [series] = telemetry.get_registry().snapshot()
+    assert series['calls'] == 3 and series['coalesced'] == 2
+    assert series['attempts'] == 1
+    telemetry.get_registry().reset()
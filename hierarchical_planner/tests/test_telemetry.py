@@ -0,0 +1,146 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+# Module to test
+from .. import telemetry
+from .. import llm_client_selector
+from .. import mock_client
+
+# --- Test Fixtures ---
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    """Ensures every test starts with no recorded metrics."""
+    telemetry.get_registry().reset()
+    yield
+    telemetry.get_registry().reset()
+
+@pytest.fixture
+def mock_config():
+    """Provides a config for the mock provider with pricing for its calls."""
+    return {
+        'mock': {'latency_ms': 0, 'jitter_ms': 0, 'retry_delay_sec': 0},
+        'telemetry': {'pricing': {'unknown': {'input_per_mtok': 1_000_000, 'output_per_mtok': 0}}},
+    }
+
+def _series(**labels):
+    matches = [s for s in telemetry.get_registry().snapshot()
+               if all(s[k] == v for k, v in labels.items())]
+    assert len(matches) == 1, telemetry.get_registry().snapshot()
+    return matches[0]
+
+# --- Test Cases ---
+
+@pytest.mark.asyncio
+async def test_tags_nest_and_follow_tasks():
+    """Tags merge over enclosing tags and are inherited by tasks created inside the block."""
+    with telemetry.tagged(role='planner'):
+        with telemetry.tagged(level='task'):
+            inherited = await asyncio.create_task(asyncio.sleep(0, result=telemetry.current_tags()))
+        assert telemetry.current_tags() == {'role': 'planner'}
+    assert inherited == {'role': 'planner', 'level': 'task'}
+    assert telemetry.current_tags() == {}
+
+@pytest.mark.asyncio
+async def test_calls_are_recorded_per_role_and_level(mock_config):
+    """Each call is counted under its tags with latency, estimated tokens and cost."""
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(mock_config, 'mock')
+    with telemetry.tagged(role='planner', level='step'):
+        await call_with_retry("Goal: {goal}", {"goal": "abcd" * 10}, mock_config)
+        await call_with_retry("Goal: {goal}", {"goal": "other"}, mock_config)
+    with telemetry.tagged(role='qa_validator', level='step'):
+        await call_with_retry("Check: {goal}", {"goal": "x"}, mock_config)
+
+    planner = _series(role='planner', level='step')
+    assert planner['provider'] == 'mock' and planner['calls'] == 2
+    assert planner['attempts'] == 2 and planner['retries'] == 0
+    assert planner['estimated_token_calls'] == 2
+    assert planner['prompt_tokens'] == len("Goal: " + "abcd" * 10) // 4 + len("Goal: other") // 4
+    assert planner['cost_usd'] == pytest.approx(planner['prompt_tokens'])
+    assert sum(planner['latency_buckets']) == 2
+    assert _series(role='qa_validator')['calls'] == 1
+
+@pytest.mark.asyncio
+async def test_retries_errors_and_cache_hits(mock_config, tmp_path):
+    """Retried attempts, failed calls and cache hits are counted; cache hits cost nothing."""
+    mock_config['mock']['rate_limit_probability'] = 1.0
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(mock_config, 'mock')
+    with pytest.raises(Exception):
+        await call_with_retry("P {x}", {"x": 1}, mock_config)
+    failed = _series()
+    assert failed['errors'] == 1 and failed['retries'] == mock_client.DEFAULT_MOCK_SETTINGS['retries'] - 1
+
+    telemetry.get_registry().reset()
+    mock_config['mock']['rate_limit_probability'] = 0.0
+    mock_config['cache'] = {'enabled': True, 'directory': str(tmp_path / "cache")}
+    await call_with_retry("P {x}", {"x": 2}, mock_config)
+    await call_with_retry("P {x}", {"x": 2}, mock_config)
+    cached = _series()
+    assert cached['calls'] == 2 and cached['cache_hits'] == 1
+    # Only the first call is paid for: "P 2" is estimated at the minimum of one prompt token
+    assert cached['cost_usd'] == pytest.approx(1.0)
+
+@pytest.mark.asyncio
+async def test_reported_usage_replaces_estimate(mocker):
+    """Token counts reported by the provider response are used instead of estimates."""
+    client = MagicMock()
+    response = SimpleNamespace(content=[SimpleNamespace(type="text", text='{"ok": true}')],
+                               usage=SimpleNamespace(input_tokens=1200, output_tokens=300))
+    client.messages.create = AsyncMock(return_value=response)
+    mocker.patch('hierarchical_planner.anthropic_client.get_anthropic_client', return_value=client)
+    config = {
+        'anthropic': {'api_key': 'key', 'model_name': 'claude-3-opus-20240229', 'retries': 1},
+        'telemetry': {'pricing': {'claude-3-opus': {'input_per_mtok': 15.0, 'output_per_mtok': 75.0}}},
+    }
+    _, _, call_with_retry = await llm_client_selector.select_llm_client(config, 'anthropic')
+    await call_with_retry("Prompt {x}", {"x": 1}, config)
+
+    series = _series(provider='anthropic')
+    assert (series['prompt_tokens'], series['completion_tokens']) == (1200, 300)
+    assert series['estimated_token_calls'] == 0
+    assert series['cost_usd'] == pytest.approx((1200 * 15.0 + 300 * 75.0) / 1_000_000)
+
+@pytest.mark.asyncio
+async def test_streamed_calls_are_recorded(mock_config):
+    """Streaming calls are recorded once complete; abandoned streams are not."""
+    stream_items = await llm_client_selector.select_streaming_client(mock_config, 'mock')
+    prompt = 'break this goal down into the major, distinct phases {x}'
+    with telemetry.tagged(role='planner', level='phase'):
+        items = [item async for item in stream_items(prompt, {"x": 1}, mock_config, "phases")]
+        stream = stream_items(prompt, {"x": 2}, mock_config, "phases")
+        await stream.__anext__()
+        await stream.aclose()
+    assert len(items) == 3
+    series = _series(role='planner', level='phase')
+    assert series['calls'] == 1 and series['errors'] == 0
+
+def test_write_metrics_json_and_prometheus(tmp_path):
+    """Metrics are written in both formats with cumulative histogram buckets."""
+    with telemetry.tagged(role='planner', level='task'):
+        call, token = telemetry.start_call('gemini', 'gemini-2.5-pro', "prompt text")
+    telemetry.note_attempt()
+    telemetry.note_attempt()
+    telemetry.note_usage(100, 20)
+    telemetry.finish_call({}, call, token, {"tasks": []})
+    config = {'telemetry': {'json_file': str(tmp_path / "m.json"), 'prometheus_file': str(tmp_path / "m.prom")}}
+
+    assert telemetry.write_metrics(config) == [str(tmp_path / "m.json"), str(tmp_path / "m.prom")]
+    data = json.loads((tmp_path / "m.json").read_text())
+    assert data['totals']['calls'] == 1 and data['totals']['retries'] == 1
+    assert data['series'][0]['prompt_tokens'] == 100
+
+    prom = (tmp_path / "m.prom").read_text()
+    labels = 'provider="gemini",model="gemini-2.5-pro",role="planner",level="task"'
+    assert f'llm_calls_total{{{labels}}} 1' in prom
+    assert f'llm_call_latency_seconds_bucket{{{labels},le="+Inf"}} 1' in prom
+    assert '# TYPE llm_call_latency_seconds histogram' in prom
+
+def test_disabled_telemetry_writes_nothing(tmp_path):
+    call, token = telemetry.start_call('gemini', 'm', "p")
+    telemetry.finish_call({}, call, token, "r")
+    config = {'telemetry': {'enabled': False, 'json_file': str(tmp_path / "m.json")}}
+    assert telemetry.write_metrics(config) == []
+    assert not (tmp_path / "m.json").exists()
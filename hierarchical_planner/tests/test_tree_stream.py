@@ -0,0 +1,135 @@
+import json
+import os
+import stat
+import tracemalloc
+
+import pytest
+
+# Module to test
+from hierarchical_planner import tree_stream
+from hierarchical_planner.tree_stream import TreeItem, TreeWriter, iter_tree, tree_items, write_tree
+from hierarchical_planner.qa_validator import validate_plan_file
+from hierarchical_planner.exceptions import JsonParsingError, PlanValidationError
+
+# --- Test Fixtures ---
+
+@pytest.fixture
+def tree():
+    """Provides a tree with annotations, non-ASCII text, an empty task and an empty phase."""
+    return {
+        "Phase 1": {
+            "Task 1.1": [
+                {"step 1": "Write \"main.py\"\nthen test it ✓", "qa_info": {"scores": [1, 2.5, None], "notes": {}}},
+                {"step 2": "Do thing B"},
+            ],
+            "Task 1.2": [],
+        },
+        "Phase 2": {},
+        "Phase/3": {"Task ~3": [{"step 1": "Last"}]},
+    }
+
+@pytest.fixture
+def tree_file(tmp_path, tree):
+    """Writes the tree the way the planner used to, with json.dump(indent=2)."""
+    path = tmp_path / "reasoning_tree.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tree, f, indent=2, ensure_ascii=False)
+    return path
+
+# --- Test Cases ---
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 17, tree_stream.DEFAULT_CHUNK_SIZE])
+def test_iter_tree_yields_steps_and_placeholders(tree_file, tree, chunk_size):
+    """Items come in file order, independent of how the file is chunked."""
+    items = list(iter_tree(str(tree_file), chunk_size=chunk_size))
+    assert items == list(tree_items(tree))
+    assert items[2] == TreeItem("Phase 1", "Task 1.2", None, None)
+    assert items[3] == TreeItem("Phase 2", None, None, None)
+
+def test_writer_output_matches_json_dump(tree_file, tmp_path):
+    """Streaming a file through the writer reproduces it byte for byte."""
+    out = tmp_path / "copy.json"
+    assert write_tree(str(out), iter_tree(str(tree_file), chunk_size=5)) == 3
+    assert out.read_bytes() == tree_file.read_bytes()
+
+def test_writer_empty_tree(tmp_path):
+    """An empty tree is written as '{}', like json.dump."""
+    out = tmp_path / "empty.json"
+    write_tree(str(out), [])
+    assert out.read_text() == json.dumps({}, indent=2)
+
+def test_writer_add_task(tmp_path, tree):
+    """Whole tasks can be written at once."""
+    out = tmp_path / "tasks.json"
+    with TreeWriter(str(out)) as writer:
+        for phase, tasks in tree.items():
+            if not tasks:
+                writer.add(TreeItem(phase, None, None, None))
+            for task, steps in tasks.items():
+                writer.add_task(phase, task, steps)
+    assert json.loads(out.read_text(encoding='utf-8')) == tree
+
+def test_writer_rejects_ungrouped_items(tmp_path):
+    """Returning to a closed phase is an error, and the target file is left untouched."""
+    out = tmp_path / "tree.json"
+    out.write_text("previous")
+    items = [TreeItem("P1", "T1", 0, {"step 1": "a"}), TreeItem("P2", "T1", 0, {"step 1": "b"}),
+             TreeItem("P1", "T2", 0, {"step 1": "c"})]
+    with pytest.raises(ValueError, match="grouped by phase"):
+        write_tree(str(out), items)
+    assert out.read_text() == "previous"
+    assert [p.name for p in tmp_path.iterdir()] == ["tree.json"]
+
+def test_writer_file_permissions(tmp_path, tree):
+    """New files get the umask's permissions, like open() would; replaced files keep theirs."""
+    out = tmp_path / "tree.json"
+    umask = os.umask(0o022)
+    try:
+        write_tree(str(out), tree_items(tree))
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(out.stat().st_mode) == 0o644
+    out.chmod(0o640)
+    write_tree(str(out), tree_items(tree))
+    assert stat.S_IMODE(out.stat().st_mode) == 0o640
+
+@pytest.mark.parametrize("content, error, message", [
+    ('{"P": {"T": [{"step 1": "a"} {"step 2": "b"}]}}', JsonParsingError, "Expected ',' or ']'"),
+    ('{"P": {"T": [{"step 1": "a"}', JsonParsingError, "Expected ',' or ']'"),
+    ('{"P": {"T": []}} trailing', JsonParsingError, "Extra data"),
+    ('["not", "a", "tree"]', PlanValidationError, "/: the reasoning tree must be a dictionary, got list"),
+    ('{"P": {"T": {"step 1": "a"}}}', PlanValidationError, "/P/T: the steps of a task must be a list, got dict"),
+])
+def test_iter_tree_errors(tmp_path, content, error, message):
+    """Syntax errors and containers of the wrong type are reported."""
+    path = tmp_path / "bad.json"
+    path.write_text(content)
+    with pytest.raises(error, match=message):
+        list(iter_tree(str(path), chunk_size=4))
+
+def test_iter_tree_memory_is_bounded(tmp_path):
+    """Peak memory while streaming stays far below the size of the file."""
+    path = tmp_path / "large.json"
+    tree = {f"Phase {p}": {f"Task {t}": [{f"step {s}": "x" * 200} for s in range(50)] for t in range(20)}
+            for p in range(10)}
+    path.write_text(json.dumps(tree, indent=2))
+    size = path.stat().st_size
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_tree(str(path)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 10 * 20 * 50
+    assert peak < size / 5
+
+def test_validate_plan_file(tmp_path, tree_file):
+    """Streaming validation reports the same messages as validate_plan_structure."""
+    assert validate_plan_file(str(tree_file)) == (3, [])
+    bad = tmp_path / "bad.json"
+    bad.write_text(json.dumps({"P": {"T": [{"step 1": ""}, "text", {"step 3": "ok"}]}}))
+    count, errors = validate_plan_file(str(bad))
+    assert count == 3
+    assert len(errors) == 2
+    assert "Step 1 value ('step 1') in Task 'T', Phase 'P' must be a non-empty string" in errors[0]
+    assert "Step 2 in Task 'T', Phase 'P' must be a dictionary" in errors[1]
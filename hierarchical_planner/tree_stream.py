@@ -0,0 +1,339 @@
+"""
+Streaming reader and writer for reasoning tree files.
+
+`json.load` materializes a whole `reasoning_tree.json` before anything can
+use it, which for multi-hundred-MB plans costs several times the file size
+in memory. `iter_tree` instead reads the file in chunks and yields one
+`TreeItem` per step, holding only the step being parsed:
+
+    for phase, task, index, step in iter_tree("reasoning_tree.json"):
+        ...
+
+Items come in file order, so the steps of a task (and the tasks of a phase)
+are contiguous and can be grouped with `itertools.groupby`. A task without
+steps is yielded once with `index` and `step` set to None, and a phase
+without tasks with `task` set to None as well, so no part of the tree is
+lost.
+
+`TreeWriter` consumes the same items and writes them out incrementally,
+producing exactly the bytes `json.dump(tree, f, indent=2, ensure_ascii=False)`
+would. The output goes to a temporary file that replaces the target only
+once it is complete, so readers never see a torn tree.
+"""
+import json
+import logging
+import os
+import stat
+import tempfile
+from typing import Dict, Any, Iterable, Iterator, List, NamedTuple, Optional, Set, TextIO, Tuple
+
+from .exceptions import JsonParsingError, PlanValidationError
+from .plan_schema import json_pointer
+
+# Configure logger for this module
+logger = logging.getLogger(__name__)
+
+# Characters read from the file at a time
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = ' \t\r\n'
+_decoder = json.JSONDecoder()
+
+
+def _target_mode(path: str) -> int:
+    """Permissions for a file replacing `path`: those of the existing file, else what `open` would create."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class TreeItem(NamedTuple):
+    """A step of a reasoning tree, or a placeholder for an empty task (step None) or phase (task None)."""
+    phase: str
+    task: Optional[str]
+    index: Optional[int]
+    step: Any
+
+
+class _Reader:
+    """Chunked JSON token reader over a text file."""
+
+    def __init__(self, f: TextIO, chunk_size: int):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._consumed = 0  # Characters dropped from the front of the buffer
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Reads more text; returns False at end of file."""
+        if self._eof:
+            return False
+        # Reading at least as much as is buffered keeps re-parsing a long value linear
+        chunk = self._file.read(max(self._chunk_size, len(self._buf) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        self._consumed += self._pos
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message: str) -> JsonParsingError:
+        return JsonParsingError(f"{message} at char {self._consumed + self._pos} of {self._file.name!r}")
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos:self._pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """Consumes and returns the next character, which must be one of `chars`."""
+        c = self.peek()
+        if not c or c not in chars:
+            raise self._error(f"Expected {' or '.join(repr(ch) for ch in chars)}, found {c or 'end of file'!r}")
+        self._pos += 1
+        return c
+
+    def value(self) -> Any:
+        """Parses and consumes the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise self._error(f"Invalid JSON ({e.msg})") from None
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return obj
+
+    def key(self) -> str:
+        """Parses an object key and the ':' after it."""
+        if self.peek() != '"':
+            raise self._error("Expected an object key")
+        key = self.value()
+        self.expect(':')
+        return key
+
+    def members(self) -> Iterator[str]:
+        """Yields the keys of an object whose '{' was consumed; the caller consumes each value."""
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            yield self.key()
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self) -> Iterator[int]:
+        """Yields the indices of an array whose '[' was consumed; the caller consumes each element."""
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.expect(',]') == ']':
+                return
+
+    def open(self, bracket: str, path: Tuple[str, ...], what: str) -> None:
+        """Consumes the opening bracket of a container the tree requires at `path`."""
+        if self.peek() != bracket:
+            found = type(self.value()).__name__  # Raises JsonParsingError on a syntax error
+            raise PlanValidationError(f"{json_pointer(path) or '/'}: {what}, got {found}.")
+        self._pos += 1
+
+
+def iter_tree(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[TreeItem]:
+    """
+    Yields the steps of a reasoning tree file without loading the whole tree.
+
+    Only the containers are checked while reading (phases are objects, tasks
+    are arrays); steps are yielded as parsed. Use `plan_schema.validate_plan`
+    on each step for a full structural check.
+
+    Raises:
+        FileNotFoundError, OSError: If the file cannot be read.
+        JsonParsingError: If the file is not valid JSON.
+        PlanValidationError: If a container has the wrong type.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _Reader(f, chunk_size)
+        reader.open('{', (), "the reasoning tree must be a dictionary")
+        for phase in reader.members():
+            reader.open('{', (phase,), "the tasks of a phase must be a dictionary")
+            has_tasks = False
+            for task in reader.members():
+                has_tasks = True
+                reader.open('[', (phase, task), "the steps of a task must be a list")
+                has_steps = False
+                for index in reader.elements():
+                    has_steps = True
+                    yield TreeItem(phase, task, index, reader.value())
+                if not has_steps:
+                    yield TreeItem(phase, task, None, None)
+            if not has_tasks:
+                yield TreeItem(phase, None, None, None)
+        if reader.peek():
+            raise reader._error("Extra data after the reasoning tree")
+
+
+def tree_items(tree: Dict[str, Any]) -> Iterator[TreeItem]:
+    """Yields the items of an in-memory reasoning tree, as `iter_tree` would for its file."""
+    for phase, tasks in tree.items():
+        if not tasks:
+            yield TreeItem(phase, None, None, None)
+            continue
+        for task, steps in tasks.items():
+            if not steps:
+                yield TreeItem(phase, task, None, None)
+                continue
+            for index, step in enumerate(steps):
+                yield TreeItem(phase, task, index, step)
+
+
+class TreeWriter:
+    """
+    Writes a reasoning tree file from `TreeItem`s, one step at a time.
+
+        with TreeWriter("reasoning_tree.json") as writer:
+            for item in items:
+                writer.add(item)
+
+    Items must be grouped like `iter_tree` yields them: all tasks of a phase,
+    and all steps of a task, contiguous. The target file is replaced when the
+    block exits normally and left untouched if it raises.
+    """
+
+    def __init__(self, path: str, indent: int = 2):
+        self.path = path
+        self.steps_written = 0
+        self._pad = [' ' * (indent * level) for level in range(4)]
+        self._indent = indent
+        self._file: Optional[TextIO] = None
+        self._tmp_path = ""
+        self._phase: Optional[str] = None
+        self._task: Optional[str] = None
+        self._seen_phases: Set[str] = set()
+        self._seen_tasks: Set[str] = set()
+        self._has_phases = False
+        self._has_tasks = False
+        self._has_steps = False
+
+    def __enter__(self) -> "TreeWriter":
+        directory = os.path.dirname(self.path) or "."
+        fd, self._tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        self._file = os.fdopen(fd, 'w', encoding='utf-8')
+        self._file.write('{')
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+        return False
+
+    def add(self, item: TreeItem) -> None:
+        """
+        Writes one item.
+
+        Raises:
+            ValueError: If the item's phase or task was already closed.
+        """
+        if item.phase != self._phase:
+            if item.phase in self._seen_phases:
+                raise ValueError(f"Phase '{item.phase}' was already written; items must be grouped by phase.")
+            self._close_phase()
+            self._open_phase(item.phase)
+        if item.task is None:
+            return
+        if item.task != self._task:
+            if item.task in self._seen_tasks:
+                raise ValueError(f"Task '{item.task}' of phase '{item.phase}' was already written; items must be grouped by task.")
+            self._close_task()
+            self._open_task(item.task)
+        if item.index is not None:
+            self._write_step(item.step)
+
+    def add_task(self, phase: str, task: str, steps: List[Any]) -> None:
+        """Writes a whole task."""
+        if not steps:
+            self.add(TreeItem(phase, task, None, None))
+        for index, step in enumerate(steps):
+            self.add(TreeItem(phase, task, index, step))
+
+    def close(self) -> None:
+        """Finishes the document and moves it into place."""
+        if self._file is None:
+            return
+        self._close_phase()
+        self._file.write('\n}' if self._has_phases else '}')
+        self._file.close()
+        self._file = None
+        # mkstemp creates the file private (0600); give it the permissions a plain write would
+        os.chmod(self._tmp_path, _target_mode(self.path))
+        os.replace(self._tmp_path, self.path)
+        logger.debug(f"Wrote {self.steps_written} steps to {self.path}")
+
+    def _abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def _open_phase(self, phase: str) -> None:
+        self._file.write((',\n' if self._has_phases else '\n') + self._pad[1] + json.dumps(phase, ensure_ascii=False) + ': {')
+        self._phase = phase
+        self._seen_phases.add(phase)
+        self._seen_tasks = set()
+        self._has_phases = True
+        self._has_tasks = False
+
+    def _open_task(self, task: str) -> None:
+        self._file.write((',\n' if self._has_tasks else '\n') + self._pad[2] + json.dumps(task, ensure_ascii=False) + ': [')
+        self._task = task
+        self._seen_tasks.add(task)
+        self._has_tasks = True
+        self._has_steps = False
+
+    def _write_step(self, step: Any) -> None:
+        # Newlines inside JSON strings are escaped, so every newline here is layout
+        text = json.dumps(step, indent=self._indent, ensure_ascii=False).replace('\n', '\n' + self._pad[3])
+        self._file.write((',\n' if self._has_steps else '\n') + self._pad[3] + text)
+        self._has_steps = True
+        self.steps_written += 1
+
+    def _close_task(self) -> None:
+        if self._task is None:
+            return
+        self._file.write(('\n' + self._pad[2] + ']') if self._has_steps else ']')
+        self._task = None
+
+    def _close_phase(self) -> None:
+        if self._phase is None:
+            return
+        self._close_task()
+        self._file.write(('\n' + self._pad[1] + '}') if self._has_tasks else '}')
+        self._phase = None
+
+
+def write_tree(path: str, items: Iterable[TreeItem], indent: int = 2) -> int:
+    """Writes a reasoning tree file from items and returns the number of steps written."""
+    with TreeWriter(path, indent) as writer:
+        for item in items:
+            writer.add(item)
+    return writer.steps_written
@@ -3,31 +3,34 @@ import warnings
 import json # Added for config file loading
 from typing import List, Dict, Optional, Any, Literal, Tuple
 
+try:
+    from .http_pool import async_client_options, current_loop
+    from .lazy_imports import lazy_import
+    from . import mock_client
+except ImportError:  # Running this file directly as a script
+    from http_pool import async_client_options, current_loop
+    from lazy_imports import lazy_import
+    mock_client = None  # The mock provider needs the hierarchical_planner package
+
 # --- Dependencies ---
 # Install required libraries:
 # pip install openai anthropic google-generativeai python-dotenv
 
-try:
-    import openai
-except ImportError:
+# SDKs are imported on first use (see lazy_imports); None if not installed
+openai = lazy_import('openai', optional=True)
+if openai is None:
     warnings.warn("openai library not found. OpenAI models will not be available. "
                   "Install with: pip install openai")
-    openai = None
 
-try:
-    import anthropic
-except ImportError:
+anthropic = lazy_import('anthropic', optional=True)
+if anthropic is None:
     warnings.warn("anthropic library not found. Anthropic models will not be available. "
                   "Install with: pip install anthropic")
-    anthropic = None
 
-try:
-    import google.generativeai as genai
-    from google.generativeai.types import GenerationConfig, HarmCategory, HarmBlockThreshold
-except ImportError:
+genai = lazy_import('google.generativeai', optional=True)
+if genai is None:
     warnings.warn("google-generativeai library not found. Google models will not be available. "
                   "Install with: pip install google-generativeai")
-    genai = None
 
 # --- Custom Exceptions (Unchanged) ---
 class LLMClientError(Exception):
@@ -54,7 +57,8 @@ class ConfigError(LLMClientError): # New exception for config issues
 # --- The Universal Client (Updated) ---
 class UniversalLLMClient:
     """
-    A universal client wrapper for OpenAI, Anthropic, and Google LLMs.
+    A universal client wrapper for OpenAI, Anthropic, and Google LLMs, plus a
+    local deterministic "mock" provider for offline runs and benchmarks.
 
     Acts as an orchestrator, providing a single interface to generate text
     using different models from various providers. Can use predefined model
@@ -68,7 +72,7 @@ class UniversalLLMClient:
     Alternatively, keys can be passed during initialization.
     """
 
-    SUPPORTED_PROVIDERS = ["openai", "anthropic", "google"]
+    SUPPORTED_PROVIDERS = ["openai", "anthropic", "google", "mock"]
     # Default config file path
     DEFAULT_CONFIG_PATH = "llm_config.json"
     # Default parameters used if not specified in config or generate() call
@@ -82,7 +86,10 @@ class UniversalLLMClient:
         anthropic_api_key: Optional[str] = None,
         google_api_key: Optional[str] = None,
         config_filepath: Optional[str] = DEFAULT_CONFIG_PATH,
-        google_safety_settings: Optional[Dict[HarmCategory, HarmBlockThreshold]] = None
+        google_safety_settings: Optional[Dict["HarmCategory", "HarmBlockThreshold"]] = None,
+        max_connections: int = 20,
+        timeout: float = 600.0,
+        mock_settings: Optional[Dict[str, Any]] = None
     ):
         """
         Initializes the client, loads configurations, and configures API access.
@@ -94,9 +101,20 @@ class UniversalLLMClient:
             config_filepath: Path to the JSON configuration file for model shortcuts.
                              Set to None to disable config loading.
             google_safety_settings: Optional safety settings for Google Gemini models.
+            max_connections: Connection pool size of the async clients used by `agenerate`.
+            timeout: Per-request timeout in seconds for every provider call.
+            mock_settings: Latency, jitter and 429 injection for the "mock" provider
+                           (see `mock_client`); needs no API key.
         """
         self._openai_client = None
         self._anthropic_client = None
+        self._openai_api_key: Optional[str] = None
+        self._anthropic_api_key: Optional[str] = None
+        # Async clients for agenerate(), created lazily per event loop: provider -> (loop, client)
+        self._async_clients: Dict[str, Tuple[Any, Any]] = {}
+        self._http_config = {'http': {'max_connections': max_connections, 'timeout_sec': timeout}}
+        self._timeout = timeout
+        self._mock_config = {'mock': dict(mock_settings or {})}
         self._google_clients: Dict[str, Any] = {}
         self._google_configured = False
         self._google_safety_settings = google_safety_settings # Store safety settings
@@ -133,7 +151,8 @@ class UniversalLLMClient:
             _openai_key = openai_api_key or os.environ.get("OPENAI_API_KEY")
             if _openai_key:
                 try:
-                    self._openai_client = openai.OpenAI(api_key=_openai_key)
+                    self._openai_client = openai.OpenAI(api_key=_openai_key, timeout=timeout)
+                    self._openai_api_key = _openai_key
                 except Exception as e:
                     warnings.warn(f"Failed to initialize OpenAI client: {e}")
 
@@ -141,7 +160,8 @@ class UniversalLLMClient:
             _anthropic_key = anthropic_api_key or os.environ.get("ANTHROPIC_API_KEY")
             if _anthropic_key:
                 try:
-                    self._anthropic_client = anthropic.Anthropic(api_key=_anthropic_key)
+                    self._anthropic_client = anthropic.Anthropic(api_key=_anthropic_key, timeout=timeout)
+                    self._anthropic_api_key = _anthropic_key
                 except Exception as e:
                     warnings.warn(f"Failed to initialize Anthropic client: {e}")
 
@@ -153,6 +173,7 @@ class UniversalLLMClient:
                     self._google_configured = True
                     # Apply default safety settings if not provided
                     if self._google_safety_settings is None:
+                        HarmCategory, HarmBlockThreshold = genai.types.HarmCategory, genai.types.HarmBlockThreshold
                         self._google_safety_settings = {
                             HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
                             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
@@ -238,85 +259,115 @@ class UniversalLLMClient:
             APIRequestError: If the API call to the provider fails.
             LLMClientError: For other client-related issues.
         """
-        provider: Optional[str] = None
-        model_name: Optional[str] = None
-        config_params: Dict[str, Any] = {}
+        provider, model_name, final_max_tokens, final_temperature, final_stop_sequences, final_top_p, provider_kwargs = \
+            self._resolve_request(model, max_tokens, temperature, stop_sequences, top_p, kwargs)
 
-        # 1. Check if 'model' is a nickname in the loaded config
-        if model in self._model_configs:
-            config = self._model_configs[model]
-            provider = config.get("provider")
-            model_name = config.get("model_name")
-
-            if not provider or not model_name:
-                raise ConfigError(
-                    f"Configuration nickname '{model}' is missing required 'provider' or 'model_name' "
-                    f"in file '{self.config_filepath}'."
+        # 4. Call the appropriate provider method
+        try:
+            if provider == "openai":
+                if not self._openai_client:
+                    raise MissingAPIKeyError("OpenAI client not initialized. Check API key or installation.")
+                return self._generate_openai(
+                    model_name, messages, system_prompt,
+                    final_max_tokens, final_temperature, final_stop_sequences, final_top_p,
+                    **provider_kwargs
                 )
-            if provider not in self.SUPPORTED_PROVIDERS:
-                 raise ConfigError(f"Unsupported provider '{provider}' found in config for nickname '{model}'.")
-
-            # Load parameters from config, using class defaults as fallback
-            config_params["temperature"] = config.get("temperature", self.DEFAULT_TEMPERATURE)
-            config_params["max_tokens"] = config.get("max_tokens", self.DEFAULT_MAX_TOKENS)
-            # Add other potential config params here if needed in the future
-            print(f"Using config '{model}': provider={provider}, model={model_name}, params={config_params}")
+            elif provider == "anthropic":
+                if not self._anthropic_client:
+                    raise MissingAPIKeyError("Anthropic client not initialized. Check API key or installation.")
+                # Anthropic requires max_tokens, ensure it has a value
+                if final_max_tokens is None:
+                    final_max_tokens = self.DEFAULT_MAX_TOKENS # Fallback if still None somehow
+                    warnings.warn(f"max_tokens was not specified for Anthropic model '{model_name}', using default {final_max_tokens}.")
 
-        else:
-            # 2. Treat 'model' as a 'provider/model_name' string
-            try:
-                provider, model_name = self._parse_model_string(model)
-                 # Use class defaults when no config is used
-                config_params["temperature"] = self.DEFAULT_TEMPERATURE
-                config_params["max_tokens"] = self.DEFAULT_MAX_TOKENS
-                print(f"Using direct model string: provider={provider}, model={model_name}")
-            except InvalidModelError:
-                 # If it wasn't found in config and isn't a valid string format
-                 raise InvalidModelError(
-                     f"Model identifier '{model}' is not a valid configuration nickname "
-                     f"found in '{getattr(self, 'config_filepath', 'N/A')}' and is not a valid 'provider/model_name' string."
+                return self._generate_anthropic(
+                    model_name, messages, system_prompt,
+                    final_max_tokens, final_temperature, final_stop_sequences,
+                    **provider_kwargs
+                )
+            elif provider == "google":
+                 # Google client/model is fetched/initialized on demand
+                 return self._generate_google(
+                     model_name, messages, system_prompt,
+                     final_max_tokens, final_temperature, final_stop_sequences, final_top_p,
+                     **provider_kwargs
                  )
+            elif provider == "mock":
+                if mock_client is None:
+                    raise LLMClientError("Mock provider is only available when imported from the hierarchical_planner package.")
+                return self._generate_mock(messages, system_prompt)
+            else:
+                # Should be caught earlier, but defensive check
+                raise InvalidModelError(f"Provider '{provider}' selection failed unexpectedly.")
 
-        # 3. Determine final parameters, applying overrides from method arguments
-        final_temperature = temperature if temperature is not None else config_params["temperature"]
-        final_max_tokens = max_tokens if max_tokens is not None else config_params["max_tokens"]
-        final_stop_sequences = stop_sequences # Pass through directly
-        final_top_p = top_p # Pass through directly
+        # --- Error Handling for API Calls (largely unchanged, added context) ---
+        except (openai.APIError, anthropic.APIError, Exception) as e:
+             # Catch specific API errors and general exceptions during the call
+             raise self._map_api_error(e, provider, model_name)
+        except LLMClientError:
+             # Re-raise our custom errors directly
+             raise
+        except Exception as e:
+            # Catch any other unexpected errors
+            raise LLMClientError(f"An unexpected error occurred: {e}")
 
-        # Filter out known params from kwargs to avoid duplication if passed via kwargs too
-        provider_kwargs = {k: v for k, v in kwargs.items() if k not in ['temperature', 'max_tokens', 'stop_sequences', 'top_p']}
 
+    async def agenerate(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        stop_sequences: Optional[List[str]] = None,
+        top_p: Optional[float] = None,
+        **kwargs
+    ) -> str:
+        """
+        Async version of `generate` that never blocks the event loop.
+
+        OpenAI and Anthropic requests go through the providers' async SDK
+        clients over a shared keep-alive connection pool; Google requests use
+        the SDK's async gRPC channel. Arguments, return value and errors are
+        the same as for `generate`.
+        """
+        provider, model_name, final_max_tokens, final_temperature, final_stop_sequences, final_top_p, provider_kwargs = \
+            self._resolve_request(model, max_tokens, temperature, stop_sequences, top_p, kwargs)
 
         # 4. Call the appropriate provider method
         try:
             if provider == "openai":
-                if not self._openai_client:
+                if not self._openai_api_key:
                     raise MissingAPIKeyError("OpenAI client not initialized. Check API key or installation.")
-                return self._generate_openai(
+                return await self._agenerate_openai(
                     model_name, messages, system_prompt,
                     final_max_tokens, final_temperature, final_stop_sequences, final_top_p,
                     **provider_kwargs
                 )
             elif provider == "anthropic":
-                if not self._anthropic_client:
+                if not self._anthropic_api_key:
                     raise MissingAPIKeyError("Anthropic client not initialized. Check API key or installation.")
                 # Anthropic requires max_tokens, ensure it has a value
                 if final_max_tokens is None:
                     final_max_tokens = self.DEFAULT_MAX_TOKENS # Fallback if still None somehow
                     warnings.warn(f"max_tokens was not specified for Anthropic model '{model_name}', using default {final_max_tokens}.")
 
-                return self._generate_anthropic(
+                return await self._agenerate_anthropic(
                     model_name, messages, system_prompt,
                     final_max_tokens, final_temperature, final_stop_sequences,
                     **provider_kwargs
                 )
             elif provider == "google":
                  # Google client/model is fetched/initialized on demand
-                 return self._generate_google(
+                 return await self._agenerate_google(
                      model_name, messages, system_prompt,
                      final_max_tokens, final_temperature, final_stop_sequences, final_top_p,
                      **provider_kwargs
                  )
+            elif provider == "mock":
+                if mock_client is None:
+                    raise LLMClientError("Mock provider is only available when imported from the hierarchical_planner package.")
+                return await self._agenerate_mock(messages, system_prompt)
             else:
                 # Should be caught earlier, but defensive check
                 raise InvalidModelError(f"Provider '{provider}' selection failed unexpectedly.")
@@ -324,17 +375,7 @@ class UniversalLLMClient:
         # --- Error Handling for API Calls (largely unchanged, added context) ---
         except (openai.APIError, anthropic.APIError, Exception) as e:
              # Catch specific API errors and general exceptions during the call
-             err_context = f"provider={provider}, model={model_name}"
-             if isinstance(e, (openai.AuthenticationError, anthropic.AuthenticationError)):
-                 raise MissingAPIKeyError(f"Authentication failed for {err_context}: {e}")
-             elif isinstance(e, (openai.RateLimitError, anthropic.RateLimitError)):
-                 raise APIRequestError(f"Rate limit exceeded for {err_context}: {e}")
-             elif isinstance(e, (openai.NotFoundError, anthropic.NotFoundError)):
-                 raise InvalidModelError(f"Model '{model_name}' not found or invalid for {provider}: {e}")
-             # Add more specific error handling as needed (e.g., Google API errors if distinct types exist)
-             else:
-                 # General API or unexpected error during generation
-                 raise APIRequestError(f"Error during API call for {err_context}: {e}")
+             raise self._map_api_error(e, provider, model_name)
         except LLMClientError:
              # Re-raise our custom errors directly
              raise
@@ -343,12 +384,117 @@ class UniversalLLMClient:
             raise LLMClientError(f"An unexpected error occurred: {e}")
 
 
+    def _resolve_request(self, model: str, max_tokens: Optional[int], temperature: Optional[float],
+                         stop_sequences: Optional[List[str]], top_p: Optional[float],
+                         kwargs: Dict[str, Any]) -> Tuple[str, str, Optional[int], Optional[float], Optional[List[str]], Optional[float], Dict[str, Any]]:
+        """Resolves a model nickname or 'provider/model_name' string and the final call parameters."""
+        provider: Optional[str] = None
+        model_name: Optional[str] = None
+        config_params: Dict[str, Any] = {}
+
+        # 1. Check if 'model' is a nickname in the loaded config
+        if model in self._model_configs:
+            config = self._model_configs[model]
+            provider = config.get("provider")
+            model_name = config.get("model_name")
+
+            if not provider or not model_name:
+                raise ConfigError(
+                    f"Configuration nickname '{model}' is missing required 'provider' or 'model_name' "
+                    f"in file '{self.config_filepath}'."
+                )
+            if provider not in self.SUPPORTED_PROVIDERS:
+                 raise ConfigError(f"Unsupported provider '{provider}' found in config for nickname '{model}'.")
+
+            # Load parameters from config, using class defaults as fallback
+            config_params["temperature"] = config.get("temperature", self.DEFAULT_TEMPERATURE)
+            config_params["max_tokens"] = config.get("max_tokens", self.DEFAULT_MAX_TOKENS)
+            # Add other potential config params here if needed in the future
+            print(f"Using config '{model}': provider={provider}, model={model_name}, params={config_params}")
+
+        else:
+            # 2. Treat 'model' as a 'provider/model_name' string
+            try:
+                provider, model_name = self._parse_model_string(model)
+                 # Use class defaults when no config is used
+                config_params["temperature"] = self.DEFAULT_TEMPERATURE
+                config_params["max_tokens"] = self.DEFAULT_MAX_TOKENS
+                print(f"Using direct model string: provider={provider}, model={model_name}")
+            except InvalidModelError:
+                 # If it wasn't found in config and isn't a valid string format
+                 raise InvalidModelError(
+                     f"Model identifier '{model}' is not a valid configuration nickname "
+                     f"found in '{getattr(self, 'config_filepath', 'N/A')}' and is not a valid 'provider/model_name' string."
+                 )
+
+        # 3. Determine final parameters, applying overrides from method arguments
+        final_temperature = temperature if temperature is not None else config_params["temperature"]
+        final_max_tokens = max_tokens if max_tokens is not None else config_params["max_tokens"]
+        final_stop_sequences = stop_sequences # Pass through directly
+        final_top_p = top_p # Pass through directly
+
+        # Filter out known params from kwargs to avoid duplication if passed via kwargs too
+        provider_kwargs = {k: v for k, v in kwargs.items() if k not in ['temperature', 'max_tokens', 'stop_sequences', 'top_p']}
+        return provider, model_name, final_max_tokens, final_temperature, final_stop_sequences, final_top_p, provider_kwargs
+
+    def _map_api_error(self, e: Exception, provider: Optional[str], model_name: Optional[str]) -> LLMClientError:
+        """Translates a provider SDK exception into the matching client error."""
+        err_context = f"provider={provider}, model={model_name}"
+        if isinstance(e, (openai.AuthenticationError, anthropic.AuthenticationError)):
+            return MissingAPIKeyError(f"Authentication failed for {err_context}: {e}")
+        elif isinstance(e, (openai.RateLimitError, anthropic.RateLimitError)):
+            return APIRequestError(f"Rate limit exceeded for {err_context}: {e}")
+        elif isinstance(e, (openai.NotFoundError, anthropic.NotFoundError)):
+            return InvalidModelError(f"Model '{model_name}' not found or invalid for {provider}: {e}")
+        # Add more specific error handling as needed (e.g., Google API errors if distinct types exist)
+        # General API or unexpected error during generation
+        return APIRequestError(f"Error during API call for {err_context}: {e}")
+
+    def _get_async_client(self, provider: str) -> Any:
+        """Returns the async SDK client for a provider, created once per event loop on the shared pool."""
+        loop = current_loop()
+        cached = self._async_clients.get(provider)
+        if cached is not None and cached[0] is loop:
+            return cached[1]
+        if provider == "openai":
+            client = openai.AsyncOpenAI(api_key=self._openai_api_key, **async_client_options(openai, self._http_config))
+        else:
+            client = anthropic.AsyncAnthropic(api_key=self._anthropic_api_key, **async_client_options(anthropic, self._http_config))
+        self._async_clients[provider] = (loop, client)
+        return client
+
     # --- Provider Specific Methods (_generate_openai, _generate_anthropic, _generate_google) ---
     # (These methods remain largely the same as in the previous version, ensuring they accept
     # the necessary parameters like max_tokens, temperature, stop_sequences, top_p, **kwargs)
 
+    def _generate_mock(self, messages: List[Dict[str, str]], system_prompt: Optional[str]) -> str:
+        """Answers from the local mock provider, blocking for its simulated latency."""
+        return mock_client.generate_content_sync(self._mock_prompt(messages, system_prompt), self._mock_config)
+
+    async def _agenerate_mock(self, messages: List[Dict[str, str]], system_prompt: Optional[str]) -> str:
+        """Answers from the local mock provider without blocking the event loop."""
+        return await mock_client.generate_content(self._mock_prompt(messages, system_prompt), self._mock_config)
+
+    @staticmethod
+    def _mock_prompt(messages: List[Dict[str, str]], system_prompt: Optional[str]) -> str:
+        parts = [system_prompt] if system_prompt else []
+        parts.extend(str(m.get("content", "")) for m in messages)
+        return "\n\n".join(parts)
+
     def _generate_openai(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int], temperature: Optional[float], stop_sequences: Optional[List[str]], top_p: Optional[float], **kwargs) -> str:
         """Handles OpenAI API call."""
+        api_args = self._openai_args(model_name, messages, system_prompt, max_tokens, temperature, stop_sequences, top_p, **kwargs)
+        response = self._openai_client.chat.completions.create(**api_args)
+        return self._openai_text(response)
+
+    async def _agenerate_openai(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int], temperature: Optional[float], stop_sequences: Optional[List[str]], top_p: Optional[float], **kwargs) -> str:
+        """Handles OpenAI API call on the async client."""
+        api_args = self._openai_args(model_name, messages, system_prompt, max_tokens, temperature, stop_sequences, top_p, **kwargs)
+        response = await self._get_async_client("openai").chat.completions.create(**api_args)
+        return self._openai_text(response)
+
+    def _openai_args(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int], temperature: Optional[float], stop_sequences: Optional[List[str]], top_p: Optional[float], **kwargs) -> Dict[str, Any]:
+        """Builds the OpenAI chat completion arguments."""
         openai_messages = []
         if system_prompt:
             openai_messages.append({"role": "system", "content": system_prompt})
@@ -370,13 +516,28 @@ class UniversalLLMClient:
         if stop_sequences is not None: api_args["stop"] = stop_sequences
         if top_p is not None: api_args["top_p"] = top_p
         api_args.update(kwargs) # Add remaining specific kwargs
+        return api_args
 
-        response = self._openai_client.chat.completions.create(**api_args)
+    @staticmethod
+    def _openai_text(response: Any) -> str:
+        """Extracts the text of an OpenAI chat completion."""
         content = response.choices[0].message.content
         return content.strip() if content else ""
 
     def _generate_anthropic(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: int, temperature: Optional[float], stop_sequences: Optional[List[str]], **kwargs) -> str:
         """Handles Anthropic API call. max_tokens is required."""
+        api_args = self._anthropic_args(model_name, messages, system_prompt, max_tokens, temperature, stop_sequences, **kwargs)
+        response = self._anthropic_client.messages.create(**api_args)
+        return self._anthropic_text(response)
+
+    async def _agenerate_anthropic(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: int, temperature: Optional[float], stop_sequences: Optional[List[str]], **kwargs) -> str:
+        """Handles Anthropic API call on the async client. max_tokens is required."""
+        api_args = self._anthropic_args(model_name, messages, system_prompt, max_tokens, temperature, stop_sequences, **kwargs)
+        response = await self._get_async_client("anthropic").messages.create(**api_args)
+        return self._anthropic_text(response)
+
+    def _anthropic_args(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: int, temperature: Optional[float], stop_sequences: Optional[List[str]], **kwargs) -> Dict[str, Any]:
+        """Builds the Anthropic messages arguments."""
         anthropic_messages = []
         valid_roles = {"user", "assistant"}
         for msg in messages:
@@ -397,9 +558,11 @@ class UniversalLLMClient:
         if stop_sequences is not None: api_args["stop_sequences"] = stop_sequences
         # Add other Anthropic specific params like top_p, top_k if needed from kwargs
         api_args.update(kwargs)
+        return api_args
 
-        response = self._anthropic_client.messages.create(**api_args)
-
+    @staticmethod
+    def _anthropic_text(response: Any) -> str:
+        """Concatenates the text blocks of an Anthropic message."""
         content = ""
         if response.content:
             for block in response.content:
@@ -412,6 +575,25 @@ class UniversalLLMClient:
 
     def _generate_google(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int], temperature: Optional[float], stop_sequences: Optional[List[str]], top_p: Optional[float], **kwargs) -> str:
         """Handles Google Gemini API call."""
+        google_model, request = self._google_request(model_name, messages, system_prompt, max_tokens, temperature, stop_sequences, top_p, **kwargs)
+        try:
+            response = google_model.generate_content(**request)
+        except Exception as e:
+             # Catch potential google-specific API call errors here
+             raise APIRequestError(f"Error during Google Gemini API call for model '{model_name}': {e}")
+        return self._google_text(response, model_name)
+
+    async def _agenerate_google(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int], temperature: Optional[float], stop_sequences: Optional[List[str]], top_p: Optional[float], **kwargs) -> str:
+        """Handles Google Gemini API call on the SDK's async gRPC channel."""
+        google_model, request = self._google_request(model_name, messages, system_prompt, max_tokens, temperature, stop_sequences, top_p, **kwargs)
+        try:
+            response = await google_model.generate_content_async(**request)
+        except Exception as e:
+             raise APIRequestError(f"Error during Google Gemini API call for model '{model_name}': {e}")
+        return self._google_text(response, model_name)
+
+    def _google_request(self, model_name: str, messages: List[Dict[str, str]], system_prompt: Optional[str], max_tokens: Optional[int], temperature: Optional[float], stop_sequences: Optional[List[str]], top_p: Optional[float], **kwargs) -> Tuple[Any, Dict[str, Any]]:
+        """Returns the Gemini model and the generate_content arguments for a request."""
         google_model = self._get_google_model(model_name)
 
         google_contents = []
@@ -464,21 +646,18 @@ class UniversalLLMClient:
         # top_k could also be added here from kwargs if needed
         generation_config_args.update(kwargs) # Add other specific kwargs
 
-        generation_config = GenerationConfig(**generation_config_args)
-
-        # Call the API
-        try:
-            response = google_model.generate_content(
-                contents=google_contents,
-                generation_config=generation_config,
-                safety_settings=self._google_safety_settings,
-                # **kwargs # kwargs are now merged into generation_config
-            )
-        except Exception as e:
-             # Catch potential google-specific API call errors here
-             raise APIRequestError(f"Error during Google Gemini API call for model '{model_name}': {e}")
+        generation_config = genai.types.GenerationConfig(**generation_config_args)
 
+        return google_model, {
+            "contents": google_contents,
+            "generation_config": generation_config,
+            "safety_settings": self._google_safety_settings,
+            "request_options": {"timeout": self._timeout},
+        }
 
+    @staticmethod
+    def _google_text(response: Any, model_name: str) -> str:
+        """Extracts the text of a Gemini response, warning on empty or blocked results."""
         # Extract text (same logic as before)
         try:
             if hasattr(response, 'text') and response.text: